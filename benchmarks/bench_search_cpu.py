@@ -0,0 +1,96 @@
+"""Micro-benchmark for the CPU trajectory evaluation kernels.
+
+Compares the throughput (trajectories per second on a single core) of the
+vectorized block kernel against the scalar per-trajectory kernel for each
+of the supported psi/phi encodings.
+"""
+
+import timeit
+import numpy as np
+
+from kbmod.fake_data.fake_data_creator import make_fake_layered_image
+from kbmod.search import (
+    PSF,
+    ImageStack,
+    PsiPhiArray,
+    evaluate_trajectories_cpu,
+    fill_psi_phi_array_from_image_stack,
+)
+from kbmod.trajectory_utils import make_trajectory
+
+
+def set_up_psi_phi(num_times=100, width=256, height=256, num_bytes=4):
+    """Create a PsiPhiArray from a stack of fake images.
+
+    Parameters
+    ----------
+    num_times : `int`
+        The number of images.
+    width : `int`
+        The width of the images in pixels.
+    height : `int`
+        The height of the images in pixels.
+    num_bytes : `int`
+        The number of bytes to use for the psi/phi encoding.
+
+    Returns
+    -------
+    psi_phi : `PsiPhiArray`
+        The filled data.
+    """
+    imgs = []
+    for i in range(num_times):
+        imgs.append(make_fake_layered_image(width, height, 2.0, 4.0, i / num_times, PSF(1.0), seed=i))
+    psi_phi = PsiPhiArray()
+    fill_psi_phi_array_from_image_stack(psi_phi, ImageStack(imgs), num_bytes, False)
+    return psi_phi
+
+
+def bench_kernel(psi_phi, candidates, use_block_kernel, do_sigmag=False):
+    """Benchmark a single kernel configuration.
+
+    Parameters
+    ----------
+    psi_phi : `PsiPhiArray`
+        The data to search.
+    candidates : `list` of `Trajectory`
+        The candidate velocities.
+    use_block_kernel : `bool`
+        Use the vectorized block kernel instead of the scalar one.
+    do_sigmag : `bool`
+        Apply sigma-G filtering to each candidate.
+
+    Returns
+    -------
+    trjs_per_sec : `float`
+        The number of trajectories evaluated per second.
+    """
+    tmr = timeit.Timer(
+        stmt="evaluate_trajectories_cpu(psi_phi, 128, 128, candidates, use_block_kernel, do_sigmag)",
+        globals={**globals(), **locals()},
+    )
+    res_time = np.min(tmr.repeat(repeat=5, number=5)) / 5.0
+    return len(candidates) / res_time
+
+
+def run_all_benchmarks():
+    candidates = [
+        make_trajectory(vx=float(vx), vy=float(vy))
+        for vx in np.linspace(-50, 50, 64)
+        for vy in np.linspace(-50, 50, 64)
+    ]
+
+    print("Encoding | SigmaG |  Scalar (trj/s) |   Block (trj/s) | Speedup")
+    print("-" * 66)
+    for num_bytes in [1, 2, 4]:
+        psi_phi = set_up_psi_phi(num_bytes=num_bytes)
+        for do_sigmag in [False, True]:
+            scalar = bench_kernel(psi_phi, candidates, False, do_sigmag)
+            block = bench_kernel(psi_phi, candidates, True, do_sigmag)
+            print(
+                f"{num_bytes:8d} | {str(do_sigmag):6s} | {scalar:15.0f} | {block:15.0f} | {block / scalar:7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    run_all_benchmarks()
@@ -48,11 +48,14 @@ class SearchConfiguration:
             "cluster_function": "DBSCAN",
             "cluster_type": "all",
             "debug": False,
+            "dedup_radius": None,
             "do_clustering": True,
             "do_mask": True,
             "do_stamp_filter": True,
             "eps": 0.03,
+            "encode_clip_frac": 0.0,
             "encode_num_bytes": -1,
+            "encode_per_time": False,
             "flag_keys": default_flag_keys,
             "gpu_filter": False,
             "ind_output_files": True,
@@ -67,18 +70,23 @@ class SearchConfiguration:
             "mask_num_images": 2,
             "mask_threshold": None,
             "max_lh": 1000.0,
+            "max_results": 1000000,
             "mjd_lims": None,
             "mom_lims": [35.5, 35.5, 2.0, 0.3, 0.3],
             "num_cores": 1,
             "num_obs": 10,
             "output_suffix": "search",
             "peak_offset": [2.0, 2.0],
+            "pool_type": "thread",
             "psf_val": 1.4,
             "psf_file": None,
+            "psi_phi_cache_dir": None,
+            "psi_phi_tile_size": None,
             "repeated_flag_keys": default_repeated_flag_keys,
             "res_filepath": None,
             "result_filename": None,
             "save_all_stamps": False,
+            "search_tile_size": None,
             "sigmaG_lims": [25, 75],
             "stamp_radius": 10,
             "stamp_type": "sum",
@@ -296,6 +296,8 @@ def load_input_from_file(filename, overrides=None):
                 return load_input_from_config(config)
     elif ".fits" in filename:
         work = WorkUnit.from_fits(filename)
+    elif path_suffix == ".kbwu":
+        work = WorkUnit.from_binary(filename)
 
     # None of the load paths worked.
     if work is None:
@@ -0,0 +1,118 @@
+"""Tools for measuring how much the compressed psi/phi encodings change the search results.
+
+Encoding psi and phi to 1 or 2 bytes reduces the memory footprint of the search, but
+quantizes the values. `encoding_accuracy_report` evaluates a set of trajectories using
+both the float and the compressed encodings and reports the differences in the
+likelihood and flux.
+"""
+
+import numpy as np
+from astropy.table import Table
+
+from kbmod.search import StackSearch, Logging
+
+
+logger = Logging.getLogger(__name__)
+
+
+def _compute_lh_and_flux(psi_curves, phi_curves):
+    """Compute the likelihood and flux of each trajectory from its psi and phi curves.
+
+    Parameters
+    ----------
+    psi_curves : `numpy.ndarray`
+        A (N, T) array of psi values with invalid values set to 0.0.
+    phi_curves : `numpy.ndarray`
+        A (N, T) array of phi values with invalid values set to 0.0.
+
+    Returns
+    -------
+    lh, flux : `numpy.ndarray`, `numpy.ndarray`
+        Length N arrays of the likelihoods and fluxes (0.0 where the sum of phi is not positive).
+    """
+    psi_sum = np.sum(psi_curves, axis=1, dtype=np.float64)
+    phi_sum = np.sum(phi_curves, axis=1, dtype=np.float64)
+    valid = phi_sum > 0.0
+
+    lh = np.zeros(len(psi_sum))
+    flux = np.zeros(len(psi_sum))
+    lh[valid] = psi_sum[valid] / np.sqrt(phi_sum[valid])
+    flux[valid] = psi_sum[valid] / phi_sum[valid]
+    return lh, flux
+
+
+def encoding_accuracy_report(stack, trajectories, num_bytes=1, per_time_scaling=False, clip_fraction=0.0):
+    """Compare the likelihoods and fluxes of trajectories computed from the float psi/phi
+    data with those computed from a compressed encoding.
+
+    Parameters
+    ----------
+    stack : `ImageStack`
+        The images to search.
+    trajectories : `list` of `Trajectory` or `numpy.ndarray`
+        The trajectories to evaluate given either as a list of Trajectory objects
+        or as a (N, 4) array where each row is (x, y, vx, vy).
+    num_bytes : `int`
+        The number of bytes for the compressed encoding (1 or 2).
+    per_time_scaling : `bool`
+        Use separate encoding parameters for each time step.
+    clip_fraction : `float`
+        The fraction of the values at each end to ignore when computing the encoding bounds.
+
+    Returns
+    -------
+    report : `astropy.table.Table`
+        A table with one row per trajectory containing the float and encoded likelihoods
+        and fluxes and their absolute errors. The table's meta data holds summary statistics
+        (the mean and maximum absolute errors and the maximum relative likelihood error).
+
+    Raises
+    ------
+    Raises a ``ValueError`` if the number of bytes is not 1 or 2.
+    """
+    if num_bytes not in [1, 2]:
+        raise ValueError(f"Invalid number of bytes {num_bytes}. Expected 1 or 2.")
+    if isinstance(trajectories, np.ndarray):
+        trajectories = np.asarray(trajectories, dtype=np.float32)
+
+    float_search = StackSearch(stack)
+    float_lh, float_flux = _compute_lh_and_flux(*float_search.get_psi_phi_curves(trajectories))
+    float_search.clear_psi_phi()
+
+    encoded_search = StackSearch(stack)
+    encoded_search.enable_gpu_encoding(num_bytes)
+    encoded_search.set_encoding_scaling(per_time_scaling, clip_fraction)
+    encoded_lh, encoded_flux = _compute_lh_and_flux(*encoded_search.get_psi_phi_curves(trajectories))
+    encoded_search.clear_psi_phi()
+
+    lh_error = np.abs(encoded_lh - float_lh)
+    flux_error = np.abs(encoded_flux - float_flux)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lh_rel_error = np.where(np.abs(float_lh) > 0.0, lh_error / np.abs(float_lh), 0.0)
+
+    report = Table(
+        {
+            "float_lh": float_lh,
+            "encoded_lh": encoded_lh,
+            "lh_error": lh_error,
+            "float_flux": float_flux,
+            "encoded_flux": encoded_flux,
+            "flux_error": flux_error,
+        }
+    )
+    report.meta["num_bytes"] = num_bytes
+    report.meta["per_time_scaling"] = per_time_scaling
+    report.meta["clip_fraction"] = clip_fraction
+    if len(report) > 0:
+        report.meta["mean_lh_error"] = float(np.mean(lh_error))
+        report.meta["max_lh_error"] = float(np.max(lh_error))
+        report.meta["max_lh_rel_error"] = float(np.max(lh_rel_error))
+        report.meta["mean_flux_error"] = float(np.mean(flux_error))
+        report.meta["max_flux_error"] = float(np.max(flux_error))
+        logger.info(
+            f"Encoding to {num_bytes} bytes (per_time_scaling={per_time_scaling}, "
+            f"clip_fraction={clip_fraction}): mean LH error={report.meta['mean_lh_error']:.4g}, "
+            f"max LH error={report.meta['max_lh_error']:.4g}, "
+            f"max flux error={report.meta['max_flux_error']:.4g}"
+        )
+    return report
@@ -1,11 +1,27 @@
 import abc
+import numpy as np
 
 from kbmod.result_list import *
 
 
 class RowFilter(abc.ABC):
     """The base class for derived filters on the ResultList
-    that operate on the results one row at a time."""
+    that operate on the results one row at a time.
+
+    Filters that only need a single array valued column of the rows (such as
+    the stamp) can set ``data_column`` to the name of that ``ResultRow``
+    attribute and implement `keep_data`. The ResultList then applies them to
+    a single array holding that column, which a `WorkerPool` splits over its
+    workers without copying the full rows.
+
+    Attributes
+    ----------
+    data_column : `str` or `None`
+        The name of the ``ResultRow`` attribute used by `keep_data` or ``None``
+        if the filter only supports `keep_row`.
+    """
+
+    data_column = None
 
     def __init__(self, *args, **kwargs):
         pass
@@ -38,6 +54,41 @@ class RowFilter(abc.ABC):
         """
         pass
 
+    def get_column_data(self, values):
+        """Combine the ``data_column`` values of the rows into a single array.
+
+        Parameters
+        ----------
+        values : `list`
+            The value of ``data_column`` for each row.
+
+        Returns
+        -------
+        data : `numpy.ndarray`
+            An array with one entry for each valid value.
+        valid : `numpy.ndarray`
+            A Boolean array indicating which values are valid. Rows without
+            valid data are not kept.
+        """
+        valid = np.array([value is not None for value in values], dtype=bool)
+        data = np.array([value for value in values if value is not None])
+        return data, valid
+
+    def keep_data(self, data):
+        """Determine which rows to keep from a block of the ``data_column`` values.
+
+        Parameters
+        ----------
+        data : `numpy.ndarray`
+            An array with one entry per row, as created by `get_column_data`.
+
+        Returns
+        -------
+        keep : `numpy.ndarray`
+           A Boolean array indicating whether to keep each row.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support filtering column data.")
+
 
 class BatchFilter(abc.ABC):
     """The base class for derived filters on the ResultList
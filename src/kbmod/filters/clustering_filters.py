@@ -1,25 +1,40 @@
 import numpy as np
 from sklearn.cluster import DBSCAN
 
+import kbmod.search as kb
 from kbmod.filters.base_filter import BatchFilter
 from kbmod.result_list import ResultList, ResultRow
 
 
 class DBSCANFilter(BatchFilter):
-    """Cluster the candidates using DBSCAN and only keep a
-    single representative trajectory from each cluster."""
+    """Cluster the candidates using DBSCAN (with ``min_samples=1``) and only keep
+    a single representative trajectory, the one with the highest likelihood, from
+    each cluster.
 
-    def __init__(self, eps, *args, **kwargs):
+    By default the clusters are computed with the native grid-based clustering
+    (``kbmod.search.cluster_grid``), which gives the same clusters as DBSCAN
+    using a spatial hash instead of computing every point's neighborhood.
+    """
+
+    valid_backends = ["grid", "sklearn"]
+
+    def __init__(self, eps, *args, backend="grid", **kwargs):
         """Create a DBSCANFilter.
 
         Parameters
         ----------
         eps : `float`
             The clustering threshold.
+        backend : `str`
+            The clustering implementation to use: "grid" for the native grid-based
+            clustering or "sklearn" for scikit-learn's DBSCAN.
         """
         super().__init__(*args, **kwargs)
+        if backend not in DBSCANFilter.valid_backends:
+            raise ValueError(f"Unknown clustering backend {backend}")
 
         self.eps = eps
+        self.backend = backend
         self.cluster_type = ""
         self.cluster_args = dict(eps=self.eps, min_samples=1, n_jobs=-1)
 
@@ -63,17 +78,19 @@ class DBSCANFilter(BatchFilter):
            A list of indices (int) indicating which rows to keep.
         """
         data = self._build_clustering_data(result_list)
-
-        # Set up the clustering algorithm
-        cluster = DBSCAN(**self.cluster_args)
-        cluster.fit(np.array(data, dtype=float).T)
-
-        # Get the best index per cluster.
-        top_vals = []
-        for cluster_num in np.unique(cluster.labels_):
-            cluster_vals = np.where(cluster.labels_ == cluster_num)[0]
-            top_vals.append(cluster_vals[0])
-        return top_vals
+        points = np.array(data, dtype=float).T
+
+        if self.backend == "grid":
+            labels = kb.cluster_grid(points, self.eps)
+        else:
+            labels = DBSCAN(**self.cluster_args).fit(points).labels_
+
+        # Get the best index per cluster by sorting on (cluster, -likelihood). The sort
+        # is stable, so ties are broken by the lower index.
+        lh = np.array(result_list.get_result_values("final_likelihood"), dtype=float)
+        order = np.lexsort((-lh, labels))
+        _, first = np.unique(labels[order], return_index=True)
+        return np.sort(order[first]).tolist()
 
 
 class ClusterPositionFilter(DBSCANFilter):
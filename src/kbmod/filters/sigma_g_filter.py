@@ -5,11 +5,11 @@ Sifting Through the Static: Moving Objectg Detection in Difference Images
 by Smotherman et. al. 2021
 """
 
-import multiprocessing as mp
 import numpy as np
+import warnings
 from scipy.special import erfinv
 
-from kbmod.result_list import ResultList, ResultRow
+from kbmod.result_list import ColumnarResultList, ResultList, ResultRow
 
 
 class SigmaGClipping:
@@ -115,6 +115,58 @@ class SigmaGClipping:
 
         return good_index
 
+    def compute_clipped_sigma_g_matrix(self, lh):
+        """Compute the SigmaG clipping on a batch of likelihood curves at once. The
+        percentiles, medians, and keep masks are computed for all rows in a single vectorized
+        pass and give the same results as calling ``compute_clipped_sigma_g`` on each row.
+
+        Parameters
+        ----------
+        lh : numpy array
+            A (N, T) array with one likelihood curve per row.
+
+        Returns
+        -------
+        keep : numpy array
+            A (N, T) Boolean array indicating which entries pass the filtering.
+
+        Raises
+        ------
+        Raises a ``ValueError`` if the input is not a two dimensional array.
+        """
+        lh = np.asarray(lh)
+        if lh.ndim != 2:
+            raise ValueError(f"Expected a two dimensional array of likelihoods, got shape {lh.shape}")
+        keep = np.zeros(lh.shape, dtype=bool)
+        if lh.shape[0] == 0 or lh.shape[1] == 0:
+            return keep
+
+        if self.clip_negative:
+            # Only the positive values are used to compute the percentiles. NaNs are never
+            # positive, so they are excluded as well. Rows without any positive values are
+            # clipped entirely (and skipped here to avoid all-NaN percentile warnings).
+            is_pos = lh > 0
+            rows = np.flatnonzero(np.any(is_pos, axis=1))
+            if len(rows) == 0:
+                return keep
+            lh = lh[rows]
+            pct = np.nanpercentile(
+                np.where(is_pos[rows], lh, np.nan), [self.low_bnd, 50, self.high_bnd], axis=1
+            )
+        else:
+            rows = slice(None)
+            pct = np.percentile(lh, [self.low_bnd, 50, self.high_bnd], axis=1)
+        lower_per, median, upper_per = pct[0][:, None], pct[1][:, None], pct[2][:, None]
+
+        delta = np.maximum(upper_per - lower_per, 1e-8)
+        nSigmaG = self.n_sigma * self.coeff * delta
+
+        row_keep = np.logical_and(lh > median - nSigmaG, lh < median + nSigmaG)
+        if self.clip_negative:
+            row_keep &= lh != 0
+        keep[rows] = row_keep
+        return keep
+
 
 def apply_single_clipped_sigma_g(params, result):
     """This function applies a clipped median filter to a single result from
@@ -131,31 +183,55 @@ def apply_single_clipped_sigma_g(params, result):
     result.filter_indices(single_res)
 
 
-def apply_clipped_sigma_g(params, result_list, num_threads=1):
+def _compute_sigma_g_mask(params, lh, pool=None):
+    """Compute the sigmaG keep mask for a matrix of likelihood curves, optionally
+    splitting the rows over a pool of workers.
+    """
+    if pool is None:
+        return params.compute_clipped_sigma_g_matrix(lh)
+    return pool.map_rows(params.compute_clipped_sigma_g_matrix, lh)
+
+
+def apply_clipped_sigma_g(params, result_list, num_threads=None, pool=None):
     """This function applies a clipped median filter to the results of a KBMOD
-    search using sigmaG as a robust estimater of standard deviation.
+    search using sigmaG as a robust estimater of standard deviation. The likelihood
+    curves of all the results are filtered together with a single call to
+    ``SigmaGClipping.compute_clipped_sigma_g_matrix``.
 
     Parameters
     ----------
     params : `SigmaGClipping`
         The object to apply the SigmaG clipping.
-    result_list : `ResultList`
+    result_list : `ResultList` or `ColumnarResultList`
         The values from trajectories. This data gets modified directly by the filtering.
-    num_threads : `int`
-        The number of threads to use.
+    num_threads : `int`, optional
+        Deprecated and ignored. The batch computation is vectorized; use ``pool``
+        to split it over multiple workers.
+    pool : `WorkerPool`, optional
+        A persistent pool of workers. If given, the rows of the likelihood matrix are
+        split over the workers (only the likelihood matrix is sent to the workers).
     """
-    if num_threads > 1:
-        lh_list = [[row.likelihood_curve] for row in result_list.results]
-
-        keep_idx_results = []
-        pool = mp.Pool(processes=num_threads)
-        keep_idx_results = pool.starmap_async(params.compute_clipped_sigma_g, lh_list)
-        pool.close()
-        pool.join()
-        keep_idx_results = keep_idx_results.get()
-
-        for i, res in enumerate(keep_idx_results):
-            result_list.results[i].filter_indices(res)
-    else:
-        for row in result_list.results:
-            apply_single_clipped_sigma_g(params, row)
+    if num_threads is not None:
+        warnings.warn(
+            "The num_threads parameter of apply_clipped_sigma_g is deprecated and ignored. "
+            "Pass a WorkerPool as pool to filter with multiple workers.",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+
+    if isinstance(result_list, ColumnarResultList):
+        psi = result_list.get_column("psi_curve")
+        phi = result_list.get_column("phi_curve")
+        if psi is None or phi is None:
+            raise ValueError("Sigma-G filtering requires the psi and phi curves.")
+        lh = psi / np.sqrt(np.where(phi == 0, 1e12, phi))
+        keep = _compute_sigma_g_mask(params, lh, pool)
+        result_list.set_valid_mask(keep & result_list.get_column("valid"))
+        return
+
+    if result_list.num_results() == 0:
+        return
+    lh = np.array([row.likelihood_curve for row in result_list.results])
+    keep = _compute_sigma_g_mask(params, lh, pool)
+    for i, row in enumerate(result_list.results):
+        row.filter_indices(np.flatnonzero(keep[i]))
@@ -9,6 +9,7 @@ import numpy as np
 import time
 
 from kbmod.configuration import SearchConfiguration
+from kbmod.filters.base_filter import RowFilter
 from kbmod.result_list import ResultRow
 from kbmod.search import (
     HAS_GPU,
@@ -24,9 +25,12 @@ from kbmod.search import (
 logger = Logging.getLogger(__name__)
 
 
-class BaseStampFilter(abc.ABC):
+class BaseStampFilter(RowFilter):
     """The base class for the various stamp filters.
 
+    The filters use only the rows' stamps, so they can be applied to a single
+    array of stamps with `keep_data`.
+
     Attributes
     ----------
     stamp_radius : ``int``
@@ -35,6 +39,8 @@ class BaseStampFilter(abc.ABC):
         The width of the stamp.
     """
 
+    data_column = "stamp"
+
     def __init__(self, stamp_radius, *args, **kwargs):
         """Store data needed for all stamp filters."""
         super().__init__(*args, **kwargs)
@@ -44,30 +50,115 @@ class BaseStampFilter(abc.ABC):
         self.stamp_radius = stamp_radius
         self.width = 2 * stamp_radius + 1
 
-    def _check_row_valid(self, row: ResultRow) -> bool:
+    def _check_stamp_valid(self, stamp) -> bool:
         """Checks whether a stamp is valid for this filter.
 
         Parameters
         ----------
-        row : ResultRow
-            The row to evaluate.
+        stamp : `numpy.ndarray` or `None`
+            The stamp to evaluate.
 
         Returns
         -------
         bool
-           An indicator of whether the row is valid.
+           An indicator of whether the stamp is valid.
         """
         # Filter any row without a stamp.
-        if row.stamp is None:
+        if stamp is None:
             return False
 
         # Check the stamp's number of elements is correct.
         # This can be as a square stamp or a linear array.
-        if row.stamp.size != self.width * self.width:
+        if stamp.size != self.width * self.width:
             return False
 
         return True
 
+    def _check_row_valid(self, row: ResultRow) -> bool:
+        """Checks whether a stamp is valid for this filter.
+
+        Parameters
+        ----------
+        row : ResultRow
+            The row to evaluate.
+
+        Returns
+        -------
+        bool
+           An indicator of whether the row is valid.
+        """
+        return self._check_stamp_valid(row.stamp)
+
+    @abc.abstractmethod
+    def _keep_stamp(self, stamp) -> bool:
+        """Determine whether to keep a single (valid) stamp.
+
+        Parameters
+        ----------
+        stamp : `numpy.ndarray`
+            The stamp to evaluate.
+
+        Returns
+        -------
+        bool
+           An indicator of whether to keep the stamp.
+        """
+        pass
+
+    def keep_row(self, row: ResultRow):
+        """Determine whether to keep an individual row based on its stamp.
+
+        Parameters
+        ----------
+        row : ResultRow
+            The row to evaluate.
+
+        Returns
+        -------
+        bool
+           An indicator of whether to keep the row.
+        """
+        # Filter rows without a valid stamp.
+        if not self._check_row_valid(row):
+            return False
+        return self._keep_stamp(row.stamp)
+
+    def get_column_data(self, values):
+        """Combine the rows' stamps into a single (N, width, width) array.
+
+        Parameters
+        ----------
+        values : `list`
+            The stamp of each row.
+
+        Returns
+        -------
+        data : `numpy.ndarray`
+            The valid stamps.
+        valid : `numpy.ndarray`
+            A Boolean array indicating which stamps are valid.
+        """
+        valid = np.array([self._check_stamp_valid(stamp) for stamp in values], dtype=bool)
+        data = np.zeros((np.count_nonzero(valid), self.width, self.width), dtype=np.single)
+        for i, ind in enumerate(np.flatnonzero(valid)):
+            data[i] = np.reshape(values[ind], (self.width, self.width))
+        return data, valid
+
+    def keep_data(self, data):
+        """Determine which stamps in an array of stamps to keep.
+
+        Parameters
+        ----------
+        data : `numpy.ndarray`
+            A (N, width, width) array of stamps.
+
+        Returns
+        -------
+        keep : `numpy.ndarray`
+           A Boolean array indicating whether to keep each stamp.
+        """
+        return np.array([self._keep_stamp(stamp) for stamp in data], dtype=bool)
+
 
 class StampPeakFilter(BaseStampFilter):
     """A filter on how far the stamp's peak is from the center.
@@ -98,26 +189,20 @@ class StampPeakFilter(BaseStampFilter):
         """
         return f"StampPeakFilter_{self.x_thresh}_{self.y_thresh}"
 
-    def keep_row(self, row: ResultRow):
-        """Determine whether to keep an individual row based on
-        the offset of the stamp's peak.
+    def _keep_stamp(self, stamp):
+        """Determine whether to keep a stamp based on the offset of its peak.
 
         Parameters
         ----------
-        row : ResultRow
-            The row to evaluate.
+        stamp : `numpy.ndarray`
+            The stamp to evaluate.
 
         Returns
         -------
         bool
-           An indicator of whether to keep the row.
+           An indicator of whether to keep the stamp.
         """
-        # Filter rows without a valid stamp.
-        if not self._check_row_valid(row):
-            return False
-
         # Find the peak in the image.
-        stamp = row.stamp
         peak_pos = RawImage(stamp).find_peak(True)
         return (
             abs(peak_pos.i - self.stamp_radius) < self.x_thresh
@@ -174,26 +259,21 @@ class StampMomentsFilter(BaseStampFilter):
             f"_m11_{self.m11_thresh}_m02_{self.m02_thresh}_m20_{self.m20_thresh}"
         )
 
-    def keep_row(self, row: ResultRow):
-        """Determine whether to keep an individual row based on
-        how well the stamp's moments match that of a Gaussian.
+    def _keep_stamp(self, stamp):
+        """Determine whether to keep a stamp based on how well its moments
+        match that of a Gaussian.
 
         Parameters
         ----------
-        row : ResultRow
-            The row to evaluate.
+        stamp : `numpy.ndarray`
+            The stamp to evaluate.
 
         Returns
         -------
         bool
-           An indicator of whether to keep the row.
+           An indicator of whether to keep the stamp.
         """
-        # Filter rows without a valid stamp.
-        if not self._check_row_valid(row):
-            return False
-
-        # Find the peack in the image.
-        stamp = row.stamp
+        # Find the moments of the image.
         moments = RawImage(stamp).find_central_moments()
         return (
             (abs(moments.m01) < self.m01_thresh)
@@ -236,20 +316,20 @@ class StampCenterFilter(BaseStampFilter):
         """
         return f"StampCenterFilter_{self.local_max}_{self.flux_thresh}"
 
-    def keep_row(self, row: ResultRow):
-        """Determine whether the center pixel meets the filtering criteria.
+    def _keep_stamp(self, stamp):
+        """Determine whether the stamp's center pixel meets the filtering criteria.
 
         Parameters
         ----------
-        row : ResultRow
-            The row to evaluate.
+        stamp : `numpy.ndarray`
+            The stamp to evaluate.
 
         Returns
         -------
         bool
-           An indicator of whether to keep the row.
+           An indicator of whether to keep the stamp.
         """
-        image = RawImage(row.stamp)
+        image = RawImage(stamp)
         return image.center_is_local_max(self.flux_thresh, self.local_max)
 
 
@@ -358,23 +438,19 @@ def get_coadds_and_filter(result_list, im_stack, stamp_params, chunk_size=100000
 
         # Create and filter the results, using the GPU if there is one and enough
         # trajectories to make it worthwhile.
-        stamps_slice = StampCreator.get_coadded_stamps(
-            im_stack,
-            trj_slice,
-            bool_slice,
-            stamp_params,
-            HAS_GPU and len(trj_slice) > 100,
-        )
-        # TODO: a way to avoid a copy here would be to do
-        # np.array([s.image for s in stamps], dtype=np.single, copy=False)
-        # but that could cause a problem with reference counting at the m
-        # moment. The real fix is to make the stamps return Image not
-        # RawImage and avoid reference to an private attribute and risking
-        # collecting RawImage but leaving a dangling ref to the attribute.
-        # That's a fix for another time so I'm leaving it as a copy here
-        for ind, stamp in enumerate(stamps_slice):
-            if stamp.width > 1:
-                result_list.results[ind + start_idx].stamp = np.array(stamp.image)
+        if HAS_GPU and len(trj_slice) > 100:
+            stamps_slice = StampCreator.get_coadded_stamps(
+                im_stack, trj_slice, bool_slice, stamp_params, True
+            )
+            for ind, stamp in enumerate(stamps_slice):
+                if stamp.width > 1:
+                    result_list.results[ind + start_idx].stamp = np.array(stamp.image)
+                    all_valid_inds.append(ind + start_idx)
+        else:
+            # On the CPU, create all of the stamps for the chunk as a single array.
+            stamps, keep = StampCreator.get_coadded_stamp_array(im_stack, trj_slice, bool_slice, stamp_params)
+            for ind in np.flatnonzero(keep):
+                result_list.results[ind + start_idx].stamp = stamps[ind]
                 all_valid_inds.append(ind + start_idx)
 
         # Move to the next chunk.
@@ -7,6 +7,7 @@ input FITS files that is used during a variety of analysis.
 import os
 import glob
 import json
+from functools import partial
 
 from astropy.table import Table
 from astropy.wcs import WCS
@@ -14,9 +15,10 @@ from astropy.utils import isiterable
 
 import numpy as np
 
-from kbmod.search import ImageStack
+from kbmod.search import ImageStack, Logging
 from .standardizers import Standardizer
 from .work_unit import WorkUnit
+from .worker_pool import WorkerPool
 
 
 __all__ = [
@@ -24,6 +26,180 @@ __all__ = [
 ]
 
 
+logger = Logging.getLogger(__name__)
+
+
+def _unravel_metadata(std):
+    """Standardize the metadata of a `Standardizer` and "unravel" it into one
+    row per processable item. See `ImageCollection.fromStandardizers`.
+
+    Parameters
+    ----------
+    std : `Standardizer`
+        The standardizer.
+
+    Returns
+    -------
+    rows : `list`
+        A list of dictionaries, one per processable item, without the
+        ``std_idx`` lookup index (which depends on the collection).
+    """
+    # needs a "validate standardized" method here or in standardizers
+    stdMeta = std.standardizeMetadata()
+
+    # unravel all standardized keys whose values are iterables unless
+    # they are a string. "Unraveling" means that each processable item
+    # of standardizer gets its own row. Each non-iterable standardized
+    # item is copied into that row. F.e. "a.fits" with 3 images becomes
+    # location    std_vals
+    #  a.fits     ...1
+    #  a.fits     ...2
+    #  a.fits     ...3
+    unravelColumns = [key for key, val in stdMeta.items() if isiterable(val) and not isinstance(val, str)]
+    rows = []
+    for j, ext in enumerate(std.processable):
+        row = {}
+        for key in stdMeta.keys():
+            if key in unravelColumns:
+                row[key] = stdMeta[key][j]
+            else:
+                row[key] = stdMeta[key]
+        row["std_idx"] = None
+        row["ext_idx"] = j
+        row["std_name"] = std.name
+        rows.append(row)
+    return rows
+
+
+def _serialize_wcs(wcs):
+    """Serialize a WCS, including the image dimensions, as a header string."""
+    if wcs is None:
+        return None
+    header = wcs.to_header(relax=True)
+    if wcs.pixel_shape is not None:
+        # pixel_shape is in the FITS (NAXIS1, NAXIS2) order, i.e. (width, height).
+        w, h = wcs.pixel_shape
+        header["NAXIS1"] = (w, "width of the original image axis")
+        header["NAXIS2"] = (h, "height of the original image axis")
+    return header.tostring()
+
+
+def _to_builtin(val):
+    """Convert numpy scalars to the equivalent builtin type so they can be JSON serialized."""
+    if isinstance(val, np.generic):
+        return val.item()
+    elif isinstance(val, dict):
+        return {key: _to_builtin(v) for key, v in val.items()}
+    elif isinstance(val, (list, tuple)):
+        return [_to_builtin(v) for v in val]
+    return val
+
+
+def _standardize_target_metadata(tgt, force=None, config=None, kwargs=None):
+    """Standardize the metadata of a single target in JSON serializable form. This is
+    run in worker processes, so only the rows (not the `Standardizer`) are returned.
+
+    Only the metadata is needed, so the target is standardized with
+    ``header_only`` enabled. The stored configuration is the caller's so the
+    standardizers created from the rows later read the data as requested.
+
+    Parameters
+    ----------
+    tgt : `str`
+        The path to the target.
+    force : `str` or `cls`, optional
+        Force the use of the given `Standardizer`.
+    config : `~StandardizerConfig`, `dict` or `None`, optional
+        Standardizer configuration.
+    kwargs : `dict`, optional
+        Additional keyword arguments for the `Standardizer`.
+
+    Returns
+    -------
+    rows : `list`
+        The unravelled metadata rows, with the WCS serialized as a header string
+        and the standardizer configuration in the ``config`` column.
+    """
+    kwargs = {} if kwargs is None else kwargs
+    conf = dict(config.toDict() if hasattr(config, "toDict") else (config or {}))
+    std = Standardizer.get(tgt, force=force, config={**conf, "header_only": True}, **kwargs)
+    rows = _unravel_metadata(std)
+
+    std_config = dict(std.config.toDict())
+    default_header_only = getattr(std.configClass, "header_only", None)
+    if "header_only" in conf:
+        std_config["header_only"] = conf["header_only"]
+    elif default_header_only is None:
+        std_config.pop("header_only", None)
+    else:
+        std_config["header_only"] = default_header_only
+    std_config = _to_builtin(std_config)
+    for row in rows:
+        row["wcs"] = _serialize_wcs(row.get("wcs", None))
+        row["config"] = std_config
+        for key, val in row.items():
+            row[key] = _to_builtin(val)
+
+    if hasattr(std, "close"):
+        std.close()
+    return rows
+
+
+class _MetadataCache:
+    """A persistent cache of the standardized metadata rows of files, keyed by the file's
+    absolute path. Entries are only valid if the file's modification time and size and the
+    standardization settings (forced standardizer and configuration) are unchanged.
+
+    Parameters
+    ----------
+    filename : `str`
+        The JSON file in which to store the cache. Loaded if it exists.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        self.modified = False
+        if os.path.isfile(filename):
+            try:
+                with open(filename) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                logger.warning(f"Unable to read metadata cache {filename}. Rebuilding it.")
+                self.entries = {}
+
+    @staticmethod
+    def _file_key(path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def get(self, path, signature):
+        """Return the cached rows for a file or None if there is no valid entry."""
+        abs_path, mtime, size = self._file_key(path)
+        entry = self.entries.get(abs_path, None)
+        if entry is None:
+            return None
+        if entry["mtime_ns"] != mtime or entry["size"] != size or entry["signature"] != signature:
+            return None
+        return entry["rows"]
+
+    def set(self, path, signature, rows):
+        """Add or replace the cached rows for a file."""
+        abs_path, mtime, size = self._file_key(path)
+        self.entries[abs_path] = {"mtime_ns": mtime, "size": size, "signature": signature, "rows": rows}
+        self.modified = True
+
+    def save(self):
+        """Write the cache to disk (via a temporary file so the cache is never left partially written)."""
+        if not self.modified:
+            return
+        tmp_file = f"{self.filename}.tmp{os.getpid()}"
+        with open(tmp_file, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_file, self.filename)
+        self.modified = False
+
+
 class ImageCollection:
     """A collection of basic pointing, file paths, names, timestamps and other
     metadata that facilitate, and make easier the construction of ImageStack
@@ -214,31 +390,10 @@ class ImageCollection:
         """
         unravelledStdMetadata = []
         for i, stdFits in enumerate(standardizers):
-            # needs a "validate standardized" method here or in standardizers
-            stdMeta = stdFits.standardizeMetadata()
-
-            # unravel all standardized keys whose values are iterables unless
-            # they are a string. "Unraveling" means that each processable item
-            # of standardizer gets its own row. Each non-iterable standardized
-            # item is copied into that row. F.e. "a.fits" with 3 images becomes
-            # location    std_vals
-            #  a.fits     ...1
-            #  a.fits     ...2
-            #  a.fits     ...3
-            unravelColumns = [
-                key for key, val in stdMeta.items() if isiterable(val) and not isinstance(val, str)
-            ]
-            for j, ext in enumerate(stdFits.processable):
-                row = {}
-                for key in stdMeta.keys():
-                    if key in unravelColumns:
-                        row[key] = stdMeta[key][j]
-                    else:
-                        row[key] = stdMeta[key]
-                    row["std_idx"] = i
-                    row["ext_idx"] = j
-                    row["std_name"] = stdFits.name
-                unravelledStdMetadata.append(row)
+            rows = _unravel_metadata(stdFits)
+            for row in rows:
+                row["std_idx"] = i
+            unravelledStdMetadata.extend(rows)
 
         # We could even track things like `whoami`, `uname`, `time` etc.
         meta = meta if meta is not None else {"n_stds": len(standardizers)}
@@ -246,7 +401,7 @@ class ImageCollection:
         return cls(metadata=metadata, standardizers=standardizers)
 
     @classmethod
-    def fromTargets(cls, tgts, force=None, config=None, **kwargs):
+    def fromTargets(cls, tgts, force=None, config=None, num_workers=1, cache_file=None, **kwargs):
         """Instantiate a ImageCollection class from a collection of targets
         recognized by the standardizers, for example file paths, integer id,
         dataset reference objects etc.
@@ -264,6 +419,15 @@ class ImageCollection:
             If `None`, when applicable, determine the correct `Standardizer` to
             use automatically. Otherwise force the use of the given
             `Standardizer`.
+        num_workers : `int`
+            The number of processes used to standardize the metadata of file
+            path targets. When larger than 1, or when ``cache_file`` is given,
+            only the metadata is read and the `Standardizer` objects are
+            created lazily when they are needed (f.e. by `toWorkUnit`).
+        cache_file : `str` or `None`, optional
+            Path to a JSON file caching the standardized metadata of each file,
+            keyed by its path, modification time and size. Unchanged files are
+            not re-read. Created if it does not exist.
         **kwargs : `dict`
             Remaining kwargs, not listed here, are passed onwards to
             the underlying `Standardizer`.
@@ -273,11 +437,62 @@ class ImageCollection:
         ValueError:
             when location is not recognized as a file, directory or an URI
         """
+        all_paths = all(isinstance(tgt, str) for tgt in tgts)
+        if (num_workers > 1 or cache_file is not None) and all_paths:
+            return cls._fromPaths(tgts, force, config, num_workers, cache_file, **kwargs)
+
         standardizers = [Standardizer.get(tgt, force=force, config=config, **kwargs) for tgt in tgts]
         return cls.fromStandardizers(standardizers)
 
     @classmethod
-    def fromDir(cls, dirpath, recursive=False, force=None, config=None, **kwargs):
+    def _fromPaths(cls, paths, force=None, config=None, num_workers=1, cache_file=None, **kwargs):
+        """Instantiate an ImageCollection from file paths by standardizing only
+        their metadata, in parallel and using the metadata cache if given. See
+        `fromTargets`.
+        """
+        force_name = force.__name__ if isinstance(force, type) else force
+        conf = config.toDict() if hasattr(config, "toDict") else config
+        signature = json.dumps(
+            {"force": force_name, "config": _to_builtin(conf), "kwargs": _to_builtin(kwargs)},
+            sort_keys=True,
+            default=str,
+        )
+
+        cache = _MetadataCache(cache_file) if cache_file is not None else None
+        all_rows = [None] * len(paths)
+        if cache is not None:
+            all_rows = [cache.get(path, signature) for path in paths]
+        missing = [i for i, rows in enumerate(all_rows) if rows is None]
+        logger.debug(
+            f"Standardizing {len(missing)} of {len(paths)} files ({len(paths) - len(missing)} cached)."
+        )
+
+        func = partial(_standardize_target_metadata, force=force, config=config, kwargs=kwargs)
+        with WorkerPool(num_workers, "process") as pool:
+            new_rows = pool.map(func, [paths[i] for i in missing])
+        for i, rows in zip(missing, new_rows):
+            all_rows[i] = rows
+            if cache is not None:
+                cache.set(paths[i], signature, rows)
+        if cache is not None:
+            cache.save()
+
+        unravelledStdMetadata = []
+        for i, rows in enumerate(all_rows):
+            for cached_row in rows:
+                row = dict(cached_row)
+                row["location"] = paths[i]
+                row["wcs"] = WCS(row["wcs"]) if row["wcs"] is not None else None
+                row["std_idx"] = i
+                unravelledStdMetadata.append(row)
+
+        metadata = Table(rows=unravelledStdMetadata, meta={"n_stds": len(paths)})
+        return cls(metadata=metadata)
+
+    @classmethod
+    def fromDir(
+        cls, dirpath, recursive=False, force=None, config=None, num_workers=1, cache_file=None, **kwargs
+    ):
         """Instantiate ImageInfoSet from a path to a directory
         containing FITS files.
 
@@ -294,12 +509,20 @@ class ImageCollection:
             If `None`, when applicable, determine the correct `Standardizer` to
             use automatically. Otherwise force the use of the given
             `Standardizer`.
+        num_workers : `int`
+            The number of processes used to standardize the metadata.
+            See `fromTargets`.
+        cache_file : `str` or `None`, optional
+            Path to a JSON file caching the standardized metadata. See
+            `fromTargets`.
         **kwargs : `dict`
             Remaining kwargs, not listed here, are passed onwards to
             the underlying `Standardizer`.
         """
         fits_files = glob.glob(os.path.join(dirpath, "*fits*"), recursive=recursive)
-        return cls.fromTargets(fits_files, force=force, config=config, **kwargs)
+        return cls.fromTargets(
+            fits_files, force=force, config=config, num_workers=num_workers, cache_file=cache_file, **kwargs
+        )
 
     ########################
     # PROPERTIES (type operations and invariants)
@@ -435,14 +658,7 @@ class ImageCollection:
 
         # a long history: https://github.com/astropy/astropy/issues/4669
         # short of which is that WCS will not roundtrip itself the way we want
-        wcs_strs = []
-        for wcs in self.wcs:
-            header = wcs.to_header(relax=True)
-            h, w = wcs.pixel_shape
-            header["NAXIS1"] = (h, "height of the original image axis")
-            header["NAXIS2"] = (w, "width of the original image axis")
-            wcs_strs.append(header.tostring())
-        tmpdata["wcs"] = wcs_strs
+        tmpdata["wcs"] = [_serialize_wcs(wcs) for wcs in self.wcs]
 
         bbox = [json.dumps(b) for b in self.bbox]
         tmpdata["bbox"] = bbox
@@ -491,18 +707,47 @@ class ImageCollection:
         # maybe timespan?
         return self.data["mjd"][-1] - self.data["mjd"][0]
 
-    def toImageStack(self):
+    def _toLayeredImages(self, entries, num_workers=1):
+        """Materialize the layered images of the given standardizers using a
+        pool of threads.
+
+        Parameters
+        ----------
+        entries : `list`
+            The standardizers.
+        num_workers : `int`
+            The number of threads used to read the images.
+
+        Returns
+        -------
+        layeredImages : `list`
+            The layered images of all standardizers, in order.
+        """
+        with WorkerPool(num_workers, "thread") as pool:
+            images = pool.map(lambda std: list(std.toLayeredImage()), entries)
+        return [img for std_images in images for img in std_images]
+
+    def toImageStack(self, num_workers=1):
         """Return an `~kbmod.search.image_stack` object for processing with
         KBMOD.
+
+        Parameters
+        ----------
+        num_workers : `int`
+            The number of threads used to read the images.
+
         Returns
         -------
         imageStack : `~kbmod.search.image_stack`
             Image stack for processing with KBMOD.
         """
-        layeredImages = [img for std in self._standardizers for img in std.toLayeredImage()]
+        # Instantiate any lazily loaded standardizers before reading the images.
+        for i in range(len(self.data)):
+            self.get_standardizer(i)
+        layeredImages = self._toLayeredImages(self._standardizers, num_workers)
         return ImageStack(layeredImages)
 
-    def toWorkUnit(self, config):
+    def toWorkUnit(self, config, num_workers=1):
         """Return an `~kbmod.WorkUnit` object for processing with
         KBMOD.
 
@@ -510,13 +755,16 @@ class ImageCollection:
         ----------
         config : `~kbmod.SearchConfiguration`
             Search configuration.
+        num_workers : `int`
+            The number of threads used to read the images.
 
         Returns
         -------
         work_unit : `~kbmod.WorkUnit`
             A `~kbmod.WorkUnit` object for processing with KBMOD.
         """
-        layeredImages = [img for std in self.standardizers for img in std["std"].toLayeredImage()]
+        stds = [std["std"] for std in self.standardizers]
+        layeredImages = self._toLayeredImages(stds, num_workers)
         imgstack = ImageStack(layeredImages)
         if None not in self.wcs:
             return WorkUnit(imgstack, config, per_image_wcs=self.wcs)
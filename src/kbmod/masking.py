@@ -80,12 +80,11 @@ def apply_mask_operations(config, stack):
     stack : `ImageStack`
         The stack after the masks have been applied.
     """
-    # Generate the global mask before we start modifying the individual masks.
+    # The global mask is built (from the original masks) in the same call as the other operations.
     if config["repeated_flag_keys"] and len(config["repeated_flag_keys"]) > 0:
         global_flags = mask_flags_from_dict(config["mask_bits_dict"], config["repeated_flag_keys"])
-        global_binary_mask = stack.make_global_mask(global_flags, config["mask_num_images"])
     else:
-        global_binary_mask = None
+        global_flags = 0
 
     # Start by creating a binary mask out of the primary flag values. Prioritize
     # the config's mask_bit_vector over the dictionary based version.
@@ -96,27 +95,17 @@ def apply_mask_operations(config, stack):
     else:
         mask_flags = 0
 
-    # Apply the primary mask.
-    for i in range(stack.img_count()):
-        stack.get_single_image(i).binarize_mask(mask_flags)
-
-    # If the threshold is set, mask those pixels.
-    if config["mask_threshold"]:
-        for i in range(stack.img_count()):
-            stack.get_single_image(i).union_threshold_masking(config["mask_threshold"])
-
-    # Union in the global masking if there was one.
-    if global_binary_mask is not None:
-        for i in range(stack.img_count()):
-            stack.get_single_image(i).union_masks(global_binary_mask)
-
-    # Grow the masks.
-    if config["mask_grow"] and config["mask_grow"] > 0:
-        for i in range(stack.img_count()):
-            stack.get_single_image(i).grow_mask(config["mask_grow"])
-
-    # Apply the masks to the images. Use 0xFFFFFF to apply all active masking bits.
-    for i in range(stack.img_count()):
-        stack.get_single_image(i).apply_mask(0xFFFFFF)
-
+    # If the threshold is set, mask the pixels above it.
+    mask_threshold = config["mask_threshold"] if config["mask_threshold"] else float("inf")
+    grow_steps = config["mask_grow"] if config["mask_grow"] and config["mask_grow"] > 0 else 0
+
+    # Binarize the masks, apply the threshold and global masks, grow the masks, and apply them
+    # to the images in a single (multithreaded) pass over the stack.
+    stack.apply_mask_operations(
+        mask_flags,
+        global_flags=global_flags,
+        global_threshold=config["mask_num_images"],
+        mask_threshold=mask_threshold,
+        grow_steps=grow_steps,
+    )
     return stack
@@ -1,10 +1,10 @@
 """ResultList is a row-based data structure for tracking results with additional logic for
 filtering and maintaining consistency between different attributes in each row. Each row is
-represented as a ResultRow.
+represented as a ResultRow. ColumnarResultList stores the same information as NumPy arrays
+(one entry per result) for vectorized processing of large numbers of results.
 """
 
 import math
-import multiprocessing as mp
 import numpy as np
 import os.path as ospath
 from pathlib import Path
@@ -19,6 +19,7 @@ from kbmod.trajectory_utils import (
     trajectory_predict_skypos,
     trajectory_to_yaml,
 )
+from kbmod.worker_pool import WorkerPool
 
 
 def _check_optional_allclose(arr1, arr2):
@@ -771,31 +772,47 @@ class ResultList:
         # Return a reference to the current object to allow chaining.
         return self
 
-    def apply_filter(self, filter_obj, num_threads=1):
+    def apply_filter(self, filter_obj, num_threads=1, pool=None):
         """Apply the given filter object to the ResultList.
 
         Modifies the ResultList in place.
 
+        Filters with a ``data_column`` are applied to a single array of that
+        column, so only that column (not the full rows) is sent to the workers.
+        Other filters are applied to each row.
+
         Parameters
         ----------
         filter_obj : RowFilter
             The filtering object to use.
+        num_threads : `int`
+            The number of processes to use if no pool is given.
+        pool : `WorkerPool`, optional
+            A persistent pool of workers to use instead of creating a new one.
 
         Returns
         -------
         self : ResultList
             Returns a reference to itself to allow chaining.
         """
-        indices_to_keep = []
-        if num_threads == 1:
-            indices_to_keep = [i for i in range(self.num_results()) if filter_obj.keep_row(self.results[i])]
+        if pool is None and num_threads > 1:
+            with WorkerPool(num_threads, "process") as tmp_pool:
+                return self.apply_filter(filter_obj, pool=tmp_pool)
+
+        if getattr(filter_obj, "data_column", None) is not None:
+            values = [getattr(row, filter_obj.data_column) for row in self.results]
+            data, valid = filter_obj.get_column_data(values)
+            keep_idx_results = np.zeros(len(values), dtype=bool)
+            if len(data) > 0:
+                if pool is not None:
+                    keep_idx_results[valid] = pool.map_rows(filter_obj.keep_data, data)
+                else:
+                    keep_idx_results[valid] = filter_obj.keep_data(data)
+        elif pool is not None:
+            keep_idx_results = pool.map(filter_obj.keep_row, self.results)
         else:
-            pool = mp.Pool(processes=num_threads)
-            keep_idx_results = pool.map_async(filter_obj.keep_row, self.results)
-            pool.close()
-            pool.join()
-            keep_idx_results = keep_idx_results.get()
-            indices_to_keep = [i for i in range(self.num_results()) if keep_idx_results[i]]
+            keep_idx_results = [filter_obj.keep_row(row) for row in self.results]
+        indices_to_keep = [i for i in range(self.num_results()) if keep_idx_results[i]]
         self.filter_results(indices_to_keep, filter_obj.get_filter_name())
 
         return self
@@ -1074,6 +1091,566 @@ class ResultList:
                 )
 
 
+class ColumnarResultList:
+    """A column-based (array backed) alternative to ResultList for large numbers of results.
+
+    Each attribute of the results is stored as a single NumPy array with one entry (row)
+    per result, so that filtering, sorting, and extending the results are vectorized index
+    operations instead of Python loops over ResultRow objects. ResultRow views of individual
+    results are available through ``get_row()`` for compatibility with code (such as the
+    RowFilters) that operates on ResultRows.
+
+    Attributes
+    ----------
+    filtered : `dict`
+        A dictionary mapping each filtering label to a ColumnarResultList of the results
+        removed at that stage. Only used if ``track_filtered`` is True.
+    track_filtered : `bool`
+        Whether to track (save) the filtered results.
+    """
+
+    # The per-result scalar columns (name and dtype).
+    _scalar_columns = {
+        "x": np.int32,
+        "y": np.int32,
+        "vx": np.float32,
+        "vy": np.float32,
+        "flux": np.float32,
+        "likelihood": np.float32,
+        "obs_count": np.int32,
+    }
+
+    # The columns that are allowed to be missing (None) for the entire list.
+    _optional_columns = ["psi_curve", "phi_curve", "stamp", "all_stamps", "pred_ra", "pred_dec"]
+
+    # Mapping of ResultRow attribute names to column names (for get_result_values).
+    _attribute_map = {
+        "trajectory.x": "x",
+        "trajectory.y": "y",
+        "trajectory.vx": "vx",
+        "trajectory.vy": "vy",
+        "trajectory.flux": "flux",
+        "trajectory.lh": "likelihood",
+        "trajectory.obs_count": "obs_count",
+        "flux": "flux",
+        "final_likelihood": "likelihood",
+        "obs_count": "obs_count",
+    }
+
+    def __init__(self, all_times, track_filtered=False):
+        """Create an empty ColumnarResultList.
+
+        Parameters
+        ----------
+        all_times : `list` or `numpy.ndarray`
+            A list of all time stamps.
+        track_filtered : `bool`
+            Whether to track (save) the filtered results. This will use
+            more memory and is recommended only for analysis.
+        """
+        self._all_times = np.asarray(all_times)
+        self.track_filtered = track_filtered
+        self.filtered = {}
+
+        num_times = len(self._all_times)
+        self._data = {name: np.zeros(0, dtype=dtype) for name, dtype in self._scalar_columns.items()}
+        self._data["valid"] = np.zeros((0, num_times), dtype=bool)
+        for name in self._optional_columns:
+            self._data[name] = None
+
+    @property
+    def all_times(self):
+        return self._all_times
+
+    @property
+    def num_times(self):
+        return len(self._all_times)
+
+    @classmethod
+    def from_trajectories(
+        cls, trajectories, all_times, psi_curves=None, phi_curves=None, track_filtered=False
+    ):
+        """Create a ColumnarResultList from search results.
+
+        Parameters
+        ----------
+        trajectories : `numpy.ndarray` or `list`
+            Either a NumPy structured array with the fields x, y, vx, vy, lh, flux, and
+            obs_count (such as the output of ``StackSearch.get_results_above``) or a
+            list of `Trajectory` objects.
+        all_times : `list` or `numpy.ndarray`
+            A list of all time stamps.
+        psi_curves : `numpy.ndarray`, optional
+            A (N, T) array of psi values (such as the output of ``StackSearch.get_psi_phi_curves``).
+        phi_curves : `numpy.ndarray`, optional
+            A (N, T) array of phi values.
+        track_filtered : `bool`
+            Whether to track (save) the filtered results.
+
+        Returns
+        -------
+        result_list : `ColumnarResultList`
+            The new result list with all time steps marked valid.
+
+        Raises
+        ------
+        ValueError if the curves do not have the correct shape or only one is given.
+        """
+        result_list = ColumnarResultList(all_times, track_filtered)
+        if not isinstance(trajectories, np.ndarray):
+            trajectories = np.array(
+                [(t.x, t.y, t.vx, t.vy, t.lh, t.flux, t.obs_count) for t in trajectories],
+                dtype=[(name, "f8") for name in ["x", "y", "vx", "vy", "lh", "flux", "obs_count"]],
+            )
+        num_results = len(trajectories)
+
+        for name, dtype in cls._scalar_columns.items():
+            src_name = "lh" if name == "likelihood" else name
+            result_list._data[name] = np.asarray(trajectories[src_name], dtype=dtype)
+        result_list._data["valid"] = np.ones((num_results, result_list.num_times), dtype=bool)
+
+        if psi_curves is not None or phi_curves is not None:
+            result_list.set_psi_phi(psi_curves, phi_curves)
+        return result_list
+
+    @classmethod
+    def from_result_list(cls, result_list):
+        """Create a ColumnarResultList from a (row-based) ResultList. Only the unfiltered
+        results are copied.
+
+        Parameters
+        ----------
+        result_list : `ResultList`
+            The input results.
+
+        Returns
+        -------
+        columnar : `ColumnarResultList`
+            The results in columnar form.
+        """
+        rows = result_list.results
+        columnar = ColumnarResultList(result_list.all_times, result_list.track_filtered)
+        num_times = columnar.num_times
+
+        columnar._data["x"] = np.array([row.trajectory.x for row in rows], dtype=np.int32)
+        columnar._data["y"] = np.array([row.trajectory.y for row in rows], dtype=np.int32)
+        columnar._data["vx"] = np.array([row.trajectory.vx for row in rows], dtype=np.float32)
+        columnar._data["vy"] = np.array([row.trajectory.vy for row in rows], dtype=np.float32)
+        columnar._data["flux"] = np.array([row.trajectory.flux for row in rows], dtype=np.float32)
+        columnar._data["likelihood"] = np.array([row.final_likelihood for row in rows], dtype=np.float32)
+        columnar._data["obs_count"] = np.array([row.trajectory.obs_count for row in rows], dtype=np.int32)
+        columnar._data["valid"] = np.array(
+            [row.valid_indices_as_booleans() for row in rows], dtype=bool
+        ).reshape(len(rows), num_times)
+
+        # Only keep the optional columns if they are set for every row.
+        for name in cls._optional_columns:
+            values = [getattr(row, name) for row in rows]
+            if len(values) > 0 and all(v is not None for v in values):
+                columnar._data[name] = np.array(values)
+        return columnar
+
+    def to_result_list(self):
+        """Create a (row-based) ResultList with a copy of the unfiltered results.
+
+        Returns
+        -------
+        result_list : `ResultList`
+            The results as ResultRows.
+        """
+        result_list = ResultList(self._all_times.tolist(), self.track_filtered)
+        for i in range(len(self)):
+            row = self.get_row(i)
+            if row.psi_curve is not None:
+                row._psi_curve = np.copy(row.psi_curve)
+                row._phi_curve = np.copy(row.phi_curve)
+            result_list.append_result(row)
+        return result_list
+
+    def __len__(self):
+        """Return the number of results in the list."""
+        return len(self._data["x"])
+
+    def num_results(self):
+        """Return the number of results in the list.
+
+        Returns
+        -------
+        int
+            The number of results in the list.
+        """
+        return len(self)
+
+    def get_column(self, name):
+        """Get the array for a single column.
+
+        Parameters
+        ----------
+        name : `str`
+            The name of the column: one of x, y, vx, vy, flux, likelihood, obs_count,
+            valid, psi_curve, phi_curve, stamp, all_stamps, pred_ra, or pred_dec.
+
+        Returns
+        -------
+        values : `numpy.ndarray` or `None`
+            The column's values (first dimension is the result) or ``None`` for
+            an optional column that is not set.
+
+        Raises
+        ------
+        KeyError if the column does not exist.
+        """
+        return self._data[name]
+
+    def set_column(self, name, values):
+        """Set the values of an optional (non-trajectory) column such as the stamps.
+
+        Parameters
+        ----------
+        name : `str`
+            The name of the column: one of stamp, all_stamps, pred_ra, or pred_dec.
+        values : `numpy.ndarray` or `None`
+            The values with one entry per result or ``None`` to remove the column.
+
+        Raises
+        ------
+        KeyError if the column is not a settable column.
+        ValueError if the number of values does not match the number of results.
+        """
+        if name not in ["stamp", "all_stamps", "pred_ra", "pred_dec"]:
+            raise KeyError(f"Column {name} cannot be set directly.")
+        if values is not None:
+            values = np.asarray(values)
+            if len(values) != len(self):
+                raise ValueError(f"Expected {len(self)} values for column {name}, got {len(values)}")
+        self._data[name] = values
+
+    def get_row(self, index):
+        """Get a ResultRow view of a single result. The psi and phi curves of
+        the row share memory with the columns, but changes to the row's trajectory,
+        valid indices, or stamps are not written back to the ColumnarResultList.
+
+        Parameters
+        ----------
+        index : `int`
+            The index of the result.
+
+        Returns
+        -------
+        row : `ResultRow`
+            The result.
+        """
+        trj = make_trajectory(
+            x=int(self._data["x"][index]),
+            y=int(self._data["y"][index]),
+            vx=float(self._data["vx"][index]),
+            vy=float(self._data["vy"][index]),
+            flux=float(self._data["flux"][index]),
+            lh=float(self._data["likelihood"][index]),
+            obs_count=int(self._data["obs_count"][index]),
+        )
+        row = ResultRow(trj, self.num_times)
+        row._final_likelihood = float(self._data["likelihood"][index])
+        row._valid_indices = np.flatnonzero(self._data["valid"][index]).tolist()
+        for name in self._optional_columns:
+            if self._data[name] is not None:
+                value = self._data[name][index]
+                if name in ["psi_curve", "phi_curve"]:
+                    setattr(row, f"_{name}", value)
+                else:
+                    setattr(row, name, value)
+        return row
+
+    def get_result_values(self, attribute):
+        """Return the values of an attribute for all the results as an array.
+        Accepts both the column names and the corresponding ResultRow attribute
+        names, such as "trajectory.x" or "final_likelihood".
+
+        Parameter
+        ---------
+        attribute : `str`
+            The name of the attribute to extract.
+
+        Returns
+        -------
+        values : `numpy.ndarray`
+            The results' values.
+
+        Raises
+        ------
+        Raises an ``AttributeError`` if the attribute does not exist.
+        """
+        if attribute == "valid_indices":
+            return [np.flatnonzero(row) for row in self._data["valid"]]
+        name = self._attribute_map.get(attribute, attribute)
+        if name not in self._data:
+            raise AttributeError(f"Unknown attribute {attribute}")
+        return self._data[name]
+
+    def _update_likelihood(self):
+        """Update the likelihood and flux of every result based on the psi and phi curves
+        and the valid mask. Matches ``ResultRow._update_likelihood``. Does nothing if the
+        curves are not set.
+        """
+        psi = self._data["psi_curve"]
+        phi = self._data["phi_curve"]
+        if psi is None or phi is None:
+            return
+
+        valid = self._data["valid"]
+        psi_sum = np.sum(np.where(valid, psi, 0.0), axis=1, dtype=np.float64)
+        phi_sum = np.sum(np.where(valid, phi, 0.0), axis=1, dtype=np.float64)
+
+        good = phi_sum > 0.0
+        safe_phi = np.where(good, phi_sum, 1.0)
+        self._data["likelihood"] = np.where(good, psi_sum / np.sqrt(safe_phi), 0.0).astype(np.float32)
+        self._data["flux"] = np.where(good, psi_sum / safe_phi, 0.0).astype(np.float32)
+
+    def set_psi_phi(self, psi, phi):
+        """Set the psi and phi curves for all results and recompute the likelihoods.
+
+        Parameters
+        ----------
+        psi : `numpy.ndarray`
+            A (N, T) array of psi values.
+        phi : `numpy.ndarray`
+            A (N, T) array of phi values.
+
+        Raises
+        ------
+        ValueError if either array does not have the shape (N, T).
+        """
+        expected = (len(self), self.num_times)
+        if psi is None or phi is None or np.shape(psi) != expected or np.shape(phi) != expected:
+            raise ValueError(
+                f"Expected psi and phi arrays of shape {expected} got {np.shape(psi)} and {np.shape(phi)}"
+            )
+        self._data["psi_curve"] = np.asarray(psi, dtype=np.float32)
+        self._data["phi_curve"] = np.asarray(phi, dtype=np.float32)
+        self._update_likelihood()
+
+    def set_valid_mask(self, mask):
+        """Set which time steps are valid for each result and recompute the
+        likelihoods and observation counts.
+
+        Parameters
+        ----------
+        mask : `numpy.ndarray`
+            A (N, T) Boolean array indicating which time steps are valid.
+
+        Raises
+        ------
+        ValueError if the mask does not have the shape (N, T).
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (len(self), self.num_times):
+            raise ValueError(f"Expected mask of shape {(len(self), self.num_times)} got {mask.shape}")
+        self._data["valid"] = mask
+        self._data["obs_count"] = np.count_nonzero(mask, axis=1).astype(np.int32)
+        self._update_likelihood()
+
+    def _take(self, inds):
+        """Create a new ColumnarResultList (without filter tracking) containing the
+        rows at the given indices.
+        """
+        subset = ColumnarResultList(self._all_times)
+        for name, values in self._data.items():
+            subset._data[name] = None if values is None else values[inds]
+        return subset
+
+    def extend(self, result_list):
+        """Append the results in a second ColumnarResultList to the current one.
+
+        Parameters
+        ----------
+        result_list : `ColumnarResultList`
+            The additional results.
+
+        Returns
+        -------
+        self : ColumnarResultList
+            Returns a reference to itself to allow chaining.
+
+        Raises
+        ------
+        ValueError if the lists have different times or different optional columns set.
+        """
+        if not np.array_equal(self._all_times, result_list._all_times):
+            raise ValueError("Cannot extend ColumnarResultList with different times.")
+
+        if len(result_list) > 0:
+            if len(self) == 0:
+                for name, values in result_list._data.items():
+                    self._data[name] = None if values is None else np.copy(values)
+            else:
+                for name, values in result_list._data.items():
+                    if (values is None) != (self._data[name] is None):
+                        raise ValueError(f"Column {name} is only set in one of the lists.")
+                    if values is not None:
+                        self._data[name] = np.concatenate([self._data[name], values])
+
+        for key, values in result_list.filtered.items():
+            if key in self.filtered:
+                self.filtered[key].extend(values)
+            else:
+                self.filtered[key] = values
+        return self
+
+    def sort(self, key="likelihood", reverse=True):
+        """Sort the results by the given column. The sort is stable.
+
+        Parameters
+        ----------
+        key : `str`
+            The column (or ResultRow attribute name) by which to sort.
+            Default = likelihood
+        reverse : `bool`
+            Sort in decreasing order.
+
+        Returns
+        -------
+        self : ColumnarResultList
+            Returns a reference to itself to allow chaining.
+        """
+        values = self.get_result_values(key)
+        if reverse:
+            order = np.argsort(-values, kind="stable")
+        else:
+            order = np.argsort(values, kind="stable")
+        self._data = self._take(order)._data
+        return self
+
+    def filter_results(self, indices_to_keep, label=None):
+        """Filter the results to only include the given indices.
+
+        Parameters
+        ----------
+        indices_to_keep : `list` or `numpy.ndarray`
+            Either the indices of the rows to keep or a Boolean mask of length N.
+        label : `str`
+            The label of the filtering stage to use. Only used if
+            we keep filtered results.
+
+        Returns
+        -------
+        self : ColumnarResultList
+            Returns a reference to itself to allow chaining.
+        """
+        keep_mask = np.asarray(indices_to_keep)
+        if keep_mask.dtype != bool:
+            inds = keep_mask.astype(int)
+            keep_mask = np.zeros(len(self), dtype=bool)
+            keep_mask[inds] = True
+
+        if self.track_filtered:
+            if label is None:
+                label = ""
+            removed = self._take(np.flatnonzero(~keep_mask))
+            if label in self.filtered:
+                self.filtered[label].extend(removed)
+            else:
+                self.filtered[label] = removed
+
+        self._data = self._take(np.flatnonzero(keep_mask))._data
+        return self
+
+    def apply_filter(self, filter_obj):
+        """Apply the given RowFilter to each result (using ResultRow views).
+
+        Parameters
+        ----------
+        filter_obj : RowFilter
+            The filtering object to use.
+
+        Returns
+        -------
+        self : ColumnarResultList
+            Returns a reference to itself to allow chaining.
+        """
+        keep = np.array([filter_obj.keep_row(self.get_row(i)) for i in range(len(self))], dtype=bool)
+        return self.filter_results(keep, filter_obj.get_filter_name())
+
+    def apply_batch_filter(self, filter_obj):
+        """Apply the given BatchFilter to the results.
+
+        Parameters
+        ----------
+        filter_obj : BatchFilter
+            The filtering object to use.
+
+        Returns
+        -------
+        self : ColumnarResultList
+            Returns a reference to itself to allow chaining.
+        """
+        indices_to_keep = filter_obj.keep_indices(self)
+        return self.filter_results(indices_to_keep, filter_obj.get_filter_name())
+
+    def get_filtered(self, label=None):
+        """Get the results filtered at a given stage or all stages.
+
+        Parameters
+        ----------
+        label : `str`
+            The filtering stage to use. If no label is provided,
+            return all filtered results.
+
+        Returns
+        -------
+        results : `ColumnarResultList`
+            The filtered results.
+
+        Raises
+        ------
+        ValueError if filtering is not enabled.
+        """
+        if not self.track_filtered:
+            raise ValueError("ColumnarResultList filter tracking not enabled.")
+
+        result = ColumnarResultList(self._all_times)
+        if label is not None:
+            if label in self.filtered:
+                result.extend(self.filtered[label])
+        else:
+            for values in self.filtered.values():
+                result.extend(values)
+        return result
+
+    def to_table(self, append_times=False):
+        """Extract the unfiltered results into an astropy table with the same
+        columns as ``ResultList.to_table``.
+
+        Parameters
+        ----------
+        append_times : `bool`
+            Append the list of all times as a column in the data.
+
+        Returns
+        -------
+        table : `astropy.table.Table`
+            A table with the data.
+        """
+        num_results = len(self)
+        table_dict = {
+            "trajectory_x": self._data["x"],
+            "trajectory_y": self._data["y"],
+            "trajectory_vx": self._data["vx"],
+            "trajectory_vy": self._data["vy"],
+            "obs_count": self._data["obs_count"],
+            "flux": self._data["flux"],
+            "likelihood": self._data["likelihood"],
+            "valid_indices": self.get_result_values("valid_indices"),
+        }
+        for name in self._optional_columns:
+            if self._data[name] is not None:
+                table_dict[name] = self._data[name]
+            else:
+                table_dict[name] = [None] * num_results
+        if append_times:
+            table_dict["all_times"] = [self._all_times] * num_results
+        return Table(table_dict)
+
+
 def load_result_list_from_files(res_filepath, suffix, all_mjd=None):
     """Create a new ResultList from outputted files.
 
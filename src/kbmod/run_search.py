@@ -17,16 +17,71 @@ from .result_list import *
 from .trajectory_generator import KBMODV1Search
 from .wcs_utils import calc_ecliptic_angle
 from .work_unit import WorkUnit
+from .worker_pool import WorkerPool
 
 
 logger = kb.Logging.getLogger(__name__)
 
 
 class SearchRunner:
-    """A class to run the KBMOD grid search."""
+    """A class to run the KBMOD grid search.
+
+    The runner owns a persistent `WorkerPool` that is used for the parallel filtering
+    steps and reused across chunks (instead of creating a new pool for each call).
+    The pool is shut down at the end of each `run_search` call. When the runner is
+    used as a context manager, the pool is instead kept across searches and shut down
+    when the context exits.
+
+    Examples
+    --------
+    >>> with SearchRunner() as runner:
+    ...     results = [runner.run_search_from_work_unit(work) for work in work_units]
+    """
 
     def __init__(self):
-        pass
+        self._pool = None
+        self._keep_pool = False
+
+    def __enter__(self):
+        self._keep_pool = True
+        return self
+
+    def __exit__(self, *args):
+        self._keep_pool = False
+        self.close()
+
+    def get_worker_pool(self, config):
+        """Get the persistent worker pool matching the configuration, creating
+        (or recreating) it if needed.
+
+        Parameters
+        ----------
+        config : `SearchConfiguration`
+            The configuration parameters
+
+        Returns
+        -------
+        pool : `WorkerPool` or `None`
+            The pool of workers or ``None`` if only a single core is used.
+        """
+        num_cores = config["num_cores"]
+        if num_cores <= 1:
+            return None
+
+        pool_type = config["pool_type"]
+        if self._pool is not None and (
+            self._pool.num_workers != num_cores or self._pool.pool_type != pool_type
+        ):
+            self.close()
+        if self._pool is None:
+            self._pool = WorkerPool(num_cores, pool_type)
+        return self._pool
+
+    def close(self):
+        """Shut down the persistent worker pool (if any)."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
     def get_angle_limits(self, config):
         """Compute the angle limits based on the configuration information.
@@ -47,10 +102,12 @@ class SearchRunner:
 
     def load_and_filter_results(self, search, config):
         """This function loads results that are output by the gpu grid search.
-        Results are loaded in chunks and evaluated to see if the minimum
-        likelihood level has been reached. If not, another chunk of results is
-        fetched. The results are filtered using a clipped-sigmaG filter as they
-        are loaded and only the passing results are kept.
+        All results above the minimum likelihood level are retrieved at once
+        (as a NumPy structured array) and then processed in chunks. The results
+        are filtered using a clipped-sigmaG filter as they are loaded and only
+        the passing results are kept. Each chunk is filtered as a single
+        `ColumnarResultList` (with vectorized operations) and only the passing
+        results are converted into `ResultRow` objects.
 
         Parameters
         ----------
@@ -59,7 +116,7 @@ class SearchRunner:
         config : `SearchConfiguration`
             The configuration parameters
         chunk_size : int
-            The number of results to load at a given time from search.
+            The number of results to process at a given time.
 
         Returns
         -------
@@ -78,6 +135,7 @@ class SearchRunner:
         num_cores = config["num_cores"]
         if num_cores <= 0:
             raise ValueError(f"Invalid number of cores {num_cores}")
+        pool = self.get_worker_pool(config)
 
         # Set up the list of results.
         img_stack = search.get_imagestack()
@@ -98,43 +156,70 @@ class SearchRunner:
         else:
             stats_filter = CombinedStatsFilter(min_obs=num_obs)
 
+        # Retrieve all the results at or above the likelihood level (sorted by decreasing
+        # likelihood). Anything below that is not guaranteed to be valid due to potential
+        # on-GPU filtering.
         logger.info("Retrieving Results")
-        likelihood_limit = False
-        res_num = 0
+        all_results = search.get_results_above(lh_level)
+        all_results = all_results[all_results["lh"] < max_lh]
+        logger.info(f"Retrieved {len(all_results)} results with likelihood in [{lh_level}, {max_lh})")
+
         total_count = 0
-        while likelihood_limit is False:
-            results = search.get_results(res_num, chunk_size)
+        for res_num in range(0, len(all_results), chunk_size):
+            results = all_results[res_num : res_num + chunk_size]
             logger.info(f"Chunk Start = {res_num}")
-            logger.info(f"Chunk Max Likelihood = {results[0].lh}")
-            logger.info(f"Chunk Min. Likelihood = {results[-1].lh}")
-
-            result_batch = ResultList(mjds)
-            for i, trj in enumerate(results):
-                # Stop as soon as we hit a result below our limit, because anything after
-                # that is not guarrenteed to be valid due to potential on-GPU filtering.
-                if trj.lh < lh_level:
-                    likelihood_limit = True
-                    break
-
-                if trj.lh < max_lh:
-                    row = ResultRow(trj, num_times)
-                    psi_curve = np.array(search.get_psi_curves(trj))
-                    phi_curve = np.array(search.get_phi_curves(trj))
-                    row.set_psi_phi(psi_curve, phi_curve)
-                    result_batch.append_result(row)
-                    total_count += 1
+            logger.info(f"Chunk Max Likelihood = {results[0]['lh']}")
+            logger.info(f"Chunk Min. Likelihood = {results[-1]['lh']}")
+
+            # Extract the psi and phi curves for the entire chunk at once.
+            trj_params = np.stack([results["x"], results["y"], results["vx"], results["vy"]], axis=1)
+            psi_curves, phi_curves = search.get_psi_phi_curves(trj_params.astype(np.float32))
+
+            result_batch = ColumnarResultList.from_trajectories(results, mjds, psi_curves, phi_curves)
+            total_count += len(result_batch)
 
             batch_size = result_batch.num_results()
             logger.info(f"Extracted batch of {batch_size} results for total of {total_count}")
             if batch_size > 0:
-                apply_clipped_sigma_g(clipper, result_batch, num_cores)
-                result_batch.apply_filter(stats_filter)
+                # Apply the sigmaG and stats filters to all the results in the batch at once.
+                apply_clipped_sigma_g(clipper, result_batch, pool=pool)
+                lh = result_batch.get_column("likelihood")
+                stats_mask = np.logical_and(
+                    result_batch.get_column("obs_count") >= stats_filter.min_obs,
+                    np.logical_and(lh >= stats_filter.min_lh, lh <= stats_filter.max_lh),
+                )
+                result_batch.filter_results(stats_mask, stats_filter.get_filter_name())
 
                 # Add the results to the final set.
-                keep.extend(result_batch)
-            res_num += chunk_size
+                keep.extend(result_batch.to_result_list())
         return keep
 
+    def load_or_save_psi_phi_cache(self, search, cache_dir):
+        """Load the search's psi and phi data from a cache directory or, if it is not
+        there, compute the data and save it to the cache.
+
+        Parameters
+        ----------
+        search : `StackSearch`
+            The search object. The encoding must already be set.
+        cache_dir : `str`
+            The directory of cached psi and phi files.
+
+        Returns
+        -------
+        cache_file : `str`
+            The path of the cache file used.
+        """
+        cache_file = os.path.join(cache_dir, f"psi_phi_{search.get_psi_phi_cache_key()}.bin")
+        if os.path.exists(cache_file):
+            logger.info(f"Loading cached psi and phi data from {cache_file}")
+            search.load_psi_phi_cache(cache_file)
+        else:
+            logger.info(f"Saving psi and phi data to {cache_file}")
+            os.makedirs(cache_dir, exist_ok=True)
+            search.save_psi_phi_cache(cache_file)
+        return cache_file
+
     def do_gpu_search(self, config, stack, trj_generator):
         """Performs search on the GPU.
 
@@ -190,14 +275,37 @@ class SearchRunner:
         # set the parameters.
         if config["encode_num_bytes"] > 0:
             search.enable_gpu_encoding(config["encode_num_bytes"])
+            search.set_encoding_scaling(bool(config["encode_per_time"]), float(config["encode_clip_frac"]))
+
+        # If we are using a tiled memory layout for the psi and phi data, set the tile size.
+        if config["psi_phi_tile_size"] is not None:
+            search.set_psi_phi_layout(kb.PSI_PHI_TILED, int(config["psi_phi_tile_size"]))
+
+        # If we are suppressing near-duplicate results inside the search, set the radii.
+        if config["dedup_radius"] is not None:
+            if len(config["dedup_radius"]) != 2:
+                raise ValueError(f"Invalid dedup_radius {config['dedup_radius']}. Expected [pos, vel].")
+            search.enable_result_dedup(float(config["dedup_radius"][0]), float(config["dedup_radius"][1]))
 
         # Enable debugging.
         if config["debug"]:
             search.set_debug(config["debug"])
 
+        # Load the psi and phi data from the cache (if available) or save it there.
+        if config["psi_phi_cache_dir"] is not None:
+            self.load_or_save_psi_phi_cache(search, config["psi_phi_cache_dir"])
+
         # Do the actual search.
         candidates = [trj for trj in trj_generator]
-        search.search(candidates, int(config["num_obs"]))
+        if config["search_tile_size"]:
+            search.search_tiled(
+                candidates,
+                int(config["num_obs"]),
+                int(config["search_tile_size"]),
+                int(config["max_results"]),
+            )
+        else:
+            search.search(candidates, int(config["num_obs"]))
         search_timer.stop()
 
         # Load the results.
@@ -223,6 +331,16 @@ class SearchRunner:
         keep : ResultList
             The results.
         """
+        try:
+            return self._run_search(config, stack, trj_generator)
+        finally:
+            # Do not leave workers (and their resources) running after the search
+            # unless the runner is being used as a context manager.
+            if not self._keep_pool:
+                self.close()
+
+    def _run_search(self, config, stack, trj_generator):
+        """Run the search. See `run_search`."""
         full_timer = kb.DebugTimer("KBMOD", logger)
 
         # Apply the mask to the images.
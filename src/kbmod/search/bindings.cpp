@@ -20,6 +20,8 @@ namespace py = pybind11;
 #include "psi_phi_array.cpp"
 #include "debug_timer.cpp"
 #include "trajectory_list.cpp"
+#include "cpu_search.cpp"
+#include "clustering.cpp"
 
 PYBIND11_MODULE(search, m) {
     m.attr("KB_NO_DATA") = pybind11::float_(search::NO_DATA);
@@ -46,12 +48,17 @@ PYBIND11_MODULE(search, m) {
     search::psi_phi_array_binding(m);
     search::debug_timer_binding(m);
     search::trajectory_list_binding(m);
+    search::clustering_bindings(m);
     // Helper function from common.h
     m.def("pixel_value_valid", &search::pixel_value_valid);
     // Functions from raw_image.cpp
     m.def("create_median_image", &search::create_median_image);
     m.def("create_summed_image", &search::create_summed_image);
     m.def("create_mean_image", &search::create_mean_image);
+    m.def("create_coadded_images", &search::create_coadded_images, py::arg("image_sets"),
+          py::arg("coadd_type"));
     // Functions from kernel_testing_helpers.cpp
     m.def("sigmag_filtered_indices", &search::sigmaGFilteredIndices);
+    m.def("evaluate_trajectories_cpu", &search::evaluateTrajectoriesCPU, py::arg("psi_phi"), py::arg("x"),
+          py::arg("y"), py::arg("candidates"), py::arg("use_block_kernel") = true, py::arg("do_sigmag") = false);
 }
@@ -0,0 +1,231 @@
+#include "clustering.h"
+#include "pydocs/clustering_docs.h"
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <numeric>
+#include <stdexcept>
+#include <unordered_map>
+
+namespace search {
+
+// A simple union-find (disjoint set) structure with path halving.
+class DisjointSet {
+public:
+    explicit DisjointSet(int size) : parent(size) { std::iota(parent.begin(), parent.end(), 0); }
+
+    int find(int i) {
+        while (parent[i] != i) {
+            parent[i] = parent[parent[i]];
+            i = parent[i];
+        }
+        return i;
+    }
+
+    void join(int a, int b) {
+        a = find(a);
+        b = find(b);
+        if (a != b) parent[std::max(a, b)] = std::min(a, b);
+    }
+
+private:
+    std::vector<int> parent;
+};
+
+// A hash table from a cell's integer coordinates to a cell ID. The cell coordinates are
+// stored in a single flat array and collisions of the 64 bit hash are resolved by chaining.
+class CellIndex {
+public:
+    explicit CellIndex(int num_dims) : num_dims(num_dims) {}
+
+    int size() const { return chain.size(); }
+
+    const int64_t* get_coords(int cell_id) const { return coords.data() + (uint64_t)cell_id * num_dims; }
+
+    // Return the ID of the cell or -1 if it is not in the index.
+    int find(const int64_t* cell) const {
+        auto it = first_cell.find(hash(cell));
+        if (it == first_cell.end()) return -1;
+        for (int id = it->second; id >= 0; id = chain[id]) {
+            if (std::equal(cell, cell + num_dims, get_coords(id))) return id;
+        }
+        return -1;
+    }
+
+    // Return the ID of the cell, adding it to the index if needed.
+    int insert(const int64_t* cell) {
+        uint64_t key = hash(cell);
+        auto it = first_cell.find(key);
+        int prev = -1;
+        if (it != first_cell.end()) {
+            for (int id = it->second; id >= 0; id = chain[id]) {
+                if (std::equal(cell, cell + num_dims, get_coords(id))) return id;
+            }
+            prev = it->second;
+        }
+
+        int new_id = chain.size();
+        coords.insert(coords.end(), cell, cell + num_dims);
+        chain.push_back(prev);
+        first_cell[key] = new_id;
+        return new_id;
+    }
+
+private:
+    uint64_t hash(const int64_t* cell) const {
+        uint64_t seed = num_dims;
+        for (int d = 0; d < num_dims; ++d) {
+            seed ^= (uint64_t)cell[d] * 0x9e3779b97f4a7c15ULL + (seed << 6) + (seed >> 2);
+        }
+        return seed;
+    }
+
+    int num_dims;
+    std::vector<int64_t> coords;
+    std::vector<int> chain;
+    std::unordered_map<uint64_t, int> first_cell;
+};
+
+std::vector<int> cluster_grid_labels(const double* points, int num_points, int num_dims, double eps) {
+    if (eps <= 0.0) throw std::runtime_error("Invalid clustering threshold. Must be > 0.");
+    if (num_dims <= 0) throw std::runtime_error("Points must have at least one dimension.");
+    if (num_points <= 0) return {};
+
+    // Use cells with a diagonal of eps so that all points in the same cell are linked.
+    // Linked points can then be at most max_offset cells apart in each dimension.
+    const double cell_size = eps / std::sqrt((double)num_dims);
+    const int max_offset = (int)std::ceil(std::sqrt((double)num_dims));
+    const double eps2 = eps * eps;
+
+    // Assign each point to a cell.
+    CellIndex cells(num_dims);
+    std::vector<int> point_cell(num_points);
+    std::vector<int64_t> coords(num_dims);
+    for (int i = 0; i < num_points; ++i) {
+        for (int d = 0; d < num_dims; ++d) {
+            double value = points[(uint64_t)i * num_dims + d];
+            if (!std::isfinite(value)) throw std::runtime_error("Unable to cluster non-finite values.");
+            coords[d] = (int64_t)std::floor(value / cell_size);
+        }
+        point_cell[i] = cells.insert(coords.data());
+    }
+
+    // Group the point indices by cell (counting sort keeps them in index order).
+    const int num_cells = cells.size();
+    std::vector<int> cell_start(num_cells + 1, 0);
+    for (int i = 0; i < num_points; ++i) cell_start[point_cell[i] + 1]++;
+    for (int c = 0; c < num_cells; ++c) cell_start[c + 1] += cell_start[c];
+    std::vector<int> cell_points(num_points);
+    std::vector<int> fill_pos(cell_start.begin(), cell_start.end() - 1);
+    for (int i = 0; i < num_points; ++i) cell_points[fill_pos[point_cell[i]]++] = i;
+
+    // Group the cells into coarse blocks of max_offset cells in each dimension so that
+    // the cells that can contain linked points are always in neighboring blocks.
+    CellIndex blocks(num_dims);
+    std::vector<int> cell_block(num_cells);
+    for (int c = 0; c < num_cells; ++c) {
+        const int64_t* cell = cells.get_coords(c);
+        for (int d = 0; d < num_dims; ++d) {
+            coords[d] = (cell[d] >= 0) ? cell[d] / max_offset : -((-cell[d] - 1) / max_offset) - 1;
+        }
+        cell_block[c] = blocks.insert(coords.data());
+    }
+    const int num_blocks = blocks.size();
+    std::vector<int> block_start(num_blocks + 1, 0);
+    for (int c = 0; c < num_cells; ++c) block_start[cell_block[c] + 1]++;
+    for (int k = 0; k < num_blocks; ++k) block_start[k + 1] += block_start[k];
+    std::vector<int> block_cells(num_cells);
+    fill_pos.assign(block_start.begin(), block_start.end() - 1);
+    for (int c = 0; c < num_cells; ++c) block_cells[fill_pos[cell_block[c]]++] = c;
+
+    // Determine whether any pair of points in the two cells is within eps.
+    auto cells_linked = [&](int c1, int c2) {
+        const int64_t* coords1 = cells.get_coords(c1);
+        const int64_t* coords2 = cells.get_coords(c2);
+        double min_dist2 = 0.0;
+        for (int d = 0; d < num_dims; ++d) {
+            double gap = std::max((double)std::abs(coords1[d] - coords2[d]) - 1.0, 0.0) * cell_size;
+            min_dist2 += gap * gap;
+        }
+        if (min_dist2 > eps2) return false;
+
+        for (int a = cell_start[c1]; a < cell_start[c1 + 1]; ++a) {
+            const double* pa = points + (uint64_t)cell_points[a] * num_dims;
+            for (int b = cell_start[c2]; b < cell_start[c2 + 1]; ++b) {
+                const double* pb = points + (uint64_t)cell_points[b] * num_dims;
+                double dist2 = 0.0;
+                for (int d = 0; d < num_dims; ++d) {
+                    double diff = pa[d] - pb[d];
+                    dist2 += diff * diff;
+                }
+                if (dist2 <= eps2) return true;
+            }
+        }
+        return false;
+    };
+
+    // Link the cells. All points within a cell are linked to each other, so two cells are
+    // joined as soon as any pair of their points is within eps. Each pair of neighboring
+    // blocks is visited once (from the block with the lower ID).
+    DisjointSet cell_sets(num_cells);
+    std::vector<int64_t> offset(num_dims, -1);
+    std::vector<int64_t> neighbor(num_dims);
+    for (int k = 0; k < num_blocks; ++k) {
+        const int64_t* block = blocks.get_coords(k);
+        std::fill(offset.begin(), offset.end(), -1);
+        while (true) {
+            for (int d = 0; d < num_dims; ++d) neighbor[d] = block[d] + offset[d];
+            const int other = blocks.find(neighbor.data());
+            if (other >= k) {
+                for (int i = block_start[k]; i < block_start[k + 1]; ++i) {
+                    const int c1 = block_cells[i];
+                    int j = (other == k) ? i + 1 : block_start[other];
+                    for (; j < block_start[other + 1]; ++j) {
+                        const int c2 = block_cells[j];
+                        if (cell_sets.find(c1) != cell_sets.find(c2) && cells_linked(c1, c2)) {
+                            cell_sets.join(c1, c2);
+                        }
+                    }
+                }
+            }
+
+            // Move to the next offset in [-1, 1]^D.
+            int d = num_dims - 1;
+            while (d >= 0 && offset[d] == 1) offset[d--] = -1;
+            if (d < 0) break;
+            offset[d]++;
+        }
+    }
+
+    // Number the clusters in the order of their first point.
+    std::vector<int> root_label(num_cells, -1);
+    std::vector<int> labels(num_points);
+    int next_label = 0;
+    for (int i = 0; i < num_points; ++i) {
+        int root = cell_sets.find(point_cell[i]);
+        if (root_label[root] < 0) root_label[root] = next_label++;
+        labels[i] = root_label[root];
+    }
+    return labels;
+}
+
+// -------------------------------------------
+// --- Python definitions --------------------
+// -------------------------------------------
+
+#ifdef Py_PYTHON_H
+static void clustering_bindings(py::module& m) {
+    m.def(
+            "cluster_grid",
+            [](py::array_t<double, py::array::c_style | py::array::forcecast> points, double eps) {
+                if (points.ndim() != 2) throw std::runtime_error("Points must be a (N, D) array.");
+                std::vector<int> labels =
+                        cluster_grid_labels(points.data(), points.shape(0), points.shape(1), eps);
+                return py::array_t<int>(labels.size(), labels.data());
+            },
+            py::arg("points"), py::arg("eps"), pydocs::DOC_cluster_grid);
+}
+#endif
+
+} /* namespace search */
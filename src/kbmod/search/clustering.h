@@ -0,0 +1,26 @@
+/*
+ * clustering.h
+ *
+ * A grid (spatial hash) based clustering of points. Two points are connected if their
+ * Euclidean distance is at most eps and the clusters are the connected components of
+ * the resulting graph. This matches DBSCAN with min_samples=1, but avoids computing
+ * the full neighborhood of every point.
+ *
+ * Created on: Oct 15, 2026
+ */
+
+#ifndef CLUSTERING_H_
+#define CLUSTERING_H_
+
+#include <vector>
+
+namespace search {
+
+// Cluster num_points points of num_dims dimensions (stored in row-major order) and
+// return a cluster label for each point. Labels are numbered in order of the first
+// point (lowest index) in each cluster.
+std::vector<int> cluster_grid_labels(const double* points, int num_points, int num_dims, double eps);
+
+} /* namespace search */
+
+#endif /* CLUSTERING_H_ */
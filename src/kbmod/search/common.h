@@ -166,6 +166,9 @@ struct ImageMoments {
 static void trajectory_bindings(py::module &m) {
     using tj = Trajectory;
 
+    // Allow the trajectories to be copied directly into NumPy structured arrays.
+    PYBIND11_NUMPY_DTYPE(tj, x, y, vx, vy, lh, flux, obs_count);
+
     py::class_<tj>(m, "Trajectory", pydocs::DOC_Trajectory)
             .def(py::init<>())
             .def_readwrite("vx", &tj::vx)
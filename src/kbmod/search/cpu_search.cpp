@@ -0,0 +1,363 @@
+#include "cpu_search.h"
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+
+namespace search {
+
+void sigmag_filtered_indices_cpu(const float* values, int num_values, float sgl0, float sgl1,
+                                 float sigmag_coeff, float width, int* idx_array, int* min_keep_idx,
+                                 int* max_keep_idx) {
+    assert(idx_array != nullptr && min_keep_idx != nullptr && max_keep_idx != nullptr);
+    if (num_values <= 0) {
+        *min_keep_idx = 0;
+        *max_keep_idx = -1;
+        return;
+    }
+
+    // Clip the percentiles to [0.01, 99.99] to avoid invalid array accesses.
+    if (sgl0 < 0.0001) sgl0 = 0.0001;
+    if (sgl1 > 0.9999) sgl1 = 0.9999;
+
+    // Sort the the indexes (idx_array) of values in ascending order.
+    for (int j = 0; j < num_values; j++) {
+        idx_array[j] = j;
+    }
+    std::sort(idx_array, idx_array + num_values, [values](int a, int b) { return values[a] < values[b]; });
+
+    // Compute the index of each of the percent values in values
+    // from the given bounds sgl0, 0.5 (median), and sgl1.
+    const int pct_L = int(ceil(num_values * sgl0) + 0.001) - 1;
+    const int pct_H = int(ceil(num_values * sgl1) + 0.001) - 1;
+    const int median_ind = int(ceil(num_values * 0.5) + 0.001) - 1;
+
+    // Compute the values that are +/- (width * sigma_g) from the median.
+    float sigma_g = sigmag_coeff * (values[idx_array[pct_H]] - values[idx_array[pct_L]]);
+    float min_value = values[idx_array[median_ind]] - width * sigma_g;
+    float max_value = values[idx_array[median_ind]] + width * sigma_g;
+
+    // Find the index of the first value >= min_value.
+    int start = 0;
+    while ((start < median_ind) && (values[idx_array[start]] < min_value)) {
+        ++start;
+    }
+    *min_keep_idx = start;
+
+    // Find the index of the last value <= max_value.
+    int end = median_ind + 1;
+    while ((end < num_values) && (values[idx_array[end]] <= max_value)) {
+        ++end;
+    }
+    *max_keep_idx = end - 1;
+}
+
+// Apply sigma-G filtering to the num_seen valid psi and phi values stored in the
+// scratch space and recompute the candidate's likelihood and flux.
+//
+// The kept observations are exactly those whose light curve value falls in
+// [median - 2 sigma_G, median + 2 sigma_G], so we only need the three percentile
+// values (found with nth_element) instead of a full sort of the light curve.
+static void apply_sigmag_filter_cpu(const SearchParameters& params, int num_seen, Trajectory* candidate,
+                                    TrajectoryScratch& scratch) {
+    if (num_seen <= 0) return;
+    for (int i = 0; i < num_seen; ++i) {
+        scratch.lc[i] = (scratch.phi[i] != 0) ? (scratch.psi[i] / scratch.phi[i]) : 0;
+    }
+
+    // Use the same percentile clipping and indexing as sigmag_filtered_indices_cpu.
+    const float sgl0 = std::max(params.sgl_L, 0.0001f);
+    const float sgl1 = std::min(params.sgl_H, 0.9999f);
+    const int pct_L = int(ceil(num_seen * sgl0) + 0.001) - 1;
+    const int pct_H = int(ceil(num_seen * sgl1) + 0.001) - 1;
+    const int median_ind = int(ceil(num_seen * 0.5) + 0.001) - 1;
+
+    // Find the percentile values on a copy of the light curve. Partition around the median
+    // first, so each of the other percentiles only needs to search one side of it.
+    float* work = scratch.lc_work.data();
+    std::copy(scratch.lc.begin(), scratch.lc.begin() + num_seen, work);
+    std::nth_element(work, work + median_ind, work + num_seen);
+    auto percentile_value = [work, median_ind, num_seen](int ind) {
+        if (ind < median_ind) {
+            std::nth_element(work, work + ind, work + median_ind);
+        } else if (ind > median_ind) {
+            std::nth_element(work + median_ind + 1, work + ind, work + num_seen);
+        }
+        return work[ind];
+    };
+    const float median_val = work[median_ind];
+    const float low_val = percentile_value(pct_L);
+    const float high_val = percentile_value(pct_H);
+
+    const float sigma_g = params.sigmag_coeff * (high_val - low_val);
+    const float min_value = median_val - 2.0 * sigma_g;
+    const float max_value = median_val + 2.0 * sigma_g;
+
+    // Compute the likelihood and flux of the track based on the filtered observations.
+    float new_psi_sum = 0.0;
+    float new_phi_sum = 0.0;
+    for (int i = 0; i < num_seen; ++i) {
+        if ((scratch.lc[i] >= min_value) && (scratch.lc[i] <= max_value)) {
+            new_psi_sum += scratch.psi[i];
+            new_phi_sum += scratch.phi[i];
+        }
+    }
+    candidate->lh = new_psi_sum / sqrt(new_phi_sum);
+    candidate->flux = new_psi_sum / new_phi_sum;
+}
+
+void evaluate_trajectory_cpu(const PsiPhiArrayMeta& psi_phi_meta, void* psi_phi_vect,
+                             const float* image_times, const SearchParameters& params,
+                             Trajectory* candidate, TrajectoryScratch& scratch) {
+    assert(psi_phi_vect != nullptr && image_times != nullptr && candidate != nullptr);
+
+    float psi_sum = 0.0;
+    float phi_sum = 0.0;
+
+    // Reset the statistics for the candidate.
+    candidate->obs_count = 0;
+    candidate->lh = -1.0;
+    candidate->flux = -1.0;
+
+    // Loop over each image and sample the appropriate pixel
+    int num_seen = 0;
+    for (int i = 0; i < psi_phi_meta.num_times; ++i) {
+        // Predict the trajectory's position.
+        float curr_time = image_times[i];
+        int current_x = candidate->x + int(candidate->vx * curr_time + 0.5);
+        int current_y = candidate->y + int(candidate->vy * curr_time + 0.5);
+
+        // Get the Psi and Phi pixel values. Skip invalid values, such as those marked NaN or NO_DATA.
+        PsiPhi pixel_vals = read_encoded_psi_phi_cpu(psi_phi_meta, psi_phi_vect, i, current_y, current_x);
+        if (pixel_value_valid(pixel_vals.psi) && pixel_value_valid(pixel_vals.phi)) {
+            psi_sum += pixel_vals.psi;
+            phi_sum += pixel_vals.phi;
+            scratch.psi[num_seen] = pixel_vals.psi;
+            scratch.phi[num_seen] = pixel_vals.phi;
+            num_seen += 1;
+        }
+    }
+    candidate->obs_count = num_seen;
+    candidate->lh = psi_sum / sqrt(phi_sum);
+    candidate->flux = psi_sum / phi_sum;
+
+    // If we do not have enough observations or a good enough LH score,
+    // do not bother with any of the following steps.
+    if ((num_seen == 0) || (candidate->obs_count < params.min_observations) ||
+        (params.do_sigmag_filter && candidate->lh < params.min_lh))
+        return;
+
+    // If we are doing sigma-G filtering, run the filter and recompute the likelihoods.
+    if (params.do_sigmag_filter) apply_sigmag_filter_cpu(params, num_seen, candidate, scratch);
+}
+
+// Gather the psi and phi values for each lane of the block at a single time step.
+// Out of bounds reads and encoded zeros are returned as NO_DATA (matching
+// read_encoded_psi_phi_cpu). Templated on the storage type so the loop can be
+// compiled to vector gathers for each of the encodings.
+template <typename T>
+static inline void gather_psi_phi_block(const PsiPhiArrayMeta& meta, const T* data, int time, const int* xs,
+                                        const int* ys, float* psi_out, float* phi_out) {
+    const PsiPhiScaling scaling = get_psi_phi_scaling(meta, time);
+#pragma omp simd
+    for (int lane = 0; lane < VELOCITY_BLOCK_SIZE; ++lane) {
+        const bool in_bounds = (xs[lane] >= 0) && (ys[lane] >= 0) && (xs[lane] < meta.width) &&
+                               (ys[lane] < meta.height);
+        const uint64_t index = in_bounds ? psi_phi_entry_index(meta, time, ys[lane], xs[lane]) : 0;
+        const float raw_psi = (float)data[index];
+        const float raw_phi = (float)data[index + 1];
+
+        if (sizeof(T) == 4) {
+            psi_out[lane] = in_bounds ? raw_psi : NO_DATA;
+            phi_out[lane] = in_bounds ? raw_phi : NO_DATA;
+        } else {
+            psi_out[lane] =
+                    in_bounds ? decode_uint_scalar(raw_psi, scaling.psi_min, scaling.psi_scale) : NO_DATA;
+            phi_out[lane] =
+                    in_bounds ? decode_uint_scalar(raw_phi, scaling.phi_min, scaling.phi_scale) : NO_DATA;
+        }
+    }
+}
+
+// On x86-64 Linux builds with GCC, compile AVX-512 and AVX2 versions of the block
+// kernel in addition to the baseline one and select between them at load time. This
+// lets a single (portable) build use the widest vector instructions the CPU supports.
+#if defined(__GNUC__) && !defined(__clang__) && defined(__x86_64__) && defined(__linux__)
+#define KB_SIMD_TARGET_CLONES __attribute__((target_clones("avx512f", "avx2", "default")))
+#else
+#define KB_SIMD_TARGET_CLONES
+#endif
+
+KB_SIMD_TARGET_CLONES
+void evaluate_velocity_block_cpu(const PsiPhiArrayMeta& psi_phi_meta, void* psi_phi_vect,
+                                 const float* image_times, const SearchParameters& params, int x, int y,
+                                 const float* vx, const float* vy, int num_candidates, Trajectory* results,
+                                 TrajectoryScratch& scratch) {
+    assert(psi_phi_vect != nullptr && image_times != nullptr && results != nullptr);
+    assert(num_candidates >= 0 && num_candidates <= VELOCITY_BLOCK_SIZE);
+
+    // Pad the velocities out to a full block so every loop runs over all of the lanes.
+    float block_vx[VELOCITY_BLOCK_SIZE] = {0.0};
+    float block_vy[VELOCITY_BLOCK_SIZE] = {0.0};
+    for (int lane = 0; lane < num_candidates; ++lane) {
+        block_vx[lane] = vx[lane];
+        block_vy[lane] = vy[lane];
+    }
+
+    float psi_sum[VELOCITY_BLOCK_SIZE] = {0.0};
+    float phi_sum[VELOCITY_BLOCK_SIZE] = {0.0};
+    int num_seen[VELOCITY_BLOCK_SIZE] = {0};
+    int xs[VELOCITY_BLOCK_SIZE];
+    int ys[VELOCITY_BLOCK_SIZE];
+
+    for (int t = 0; t < psi_phi_meta.num_times; ++t) {
+        // Predict the positions for all the lanes (using the same rounding as evaluate_trajectory_cpu).
+        const float curr_time = image_times[t];
+#pragma omp simd
+        for (int lane = 0; lane < VELOCITY_BLOCK_SIZE; ++lane) {
+            xs[lane] = x + int(block_vx[lane] * curr_time + 0.5);
+            ys[lane] = y + int(block_vy[lane] * curr_time + 0.5);
+        }
+
+        // Gather the psi and phi values for all of the lanes.
+        float* psi_t = scratch.block_psi.data() + t * VELOCITY_BLOCK_SIZE;
+        float* phi_t = scratch.block_phi.data() + t * VELOCITY_BLOCK_SIZE;
+        if (psi_phi_meta.num_bytes == 1) {
+            gather_psi_phi_block(psi_phi_meta, reinterpret_cast<uint8_t*>(psi_phi_vect), t, xs, ys, psi_t, phi_t);
+        } else if (psi_phi_meta.num_bytes == 2) {
+            gather_psi_phi_block(psi_phi_meta, reinterpret_cast<uint16_t*>(psi_phi_vect), t, xs, ys, psi_t,
+                                 phi_t);
+        } else {
+            gather_psi_phi_block(psi_phi_meta, reinterpret_cast<float*>(psi_phi_vect), t, xs, ys, psi_t, phi_t);
+        }
+
+        // Accumulate the valid values. Invalid values (NaN or NO_DATA) are skipped.
+#pragma omp simd
+        for (int lane = 0; lane < VELOCITY_BLOCK_SIZE; ++lane) {
+            const bool valid = pixel_value_valid(psi_t[lane]) && pixel_value_valid(phi_t[lane]);
+            psi_sum[lane] += valid ? psi_t[lane] : 0.0f;
+            phi_sum[lane] += valid ? phi_t[lane] : 0.0f;
+            num_seen[lane] += valid ? 1 : 0;
+        }
+    }
+
+    // Fill in the results and apply the (per candidate) sigma-G filtering.
+    for (int lane = 0; lane < num_candidates; ++lane) {
+        Trajectory* candidate = &results[lane];
+        candidate->x = x;
+        candidate->y = y;
+        candidate->vx = block_vx[lane];
+        candidate->vy = block_vy[lane];
+        candidate->obs_count = num_seen[lane];
+        candidate->lh = psi_sum[lane] / sqrt(phi_sum[lane]);
+        candidate->flux = psi_sum[lane] / phi_sum[lane];
+
+        if ((num_seen[lane] == 0) || (candidate->obs_count < params.min_observations) ||
+            (params.do_sigmag_filter && candidate->lh < params.min_lh))
+            continue;
+
+        if (params.do_sigmag_filter) {
+            // Compact this lane's valid observations into the per-trajectory scratch space.
+            int count = 0;
+            for (int t = 0; t < psi_phi_meta.num_times; ++t) {
+                const float psi = scratch.block_psi[t * VELOCITY_BLOCK_SIZE + lane];
+                const float phi = scratch.block_phi[t * VELOCITY_BLOCK_SIZE + lane];
+                if (pixel_value_valid(psi) && pixel_value_valid(phi)) {
+                    scratch.psi[count] = psi;
+                    scratch.phi[count] = phi;
+                    ++count;
+                }
+            }
+            apply_sigmag_filter_cpu(params, count, candidate, scratch);
+        }
+    }
+}
+
+void search_cpu_only(PsiPhiArray& psi_phi_array, const SearchParameters& params,
+                     std::vector<Trajectory>& trj_to_search, TrajectoryList& results) {
+    if (!psi_phi_array.cpu_array_allocated()) {
+        throw std::runtime_error("PsiPhi data has not been created.");
+    }
+    if (results.on_gpu()) throw std::runtime_error("Result data on GPU.");
+
+    const int search_width = params.x_start_max - params.x_start_min;
+    const int search_height = params.y_start_max - params.y_start_min;
+    const int num_search_pixels = search_width * search_height;
+    if (results.get_size() < num_search_pixels * RESULTS_PER_PIXEL) {
+        throw std::runtime_error("Result list is too small for the search space.");
+    }
+
+    PsiPhiArrayMeta meta = psi_phi_array.get_meta_data();
+    void* psi_phi_vect = psi_phi_array.get_cpu_array_ptr();
+    const float* image_times = psi_phi_array.get_cpu_time_array_ptr();
+    const int num_trajectories = trj_to_search.size();
+    std::vector<Trajectory>& result_list = results.get_list();
+
+    // Store the candidate velocities as contiguous arrays so they can be loaded in blocks.
+    std::vector<float> all_vx(num_trajectories);
+    std::vector<float> all_vy(num_trajectories);
+    for (int t = 0; t < num_trajectories; ++t) {
+        all_vx[t] = trj_to_search[t].vx;
+        all_vy[t] = trj_to_search[t].vy;
+    }
+
+#pragma omp parallel
+    {
+        TrajectoryScratch scratch(meta.num_times);
+        Trajectory block_results[VELOCITY_BLOCK_SIZE];
+
+        // Each starting pixel is independent and writes to its own block of the results,
+        // so we can divide them up between the threads.
+#pragma omp for schedule(dynamic, 16)
+        for (int pixel = 0; pixel < num_search_pixels; ++pixel) {
+            const int x_i = pixel % search_width;
+            const int y_i = pixel / search_width;
+            const int x = x_i + params.x_start_min;
+            const int y = y_i + params.y_start_min;
+
+            // Create an initial set of best results with likelihood -1.0.
+            Trajectory best[RESULTS_PER_PIXEL];
+            for (int r = 0; r < RESULTS_PER_PIXEL; ++r) {
+                best[r].x = x;
+                best[r].y = y;
+                best[r].lh = -1.0;
+            }
+
+            for (int start = 0; start < num_trajectories; start += VELOCITY_BLOCK_SIZE) {
+                const int block_size = std::min(VELOCITY_BLOCK_SIZE, num_trajectories - start);
+                evaluate_velocity_block_cpu(meta, psi_phi_vect, image_times, params, x, y, &all_vx[start],
+                                            &all_vy[start], block_size, block_results, scratch);
+
+                for (int b = 0; b < block_size; ++b) {
+                    Trajectory curr_trj = block_results[b];
+
+                    // If we do not have enough observations or a good enough LH score,
+                    // do not bother inserting it into the sorted list of results.
+                    if ((curr_trj.obs_count < params.min_observations) ||
+                        (params.do_sigmag_filter && curr_trj.lh < params.min_lh))
+                        continue;
+
+                    // Insert the new trajectory into the sorted list of results.
+                    // Only sort the values with valid likelihoods.
+                    Trajectory temp;
+                    for (int r = 0; r < RESULTS_PER_PIXEL; ++r) {
+                        if (curr_trj.lh > best[r].lh && curr_trj.lh > -1.0) {
+                            temp = best[r];
+                            best[r] = curr_trj;
+                            curr_trj = temp;
+                        }
+                    }
+                }
+            }
+
+            // Copy the sorted list of best results for this pixel into
+            // the correct location within the global results vector.
+            const int base_index = pixel * RESULTS_PER_PIXEL;
+            for (int r = 0; r < RESULTS_PER_PIXEL; ++r) {
+                result_list[base_index + r] = best[r];
+            }
+        }
+    }
+}
+
+} /* namespace search */
@@ -0,0 +1,104 @@
+/*
+ * cpu_search.h
+ *
+ * The CPU implementation of the core search functions. These mirror the on-device
+ * functions in kernels/kernels.cu (evaluateTrajectory, SigmaGFilteredIndicesCU, and
+ * searchFilterImages) so that a full search can be run on machines without a GPU.
+ * The grid search is parallelized over the starting pixels with OpenMP.
+ *
+ * Created on: Oct 15, 2026
+ */
+
+#ifndef CPU_SEARCH_H_
+#define CPU_SEARCH_H_
+
+#include <cstdint>
+#include <vector>
+
+#include "common.h"
+#include "psi_phi_array_ds.h"
+#include "trajectory_list.h"
+
+namespace search {
+
+// The number of candidate velocities evaluated together (in SIMD lanes) for
+// a single starting pixel. 16 floats fills an AVX-512 register.
+constexpr int VELOCITY_BLOCK_SIZE = 16;
+
+/* Scratch space for evaluating trajectories. Each thread uses its own copy
+   so that the buffers can be reused across trajectory evaluations without
+   reallocating memory. The block arrays hold the psi and phi values for a
+   full block of velocities in [time][lane] order. */
+struct TrajectoryScratch {
+    std::vector<float> psi;
+    std::vector<float> phi;
+    std::vector<float> lc;
+    std::vector<float> lc_work;
+    std::vector<float> block_psi;
+    std::vector<float> block_phi;
+
+    explicit TrajectoryScratch(int num_times)
+            : psi(num_times),
+              phi(num_times),
+              lc(num_times),
+              lc_work(num_times),
+              block_psi(num_times * VELOCITY_BLOCK_SIZE),
+              block_phi(num_times * VELOCITY_BLOCK_SIZE) {}
+};
+
+// Decode the psi and phi values at a given time, row, and column. Returns NO_DATA
+// for out of bounds reads. Matches read_encoded_psi_phi() in kernels.cu.
+inline PsiPhi read_encoded_psi_phi_cpu(const PsiPhiArrayMeta& meta, void* psi_phi_vect, int time, int row,
+                                       int col) {
+    if ((row < 0) || (col < 0) || (row >= meta.height) || (col >= meta.width) || (psi_phi_vect == nullptr)) {
+        return {NO_DATA, NO_DATA};
+    }
+
+    // Compute the in-list index from the row, column, and time.
+    uint64_t start_index = psi_phi_entry_index(meta, time, row, col);
+    if (meta.num_bytes == 4) {
+        return {reinterpret_cast<float*>(psi_phi_vect)[start_index],
+                reinterpret_cast<float*>(psi_phi_vect)[start_index + 1]};
+    }
+
+    // Handle the compressed encodings.
+    float psi_value = (meta.num_bytes == 1) ? (float)reinterpret_cast<uint8_t*>(psi_phi_vect)[start_index]
+                                            : (float)reinterpret_cast<uint16_t*>(psi_phi_vect)[start_index];
+    float phi_value = (meta.num_bytes == 1)
+                              ? (float)reinterpret_cast<uint8_t*>(psi_phi_vect)[start_index + 1]
+                              : (float)reinterpret_cast<uint16_t*>(psi_phi_vect)[start_index + 1];
+    const PsiPhiScaling scaling = get_psi_phi_scaling(meta, time);
+    return {decode_uint_scalar(psi_value, scaling.psi_min, scaling.psi_scale),
+            decode_uint_scalar(phi_value, scaling.phi_min, scaling.phi_scale)};
+}
+
+// Compute the indices of the values that pass sigma-G filtering. After the call idx_array
+// holds the indices of values in sorted order and [min_keep_idx, max_keep_idx] is
+// the range of positions in idx_array that are kept.
+void sigmag_filtered_indices_cpu(const float* values, int num_values, float sgl0, float sgl1,
+                                 float sigmag_coeff, float width, int* idx_array, int* min_keep_idx,
+                                 int* max_keep_idx);
+
+// Evaluate a single candidate trajectory. Modifies the trajectory in place to
+// set the number of observations, likelihood, and flux.
+void evaluate_trajectory_cpu(const PsiPhiArrayMeta& psi_phi_meta, void* psi_phi_vect,
+                             const float* image_times, const SearchParameters& params,
+                             Trajectory* candidate, TrajectoryScratch& scratch);
+
+// Evaluate a block of up to VELOCITY_BLOCK_SIZE candidate velocities starting from
+// pixel (x, y). The position prediction, psi/phi gather, and sums are vectorized
+// across the candidates. Fills the first num_candidates entries of results with the
+// same values that evaluate_trajectory_cpu() would produce.
+void evaluate_velocity_block_cpu(const PsiPhiArrayMeta& psi_phi_meta, void* psi_phi_vect,
+                                 const float* image_times, const SearchParameters& params, int x, int y,
+                                 const float* vx, const float* vy, int num_candidates, Trajectory* results,
+                                 TrajectoryScratch& scratch);
+
+// Run the full grid search on the CPU. Fills results with RESULTS_PER_PIXEL
+// trajectories for each starting pixel (in search space order).
+void search_cpu_only(PsiPhiArray& psi_phi_array, const SearchParameters& params,
+                     std::vector<Trajectory>& trj_to_search, TrajectoryList& results);
+
+} /* namespace search */
+
+#endif /* CPU_SEARCH_H_ */
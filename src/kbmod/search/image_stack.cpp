@@ -35,29 +35,143 @@ void ImageStack::convolve_psf() {
 }
 
 RawImage ImageStack::make_global_mask(int flags, int threshold) {
-    int npixels = get_npixels();
+    GlobalMaskBuilder builder(get_width(), get_height(), flags);
+    builder.add_stack(*this);
+    return builder.make_mask(threshold);
+}
 
-    // Start with an empty global mask.
-    RawImage global_mask = RawImage(get_width(), get_height());
-    global_mask.set_all(0.0);
+void ImageStack::apply_mask_operations(int mask_flags, int global_flags, int global_threshold,
+                                       float mask_threshold, int grow_steps) {
+    // Generate the global mask before we start modifying the individual masks.
+    const bool use_global = (global_flags != 0);
+    RawImage global_mask = use_global ? make_global_mask(global_flags, global_threshold) : RawImage();
+    const float* global_m = use_global ? global_mask.data() : nullptr;
+
+    const int num_images = images.size();
+    const int npixels = get_npixels();
+#pragma omp parallel for schedule(dynamic)
+    for (int img = 0; img < num_images; ++img) {
+        LayeredImage& image = images[img];
+        float* mask_pixels = image.get_mask().data();
+        float* sci_pixels = image.get_science().data();
+        float* var_pixels = image.get_variance().data();
+
+        // Binarize the mask, mask pixels above the threshold, and union in the global mask
+        // in a single pass.
+        for (int p = 0; p < npixels; ++p) {
+            bool masked = (mask_flags & static_cast<int>(mask_pixels[p])) != 0;
+            masked = masked || (sci_pixels[p] > mask_threshold);
+            masked = masked || (use_global && global_m[p] > 0.0);
+            mask_pixels[p] = masked ? 1 : 0;
+        }
 
-    // For each pixel count the number of images where it is masked.
-    std::vector<int> counts(npixels, 0);
-    for (unsigned int img = 0; img < images.size(); ++img) {
-        auto imgMask = images[img].get_mask().get_image().reshaped();
+        if (grow_steps > 0) image.grow_mask(grow_steps);
 
-        // Count the number of times a pixel has any of the given flags
-        for (unsigned int pixel = 0; pixel < npixels; ++pixel) {
-            if ((flags & static_cast<int>(imgMask[pixel])) != 0) counts[pixel]++;
+        // Apply the binary mask to the science and variance layers.
+        for (int p = 0; p < npixels; ++p) {
+            if (mask_pixels[p] != 0) {
+                sci_pixels[p] = NO_DATA;
+                var_pixels[p] = NO_DATA;
+            }
         }
     }
+}
 
-    // Set all pixels below threshold to 0 and all above to 1
-    auto global_m = global_mask.get_image().reshaped();
-    for (unsigned int p = 0; p < npixels; ++p) {
-        global_m[p] = counts[p] < threshold ? 0.0 : 1.0;
+// --------------------------------------------
+// GlobalMaskBuilder
+// --------------------------------------------
+
+GlobalMaskBuilder::GlobalMaskBuilder(unsigned width, unsigned height, int flags)
+        : width(width), height(height), flags(flags), num_images(0), counts((uint64_t)width * height, 0) {}
+
+int GlobalMaskBuilder::get_count(int row, int col) const {
+    if (row < 0 || col < 0 || row >= height || col >= width) {
+        throw std::out_of_range("GlobalMaskBuilder index out of bounds.");
+    }
+    return counts[(uint64_t)row * width + col];
+}
+
+void GlobalMaskBuilder::check_dimensions(LayeredImage& img) const {
+    if (img.get_width() != width || img.get_height() != height) {
+        throw std::runtime_error("Image dimensions do not match the GlobalMaskBuilder.");
+    }
+}
+
+void GlobalMaskBuilder::add_image(LayeredImage& img) {
+    check_dimensions(img);
+    if (num_images >= std::numeric_limits<uint16_t>::max()) {
+        throw std::runtime_error("Too many images for the GlobalMaskBuilder counters.");
+    }
+
+    const int npixels = counts.size();
+    const float* mask_pixels = img.get_mask().data();
+#pragma omp parallel for simd schedule(static)
+    for (int pixel = 0; pixel < npixels; ++pixel) {
+        counts[pixel] += ((flags & static_cast<int>(mask_pixels[pixel])) != 0);
+    }
+    num_images++;
+}
+
+void GlobalMaskBuilder::remove_image(LayeredImage& img) {
+    check_dimensions(img);
+    const int npixels = counts.size();
+    const float* mask_pixels = img.get_mask().data();
+
+    // Check that the image could have been added before changing any of the counts.
+    int num_invalid = 0;
+#pragma omp parallel for reduction(+ : num_invalid) schedule(static)
+    for (int pixel = 0; pixel < npixels; ++pixel) {
+        num_invalid += (((flags & static_cast<int>(mask_pixels[pixel])) != 0) && (counts[pixel] == 0));
+    }
+    if (num_images == 0 || num_invalid > 0) {
+        throw std::runtime_error("Removing an image that was not added to the GlobalMaskBuilder.");
     }
 
+#pragma omp parallel for simd schedule(static)
+    for (int pixel = 0; pixel < npixels; ++pixel) {
+        counts[pixel] -= ((flags & static_cast<int>(mask_pixels[pixel])) != 0);
+    }
+    num_images--;
+}
+
+void GlobalMaskBuilder::add_stack(ImageStack& stack) {
+    const int stack_size = stack.img_count();
+    for (int img = 0; img < stack_size; ++img) check_dimensions(stack.get_single_image(img));
+    if (num_images + stack_size > std::numeric_limits<uint16_t>::max()) {
+        throw std::runtime_error("Too many images for the GlobalMaskBuilder counters.");
+    }
+
+    // Each thread handles a contiguous block of pixels across all of the images, so
+    // the counts are only written once.
+    const int npixels = counts.size();
+    std::vector<LayeredImage>& images = stack.get_images();
+#pragma omp parallel for schedule(static)
+    for (int pixel = 0; pixel < npixels; ++pixel) {
+        int count = counts[pixel];
+        for (int img = 0; img < stack_size; ++img) {
+            // Count the number of times a pixel has any of the given flags
+            if ((flags & static_cast<int>(images[img].get_mask().data()[pixel])) != 0) count++;
+        }
+        counts[pixel] = count;
+    }
+    num_images += stack_size;
+}
+
+void GlobalMaskBuilder::clear() {
+    std::fill(counts.begin(), counts.end(), 0);
+    num_images = 0;
+}
+
+RawImage GlobalMaskBuilder::make_mask(int threshold) const {
+    RawImage global_mask = RawImage(width, height);
+
+    // Set all pixels below threshold to 0 and all above to 1
+    const int npixels = counts.size();
+    float* global_m = global_mask.data();
+#pragma omp parallel for simd schedule(static)
+    for (int pixel = 0; pixel < npixels; ++pixel) {
+        global_m[pixel] = counts[pixel] < threshold ? 0.0 : 1.0;
+    }
     return global_mask;
 }
 
@@ -77,10 +191,28 @@ static void image_stack_bindings(py::module& m) {
             .def("build_zeroed_times", &is::build_zeroed_times, pydocs::DOC_ImageStack_build_zeroed_times)
             .def("img_count", &is::img_count, pydocs::DOC_ImageStack_img_count)
             .def("make_global_mask", &is::make_global_mask, pydocs::DOC_ImageStack_make_global_mask)
+            .def("apply_mask_operations", &is::apply_mask_operations, py::arg("mask_flags"),
+                 py::arg("global_flags") = 0, py::arg("global_threshold") = 0,
+                 py::arg("mask_threshold") = std::numeric_limits<float>::infinity(),
+                 py::arg("grow_steps") = 0, pydocs::DOC_ImageStack_apply_mask_operations)
             .def("convolve_psf", &is::convolve_psf, pydocs::DOC_ImageStack_convolve_psf)
             .def("get_width", &is::get_width, pydocs::DOC_ImageStack_get_width)
             .def("get_height", &is::get_height, pydocs::DOC_ImageStack_get_height)
             .def("get_npixels", &is::get_npixels, pydocs::DOC_ImageStack_get_npixels);
+
+    using gmb = search::GlobalMaskBuilder;
+    py::class_<gmb>(m, "GlobalMaskBuilder", pydocs::DOC_GlobalMaskBuilder)
+            .def(py::init<unsigned, unsigned, int>(), py::arg("width"), py::arg("height"), py::arg("flags"))
+            .def_property_readonly("width", &gmb::get_width)
+            .def_property_readonly("height", &gmb::get_height)
+            .def_property_readonly("flags", &gmb::get_flags)
+            .def_property_readonly("num_images", &gmb::get_num_images)
+            .def("get_count", &gmb::get_count, pydocs::DOC_GlobalMaskBuilder_get_count)
+            .def("add_image", &gmb::add_image, pydocs::DOC_GlobalMaskBuilder_add_image)
+            .def("remove_image", &gmb::remove_image, pydocs::DOC_GlobalMaskBuilder_remove_image)
+            .def("add_stack", &gmb::add_stack, pydocs::DOC_GlobalMaskBuilder_add_stack)
+            .def("clear", &gmb::clear, pydocs::DOC_GlobalMaskBuilder_clear)
+            .def("make_mask", &gmb::make_mask, pydocs::DOC_GlobalMaskBuilder_make_mask);
 }
 
 #endif /* Py_PYTHON_H */
@@ -1,11 +1,13 @@
 #ifndef IMAGESTACK_H_
 #define IMAGESTACK_H_
 
+#include <cstdint>
 #include <vector>
 #include <dirent.h>
 #include <string>
 #include <list>
 #include <iostream>
+#include <limits>
 #include <stdexcept>
 
 #include "layered_image.h"
@@ -34,12 +36,53 @@ public:
     // Make and return a global mask.
     RawImage make_global_mask(int flags, int threshold);
 
+    // Apply the full masking pipeline (binarize, threshold, global mask, grow, and apply)
+    // to every image in a single call.
+    void apply_mask_operations(int mask_flags, int global_flags, int global_threshold, float mask_threshold,
+                               int grow_steps);
+
     virtual ~ImageStack(){};
 
 private:
     std::vector<LayeredImage> images;
 };
 
+/* Keeps a count, for each pixel, of the number of images in which the pixel has any of
+   the given mask flags set. Images can be added and removed one at a time (for example
+   as new images are appended to a stack) and the threshold is only applied when the
+   global mask is requested. */
+class GlobalMaskBuilder {
+public:
+    GlobalMaskBuilder(unsigned width, unsigned height, int flags);
+
+    // Simple getters.
+    unsigned get_width() const { return width; }
+    unsigned get_height() const { return height; }
+    int get_flags() const { return flags; }
+    int get_num_images() const { return num_images; }
+    int get_count(int row, int col) const;
+
+    // Functions for updating the counts.
+    void add_image(LayeredImage& img);
+    void remove_image(LayeredImage& img);
+    void add_stack(ImageStack& stack);
+    void clear();
+
+    // Make the binary global mask of the pixels masked in at least threshold images.
+    RawImage make_mask(int threshold) const;
+
+    virtual ~GlobalMaskBuilder(){};
+
+private:
+    void check_dimensions(LayeredImage& img) const;
+
+    unsigned width;
+    unsigned height;
+    int flags;
+    int num_images;
+    std::vector<uint16_t> counts;
+};
+
 } /* namespace search */
 
 #endif /* IMAGESTACK_H_ */
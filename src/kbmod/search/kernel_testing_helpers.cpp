@@ -1,7 +1,11 @@
 /* Helper functions for testing functions in the .cu files from Python. */
 
+#include <algorithm>
+#include <float.h>
 #include <vector>
 
+#include "cpu_search.h"
+
 namespace search {
 #ifdef HAVE_CUDA
 /* The filter_kenerls.cu functions. */
@@ -29,7 +33,8 @@ std::vector<int> sigmaGFilteredIndices(std::vector<float> values, float sgl0, fl
     SigmaGFilteredIndicesCU(values.data(), num_values, sgl0, sgl1, sigma_g_coeff, width, idx_array.data(),
                             &min_keep_idx, &max_keep_idx);
 #else
-    throw std::runtime_error("Non-GPU SigmaGFilteredIndicesCU is not implemented.");
+    sigmag_filtered_indices_cpu(values.data(), num_values, sgl0, sgl1, sigma_g_coeff, width, idx_array.data(),
+                                &min_keep_idx, &max_keep_idx);
 #endif
 
     // Copy the result into a vector and return it.
@@ -40,4 +45,52 @@ std::vector<int> sigmaGFilteredIndices(std::vector<float> values, float sgl0, fl
     return result;
 }
 
+/* Used for testing and benchmarking the CPU trajectory evaluation from python.
+ *
+ * Evaluates each of the candidate velocities starting from pixel (x, y) with either the
+ * vectorized block kernel (evaluate_velocity_block_cpu) or the scalar kernel
+ * (evaluate_trajectory_cpu). Uses min_observations = 0 and no likelihood threshold.
+ */
+std::vector<Trajectory> evaluateTrajectoriesCPU(PsiPhiArray& psi_phi, int x, int y,
+                                                std::vector<Trajectory>& candidates, bool use_block_kernel,
+                                                bool do_sigmag) {
+    if (!psi_phi.cpu_array_allocated()) throw std::runtime_error("PsiPhi data has not been created.");
+
+    SearchParameters params;
+    params.min_observations = 0;
+    params.min_lh = -FLT_MAX;
+    params.do_sigmag_filter = do_sigmag;
+    params.sgl_L = 0.25;
+    params.sgl_H = 0.75;
+    params.sigmag_coeff = 0.7413;
+
+    PsiPhiArrayMeta meta = psi_phi.get_meta_data();
+    TrajectoryScratch scratch(meta.num_times);
+    const int num_candidates = candidates.size();
+
+    std::vector<Trajectory> results(candidates.begin(), candidates.end());
+    if (use_block_kernel) {
+        std::vector<float> vx(num_candidates);
+        std::vector<float> vy(num_candidates);
+        for (int i = 0; i < num_candidates; ++i) {
+            vx[i] = candidates[i].vx;
+            vy[i] = candidates[i].vy;
+        }
+        for (int start = 0; start < num_candidates; start += VELOCITY_BLOCK_SIZE) {
+            int block_size = std::min(VELOCITY_BLOCK_SIZE, num_candidates - start);
+            evaluate_velocity_block_cpu(meta, psi_phi.get_cpu_array_ptr(), psi_phi.get_cpu_time_array_ptr(),
+                                        params, x, y, &vx[start], &vy[start], block_size, &results[start],
+                                        scratch);
+        }
+    } else {
+        for (int i = 0; i < num_candidates; ++i) {
+            results[i].x = x;
+            results[i].y = y;
+            evaluate_trajectory_cpu(meta, psi_phi.get_cpu_array_ptr(), psi_phi.get_cpu_time_array_ptr(),
+                                    params, &results[i], scratch);
+        }
+    }
+    return results;
+}
+
 } /* namespace search */
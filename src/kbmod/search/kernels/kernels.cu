@@ -41,7 +41,7 @@ __host__ __device__ PsiPhi read_encoded_psi_phi(PsiPhiArrayMeta &params, void *p
     }
 
     // Compute the in-list index from the row, column, and time.
-    int start_index = 2 * (params.pixels_per_image * time + row * params.width + col);
+    uint64_t start_index = psi_phi_entry_index(params, time, row, col);
     if (params.num_bytes == 4) {
         // Short circuit the typical case of float encoding. No scaling or shifting done.
         return {reinterpret_cast<float *>(psi_phi_vect)[start_index],
@@ -49,16 +49,17 @@ __host__ __device__ PsiPhi read_encoded_psi_phi(PsiPhiArrayMeta &params, void *p
     }
 
     // Handle the compressed encodings.
+    const PsiPhiScaling scaling = get_psi_phi_scaling(params, time);
     PsiPhi result;
     float psi_value = (params.num_bytes == 1)
                               ? (float)reinterpret_cast<uint8_t *>(psi_phi_vect)[start_index]
                               : (float)reinterpret_cast<uint16_t *>(psi_phi_vect)[start_index];
-    result.psi = (psi_value == 0.0) ? NO_DATA : (psi_value - 1.0) * params.psi_scale + params.psi_min_val;
+    result.psi = (psi_value == 0.0) ? NO_DATA : (psi_value - 1.0) * scaling.psi_scale + scaling.psi_min;
 
     float phi_value = (params.num_bytes == 1)
                               ? (float)reinterpret_cast<uint8_t *>(psi_phi_vect)[start_index + 1]
                               : (float)reinterpret_cast<uint16_t *>(psi_phi_vect)[start_index + 1];
-    result.phi = (phi_value == 0.0) ? NO_DATA : (phi_value - 1.0) * params.phi_scale + params.phi_min_val;
+    result.phi = (phi_value == 0.0) ? NO_DATA : (phi_value - 1.0) * scaling.phi_scale + scaling.phi_min;
 
     return result;
 }
@@ -320,7 +321,8 @@ extern "C" void deviceSearchFilter(PsiPhiArray &psi_phi_array, SearchParameters
     dim3 threads(THREAD_DIM_X, THREAD_DIM_Y);
 
     // Launch Search
-    searchFilterImages<<<blocks, threads>>>(psi_phi_array.get_meta_data(), psi_phi_array.get_gpu_array_ptr(),
+    searchFilterImages<<<blocks, threads>>>(psi_phi_array.get_gpu_meta_data(),
+                                            psi_phi_array.get_gpu_array_ptr(),
                                             psi_phi_array.get_gpu_time_array_ptr(), params, num_trajectories,
                                             device_tests, device_results);
     cudaDeviceSynchronize();
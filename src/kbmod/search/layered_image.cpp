@@ -86,35 +86,44 @@ void LayeredImage::union_threshold_masking(float thresh) {
     }
 }
 
-/* This implementation of grow_mask is optimized for steps > 1
-   (which is how the code is generally used. If you are only
-   growing the mask by 1, the extra copy will be a little slower.
+/* Grow the mask with a two pass (forward and backward) chamfer distance transform.
+   With 4-connected neighbors this computes the exact Manhattan distance from each
+   pixel to the nearest masked pixel, so the result matches expanding the mask by one
+   pixel per step, but only takes two passes over the image regardless of the steps.
 */
 void LayeredImage::grow_mask(int steps) {
-    ImageI bitmask = ImageI::Constant(height, width, -1);
-    bitmask = (mask.get_image().array() > 0).select(0, bitmask);
-
-    for (int itr = 1; itr <= steps; ++itr) {
-        for (int j = 0; j < height; ++j) {
-            for (int i = 0; i < width; ++i) {
-                if (bitmask(j, i) == -1) {
-                    if (((j - 1 >= 0) && (bitmask(j - 1, i) == itr - 1)) ||
-                        ((i - 1 >= 0) && (bitmask(j, i - 1) == itr - 1)) ||
-                        ((j + 1 < height) && (bitmask(j + 1, i) == itr - 1)) ||
-                        ((i + 1 < width) && (bitmask(j, i + 1) == itr - 1))) {
-                        bitmask(j, i) = itr;
-                    }
-                }
-            }  // for i
-        }      // for j
-    }          // for step
+    const int num_pixels = get_npixels();
+    float* mask_pixels = mask.data();
 
-    // Overwrite the mask with the expanded one.
+    // Any distance is smaller than width + height.
+    const int far = width + height;
+    std::vector<int> dist(num_pixels);
+    for (int p = 0; p < num_pixels; ++p) {
+        dist[p] = (mask_pixels[p] > 0) ? 0 : far;
+    }
+
+    // Forward pass: propagate distances from the pixels above and to the left.
     for (int j = 0; j < height; ++j) {
         for (int i = 0; i < width; ++i) {
-            mask.set_pixel({j, i}, (bitmask(j, i) == -1) ? 0 : 1);
+            const int idx = j * width + i;
+            if (j > 0) dist[idx] = std::min(dist[idx], dist[idx - width] + 1);
+            if (i > 0) dist[idx] = std::min(dist[idx], dist[idx - 1] + 1);
         }
     }
+
+    // Backward pass: propagate distances from the pixels below and to the right.
+    for (int j = height - 1; j >= 0; --j) {
+        for (int i = width - 1; i >= 0; --i) {
+            const int idx = j * width + i;
+            if (j < height - 1) dist[idx] = std::min(dist[idx], dist[idx + width] + 1);
+            if (i < width - 1) dist[idx] = std::min(dist[idx], dist[idx + 1] + 1);
+        }
+    }
+
+    // Overwrite the mask with the expanded one.
+    for (int p = 0; p < num_pixels; ++p) {
+        mask_pixels[p] = (dist[p] <= steps) ? 1 : 0;
+    }
 }
 
 void LayeredImage::subtract_template(RawImage& sub_template) {
@@ -1,6 +1,7 @@
 #ifndef LAYEREDIMAGE_H_
 #define LAYEREDIMAGE_H_
 
+#include <algorithm>
 #include <vector>
 #include <iostream>
 #include <string>
@@ -102,6 +102,39 @@ void PSF::square_psf() {
     calc_sum();
 }
 
+bool PSF::get_separable_kernels(std::vector<float>& col_kernel, std::vector<float>& row_kernel) const {
+    // Use the largest magnitude entry as the pivot for the decomposition.
+    int pivot = 0;
+    for (int i = 1; i < (int)kernel.size(); ++i) {
+        if (std::fabs(kernel[i]) > std::fabs(kernel[pivot])) pivot = i;
+    }
+    const float max_abs = std::fabs(kernel[pivot]);
+    if (max_abs == 0.0) return false;
+    const int pivot_row = pivot / dim;
+    const int pivot_col = pivot % dim;
+
+    col_kernel.resize(dim);
+    row_kernel.resize(dim);
+    for (int i = 0; i < dim; ++i) {
+        col_kernel[i] = kernel[i * dim + pivot_col];
+        row_kernel[i] = kernel[pivot_row * dim + i] / kernel[pivot];
+    }
+
+    // The kernel is separable if the outer product reproduces it (up to float precision).
+    const float tolerance = 1e-6 * max_abs;
+    for (int r = 0; r < dim; ++r) {
+        for (int c = 0; c < dim; ++c) {
+            if (std::fabs(kernel[r * dim + c] - col_kernel[r] * row_kernel[c]) > tolerance) return false;
+        }
+    }
+    return true;
+}
+
+bool PSF::is_separable() const {
+    std::vector<float> col_kernel, row_kernel;
+    return get_separable_kernels(col_kernel, row_kernel);
+}
+
 std::string PSF::print() {
     std::stringstream ss;
     ss.setf(std::ios::fixed, std::ios::floatfield);
@@ -174,6 +207,7 @@ static void psf_bindings(py::module& m) {
             .def("get_kernel", &psf::get_kernel, pydocs::DOC_PSF_get_kernel)
             .def("get_value", &psf::get_value, pydocs::DOC_PSF_get_value)
             .def("square_psf", &psf::square_psf, pydocs::DOC_PSF_square_psf)
+            .def("is_separable", &psf::is_separable, pydocs::DOC_PSF_is_separable)
             .def("print", &psf::print, pydocs::DOC_PSF_print);
 }
 #endif
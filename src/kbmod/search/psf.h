@@ -39,6 +39,11 @@ public:
 
     // Computation functions.
     void square_psf();
+
+    // Check whether the kernel is separable (the outer product of a column and a row kernel,
+    // as is the case for Gaussians) and, if so, fill in the two 1-D kernels.
+    bool get_separable_kernels(std::vector<float>& col_kernel, std::vector<float>& row_kernel) const;
+    bool is_separable() const;
     std::string print();
 
 private:
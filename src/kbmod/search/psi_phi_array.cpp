@@ -2,6 +2,18 @@
 #include "psi_phi_array_utils.h"
 #include "pydocs/psi_phi_array_docs.h"
 
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#include <algorithm>
+#include <cstring>
+#include <type_traits>
+
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
 // Declaration of CUDA functions that will be linked in.
 #ifdef HAVE_CUDA
 #include "kernels/kernel_memory.h"
@@ -23,11 +35,18 @@ PsiPhiArray::~PsiPhiArray() { clear(); }
 
 void PsiPhiArray::clear() {
     // Free all used memory on CPU and GPU.
-    if (cpu_array_ptr != nullptr) {
+    if (cpu_mapped_ptr != nullptr) {
+        munmap(cpu_mapped_ptr, cpu_mapped_size);
+        cpu_mapped_ptr = nullptr;
+        cpu_mapped_size = 0;
+        cpu_array_ptr = nullptr;
+    } else if (cpu_array_ptr != nullptr) {
         free(cpu_array_ptr);
         cpu_array_ptr = nullptr;
     }
     cpu_time_array.clear();
+    cpu_scale_array.clear();
+    meta_data.time_scaling = nullptr;
     clear_from_gpu();
 
     // Reset the meta data except the encoding information.
@@ -37,6 +56,7 @@ void PsiPhiArray::clear() {
     meta_data.pixels_per_image = 0;
     meta_data.num_entries = 0;
     meta_data.total_array_size = 0;
+    meta_data.tiles_per_row = 0;
 
     meta_data.psi_min_val = FLT_MAX;
     meta_data.psi_max_val = -FLT_MAX;
@@ -60,6 +80,7 @@ void PsiPhiArray::clear_from_gpu() {
 
 #ifdef HAVE_CUDA
     gpu_time_array.free_gpu_memory();
+    if (gpu_scale_array.on_gpu()) gpu_scale_array.free_gpu_memory();
     free_gpu_block(gpu_array_ptr);
 #endif
 
@@ -96,10 +117,22 @@ void PsiPhiArray::move_to_gpu(bool debug) {
     gpu_time_array.resize(cpu_time_array.size());
     gpu_time_array.copy_vector_to_gpu(cpu_time_array);
 
+    // Copy the per time step encoding parameters (if used).
+    if (!cpu_scale_array.empty()) {
+        gpu_scale_array.resize(cpu_scale_array.size());
+        gpu_scale_array.copy_vector_to_gpu(cpu_scale_array);
+    }
+
     data_on_gpu = true;
 #endif
 }
 
+PsiPhiArrayMeta PsiPhiArray::get_gpu_meta_data() {
+    PsiPhiArrayMeta gpu_meta = meta_data;
+    gpu_meta.time_scaling = gpu_scale_array.on_gpu() ? gpu_scale_array.get_ptr() : nullptr;
+    return gpu_meta;
+}
+
 void PsiPhiArray::set_meta_data(int new_num_bytes, int new_num_times, int new_height, int new_width) {
     // Validity checking of parameters.
     if (new_num_bytes != -1 && new_num_bytes != 1 && new_num_bytes != 2 && new_num_bytes != 4) {
@@ -127,8 +160,68 @@ void PsiPhiArray::set_meta_data(int new_num_bytes, int new_num_times, int new_he
     meta_data.num_times = new_num_times;
     meta_data.width = new_width;
     meta_data.height = new_height;
-    meta_data.pixels_per_image = meta_data.width * meta_data.height;
-    meta_data.num_entries = 2 * meta_data.pixels_per_image * meta_data.num_times;
+    update_array_sizes();
+}
+
+void PsiPhiArray::set_layout(PsiPhiLayout new_layout, int new_tile_size) {
+    if (cpu_array_ptr != nullptr) {
+        throw std::runtime_error("Cannot change layout with allocated arrays. Call clear() first.");
+    }
+
+    int shift = 0;
+    if (new_layout == PSI_PHI_TILED) {
+        if ((new_tile_size <= 0) || ((new_tile_size & (new_tile_size - 1)) != 0) || (new_tile_size > 1024)) {
+            throw std::runtime_error("Invalid tile size " + std::to_string(new_tile_size) +
+                                     ". Must be a power of 2 up to 1024.");
+        }
+        while ((1 << shift) < new_tile_size) ++shift;
+    } else if (new_layout != PSI_PHI_INTERLEAVED) {
+        throw std::runtime_error("Invalid PsiPhi layout.");
+    }
+
+    meta_data.layout = new_layout;
+    meta_data.tile_shift = shift;
+    update_array_sizes();
+}
+
+void PsiPhiArray::set_encoding_options(bool per_time_scaling, float clip_fraction) {
+    if (cpu_array_ptr != nullptr) {
+        throw std::runtime_error("Cannot change encoding options with allocated arrays. Call clear() first.");
+    }
+    if (!(clip_fraction >= 0.0 && clip_fraction < 0.5)) {
+        throw std::runtime_error("Invalid clip fraction " + std::to_string(clip_fraction) +
+                                 ". Must be in [0.0, 0.5).");
+    }
+    meta_data.per_time_scaling = per_time_scaling;
+    meta_data.clip_fraction = clip_fraction;
+}
+
+void PsiPhiArray::set_time_scaling(const std::vector<float>& scaling) {
+    if (scaling.size() != 4 * (uint64_t)meta_data.num_times) {
+        throw std::runtime_error("Per time scaling must have 4 values for each time step.");
+    }
+    for (int t = 0; t < meta_data.num_times; ++t) {
+        if (!(scaling[4 * t + 1] > 0.0) || !(scaling[4 * t + 3] > 0.0)) {
+            throw std::runtime_error("Scale value must be greater than zero.");
+        }
+    }
+    cpu_scale_array = scaling;
+    meta_data.time_scaling = cpu_scale_array.data();
+}
+
+void PsiPhiArray::update_array_sizes() {
+    meta_data.pixels_per_image = (uint64_t)meta_data.width * meta_data.height;
+    if (meta_data.layout == PSI_PHI_TILED) {
+        // Pad the image out to a whole number of tiles.
+        const int tile_size = 1 << meta_data.tile_shift;
+        const uint64_t tiles_per_col = (meta_data.height + tile_size - 1) / tile_size;
+        meta_data.tiles_per_row = (meta_data.width + tile_size - 1) / tile_size;
+        meta_data.num_entries =
+                2 * tiles_per_col * meta_data.tiles_per_row * tile_size * tile_size * meta_data.num_times;
+    } else {
+        meta_data.tiles_per_row = 0;
+        meta_data.num_entries = 2 * meta_data.pixels_per_image * meta_data.num_times;
+    }
     meta_data.total_array_size = meta_data.block_size * meta_data.num_entries;
 }
 
@@ -160,7 +253,8 @@ PsiPhi PsiPhiArray::read_psi_phi(int time, int row, int col) {
     }
 
     // Compute the in-list index from the row, column, and time.
-    int start_index = 2 * (meta_data.pixels_per_image * time + row * meta_data.width + col);
+    uint64_t start_index = psi_phi_entry_index(meta_data, time, row, col);
+    const PsiPhiScaling scaling = get_psi_phi_scaling(meta_data, time);
 
     if (meta_data.num_bytes == 4) {
         // Short circuit the typical case of float encoding.
@@ -172,14 +266,12 @@ PsiPhi PsiPhiArray::read_psi_phi(int time, int row, int col) {
         float psi_value = (meta_data.num_bytes == 1)
                                   ? (float)reinterpret_cast<uint8_t*>(cpu_array_ptr)[start_index]
                                   : (float)reinterpret_cast<uint16_t*>(cpu_array_ptr)[start_index];
-        result.psi = (psi_value == 0.0) ? NO_DATA
-                                        : (psi_value - 1.0) * meta_data.psi_scale + meta_data.psi_min_val;
+        result.psi = decode_uint_scalar(psi_value, scaling.psi_min, scaling.psi_scale);
 
         float phi_value = (meta_data.num_bytes == 1)
                                   ? (float)reinterpret_cast<uint8_t*>(cpu_array_ptr)[start_index + 1]
                                   : (float)reinterpret_cast<uint16_t*>(cpu_array_ptr)[start_index + 1];
-        result.phi = (phi_value == 0.0) ? NO_DATA
-                                        : (phi_value - 1.0) * meta_data.phi_scale + meta_data.phi_min_val;
+        result.phi = decode_uint_scalar(phi_value, scaling.phi_min, scaling.phi_scale);
     }
     return result;
 }
@@ -195,6 +287,19 @@ float PsiPhiArray::read_time(int time_index) {
 // --- Implementation of utility functions ---
 // -------------------------------------------
 
+// Compute the scale parameter for encoding values in [min_val, max_val] with num_bytes.
+static float compute_scale_from_bounds(float min_val, float max_val, int num_bytes) {
+    float scale = 1.0;
+    if (num_bytes == 1 || num_bytes == 2) {
+        float width = (max_val - min_val);
+        if (width < 1e-6) width = 1e-6;  // Avoid a zero width.
+
+        long int num_values = (1 << (8 * num_bytes)) - 1;
+        scale = width / (double)num_values;
+    }
+    return scale;
+}
+
 // Compute the min, max, and scale parameter from the a vector of image data.
 std::array<float, 3> compute_scale_params_from_image_vect(const std::vector<RawImage>& imgs, int num_bytes) {
     int num_images = imgs.size();
@@ -202,93 +307,202 @@ std::array<float, 3> compute_scale_params_from_image_vect(const std::vector<RawI
     // Do a linear pass through the data to compute the scaling parameters for psi and phi.
     float min_val = FLT_MAX;
     float max_val = -FLT_MAX;
+#pragma omp parallel for schedule(dynamic) reduction(min : min_val) reduction(max : max_val)
     for (int i = 0; i < num_images; ++i) {
         std::array<float, 2> bnds = imgs[i].compute_bounds();
         if (bnds[0] < min_val) min_val = bnds[0];
         if (bnds[1] > max_val) max_val = bnds[1];
     }
 
-    // Set the scale if we are encoding the values.
-    float scale = 1.0;
-    if (num_bytes == 1 || num_bytes == 2) {
-        float width = (max_val - min_val);
-        if (width < 1e-6) width = 1e-6;  // Avoid a zero width.
+    return {min_val, max_val, compute_scale_from_bounds(min_val, max_val, num_bytes)};
+}
 
-        long int num_values = (1 << (8 * num_bytes)) - 1;
-        scale = width / (double)num_values;
+// Compute the bounds of the valid values in an image. If clip_fraction > 0, that fraction of
+// the valid values at each end is ignored. Returns {FLT_MAX, -FLT_MAX} if there are no valid values.
+static std::array<float, 2> compute_clipped_bounds(const RawImage& img, float clip_fraction) {
+    if (clip_fraction <= 0.0) return img.compute_bounds();
+
+    std::vector<float> values;
+    values.reserve(img.get_npixels());
+    const float* pixels = img.get_image().data();
+    const uint64_t num_pixels = img.get_npixels();
+    for (uint64_t i = 0; i < num_pixels; ++i) {
+        if (pixel_value_valid(pixels[i])) values.push_back(pixels[i]);
     }
+    if (values.empty()) return {FLT_MAX, -FLT_MAX};
 
-    return {min_val, max_val, scale};
+    const uint64_t low = (uint64_t)(clip_fraction * (values.size() - 1));
+    const uint64_t high = values.size() - 1 - low;
+    std::nth_element(values.begin(), values.begin() + low, values.end());
+    std::nth_element(values.begin() + low, values.begin() + high, values.end());
+    return {values[low], values[high]};
 }
 
-template <typename T>
-void set_encode_cpu_psi_phi_array(PsiPhiArray& data, const std::vector<RawImage>& psi_imgs,
-                                  const std::vector<RawImage>& phi_imgs, bool debug) {
-    if (data.get_cpu_array_ptr() != nullptr) {
-        throw std::runtime_error("CPU PsiPhi already allocated.");
+// Compute the (clipped) bounds of the psi and phi values for each time step
+// ({psi_min, psi_max, phi_min, phi_max}) by generating the psi and phi images one
+// at a time and discarding them.
+static std::vector<std::array<float, 4>> compute_psi_phi_bounds_from_stack(ImageStack& stack,
+                                                                           float clip_fraction,
+                                                                           bool parallel_images) {
+    const int num_images = stack.img_count();
+    std::vector<std::array<float, 4>> bounds(num_images);
+#pragma omp parallel for schedule(dynamic) if (parallel_images)
+    for (int i = 0; i < num_images; ++i) {
+        LayeredImage& img = stack.get_single_image(i);
+        std::array<float, 2> psi_bnds = compute_clipped_bounds(img.generate_psi_image(), clip_fraction);
+        std::array<float, 2> phi_bnds = compute_clipped_bounds(img.generate_phi_image(), clip_fraction);
+        bounds[i] = {psi_bnds[0], psi_bnds[1], phi_bnds[0], phi_bnds[1]};
     }
+    return bounds;
+}
+
+// Set the encoding parameters from the bounds of each time step's psi and phi values. The
+// global parameters always cover the full range of the (clipped) values. If per time scaling
+// is enabled, each time step also gets its own parameters.
+static void set_scaling_from_bounds(PsiPhiArray& data, const std::vector<std::array<float, 4>>& bounds,
+                                    bool debug) {
+    const int num_bytes = data.get_num_bytes();
+    std::array<float, 4> global = {FLT_MAX, -FLT_MAX, FLT_MAX, -FLT_MAX};
+    for (const std::array<float, 4>& bnds : bounds) {
+        global[0] = std::min(global[0], bnds[0]);
+        global[1] = std::max(global[1], bnds[1]);
+        global[2] = std::min(global[2], bnds[2]);
+        global[3] = std::max(global[3], bnds[3]);
+    }
+    data.set_psi_scaling(global[0], global[1], compute_scale_from_bounds(global[0], global[1], num_bytes));
+    data.set_phi_scaling(global[2], global[3], compute_scale_from_bounds(global[2], global[3], num_bytes));
+
     if (debug) {
-        printf("Allocating CPU memory for encoded PsiPhi array using %lu bytes.\n",
-               data.get_total_array_size());
+        printf("Encoding psi to %i bytes min=%f, max=%f, scale=%f\n", num_bytes, data.get_psi_min_val(),
+               data.get_psi_max_val(), data.get_psi_scale());
+        printf("Encoding phi to %i bytes min=%f, max=%f, scale=%f\n", num_bytes, data.get_phi_min_val(),
+               data.get_phi_max_val(), data.get_phi_scale());
     }
-    T* encoded = (T*)malloc(data.get_total_array_size());
-    if (encoded == nullptr) {
-        throw std::runtime_error("Unable to allocate space for CPU PsiPhi array.");
+
+    if (data.get_per_time_scaling()) {
+        std::vector<float> scaling(4 * bounds.size());
+        for (size_t t = 0; t < bounds.size(); ++t) {
+            // Time steps without any valid data get a trivial (but valid) encoding.
+            std::array<float, 4> bnds = bounds[t];
+            if (bnds[0] > bnds[1]) bnds[0] = bnds[1] = 0.0;
+            if (bnds[2] > bnds[3]) bnds[2] = bnds[3] = 0.0;
+
+            scaling[4 * t] = bnds[0];
+            scaling[4 * t + 1] = compute_scale_from_bounds(bnds[0], bnds[1], num_bytes);
+            scaling[4 * t + 2] = bnds[2];
+            scaling[4 * t + 3] = compute_scale_from_bounds(bnds[2], bnds[3], num_bytes);
+        }
+        data.set_time_scaling(scaling);
+        if (debug) printf("Using separate encoding parameters for each of %lu times.\n", bounds.size());
     }
+}
+
+// Interleave a single time step's psi and phi images into the (already allocated) CPU
+// array, encoding the values if T is an unsigned integer type. Each row (or, for the
+// tiled layout, each part of a row within a tile) maps to a contiguous block of the
+// output, so the rows are written in parallel.
+template <typename T>
+void write_psi_phi_time_step(PsiPhiArray& data, T* encoded, int time, const RawImage& psi_img,
+                             const RawImage& phi_img) {
+    const PsiPhiArrayMeta& meta = data.get_meta_data();
+    const PsiPhiScaling scaling = get_psi_phi_scaling(meta, time);
+    const float psi_min = scaling.psi_min;
+    const float psi_scale = scaling.psi_scale;
+    const float phi_min = scaling.phi_min;
+    const float phi_scale = scaling.phi_scale;
 
     // Create a safe maximum that is slightly less than the true max to avoid
     // rollover of the unsigned integer.
-    float safe_max_psi = data.get_psi_max_val() - data.get_psi_scale() / 100.0;
-    float safe_max_phi = data.get_phi_max_val() - data.get_phi_scale() / 100.0;
-
-    int current_index = 0;
-    int num_bytes = data.get_num_bytes();
-    for (int t = 0; t < data.get_num_times(); ++t) {
-        for (int row = 0; row < data.get_height(); ++row) {
-            for (int col = 0; col < data.get_width(); ++col) {
-                float psi_value = psi_imgs[t].get_pixel({row, col});
-                float phi_value = phi_imgs[t].get_pixel({row, col});
-
-                // Handle the encoding for the different values.
-                if (num_bytes == 1 || num_bytes == 2) {
-                    psi_value = encode_uint_scalar(psi_value, data.get_psi_min_val(), safe_max_psi,
-                                                   data.get_psi_scale());
-                    phi_value = encode_uint_scalar(phi_value, data.get_phi_min_val(), safe_max_phi,
-                                                   data.get_phi_scale());
+    float psi_max = meta.psi_max_val;
+    float phi_max = meta.phi_max_val;
+    if constexpr (!std::is_same<T, float>::value) {
+        if (meta.time_scaling != nullptr) {
+            const float num_values = (1 << (8 * sizeof(T))) - 1;
+            psi_max = psi_min + psi_scale * num_values;
+            phi_max = phi_min + phi_scale * num_values;
+        }
+    }
+    const float safe_max_psi = psi_max - psi_scale / 100.0;
+    const float safe_max_phi = phi_max - phi_scale / 100.0;
+
+    const int height = meta.height;
+    const int width = meta.width;
+    const int segment_length = (meta.layout == PSI_PHI_TILED) ? data.get_tile_size() : width;
+    const float* psi_data = psi_img.get_image().data();
+    const float* phi_data = phi_img.get_image().data();
+#pragma omp parallel for schedule(static)
+    for (int row = 0; row < height; ++row) {
+        const float* psi_row = psi_data + (uint64_t)row * width;
+        const float* phi_row = phi_data + (uint64_t)row * width;
+        for (int col_start = 0; col_start < width; col_start += segment_length) {
+            const int col_end = std::min(width, col_start + segment_length);
+            T* out = encoded + psi_phi_entry_index(meta, time, row, col_start);
+            for (int col = col_start; col < col_end; ++col, out += 2) {
+                if constexpr (std::is_same<T, float>::value) {
+                    out[0] = psi_row[col];
+                    out[1] = phi_row[col];
+                } else {
+                    out[0] = static_cast<T>(
+                            encode_uint_scalar(psi_row[col], psi_min, safe_max_psi, psi_scale));
+                    out[1] = static_cast<T>(
+                            encode_uint_scalar(phi_row[col], phi_min, safe_max_phi, phi_scale));
                 }
-
-                encoded[current_index++] = static_cast<T>(psi_value);
-                encoded[current_index++] = static_cast<T>(phi_value);
             }
         }
     }
-
-    data.set_cpu_array_ptr((void*)encoded);
 }
 
-void set_float_cpu_psi_phi_array(PsiPhiArray& data, const std::vector<RawImage>& psi_imgs,
-                                 const std::vector<RawImage>& phi_imgs, bool debug) {
+template <typename T>
+T* allocate_cpu_psi_phi_array(PsiPhiArray& data, bool debug) {
     if (data.get_cpu_array_ptr() != nullptr) {
         throw std::runtime_error("CPU PsiPhi already allocated.");
     }
     if (debug) {
         printf("Allocating CPU memory for PsiPhi array using %lu bytes.\n", data.get_total_array_size());
     }
-    float* encoded = (float*)malloc(data.get_total_array_size());
+    T* encoded = (T*)malloc(data.get_total_array_size());
     if (encoded == nullptr) {
         throw std::runtime_error("Unable to allocate space for CPU PsiPhi array.");
     }
 
-    int current_index = 0;
+    // The padding of the tiled layout is never written, so mark everything as NO_DATA first.
+    if (data.get_layout() == PSI_PHI_TILED) {
+        const T no_data = static_cast<T>(std::is_same<T, float>::value ? NO_DATA : 0.0f);
+        std::fill(encoded, encoded + data.get_num_entries(), no_data);
+    }
+    return encoded;
+}
+
+template <typename T>
+void set_encode_cpu_psi_phi_array(PsiPhiArray& data, const std::vector<RawImage>& psi_imgs,
+                                  const std::vector<RawImage>& phi_imgs, bool debug) {
+    T* encoded = allocate_cpu_psi_phi_array<T>(data, debug);
     for (int t = 0; t < data.get_num_times(); ++t) {
-        for (int row = 0; row < data.get_height(); ++row) {
-            for (int col = 0; col < data.get_width(); ++col) {
-                encoded[current_index++] = psi_imgs[t].get_pixel({row, col});
-                encoded[current_index++] = phi_imgs[t].get_pixel({row, col});
-            }
-        }
+        write_psi_phi_time_step<T>(data, encoded, t, psi_imgs[t], phi_imgs[t]);
     }
+    data.set_cpu_array_ptr((void*)encoded);
+}
 
+void set_float_cpu_psi_phi_array(PsiPhiArray& data, const std::vector<RawImage>& psi_imgs,
+                                 const std::vector<RawImage>& phi_imgs, bool debug) {
+    set_encode_cpu_psi_phi_array<float>(data, psi_imgs, phi_imgs, debug);
+}
+
+// Generate the psi and phi image for each LayeredImage in the stack and write it directly
+// into the CPU array. Only the psi and phi images currently being processed (one pair per
+// thread) are held in memory.
+template <typename T>
+void set_encode_cpu_psi_phi_array_from_stack(PsiPhiArray& data, ImageStack& stack, bool parallel_images,
+                                             bool debug) {
+    T* encoded = allocate_cpu_psi_phi_array<T>(data, debug);
+    const int num_images = stack.img_count();
+#pragma omp parallel for schedule(dynamic) if (parallel_images)
+    for (int i = 0; i < num_images; ++i) {
+        LayeredImage& img = stack.get_single_image(i);
+        RawImage psi_img = img.generate_psi_image();
+        RawImage phi_img = img.generate_phi_image();
+        write_psi_phi_time_step<T>(data, encoded, i, psi_img, phi_img);
+    }
     data.set_cpu_array_ptr((void*)encoded);
 }
 
@@ -312,20 +526,15 @@ void fill_psi_phi_array(PsiPhiArray& result_data, int num_bytes, const std::vect
 
     if (result_data.get_num_bytes() == 1 || result_data.get_num_bytes() == 2) {
         // Compute the scaling parameters needed for encoding.
-        std::array<float, 3> psi_params =
-                compute_scale_params_from_image_vect(psi_imgs, result_data.get_num_bytes());
-        result_data.set_psi_scaling(psi_params[0], psi_params[1], psi_params[2]);
-
-        std::array<float, 3> phi_params =
-                compute_scale_params_from_image_vect(phi_imgs, result_data.get_num_bytes());
-        result_data.set_phi_scaling(phi_params[0], phi_params[1], phi_params[2]);
-
-        if (debug) {
-            printf("Encoding psi to %i bytes min=%f, max=%f, scale=%f\n", result_data.get_num_bytes(),
-                   psi_params[0], psi_params[1], psi_params[2]);
-            printf("Encoding phi to %i bytes min=%f, max=%f, scale=%f\n", result_data.get_num_bytes(),
-                   phi_params[0], phi_params[1], phi_params[2]);
+        const float clip_fraction = result_data.get_clip_fraction();
+        std::vector<std::array<float, 4>> bounds(num_times);
+#pragma omp parallel for schedule(dynamic)
+        for (int t = 0; t < num_times; ++t) {
+            std::array<float, 2> psi_bnds = compute_clipped_bounds(psi_imgs[t], clip_fraction);
+            std::array<float, 2> phi_bnds = compute_clipped_bounds(phi_imgs[t], clip_fraction);
+            bounds[t] = {psi_bnds[0], psi_bnds[1], phi_bnds[0], phi_bnds[1]};
         }
+        set_scaling_from_bounds(result_data, bounds, debug);
 
         // Do the local encoding.
         if (result_data.get_num_bytes() == 1) {
@@ -351,28 +560,250 @@ void fill_psi_phi_array(PsiPhiArray& result_data, int num_bytes, const std::vect
 
 void fill_psi_phi_array_from_image_stack(PsiPhiArray& result_data, ImageStack& stack, int num_bytes,
                                          bool debug) {
-    // Compute Phi and Psi from convolved images while leaving masked pixels alone
-    // Reinsert 0s for NO_DATA?
-    std::vector<RawImage> psi_images;
-    std::vector<RawImage> phi_images;
+    if (result_data.get_cpu_array_ptr() != nullptr) {
+        return;
+    }
+
     const int num_images = stack.img_count();
-    if (debug) {
-        unsigned long num_bytes = 2 * stack.get_height() * stack.get_width() * num_images * sizeof(float);
-        printf("Building %i temporary %i by %i images (psi and phi), requiring %lu bytes", (num_images * 2),
-               stack.get_width(), stack.get_height(), num_bytes);
+    if (num_images <= 0) throw std::runtime_error("Trying to fill PsiPhi from an empty stack.");
+    result_data.set_meta_data(num_bytes, num_images, stack.get_height(), stack.get_width());
+
+    // When there are at least as many images as threads, give each thread whole images.
+    // Otherwise process the images one at a time and let the convolutions use all of the threads.
+    int max_threads = 1;
+#ifdef _OPENMP
+    max_threads = omp_get_max_threads();
+#endif
+    const bool parallel_images = (num_images >= max_threads);
+
+    // The psi and phi images are generated one at a time and written directly into the
+    // final array, so the full set of temporary psi and phi images is never held in memory.
+    // Masked pixels are left as NO_DATA.
+    if (result_data.get_num_bytes() == 1 || result_data.get_num_bytes() == 2) {
+        // Compute the scaling parameters needed for encoding with a first pass over the images.
+        set_scaling_from_bounds(
+                result_data,
+                compute_psi_phi_bounds_from_stack(stack, result_data.get_clip_fraction(), parallel_images),
+                debug);
+
+        if (result_data.get_num_bytes() == 1) {
+            set_encode_cpu_psi_phi_array_from_stack<uint8_t>(result_data, stack, parallel_images, debug);
+        } else {
+            set_encode_cpu_psi_phi_array_from_stack<uint16_t>(result_data, stack, parallel_images, debug);
+        }
+    } else {
+        if (debug) {
+            printf("Encoding psi and phi as floats.\n");
+        }
+        set_encode_cpu_psi_phi_array_from_stack<float>(result_data, stack, parallel_images, debug);
+    }
+
+    result_data.set_time_array(stack.build_zeroed_times());
+}
+
+// Mix a block of memory into a running 64-bit hash, 8 bytes at a time.
+static uint64_t hash_bytes(uint64_t hash, const void* data, uint64_t num_bytes) {
+    const unsigned char* bytes = static_cast<const unsigned char*>(data);
+    uint64_t word;
+    uint64_t i = 0;
+    for (; i + 8 <= num_bytes; i += 8) {
+        std::memcpy(&word, bytes + i, 8);
+        hash = (hash ^ word) * 0x9E3779B97F4A7C15ULL;
+        hash ^= hash >> 32;
+    }
+    for (; i < num_bytes; ++i) {
+        hash = (hash ^ bytes[i]) * 0x100000001B3ULL;
+    }
+    return hash;
+}
+
+std::string compute_psi_phi_cache_key(ImageStack& stack, int num_bytes, PsiPhiLayout layout, int tile_size,
+                                      bool per_time_scaling, float clip_fraction) {
+    const int num_images = stack.img_count();
+    const int width = stack.get_width();
+    const int height = stack.get_height();
+    if (num_bytes != 1 && num_bytes != 2) num_bytes = 4;
+    if (layout != PSI_PHI_TILED) tile_size = 1;
+
+    // The encoding options only change the data for the compressed encodings.
+    if (num_bytes == 4) {
+        per_time_scaling = false;
+        clip_fraction = 0.0;
     }
 
-    // Build the psi and phi images first.
+    // Hash the data for each image (in parallel), then combine the hashes in order.
+    std::vector<uint64_t> image_hashes(num_images);
+#pragma omp parallel for schedule(dynamic)
     for (int i = 0; i < num_images; ++i) {
         LayeredImage& img = stack.get_single_image(i);
-        psi_images.push_back(img.generate_psi_image());
-        phi_images.push_back(img.generate_phi_image());
+        const uint64_t num_pixel_bytes = (uint64_t)width * height * sizeof(float);
+        const double obstime = img.get_obstime();
+        const std::vector<float>& kernel = img.get_psf().get_kernel();
+
+        uint64_t hash = 0xCBF29CE484222325ULL;
+        hash = hash_bytes(hash, &obstime, sizeof(double));
+        hash = hash_bytes(hash, img.get_science().data(), num_pixel_bytes);
+        hash = hash_bytes(hash, img.get_variance().data(), num_pixel_bytes);
+        hash = hash_bytes(hash, kernel.data(), kernel.size() * sizeof(float));
+        image_hashes[i] = hash;
+    }
+
+    const int32_t header[8] = {PSI_PHI_FILE_VERSION, num_bytes, num_images, height,
+                               width,                layout,    tile_size,  per_time_scaling};
+    uint64_t hash = hash_bytes(0xCBF29CE484222325ULL, header, sizeof(header));
+    hash = hash_bytes(hash, &clip_fraction, sizeof(float));
+    hash = hash_bytes(hash, image_hashes.data(), image_hashes.size() * sizeof(uint64_t));
+
+    char key[17];
+    snprintf(key, sizeof(key), "%016llx", (unsigned long long)hash);
+    return std::string(key);
+}
+
+// The on-disk layout is a fixed size header, the (zeroed) times, the per time
+// encoding parameters (if used), padding to PSI_PHI_FILE_ALIGNMENT bytes, and
+// then the psi/phi data.
+struct PsiPhiFileHeader {
+    char magic[8];
+    int32_t version;
+    int32_t num_bytes;
+    int32_t num_times;
+    int32_t height;
+    int32_t width;
+    int32_t layout;
+    int32_t tile_size;
+    int32_t per_time_scaling;
+    float clip_fraction;
+    int32_t has_time_scaling;
+    float psi_min_val;
+    float psi_max_val;
+    float psi_scale;
+    float phi_min_val;
+    float phi_max_val;
+    float phi_scale;
+    uint64_t data_offset;
+    uint64_t data_size;
+};
+
+void save_psi_phi_array(PsiPhiArray& data, const std::string& filename) {
+    if (!data.cpu_array_allocated()) {
+        throw std::runtime_error("Cannot save PsiPhiArray without allocated CPU data.");
+    }
+
+    PsiPhiFileHeader header;
+    std::memcpy(header.magic, PSI_PHI_FILE_MAGIC, 8);
+    header.version = PSI_PHI_FILE_VERSION;
+    header.num_bytes = data.get_num_bytes();
+    header.num_times = data.get_num_times();
+    header.height = data.get_height();
+    header.width = data.get_width();
+    header.layout = data.get_layout();
+    header.tile_size = data.get_tile_size();
+    header.per_time_scaling = data.get_per_time_scaling();
+    header.clip_fraction = data.get_clip_fraction();
+    header.has_time_scaling = !data.get_time_scaling().empty();
+    header.psi_min_val = data.get_psi_min_val();
+    header.psi_max_val = data.get_psi_max_val();
+    header.psi_scale = data.get_psi_scale();
+    header.phi_min_val = data.get_phi_min_val();
+    header.phi_max_val = data.get_phi_max_val();
+    header.phi_scale = data.get_phi_scale();
+
+    const std::vector<float>& time_scaling = data.get_time_scaling();
+    const uint64_t times_end =
+            sizeof(PsiPhiFileHeader) + (header.num_times + time_scaling.size()) * sizeof(float);
+    header.data_offset = ((times_end + PSI_PHI_FILE_ALIGNMENT - 1) / PSI_PHI_FILE_ALIGNMENT) *
+                         PSI_PHI_FILE_ALIGNMENT;
+    header.data_size = data.get_total_array_size();
+
+    // Write to a temporary file and rename it, so a partially written file is never
+    // picked up as a valid cache entry.
+    const std::string tmp_filename = filename + ".tmp";
+    FILE* fp = fopen(tmp_filename.c_str(), "wb");
+    if (fp == nullptr) {
+        throw std::runtime_error("Unable to open " + tmp_filename + " for writing.");
+    }
+    std::vector<char> padding(header.data_offset - times_end, 0);
+    bool success = (fwrite(&header, sizeof(PsiPhiFileHeader), 1, fp) == 1);
+    success = success && (fwrite(data.get_cpu_time_array_ptr(), sizeof(float), header.num_times, fp) ==
+                          (size_t)header.num_times);
+    success = success && (fwrite(time_scaling.data(), sizeof(float), time_scaling.size(), fp) ==
+                          time_scaling.size());
+    success = success && (fwrite(padding.data(), 1, padding.size(), fp) == padding.size());
+    success = success && (fwrite(data.get_cpu_array_ptr(), 1, header.data_size, fp) == header.data_size);
+    success = (fclose(fp) == 0) && success;
+    if (!success || rename(tmp_filename.c_str(), filename.c_str()) != 0) {
+        remove(tmp_filename.c_str());
+        throw std::runtime_error("Error writing PsiPhiArray to " + filename);
+    }
+}
+
+void load_psi_phi_array(PsiPhiArray& data, const std::string& filename) {
+    int fd = open(filename.c_str(), O_RDONLY);
+    if (fd < 0) {
+        throw std::runtime_error("Unable to open PsiPhiArray file " + filename);
+    }
+    struct stat file_stats;
+    PsiPhiFileHeader header;
+    if ((fstat(fd, &file_stats) != 0) ||
+        (pread(fd, &header, sizeof(PsiPhiFileHeader), 0) != sizeof(PsiPhiFileHeader)) ||
+        (std::memcmp(header.magic, PSI_PHI_FILE_MAGIC, 8) != 0) || (header.version != PSI_PHI_FILE_VERSION)) {
+        close(fd);
+        throw std::runtime_error("Invalid PsiPhiArray file " + filename);
+    }
+
+    // Check that the file is complete and matches the meta data.
+    data.clear();
+    try {
+        data.set_layout(static_cast<PsiPhiLayout>(header.layout), header.tile_size);
+        data.set_encoding_options(header.per_time_scaling, header.clip_fraction);
+        data.set_meta_data(header.num_bytes, header.num_times, header.height, header.width);
+    } catch (const std::runtime_error& err) {
+        close(fd);
+        data.clear();
+        throw std::runtime_error("Invalid meta data in PsiPhiArray file " + filename + ": " + err.what());
+    }
+    const uint64_t file_size = file_stats.st_size;
+    const uint64_t num_scaling = header.has_time_scaling ? 4 * (uint64_t)header.num_times : 0;
+    if ((header.data_size != data.get_total_array_size()) ||
+        (header.data_offset < sizeof(PsiPhiFileHeader) + (header.num_times + num_scaling) * sizeof(float)) ||
+        (header.data_offset + header.data_size != file_size)) {
+        close(fd);
+        data.clear();
+        throw std::runtime_error("Corrupt or truncated PsiPhiArray file " + filename);
     }
 
-    // Convert these into an array form. Needs the full psi and phi computed first so the
-    // encoding can compute the bounds of each array.
-    std::vector<float> zeroed_times = stack.build_zeroed_times();
-    fill_psi_phi_array(result_data, num_bytes, psi_images, phi_images, zeroed_times, debug);
+    std::vector<float> times(header.num_times);
+    std::vector<float> time_scaling(num_scaling);
+    const ssize_t times_bytes = header.num_times * sizeof(float);
+    const ssize_t scaling_bytes = num_scaling * sizeof(float);
+    if ((pread(fd, times.data(), times_bytes, sizeof(PsiPhiFileHeader)) != times_bytes) ||
+        (pread(fd, time_scaling.data(), scaling_bytes, sizeof(PsiPhiFileHeader) + times_bytes) !=
+         scaling_bytes)) {
+        close(fd);
+        data.clear();
+        throw std::runtime_error("Unable to read times from PsiPhiArray file " + filename);
+    }
+
+    try {
+        if (header.num_bytes == 1 || header.num_bytes == 2) {
+            data.set_psi_scaling(header.psi_min_val, header.psi_max_val, header.psi_scale);
+            data.set_phi_scaling(header.phi_min_val, header.phi_max_val, header.phi_scale);
+            if (num_scaling > 0) data.set_time_scaling(time_scaling);
+        }
+        data.set_time_array(times);
+    } catch (const std::runtime_error& err) {
+        close(fd);
+        data.clear();
+        throw;
+    }
+
+    void* mapped = mmap(nullptr, file_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (mapped == MAP_FAILED) {
+        data.clear();
+        throw std::runtime_error("Unable to memory map PsiPhiArray file " + filename);
+    }
+    data.set_cpu_array_mapping(mapped, file_size, header.data_offset);
 }
 
 // -------------------------------------------
@@ -388,6 +819,11 @@ static void psi_phi_array_binding(py::module& m) {
             .def_readwrite("psi", &search::PsiPhi::psi)
             .def_readwrite("phi", &search::PsiPhi::phi);
 
+    py::enum_<search::PsiPhiLayout>(m, "PsiPhiLayout", pydocs::DOC_PsiPhiLayout)
+            .value("PSI_PHI_INTERLEAVED", search::PsiPhiLayout::PSI_PHI_INTERLEAVED)
+            .value("PSI_PHI_TILED", search::PsiPhiLayout::PSI_PHI_TILED)
+            .export_values();
+
     py::class_<ppa>(m, "PsiPhiArray", pydocs::DOC_PsiPhiArray)
             .def(py::init<>())
             .def_property_readonly("on_gpu", &ppa::on_gpu, pydocs::DOC_PsiPhiArray_on_gpu)
@@ -402,6 +838,14 @@ static void psi_phi_array_binding(py::module& m) {
             .def_property_readonly("total_array_size", &ppa::get_total_array_size,
                                    pydocs::DOC_PsiPhiArray_get_total_array_size)
             .def_property_readonly("block_size", &ppa::get_block_size, pydocs::DOC_PsiPhiArray_get_block_size)
+            .def_property_readonly("layout", &ppa::get_layout, pydocs::DOC_PsiPhiArray_get_layout)
+            .def_property_readonly("tile_size", &ppa::get_tile_size, pydocs::DOC_PsiPhiArray_get_tile_size)
+            .def_property_readonly("per_time_scaling", &ppa::get_per_time_scaling,
+                                   pydocs::DOC_PsiPhiArray_get_per_time_scaling)
+            .def_property_readonly("clip_fraction", &ppa::get_clip_fraction,
+                                   pydocs::DOC_PsiPhiArray_get_clip_fraction)
+            .def_property_readonly("time_scaling", &ppa::get_time_scaling,
+                                   pydocs::DOC_PsiPhiArray_get_time_scaling)
             .def_property_readonly("psi_min_val", &ppa::get_psi_min_val,
                                    pydocs::DOC_PsiPhiArray_get_psi_min_val)
             .def_property_readonly("psi_max_val", &ppa::get_psi_max_val,
@@ -414,9 +858,15 @@ static void psi_phi_array_binding(py::module& m) {
             .def_property_readonly("phi_scale", &ppa::get_phi_scale, pydocs::DOC_PsiPhiArray_get_phi_scale)
             .def_property_readonly("cpu_array_allocated", &ppa::cpu_array_allocated,
                                    pydocs::DOC_PsiPhiArray_get_cpu_array_allocated)
+            .def_property_readonly("cpu_array_mapped", &ppa::cpu_array_mapped,
+                                   pydocs::DOC_PsiPhiArray_get_cpu_array_mapped)
             .def_property_readonly("gpu_array_allocated", &ppa::gpu_array_allocated,
                                    pydocs::DOC_PsiPhiArray_get_gpu_array_allocated)
             .def("set_meta_data", &ppa::set_meta_data, pydocs::DOC_PsiPhiArray_set_meta_data)
+            .def("set_layout", &ppa::set_layout, py::arg("layout"), py::arg("tile_size") = 1,
+                 pydocs::DOC_PsiPhiArray_set_layout)
+            .def("set_encoding_options", &ppa::set_encoding_options, py::arg("per_time_scaling"),
+                 py::arg("clip_fraction") = 0.0, pydocs::DOC_PsiPhiArray_set_encoding_options)
             .def("set_time_array", &ppa::set_time_array, pydocs::DOC_PsiPhiArray_set_time_array)
             .def("move_to_gpu", &ppa::move_to_gpu, py::arg("debug") = false,
                  pydocs::DOC_PsiPhiArray_move_to_gpu)
@@ -425,6 +875,14 @@ static void psi_phi_array_binding(py::module& m) {
             .def("read_psi_phi", &ppa::read_psi_phi, pydocs::DOC_PsiPhiArray_read_psi_phi)
             .def("read_time", &ppa::read_time, pydocs::DOC_PsiPhiArray_read_time);
     m.def("compute_scale_params_from_image_vect", &search::compute_scale_params_from_image_vect);
+    m.def("compute_psi_phi_cache_key", &search::compute_psi_phi_cache_key, py::arg("stack"),
+          py::arg("num_bytes"), py::arg("layout") = search::PSI_PHI_INTERLEAVED, py::arg("tile_size") = 1,
+          py::arg("per_time_scaling") = false, py::arg("clip_fraction") = 0.0,
+          pydocs::DOC_PsiPhiArray_compute_psi_phi_cache_key);
+    m.def("save_psi_phi_array", &search::save_psi_phi_array, py::arg("psi_phi"), py::arg("filename"),
+          pydocs::DOC_PsiPhiArray_save_psi_phi_array);
+    m.def("load_psi_phi_array", &search::load_psi_phi_array, py::arg("psi_phi"), py::arg("filename"),
+          pydocs::DOC_PsiPhiArray_load_psi_phi_array);
     m.def("decode_uint_scalar", &search::decode_uint_scalar);
     m.def("encode_uint_scalar", &search::encode_uint_scalar);
     m.def("fill_psi_phi_array", &search::fill_psi_phi_array, pydocs::DOC_PsiPhiArray_fill_psi_phi_array);
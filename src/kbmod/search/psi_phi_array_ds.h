@@ -21,6 +21,7 @@
 #define PSI_PHI_ARRAY_DS_
 
 #include <cmath>
+#include <cstdint>
 #include <stdio.h>
 #include <float.h>
 #include <vector>
@@ -46,6 +47,22 @@ inline float decode_uint_scalar(float value, float min_val, float scale) {
     return (value == 0.0) ? NO_DATA : (value - 1.0) * scale + min_val;
 }
 
+// Allow the indexing helpers to be called from both host and device code.
+#ifdef __CUDACC__
+#define PSI_PHI_HOST_DEVICE __host__ __device__
+#else
+#define PSI_PHI_HOST_DEVICE
+#endif
+
+/* The memory layouts of the psi/phi data.
+   PSI_PHI_INTERLEAVED: [time][row][col][psi, phi]
+   PSI_PHI_TILED: [tile][time][row in tile][col in tile][psi, phi] where each tile covers
+       tile_size x tile_size pixels (tile_size is a power of 2). The data for a small region
+       at all times is contiguous, so neighboring trajectories share cache lines. The tiles
+       on the right and bottom edges are padded with NO_DATA.
+*/
+enum PsiPhiLayout { PSI_PHI_INTERLEAVED = 0, PSI_PHI_TILED };
+
 // The struct of meta data for the PsiPhiArray.
 struct PsiPhiArrayMeta {
     int num_times = 0;
@@ -66,8 +83,54 @@ struct PsiPhiArrayMeta {
     float phi_min_val = FLT_MAX;
     float phi_max_val = -FLT_MAX;
     float phi_scale = 1.0;
+
+    // Memory layout parameters. The tile size is (1 << tile_shift).
+    PsiPhiLayout layout = PSI_PHI_INTERLEAVED;
+    int tile_shift = 0;
+    int tiles_per_row = 0;
+
+    // Options for computing the encoding parameters: use separate parameters for each
+    // time step and/or ignore a fraction of the most extreme values at each end when
+    // computing the bounds (those values are clipped).
+    bool per_time_scaling = false;
+    float clip_fraction = 0.0;
+
+    // The per time step encoding parameters [time][psi_min, psi_scale, phi_min, phi_scale]
+    // or nullptr if the global parameters above are used. Points to CPU or GPU memory
+    // depending on where the meta data is used.
+    const float* time_scaling = nullptr;
 };
 
+// The encoding parameters for a single time step.
+struct PsiPhiScaling {
+    float psi_min;
+    float psi_scale;
+    float phi_min;
+    float phi_scale;
+};
+
+PSI_PHI_HOST_DEVICE inline PsiPhiScaling get_psi_phi_scaling(const PsiPhiArrayMeta& meta, int time) {
+    if (meta.time_scaling != nullptr) {
+        const float* params = meta.time_scaling + 4 * time;
+        return {params[0], params[1], params[2], params[3]};
+    }
+    return {meta.psi_min_val, meta.psi_scale, meta.phi_min_val, meta.phi_scale};
+}
+
+// Compute the index of the psi entry for a given time and (in bounds) pixel. The
+// corresponding phi entry is at the next index.
+PSI_PHI_HOST_DEVICE inline uint64_t psi_phi_entry_index(const PsiPhiArrayMeta& meta, int time, int row,
+                                                        int col) {
+    if (meta.layout == PSI_PHI_TILED) {
+        const uint64_t tile =
+                (uint64_t)(row >> meta.tile_shift) * meta.tiles_per_row + (col >> meta.tile_shift);
+        const int tile_mask = (1 << meta.tile_shift) - 1;
+        const uint64_t in_tile = ((row & tile_mask) << meta.tile_shift) + (col & tile_mask);
+        return 2 * (((tile * meta.num_times + time) << (2 * meta.tile_shift)) + in_tile);
+    }
+    return 2 * (meta.pixels_per_image * time + (uint64_t)row * meta.width + col);
+}
+
 /* PsiPhiArray is a class to hold the psi and phi arrays for the CPU and GPU as well as
    the meta data and functions to do encoding and decoding on CPU.
 */
@@ -80,6 +143,9 @@ public:
 
     inline PsiPhiArrayMeta& get_meta_data() { return meta_data; }
 
+    // A copy of the meta data with the per time step encoding parameters pointing to GPU memory.
+    PsiPhiArrayMeta get_gpu_meta_data();
+
     // --- Getter functions (for Python interface) ----------------
     inline bool on_gpu() { return data_on_gpu; }
     inline int get_num_bytes() { return meta_data.num_bytes; }
@@ -90,6 +156,11 @@ public:
     inline long unsigned get_num_entries() { return meta_data.num_entries; }
     inline long unsigned get_total_array_size() { return meta_data.total_array_size; }
     inline int get_block_size() { return meta_data.block_size; }
+    inline PsiPhiLayout get_layout() { return meta_data.layout; }
+    inline int get_tile_size() { return 1 << meta_data.tile_shift; }
+    inline bool get_per_time_scaling() { return meta_data.per_time_scaling; }
+    inline float get_clip_fraction() { return meta_data.clip_fraction; }
+    inline const std::vector<float>& get_time_scaling() { return cpu_scale_array; }
 
     inline float get_psi_min_val() { return meta_data.psi_min_val; }
     inline float get_psi_max_val() { return meta_data.psi_max_val; }
@@ -107,6 +178,9 @@ public:
 
     // Setters for the utility functions to allocate the data.
     void set_meta_data(int new_num_bytes, int new_num_times, int new_height, int new_width);
+    void set_layout(PsiPhiLayout new_layout, int new_tile_size = 1);
+    void set_encoding_options(bool per_time_scaling, float clip_fraction);
+    void set_time_scaling(const std::vector<float>& scaling);
     void set_psi_scaling(float min_val, float max_val, float scale_val);
     void set_phi_scaling(float min_val, float max_val, float scale_val);
     void set_time_array(const std::vector<float>& times);
@@ -120,10 +194,22 @@ public:
     inline void* get_gpu_array_ptr() { return gpu_array_ptr; }
     inline void set_cpu_array_ptr(void* new_ptr) { cpu_array_ptr = new_ptr; }
 
+    // Use data from a read-only memory mapped file (starting at the given offset) as the CPU
+    // array. The mapping is released by clear().
+    inline void set_cpu_array_mapping(void* base_ptr, long unsigned mapped_size, long unsigned offset) {
+        cpu_mapped_ptr = base_ptr;
+        cpu_mapped_size = mapped_size;
+        cpu_array_ptr = (void*)((char*)base_ptr + offset);
+    }
+    inline bool cpu_array_mapped() { return cpu_mapped_ptr != nullptr; }
+
     inline float* get_cpu_time_array_ptr() { return cpu_time_array.data(); }
     inline float* get_gpu_time_array_ptr() { return gpu_time_array.get_ptr(); }
 
 private:
+    // Compute the array sizes from the dimensions, encoding, and layout.
+    void update_array_sizes();
+
     PsiPhiArrayMeta meta_data;
     bool data_on_gpu;
 
@@ -132,6 +218,12 @@ private:
     void* gpu_array_ptr = nullptr;
     std::vector<float> cpu_time_array;
     GPUArray<float> gpu_time_array;
+    std::vector<float> cpu_scale_array;
+    GPUArray<float> gpu_scale_array;
+
+    // The memory mapped file backing the CPU array (if any).
+    void* cpu_mapped_ptr = nullptr;
+    long unsigned cpu_mapped_size = 0;
 };
 
 } /* namespace search */
@@ -14,6 +14,7 @@
 #include <cmath>
 #include <stdio.h>
 #include <float.h>
+#include <string>
 #include <vector>
 
 #include "common.h"
@@ -34,6 +35,20 @@ void fill_psi_phi_array(PsiPhiArray& result_data, int num_bytes, const std::vect
 void fill_psi_phi_array_from_image_stack(PsiPhiArray& result_data, ImageStack& stack, int num_bytes,
                                          bool debug = false);
 
+// Saving and loading the PsiPhiArray data from a binary file. Loaded files are memory mapped.
+constexpr char PSI_PHI_FILE_MAGIC[] = "KBPSIPHI";
+constexpr int PSI_PHI_FILE_VERSION = 3;
+constexpr uint64_t PSI_PHI_FILE_ALIGNMENT = 64;
+
+// Compute a key (as a hex string) identifying the psi/phi data that would be built
+// from the ImageStack with the given encoding, layout, and encoding options.
+std::string compute_psi_phi_cache_key(ImageStack& stack, int num_bytes,
+                                      PsiPhiLayout layout = PSI_PHI_INTERLEAVED, int tile_size = 1,
+                                      bool per_time_scaling = false, float clip_fraction = 0.0);
+
+void save_psi_phi_array(PsiPhiArray& data, const std::string& filename);
+void load_psi_phi_array(PsiPhiArray& data, const std::string& filename);
+
 } /* namespace search */
 
 #endif /* PSI_PHI_ARRAY_UTILS_ */
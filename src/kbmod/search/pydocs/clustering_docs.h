@@ -0,0 +1,33 @@
+#ifndef CLUSTERING_DOCS_
+#define CLUSTERING_DOCS_
+
+namespace pydocs {
+
+static const auto DOC_cluster_grid = R"doc(
+  Cluster points using a grid (spatial hash) index. Two points are linked if
+  their Euclidean distance is at most ``eps`` and each cluster is a connected
+  component of the linked points. This gives the same clusters as DBSCAN with
+  ``min_samples=1``.
+
+  Parameters
+  ----------
+  points : `numpy.ndarray`
+      A (N, D) array of the points to cluster.
+  eps : `float`
+      The clustering threshold.
+
+  Returns
+  -------
+  labels : `numpy.ndarray`
+      A length N array of the cluster labels. The labels are numbered in order
+      of the first point in each cluster.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if ``eps`` is not positive, the array is not two
+  dimensional, or any of the points are not finite.
+  )doc";
+
+} /* namespace pydocs */
+
+#endif /* CLUSTERING_DOCS_ */
@@ -53,6 +53,34 @@ static const auto DOC_ImageStack_make_global_mask = R"doc(
       and 0 for unmasked pixels.
   )doc";
 
+static const auto DOC_ImageStack_apply_mask_operations = R"doc(
+  Apply the full masking pipeline to every image in a single call (in parallel
+  over the images). For each image this is equivalent to calling, in order,
+  ``binarize_mask(mask_flags)``, ``union_threshold_masking(mask_threshold)``,
+  ``union_masks(global_mask)`` (where the global mask is computed from the
+  original masks with ``make_global_mask``), ``grow_mask(grow_steps)``, and
+  ``apply_mask(0xFFFFFF)``, but makes a single pass over the pixels for the
+  first three steps and grows the mask with a distance transform. Modifies the
+  images in-place.
+
+  Parameters
+  ----------
+  mask_flags : `int`
+      A bit mask of the mask flags to use for each image.
+  global_flags : `int`
+      A bit mask of the mask flags to use when building the global mask.
+      Use 0 to skip the global mask.
+  global_threshold : `int`
+      The minimum number of images in which a pixel must be masked to be
+      part of the global mask.
+  mask_threshold : `float`
+      Mask all pixels with science values above this threshold. Use infinity
+      (the default) to skip the threshold masking.
+  grow_steps : `int`
+      The number of pixels by which to grow the masked regions. Use 0 to
+      skip growing the masks.
+  )doc";
+
 static const auto DOC_ImageStack_convolve_psf = R"doc(
   Convolves each image (science and variance layers) with the PSF
   stored in the LayeredImage object.
@@ -70,6 +98,106 @@ static const auto DOC_ImageStack_get_npixels = R"doc(
   Returns the number of pixels per image.
   )doc";
 
+static const auto DOC_GlobalMaskBuilder = R"doc(
+  Keeps a count, for each pixel, of the number of images in which the pixel has
+  any of the given mask flags set. Images can be added or removed one at a time
+  (for example as new images are ingested), and the threshold is only applied
+  when the global mask is requested with ``make_mask``.
+
+  Parameters
+  ----------
+  width : `int`
+      The width of the images in pixels.
+  height : `int`
+      The height of the images in pixels.
+  flags : `int`
+      A bit mask of mask flags to use when counting.
+  )doc";
+
+static const auto DOC_GlobalMaskBuilder_get_count = R"doc(
+  Returns the number of images in which the pixel at (row, col) is masked
+  by one of the flags.
+
+  Parameters
+  ----------
+  row : `int`
+      The row of the pixel.
+  col : `int`
+      The column of the pixel.
+
+  Returns
+  -------
+  count : `int`
+      The count.
+
+  Raises
+  ------
+  Raises an ``IndexError`` if the pixel is out of bounds.
+  )doc";
+
+static const auto DOC_GlobalMaskBuilder_add_image = R"doc(
+  Add the mask of a single image to the counts.
+
+  Parameters
+  ----------
+  img : `LayeredImage`
+      The image to add.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if the image dimensions do not match or there are
+  too many images (more than 65535) for the counters.
+  )doc";
+
+static const auto DOC_GlobalMaskBuilder_remove_image = R"doc(
+  Remove the mask of a single image (previously added) from the counts. The image's
+  mask must not have changed since it was added.
+
+  Parameters
+  ----------
+  img : `LayeredImage`
+      The image to remove.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if the image dimensions do not match or the image
+  could not have been added (a masked pixel has a count of zero).
+  )doc";
+
+static const auto DOC_GlobalMaskBuilder_add_stack = R"doc(
+  Add the masks of all the images in an ImageStack to the counts.
+
+  Parameters
+  ----------
+  stack : `ImageStack`
+      The images to add.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if the image dimensions do not match or there are
+  too many images (more than 65535) for the counters.
+  )doc";
+
+static const auto DOC_GlobalMaskBuilder_clear = R"doc(
+  Reset all of the counts to zero.
+  )doc";
+
+static const auto DOC_GlobalMaskBuilder_make_mask = R"doc(
+  Create the binary global mask, which marks a pixel as masked if and only if it
+  is masked by one of the flags in at least ``threshold`` of the images.
+
+  Parameters
+  ----------
+  threshold : `int`
+      The minimum number of images in which a pixel must be masked to be
+      part of the global mask.
+
+  Returns
+  -------
+  global_mask : `RawImage`
+      A RawImage with 1 for each masked pixel and 0 otherwise.
+  )doc";
+
 }  // namespace pydocs
 
 #endif /* IMAGESTACK_DOCS */
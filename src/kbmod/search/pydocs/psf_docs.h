@@ -73,6 +73,11 @@ static const auto DOC_PSF_square_psf = R"doc(
   "Squares, raises to the power of two, the elements of the PSF kernel.
   ")doc";
 
+static const auto DOC_PSF_is_separable = R"doc(
+  "Whether the PSF kernel is separable (the outer product of a column and a row
+  kernel, such as a Gaussian). Separable kernels are convolved as two 1-D passes.
+  ")doc";
+
 static const auto DOC_PSF_print = R"doc(
   "Pretty-prints the PSF.
   ")doc";
@@ -18,6 +18,14 @@ static const auto DOC_PsiPhiArray = R"doc(
   An encoded array of Psi and Phi values along with their meta data.
   )doc";
 
+static const auto DOC_PsiPhiLayout = R"doc(
+  The memory layout of the psi and phi data.
+
+  ``PSI_PHI_INTERLEAVED`` stores the data as [time][row][col][psi, phi].
+  ``PSI_PHI_TILED`` stores the data as [tile][time][row in tile][col in tile][psi, phi]
+  so the data for a small square of pixels at all times is contiguous.
+  )doc";
+
 static const auto DOC_PsiPhiArray_on_gpu = R"doc(
   A Boolean indicating whether a copy of the data is on the GPU.
   )doc";
@@ -55,6 +63,28 @@ static const auto DOC_PsiPhiArray_get_block_size = R"doc(
   The size of a single entry in bytes.
   )doc";
 
+static const auto DOC_PsiPhiArray_get_layout = R"doc(
+  The memory layout (a ``PsiPhiLayout``).
+  )doc";
+
+static const auto DOC_PsiPhiArray_get_tile_size = R"doc(
+  The width and height of the tiles in pixels for the tiled layout (1 otherwise).
+  )doc";
+
+static const auto DOC_PsiPhiArray_get_per_time_scaling = R"doc(
+  Whether each time step uses its own encoding parameters (for 1 and 2 byte encodings).
+  )doc";
+
+static const auto DOC_PsiPhiArray_get_clip_fraction = R"doc(
+  The fraction of the valid values at each end that are clipped when computing the
+  encoding bounds.
+  )doc";
+
+static const auto DOC_PsiPhiArray_get_time_scaling = R"doc(
+  The per time encoding parameters as a flat list of [psi_min, psi_scale, phi_min, phi_scale]
+  for each time step. Empty if the global parameters are used.
+  )doc";
+
 static const auto DOC_PsiPhiArray_get_psi_min_val = R"doc(
   The minimum value of psi used in the scaling computations.
   )doc";
@@ -165,6 +195,41 @@ static const auto DOC_PsiPhiArray_set_meta_data = R"doc(
         The width of each image in pixels.
   )doc";
 
+static const auto DOC_PsiPhiArray_set_layout = R"doc(
+    Set the memory layout for the array. Must be called before the data is
+    allocated. The layout is kept when the array is cleared.
+
+    Parameters
+    ----------
+    layout : `PsiPhiLayout`
+        The memory layout.
+    tile_size : `int`
+        The width and height of the tiles in pixels. Must be a power of 2
+        (at most 1024). Only used for ``PSI_PHI_TILED``.
+
+    Raises
+    ------
+    Raises a ``RuntimeError`` if the data is allocated or the tile size is invalid.
+  )doc";
+
+static const auto DOC_PsiPhiArray_set_encoding_options = R"doc(
+    Set the options used when encoding psi and phi to 1 or 2 bytes. Must be called
+    before the data is allocated. The options are kept when the array is cleared.
+
+    Parameters
+    ----------
+    per_time_scaling : `bool`
+        Compute separate encoding parameters for each time step instead of a
+        single set for the full stack.
+    clip_fraction : `float`
+        The fraction of the valid values at each end to ignore when computing
+        the encoding bounds. Values outside the bounds are clamped. Must be in [0.0, 0.5).
+
+    Raises
+    ------
+    Raises a ``RuntimeError`` if the data is allocated or the clip fraction is invalid.
+  )doc";
+
 static const auto DOC_PsiPhiArray_set_time_array = R"doc(
     Set the zeroed times.
 
@@ -198,6 +263,11 @@ static const auto DOC_PsiPhiArray_fill_psi_phi_array = R"doc(
 static const auto DOC_PsiPhiArray_fill_psi_phi_array_from_image_stack = R"doc(
     Fill the PsiPhiArray an ImageStack.
 
+    The psi and phi images are generated one image at a time and written directly
+    into the PsiPhiArray, so the full set of psi and phi images is never held in memory.
+    For the 1 and 2 byte encodings, the encoding bounds are computed with an extra
+    pass over the images.
+
     Parameters
     ----------
     result_data : `PsiPhiArray`
@@ -212,6 +282,70 @@ static const auto DOC_PsiPhiArray_fill_psi_phi_array_from_image_stack = R"doc(
     Raises a ``RuntimeError`` if invalid values are found.
   )doc";
 
+static const auto DOC_PsiPhiArray_get_cpu_array_mapped = R"doc(
+  A Boolean indicating whether the cpu data (psi/phi) array is memory mapped from a file.
+  )doc";
+
+static const auto DOC_PsiPhiArray_compute_psi_phi_cache_key = R"doc(
+    Compute a key identifying the psi and phi data that would be built from an ImageStack.
+    The key depends on the science and variance pixels, the PSFs, the observation times,
+    the image dimensions, and the encoding.
+
+    Parameters
+    ----------
+    stack : `ImageStack`
+        The stack of LayeredImages.
+    num_bytes : `int`
+        The type of encoding to use (1, 2, or 4).
+    layout : `PsiPhiLayout`
+        The memory layout.
+    tile_size : `int`
+        The tile size for the tiled layout.
+    per_time_scaling : `bool`
+        Whether each time step uses its own encoding parameters. Ignored for 4 bytes.
+    clip_fraction : `float`
+        The fraction of values clipped at each end when computing the encoding bounds.
+        Ignored for 4 bytes.
+
+    Returns
+    -------
+    key : `str`
+        The key as a hex string.
+  )doc";
+
+static const auto DOC_PsiPhiArray_save_psi_phi_array = R"doc(
+    Save the PsiPhiArray's meta data, encoding parameters, times, and CPU array
+    to a binary file.
+
+    Parameters
+    ----------
+    psi_phi : `PsiPhiArray`
+        The data to save.
+    filename : `str`
+        The file name.
+
+    Raises
+    ------
+    Raises a ``RuntimeError`` if the CPU array is not allocated or the file cannot be written.
+  )doc";
+
+static const auto DOC_PsiPhiArray_load_psi_phi_array = R"doc(
+    Load a PsiPhiArray from a binary file created by ``save_psi_phi_array``. Any existing
+    data is cleared. The psi and phi data is memory mapped (read-only) instead of read
+    into memory.
+
+    Parameters
+    ----------
+    psi_phi : `PsiPhiArray`
+        The location to store the data.
+    filename : `str`
+        The file name.
+
+    Raises
+    ------
+    Raises a ``RuntimeError`` if the file cannot be read or is invalid.
+  )doc";
+
 }  // namespace pydocs
 
 #endif /* PSI_PHI_ARRAY_DOCS */
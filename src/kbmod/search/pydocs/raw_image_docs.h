@@ -344,6 +344,47 @@ static const auto DOC_RawImage_convolve_gpu = R"doc(
 static const auto DOC_RawImage_convolve_cpu = R"doc(
   Convolve the image with a PSF.
 
+  Convolves in-place. Masked pixels are unchanged and the remaining pixels are
+  normalized by the portion of the PSF covering valid pixels. Separable kernels
+  (such as Gaussians) are applied as two 1-D passes, large non-separable kernels
+  use FFT convolution, and small non-separable kernels use the direct sum.
+
+  Parameters
+  ----------
+  psf : `PSF`
+      Point Spread Function.
+  )doc";
+
+static const auto DOC_RawImage_convolve_direct_cpu = R"doc(
+  Convolve the image with a PSF using the direct sum over the kernel.
+
+  Convolves in-place.
+
+  Parameters
+  ----------
+  psf : `PSF`
+      Point Spread Function.
+  )doc";
+
+static const auto DOC_RawImage_convolve_separable_cpu = R"doc(
+  Convolve the image with a separable PSF as a row pass and a column pass.
+
+  Convolves in-place.
+
+  Parameters
+  ----------
+  psf : `PSF`
+      Point Spread Function.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if the PSF is not separable.
+  )doc";
+
+static const auto DOC_RawImage_convolve_fft_cpu = R"doc(
+  Convolve the image with a PSF using FFTs. The masked image and the mask of
+  valid pixels are convolved together to compute the normalization.
+
   Convolves in-place.
 
   Parameters
@@ -7,7 +7,49 @@ static const auto DOC_StackSearch = R"doc(
   )doc";
 
 static const auto DOC_StackSearch_search = R"doc(
-  todo
+  Performs the grid search over all starting pixels in the search bounds and
+  all candidate velocities. Keeps the best results for each starting pixel
+  and sorts the full set of results by likelihood.
+
+  Parameters
+  ----------
+  search_list : `list` of `kb.Trajectory`
+      The candidate velocities to search. Only the ``vx`` and ``vy``
+      attributes are used.
+  min_observations : `int`
+      The minimum number of valid observations for a result.
+  on_gpu : `bool`
+      Run the search on the GPU. If ``False`` the search is run with the
+      multithreaded CPU implementation. Defaults to ``True`` when kbmod
+      was built with CUDA. Falls back to the CPU (with a warning) if
+      CUDA is not available.
+  )doc";
+
+static const auto DOC_StackSearch_search_tiled = R"doc(
+  Performs the grid search one square tile of starting pixels at a time,
+  merging each tile's results into a bounded set of the best results. Peak
+  memory use is set by the tile size and ``max_results`` instead of the
+  size of the search region. The kept results are sorted by likelihood.
+
+  Parameters
+  ----------
+  search_list : `list` of `kb.Trajectory`
+      The candidate velocities to search. Only the ``vx`` and ``vy``
+      attributes are used.
+  min_observations : `int`
+      The minimum number of valid observations for a result.
+  tile_size : `int`
+      The width and height (in pixels) of each tile of starting pixels.
+  max_results : `int`
+      The maximum number of results to keep over all tiles.
+  on_gpu : `bool`
+      Run the search on the GPU. Defaults to ``True`` when kbmod was
+      built with CUDA. Falls back to the CPU (with a warning) if CUDA is
+      not available.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if ``tile_size`` or ``max_results`` is not positive.
   )doc";
 
 static const auto DOC_StackSearch_set_min_obs = R"doc(
@@ -58,6 +100,34 @@ static const auto DOC_StackSearch_enable_gpu_encoding = R"doc(
       The number of bytes to use for encoding the data.
   )doc";
 
+static const auto DOC_StackSearch_enable_result_dedup = R"doc(
+  Suppress near-duplicate results at the end of the search, before the results
+  are returned. Once the search completes, the unfilled results and those with
+  fewer than ``min_observations`` are dropped, the rest are sorted by likelihood,
+  and a non-maximum suppression removes any result whose starting pixel is
+  within ``pos_radius`` and whose velocity is within ``vel_radius`` of a higher
+  likelihood result. The full result buffer is still allocated (and sorted) by
+  the search, so this reduces the number of results returned rather than the
+  search's peak memory. For the tiled search the suppression is applied to each
+  tile and again to the combined results, so the results near tile edges can
+  differ slightly from those of the full search.
+
+  Parameters
+  ----------
+  pos_radius : `float`
+      The suppression radius for the starting position (in pixels).
+  vel_radius : `float`
+      The suppression radius for the velocity (in pixels per day).
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if either radius is negative.
+  )doc";
+
+static const auto DOC_StackSearch_disable_result_dedup = R"doc(
+  Turn off the suppression of near-duplicate results.
+  )doc";
+
 static const auto DOC_StackSearch_set_start_bounds_x = R"doc(
   Set the starting and ending bounds in the x direction for a grid search.
   The grid search will test all pixels [x_min, x_max).
@@ -147,6 +217,27 @@ static const auto DOC_StackSearch_get_phi_curves = R"doc(
      The phi values at each time step with NO_DATA replaced by 0.0.
   )doc";
 
+static const auto DOC_StackSearch_get_psi_phi_curves = R"doc(
+  Return the time series of psi and phi values for a batch of trajectories
+  in pixel space. The curves are extracted in parallel.
+
+  Parameters
+  ----------
+  trajectories : `list` of `kb.Trajectory` or `numpy.ndarray`
+      The input trajectories given either as a list of Trajectory objects
+      or as a (N, 4) float32 array where each row is (x, y, vx, vy).
+
+  Returns
+  -------
+  psi_curves, phi_curves : `numpy.ndarray`, `numpy.ndarray`
+     Two (N, T) float32 arrays with the psi and phi values for each
+     trajectory (row) and time step (column), with NO_DATA replaced by 0.0.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if the array does not have 4 columns.
+  )doc";
+
 static const auto DOC_StackSearch_clear_psi_phi = R"doc(
   Clear the pre-computed psi and phi data.
   )doc";
@@ -155,6 +246,69 @@ static const auto DOC_StackSearch_prepare_psi_phi = R"doc(
   Compute the cached psi and phi data.
   )doc";
 
+static const auto DOC_StackSearch_set_psi_phi_layout = R"doc(
+  Set the memory layout of the psi and phi data used by the search. Clears the
+  cached psi and phi data if the layout changes.
+
+  Parameters
+  ----------
+  layout : `PsiPhiLayout`
+      The layout: ``PSI_PHI_INTERLEAVED`` ([time][row][col]) or ``PSI_PHI_TILED``
+      (where the data for a tile of pixels at all times is contiguous).
+  tile_size : `int`
+      The width and height of the tiles in pixels. Must be a power of 2.
+      Only used for ``PSI_PHI_TILED``.
+  )doc";
+
+static const auto DOC_StackSearch_set_encoding_scaling = R"doc(
+  Set how the encoding parameters are computed when psi and phi are encoded to
+  1 or 2 bytes. Clears the cached psi and phi data if the options change.
+
+  Parameters
+  ----------
+  per_time_scaling : `bool`
+      Use separate encoding parameters for each time step, so a few bright or
+      noisy images do not reduce the precision of all the others.
+  clip_fraction : `float`
+      The fraction of the valid values at each end to ignore when computing the
+      encoding bounds. Values outside the bounds are clamped. Must be in [0.0, 0.5).
+  )doc";
+
+static const auto DOC_StackSearch_get_psi_phi_cache_key = R"doc(
+  Get the key identifying the psi and phi data for the current images and encoding.
+  Searches with the same key can share a cached copy of the data.
+
+  Returns
+  -------
+  key : `str`
+      The key as a hex string.
+  )doc";
+
+static const auto DOC_StackSearch_save_psi_phi_cache = R"doc(
+  Save the psi and phi data (computing it if needed) to a binary file that can be
+  loaded by later searches with ``load_psi_phi_cache``.
+
+  Parameters
+  ----------
+  filename : `str`
+      The file name.
+  )doc";
+
+static const auto DOC_StackSearch_load_psi_phi_cache = R"doc(
+  Load the psi and phi data from a file created by ``save_psi_phi_cache`` instead of
+  computing it. The data is memory mapped from the file.
+
+  Parameters
+  ----------
+  filename : `str`
+      The file name.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if the file is invalid or does not match the current
+  images and encoding.
+  )doc";
+
 static const auto DOC_StackSearch_get_results = R"doc(
   Get a batch of cached results.
 
@@ -177,6 +331,23 @@ static const auto DOC_StackSearch_get_results = R"doc(
   ``RunTimeError`` if start < 0 or count <= 0.
   )doc";
 
+static const auto DOC_StackSearch_get_results_above = R"doc(
+  Get all of the cached results with a likelihood at or above a threshold as a
+  NumPy structured array with the fields ``x``, ``y``, ``vx``, ``vy``, ``lh``,
+  ``flux``, and ``obs_count``. The results are sorted in decreasing order of
+  likelihood. Only the results above the threshold are sorted.
+
+  Parameters
+  ----------
+  min_lh : `float`
+      The minimum likelihood of the results to return.
+
+  Returns
+  -------
+  results : `numpy.ndarray`
+      A structured array with one entry for each result.
+  )doc";
+
 static const auto DOC_StackSearch_set_results = R"doc(
   Set the cached results. Used for testing.
 
@@ -196,7 +367,7 @@ static const auto DOC_StackSearch_evaluate_single_trajectory = R"doc(
 
   Note
   ----
-  Runs on the CPU, but requires CUDA compiler.
+  Runs on the CPU.
 
   Parameters
   ----------
@@ -209,7 +380,7 @@ static const auto DOC_StackSearch_search_linear_trajectory = R"doc(
 
   Note
   ----
-  Runs on the CPU, but requires CUDA compiler.
+  Runs on the CPU.
 
   Parameters
   ----------
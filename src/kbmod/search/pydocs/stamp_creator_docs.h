@@ -146,6 +146,38 @@ static const auto DOC_StampCreator_get_coadded_stamps = R"doc(
 
   )doc";
 
+static const auto DOC_StampCreator_get_coadded_stamp_array = R"doc(
+  Create the co-added stamps for a list of trajectories on the CPU (in parallel
+  over the trajectories) and apply the stamp filtering. The stamps are returned
+  as a single array instead of a list of `RawImage`.
+
+  Parameters
+  ----------
+  stack : `ImageStack`
+      The stack of images to use.
+  trajectories : `list` of `Trajectory`
+      The list of trajectories to uses.
+  use_index : `list` of `list` of `bool`
+      A list of lists (vectors) of Booleans indicating whether or not to use each
+      time step. use_index[i][j] indicates whether we should use timestep j of
+      trajectory i. An empty (size=0) list for any trajectory will use all time
+      steps for that trajectory.
+  params : `StampParameters`
+      The parameters for stamp generation and filtering, such as radius and co-add type.
+
+  Returns
+  -------
+  stamps, keep : `numpy.ndarray`, `numpy.ndarray`
+      A (N, S, S) array of the co-added stamps, where S = 2 * radius + 1, and a
+      length N Boolean array indicating which stamps passed the filtering (all True
+      if ``params.do_filtering`` is False). Filtered stamps are still included in
+      the stamps array.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` if the radius, co-add type, or use_index lists are invalid.
+  )doc";
+
 static const auto DOC_StampCreator_filter_stamp = R"doc(
   Filters stamps based on the given parameters.
       
@@ -180,6 +180,47 @@ static const auto DOC_TrajectoryList_filter_by_obs_count = R"doc(
   Raises a ``RuntimeError`` the data is on GPU.
   )doc";
 
+static const auto DOC_TrajectoryList_partition_by_likelihood = R"doc(
+  Move all trajectories with a likelihood at or above the threshold to the
+  front of the list and sort only those (in decreasing order of likelihood).
+  The remaining trajectories are kept, but their order is unspecified. The data
+  must reside on the CPU.
+
+  Parameters
+  ----------
+  min_likelihood : `float`
+      The likelihood threshold.
+
+  Returns
+  -------
+  count : `int`
+      The number of trajectories at or above the threshold.
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` the data is on GPU.
+  )doc";
+
+static const auto DOC_TrajectoryList_filter_duplicates = R"doc(
+  Remove near-duplicate trajectories with a greedy non-maximum suppression.
+  The trajectories are sorted by decreasing likelihood and a trajectory is
+  dropped if a higher likelihood trajectory that was kept has a starting
+  pixel within ``pos_radius`` and a velocity within ``vel_radius`` (both
+  using Euclidean distance). The remaining trajectories are sorted by
+  decreasing likelihood. The data must reside on the CPU.
+
+  Parameters
+  ----------
+  pos_radius : `float`
+      The suppression radius for the starting position (in pixels).
+  vel_radius : `float`
+      The suppression radius for the velocity (in pixels per day).
+
+  Raises
+  ------
+  Raises a ``RuntimeError`` the data is on GPU or either radius is negative.
+  )doc";
+
 static const auto DOC_TrajectoryList_filter_by_valid = R"doc(
   Filter out all trajectories with the ``valid`` attribute set to ``False``.
   Ordering is not preserved. The data must reside on the CPU.
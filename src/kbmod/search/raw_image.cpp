@@ -1,5 +1,9 @@
 #include "raw_image.h"
 
+#include <algorithm>
+#include <complex>
+#include <unsupported/Eigen/FFT>
+
 namespace search {
 using Index = indexing::Index;
 using Point = indexing::Point;
@@ -185,12 +189,58 @@ std::array<float, 2> RawImage::compute_bounds() const {
     return {min_val, max_val};
 }
 
+// Non-separable kernels with at least this many rows (and columns) are convolved with FFTs.
+constexpr int FFT_CONVOLVE_MIN_DIM = 15;
+
+// Split the image into a copy with the invalid pixels zeroed and a mask of the valid pixels.
+static void split_valid_pixels(const Image& image, Image& masked, Image& valid) {
+    masked = Image::Zero(image.rows(), image.cols());
+    valid = Image::Zero(image.rows(), image.cols());
+    for (int y = 0; y < image.rows(); ++y) {
+        for (int x = 0; x < image.cols(); ++x) {
+            if (pixel_value_valid(image(y, x))) {
+                masked(y, x) = image(y, x);
+                valid(y, x) = 1.0;
+            }
+        }
+    }
+}
+
+// Combine the convolved (masked) image and the convolved validity mask into the normalized result,
+// matching the direct convolution: invalid pixels do not change and pixels with no valid data under
+// the kernel (portion at or below min_portion) become NO_DATA.
+static void normalize_masked_convolution(Image& image, const Image& sums, const Image& portions,
+                                         float psf_total, float min_portion) {
+#pragma omp parallel for schedule(static)
+    for (int y = 0; y < image.rows(); ++y) {
+        for (int x = 0; x < image.cols(); ++x) {
+            if (!pixel_value_valid(image(y, x))) continue;
+            if (std::fabs(portions(y, x)) <= min_portion) {
+                image(y, x) = NO_DATA;
+            } else {
+                image(y, x) = (sums(y, x) * psf_total) / portions(y, x);
+            }
+        }
+    }
+}
+
 void RawImage::convolve_cpu(PSF& psf) {
+    if (psf.is_separable()) {
+        convolve_separable_cpu(psf);
+    } else if (psf.get_dim() >= FFT_CONVOLVE_MIN_DIM) {
+        convolve_fft_cpu(psf);
+    } else {
+        convolve_direct_cpu(psf);
+    }
+}
+
+void RawImage::convolve_direct_cpu(PSF& psf) {
     Image result = Image::Zero(height, width);
 
     const int psf_rad = psf.get_radius();
     const float psf_total = psf.get_sum();
 
+#pragma omp parallel for schedule(static)
     for (int y = 0; y < height; ++y) {
         for (int x = 0; x < width; ++x) {
             // Pixels with invalid data (e.g. NO_DATA or NaN) do not change.
@@ -224,6 +274,146 @@ void RawImage::convolve_cpu(PSF& psf) {
     image = std::move(result);
 }
 
+void RawImage::convolve_separable_cpu(PSF& psf) {
+    std::vector<float> col_kernel, row_kernel;
+    if (!psf.get_separable_kernels(col_kernel, row_kernel)) {
+        throw std::runtime_error("PSF kernel is not separable.");
+    }
+    const int psf_rad = psf.get_radius();
+
+    // Convolve the masked image and the validity mask (which gives the portion of the PSF
+    // covering valid pixels) with the row kernel and then the column kernel.
+    Image masked, valid;
+    split_valid_pixels(image, masked, valid);
+    Image masked_tmp = Image::Zero(height, width);
+    Image valid_tmp = Image::Zero(height, width);
+
+#pragma omp parallel for schedule(static)
+    for (int y = 0; y < (int)height; ++y) {
+        for (int x = 0; x < (int)width; ++x) {
+            const int i_min = std::max(-psf_rad, -x);
+            const int i_max = std::min(psf_rad, (int)width - 1 - x);
+            float sum = 0.0;
+            float portion = 0.0;
+            for (int i = i_min; i <= i_max; ++i) {
+                sum += row_kernel[i + psf_rad] * masked(y, x + i);
+                portion += row_kernel[i + psf_rad] * valid(y, x + i);
+            }
+            masked_tmp(y, x) = sum;
+            valid_tmp(y, x) = portion;
+        }
+    }
+
+#pragma omp parallel for schedule(static)
+    for (int y = 0; y < (int)height; ++y) {
+        const int j_min = std::max(-psf_rad, -y);
+        const int j_max = std::min(psf_rad, (int)height - 1 - y);
+        for (int x = 0; x < (int)width; ++x) {
+            float sum = 0.0;
+            float portion = 0.0;
+            for (int j = j_min; j <= j_max; ++j) {
+                sum += col_kernel[j + psf_rad] * masked_tmp(y + j, x);
+                portion += col_kernel[j + psf_rad] * valid_tmp(y + j, x);
+            }
+            masked(y, x) = sum;
+            valid(y, x) = portion;
+        }
+    }
+
+    normalize_masked_convolution(image, masked, valid, psf.get_sum(), 0.0);
+}
+
+// Find the smallest size >= min_size whose only prime factors are 2, 3, and 5 (fast FFT sizes).
+static int next_fft_size(int min_size) {
+    for (int size = std::max(min_size, 1);; ++size) {
+        int remainder = size;
+        for (int factor : {2, 3, 5}) {
+            while (remainder % factor == 0) remainder /= factor;
+        }
+        if (remainder == 1) return size;
+    }
+}
+
+// In-place 2-D FFT (forward or inverse) of a row-major rows x cols array.
+static void fft_2d(std::vector<std::complex<double>>& data, int rows, int cols, bool forward) {
+#pragma omp parallel
+    {
+        Eigen::FFT<double> fft;
+        std::vector<std::complex<double>> in(std::max(rows, cols));
+        std::vector<std::complex<double>> out(std::max(rows, cols));
+
+        in.resize(cols);
+#pragma omp for schedule(static)
+        for (int r = 0; r < rows; ++r) {
+            std::copy(data.begin() + (uint64_t)r * cols, data.begin() + (uint64_t)(r + 1) * cols, in.begin());
+            if (forward) {
+                fft.fwd(out, in);
+            } else {
+                fft.inv(out, in);
+            }
+            std::copy(out.begin(), out.begin() + cols, data.begin() + (uint64_t)r * cols);
+        }
+
+        in.resize(rows);
+#pragma omp for schedule(static)
+        for (int c = 0; c < cols; ++c) {
+            for (int r = 0; r < rows; ++r) in[r] = data[(uint64_t)r * cols + c];
+            if (forward) {
+                fft.fwd(out, in);
+            } else {
+                fft.inv(out, in);
+            }
+            for (int r = 0; r < rows; ++r) data[(uint64_t)r * cols + c] = out[r];
+        }
+    }
+}
+
+void RawImage::convolve_fft_cpu(PSF& psf) {
+    const int psf_rad = psf.get_radius();
+    const int psf_dim = psf.get_dim();
+
+    // Pad the arrays so the circular convolution does not wrap around the image edges.
+    const int rows = next_fft_size(height + psf_rad);
+    const int cols = next_fft_size(width + psf_rad);
+
+    // Convolve the masked image (real part) and the validity mask (imaginary part) together.
+    std::vector<std::complex<double>> signal((uint64_t)rows * cols, 0.0);
+    for (int y = 0; y < (int)height; ++y) {
+        for (int x = 0; x < (int)width; ++x) {
+            if (pixel_value_valid(image(y, x))) signal[(uint64_t)y * cols + x] = {image(y, x), 1.0};
+        }
+    }
+
+    // The direct convolution correlates the image with the kernel, so the kernel is flipped
+    // (entry (j, i) of the kernel is placed at (-j, -i) modulo the padded size).
+    std::vector<std::complex<double>> kernel((uint64_t)rows * cols, 0.0);
+    double abs_total = 0.0;
+    for (int j = -psf_rad; j <= psf_rad; ++j) {
+        for (int i = -psf_rad; i <= psf_rad; ++i) {
+            float value = psf.get_value(i + psf_rad, j + psf_rad);
+            kernel[(uint64_t)((rows - j) % rows) * cols + (cols - i) % cols] = value;
+            abs_total += std::fabs(value);
+        }
+    }
+
+    fft_2d(signal, rows, cols, true);
+    fft_2d(kernel, rows, cols, true);
+    for (uint64_t k = 0; k < signal.size(); ++k) signal[k] *= kernel[k];
+    fft_2d(signal, rows, cols, false);
+
+    Image sums(height, width);
+    Image portions(height, width);
+    for (int y = 0; y < (int)height; ++y) {
+        for (int x = 0; x < (int)width; ++x) {
+            sums(y, x) = signal[(uint64_t)y * cols + x].real();
+            portions(y, x) = signal[(uint64_t)y * cols + x].imag();
+        }
+    }
+
+    // Treat the FFT round off in the portions (relative to the kernel's total weight) as zero.
+    normalize_masked_convolution(image, sums, portions, psf.get_sum(), 1e-9 * abs_total);
+}
+
 #ifdef HAVE_CUDA
 // Performs convolution between an image represented as an array of floats
 // and a PSF on a GPU device.
@@ -255,6 +445,12 @@ void RawImage::set_all(float value) { image.setConstant(value); }
 
 // The maximum value of the image and return the coordinates.
 Index RawImage::find_peak(bool furthest_from_center) const {
+    return find_image_peak(image, furthest_from_center);
+}
+
+Index find_image_peak(const Eigen::Ref<const Image>& image, bool furthest_from_center) {
+    const int width = image.cols();
+    const int height = image.rows();
     int c_x = width / 2;
     int c_y = height / 2;
 
@@ -291,7 +487,11 @@ Index RawImage::find_peak(bool furthest_from_center) const {
 // It computes the moments on the "normalized" image where the minimum
 // value has been shifted to zero and the sum of all elements is 1.0.
 // Elements with invalid or masked data are treated as zero.
-ImageMoments RawImage::find_central_moments() const {
+ImageMoments RawImage::find_central_moments() const { return find_image_central_moments(image); }
+
+ImageMoments find_image_central_moments(const Eigen::Ref<const Image>& image) {
+    const int width = image.cols();
+    const int height = image.rows();
     const int num_pixels = width * height;
     const int c_x = width / 2;
     const int c_y = height / 2;
@@ -357,104 +557,145 @@ bool RawImage::center_is_local_max(double flux_thresh, bool local_max) const {
 // obstime by definition of operation, but I guess it's out of
 // scope for this PR because it requires updating layered_image
 // and image stack
-RawImage create_median_image(const std::vector<RawImage>& images) {
-    int num_images = images.size();
-    assert(num_images > 0);
-
-    int width = images[0].get_width();
-    int height = images[0].get_height();
+// Only parallelize the coadds over rows for large images. Many small images (such as
+// stamps) are better coadded in parallel over the images (see create_coadded_images and
+// StampCreator::get_coadded_stamp_batch_cpu).
+constexpr uint64_t MIN_PARALLEL_COADD_VALUES = 1 << 16;
+
+static void check_coadd_dimensions(const std::vector<RawImage>& images) {
+    if (images.size() == 0) throw std::runtime_error("Cannot coadd an empty list of images.");
+    const unsigned width = images[0].get_width();
+    const unsigned height = images[0].get_height();
     for (auto& img : images) {
-        assert(img.get_width() == width and img.get_height() == height);
+        if (img.get_width() != width || img.get_height() != height) {
+            throw std::runtime_error("Can not coadd images with different dimensions.");
+        }
     }
+}
 
-    Image result = Image::Zero(height, width);
+RawImage create_median_image(const std::vector<RawImage>& images) {
+    check_coadd_dimensions(images);
+    const int num_images = images.size();
+    const int width = images[0].get_width();
+    const int height = images[0].get_height();
+    const bool parallel = (uint64_t)num_images * width * height >= MIN_PARALLEL_COADD_VALUES;
 
-    std::vector<float> pix_array(num_images);
-    for (int y = 0; y < height; ++y) {
-        for (int x = 0; x < width; ++x) {
-            int num_unmasked = 0;
-            for (auto& img : images) {
-                // Only used the unmasked array.
-                if (img.pixel_has_data({y, x})) {
-                    pix_array[num_unmasked] = img.get_pixel({y, x});
-                    num_unmasked += 1;
+    Image result = Image::Zero(height, width);
+#pragma omp parallel if (parallel)
+    {
+        std::vector<float> pix_array(num_images);
+#pragma omp for schedule(static)
+        for (int y = 0; y < height; ++y) {
+            for (int x = 0; x < width; ++x) {
+                int num_unmasked = 0;
+                for (auto& img : images) {
+                    // Only used the unmasked array.
+                    const float value = img.get_image()(y, x);
+                    if (pixel_value_valid(value)) {
+                        pix_array[num_unmasked] = value;
+                        num_unmasked += 1;
+                    }
                 }
-            }
 
-            if (num_unmasked > 0) {
-                std::sort(pix_array.begin(), pix_array.begin() + num_unmasked);
+                // We use a 0.0 value if there is no data to allow for visualization
+                // and value based filtering.
+                if (num_unmasked == 0) continue;
 
-                // If we have an even number of elements, take the mean of the two
-                // middle ones.
+                // Select the middle element (partially sorting the values). If we have an even
+                // number of elements, take the mean of the two middle ones. The lower middle one
+                // is the largest value in the first half after the selection.
                 int median_ind = num_unmasked / 2;
+                std::nth_element(pix_array.begin(), pix_array.begin() + median_ind,
+                                 pix_array.begin() + num_unmasked);
                 if (num_unmasked % 2 == 0) {
-                    float ave_middle = (pix_array[median_ind] + pix_array[median_ind - 1]) / 2.0;
-                    result(y, x) = ave_middle;
+                    float lower = *std::max_element(pix_array.begin(), pix_array.begin() + median_ind);
+                    result(y, x) = (pix_array[median_ind] + lower) / 2.0;
                 } else {
                     result(y, x) = pix_array[median_ind];
                 }
-            } else {
-                // We use a 0.0 value if there is no data to allow for visualization
-                // and value based filtering.
-                result(y, x) = 0.0;
-            }
-        }  // for x
-    }      // for y
+            }  // for x
+        }      // for y
+    }
     return RawImage(result);
 }
 
 RawImage create_summed_image(const std::vector<RawImage>& images) {
-    int num_images = images.size();
-    assert(num_images > 0);
-
-    int width = images[0].get_width();
-    int height = images[0].get_height();
-    for (auto& img : images) assert(img.get_width() == width and img.get_height() == height);
+    check_coadd_dimensions(images);
+    const int num_images = images.size();
+    const int width = images[0].get_width();
+    const int height = images[0].get_height();
+    const bool parallel = (uint64_t)num_images * width * height >= MIN_PARALLEL_COADD_VALUES;
 
+    // Accumulate each row across the images, skipping the invalid pixels.
     Image result = Image::Zero(height, width);
-    for (auto& img : images) {
-        for (int y = 0; y < height; ++y) {
-            for (int x = 0; x < width; ++x) {
-                if (img.pixel_has_data({y, x})) {
-                    result(y, x) += img.get_pixel({y, x});
-                }
-            }
+#pragma omp parallel for schedule(static) if (parallel)
+    for (int y = 0; y < height; ++y) {
+        auto sum = result.row(y).array();
+        for (auto& img : images) {
+            const auto values = img.get_image().row(y).array();
+            sum += values.isFinite().select(values, 0.0f);
         }
     }
     return RawImage(result);
 }
 
 RawImage create_mean_image(const std::vector<RawImage>& images) {
-    int num_images = images.size();
-    assert(num_images > 0);
-
-    int width = images[0].get_width();
-    int height = images[0].get_height();
-    for (auto& img : images)
-        assertm(img.get_width() == width and img.get_height() == height,
-                "Can not sum images with different dimensions.");
+    check_coadd_dimensions(images);
+    const int num_images = images.size();
+    const int width = images[0].get_width();
+    const int height = images[0].get_height();
+    const bool parallel = (uint64_t)num_images * width * height >= MIN_PARALLEL_COADD_VALUES;
 
+    // Accumulate the sum and count of the valid pixels for each row across the images.
     Image result = Image::Zero(height, width);
+#pragma omp parallel for schedule(static) if (parallel)
     for (int y = 0; y < height; ++y) {
-        for (int x = 0; x < width; ++x) {
-            float sum = 0.0;
-            float count = 0.0;
-            for (auto& img : images) {
-                if (img.pixel_has_data({y, x})) {
-                    count += 1.0;
-                    sum += img.get_pixel({y, x});
-                }
-            }
+        Eigen::ArrayXf sum = Eigen::ArrayXf::Zero(width);
+        Eigen::ArrayXf count = Eigen::ArrayXf::Zero(width);
+        for (auto& img : images) {
+            const auto values = img.get_image().row(y).array().transpose();
+            const auto valid = values.isFinite();
+            sum += valid.select(values, 0.0f);
+            count += valid.cast<float>();
+        }
 
-            if (count > 0.0)
-                result(y, x) = sum / count;
-            else
-                result(y, x) = 0.0;  // use 0 for visualization purposes
-        }                            // for x
-    }                                // for y
+        // Use 0 for pixels without data for visualization purposes.
+        result.row(y) = (count > 0.0f).select(sum / count, 0.0f).transpose();
+    }
     return RawImage(result);
 }
 
+std::vector<RawImage> create_coadded_images(const std::vector<std::vector<RawImage>>& image_sets,
+                                            StampType coadd_type) {
+    const int num_sets = image_sets.size();
+    std::vector<RawImage> results(num_sets);
+
+    if (coadd_type != STAMP_MEDIAN && coadd_type != STAMP_MEAN && coadd_type != STAMP_SUM) {
+        throw std::runtime_error("Invalid stamp coadd type.");
+    }
+
+    // Each set is coadded by a single thread (the per-image parallelism is only used for large
+    // images). Exceptions cannot leave the parallel region, so record the first error instead.
+    std::string error_msg;
+#pragma omp parallel for schedule(dynamic)
+    for (int i = 0; i < num_sets; ++i) {
+        try {
+            if (coadd_type == STAMP_MEDIAN) {
+                results[i] = create_median_image(image_sets[i]);
+            } else if (coadd_type == STAMP_MEAN) {
+                results[i] = create_mean_image(image_sets[i]);
+            } else {
+                results[i] = create_summed_image(image_sets[i]);
+            }
+        } catch (const std::runtime_error& err) {
+#pragma omp critical
+            if (error_msg.empty()) error_msg = err.what();
+        }
+    }
+    if (!error_msg.empty()) throw std::runtime_error(error_msg);
+    return results;
+}
+
 #ifdef Py_PYTHON_H
 static void raw_image_bindings(py::module& m) {
     using rie = search::RawImage;
@@ -530,6 +771,10 @@ static void raw_image_bindings(py::module& m) {
             .def("apply_mask", &rie::apply_mask, pydocs::DOC_RawImage_apply_mask)
             .def("convolve_gpu", &rie::convolve, pydocs::DOC_RawImage_convolve_gpu)
             .def("convolve_cpu", &rie::convolve_cpu, pydocs::DOC_RawImage_convolve_cpu)
+            .def("convolve_direct_cpu", &rie::convolve_direct_cpu, pydocs::DOC_RawImage_convolve_direct_cpu)
+            .def("convolve_separable_cpu", &rie::convolve_separable_cpu,
+                 pydocs::DOC_RawImage_convolve_separable_cpu)
+            .def("convolve_fft_cpu", &rie::convolve_fft_cpu, pydocs::DOC_RawImage_convolve_fft_cpu)
             // python interface adapters
             .def("create_stamp",
                  [](rie& cls, float x, float y, int radius, bool keep_no_data) {
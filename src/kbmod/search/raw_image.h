@@ -100,9 +100,14 @@ public:
     // Compute the min and max bounds of values in the image.
     std::array<float, 2> compute_bounds() const;
 
-    // Convolve the image with a point spread function.
+    // Convolve the image with a point spread function. On the CPU separable kernels are
+    // applied as two 1-D passes, large non-separable kernels use FFTs, and small ones
+    // use the direct sum.
     void convolve(PSF psf);
     void convolve_cpu(PSF& psf);
+    void convolve_direct_cpu(PSF& psf);
+    void convolve_separable_cpu(PSF& psf);
+    void convolve_fft_cpu(PSF& psf);
 
     // Masks out the array of the image where 'flags' is a bit vector of mask flags
     // to apply (use 0xFFFFFF to apply all flags).
@@ -130,11 +135,21 @@ private:
     Image image;
 };
 
+// Helper functions for finding the peak and central moments of an image (or a block
+// of pixels, such as a stamp in a larger buffer). Used by the RawImage member functions.
+Index find_image_peak(const Eigen::Ref<const Image>& image, bool furthest_from_center);
+ImageMoments find_image_central_moments(const Eigen::Ref<const Image>& image);
+
 // Helper functions for creating composite images.
 RawImage create_median_image(const std::vector<RawImage>& images);
 RawImage create_summed_image(const std::vector<RawImage>& images);
 RawImage create_mean_image(const std::vector<RawImage>& images);
 
+// Coadd each set of images (for example the stamps for many trajectories) in parallel.
+// A general purpose utility; the stamp coadds use the fused batch in StampCreator.
+std::vector<RawImage> create_coadded_images(const std::vector<std::vector<RawImage>>& image_sets,
+                                            StampType coadd_type);
+
 } /* namespace search */
 
 #endif /* RAWIMAGEEIGEN_H_ */
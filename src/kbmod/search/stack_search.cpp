@@ -18,6 +18,7 @@ auto rs_logger = logging::getLogger("kbmod.search.run_search");
 StackSearch::StackSearch(ImageStack& imstack) : stack(imstack), results(0) {
     debug_info = false;
     psi_phi_generated = false;
+    results_sorted = true;
 
     // Default The Thresholds.
     params.min_observations = 0;
@@ -32,6 +33,11 @@ StackSearch::StackSearch(ImageStack& imstack) : stack(imstack), results(0) {
     // Default the encoding parameters.
     params.encode_num_bytes = -1;
 
+    // Default to keeping duplicate results.
+    do_dedup = false;
+    dedup_pos_radius = 0.0;
+    dedup_vel_radius = 0.0;
+
     // Default pixel starting bounds.
     params.x_start_min = 0;
     params.x_start_max = stack.get_width();
@@ -85,6 +91,35 @@ void StackSearch::enable_gpu_encoding(int encode_num_bytes) {
     }
 }
 
+void StackSearch::set_psi_phi_layout(PsiPhiLayout layout, int tile_size) {
+    // Changing the layout requires rebuilding the cached values.
+    if (layout != psi_phi_array.get_layout() ||
+        (layout == PSI_PHI_TILED && tile_size != psi_phi_array.get_tile_size())) {
+        clear_psi_phi();
+    }
+    psi_phi_array.set_layout(layout, tile_size);
+}
+
+void StackSearch::set_encoding_scaling(bool per_time_scaling, float clip_fraction) {
+    // Changing the encoding options requires rebuilding the cached values.
+    if (per_time_scaling != psi_phi_array.get_per_time_scaling() ||
+        clip_fraction != psi_phi_array.get_clip_fraction()) {
+        clear_psi_phi();
+    }
+    psi_phi_array.set_encoding_options(per_time_scaling, clip_fraction);
+}
+
+void StackSearch::enable_result_dedup(float pos_radius, float vel_radius) {
+    if (pos_radius < 0.0 || vel_radius < 0.0) {
+        throw std::runtime_error("Invalid radius for result deduplication.");
+    }
+    do_dedup = true;
+    dedup_pos_radius = pos_radius;
+    dedup_vel_radius = vel_radius;
+}
+
+void StackSearch::disable_result_dedup() { do_dedup = false; }
+
 void StackSearch::set_start_bounds_x(int x_min, int x_max) {
     if (x_min >= x_max) {
         throw std::runtime_error("Invalid search bounds for the x pixel.");
@@ -127,6 +162,61 @@ void StackSearch::clear_psi_phi() {
     }
 }
 
+std::string StackSearch::get_psi_phi_cache_key() {
+    return compute_psi_phi_cache_key(stack, params.encode_num_bytes, psi_phi_array.get_layout(),
+                                     psi_phi_array.get_tile_size(), psi_phi_array.get_per_time_scaling(),
+                                     psi_phi_array.get_clip_fraction());
+}
+
+void StackSearch::save_psi_phi_cache(const std::string& filename) {
+    prepare_psi_phi();
+    save_psi_phi_array(psi_phi_array, filename);
+}
+
+void StackSearch::load_psi_phi_cache(const std::string& filename) {
+    clear_psi_phi();
+    const PsiPhiLayout expected_layout = psi_phi_array.get_layout();
+    const int expected_tile_size = psi_phi_array.get_tile_size();
+    const bool expected_per_time = psi_phi_array.get_per_time_scaling();
+    const float expected_clip = psi_phi_array.get_clip_fraction();
+    auto restore_options = [&]() {
+        psi_phi_array.clear();
+        psi_phi_array.set_layout(expected_layout, expected_tile_size);
+        psi_phi_array.set_encoding_options(expected_per_time, expected_clip);
+    };
+
+    DebugTimer timer = DebugTimer("loading Psi and Phi from " + filename, rs_logger);
+    try {
+        load_psi_phi_array(psi_phi_array, filename);
+    } catch (const std::runtime_error& err) {
+        restore_options();
+        throw;
+    }
+    timer.stop();
+
+    // Check that the data matches the current images, encoding, and layout.
+    int expected_bytes = (params.encode_num_bytes == 1 || params.encode_num_bytes == 2)
+                                 ? params.encode_num_bytes
+                                 : 4;
+    bool matches = (psi_phi_array.get_num_times() == stack.img_count()) &&
+                   (psi_phi_array.get_width() == stack.get_width()) &&
+                   (psi_phi_array.get_height() == stack.get_height()) &&
+                   (psi_phi_array.get_num_bytes() == expected_bytes) &&
+                   (psi_phi_array.get_layout() == expected_layout) &&
+                   (psi_phi_array.get_tile_size() == expected_tile_size);
+    if (expected_bytes != 4) {
+        // The encoding options only matter for the compressed encodings.
+        matches = matches && (psi_phi_array.get_per_time_scaling() == expected_per_time) &&
+                  (psi_phi_array.get_clip_fraction() == expected_clip);
+    }
+    if (!matches) {
+        restore_options();
+        throw std::runtime_error("Psi/Phi cache " + filename +
+                                 " does not match the ImageStack, encoding, or layout.");
+    }
+    psi_phi_generated = true;
+}
+
 // --------------------------------------------
 // Core search functions
 // --------------------------------------------
@@ -139,7 +229,9 @@ void StackSearch::evaluate_single_trajectory(Trajectory& trj) {
     evaluateTrajectory(psi_phi_array.get_meta_data(), psi_phi_array.get_cpu_array_ptr(),
                        psi_phi_array.get_cpu_time_array_ptr(), params, &trj);
 #else
-    throw std::runtime_error("CUDA installation is needed for single trajectory search.");
+    TrajectoryScratch scratch(psi_phi_array.get_num_times());
+    evaluate_trajectory_cpu(psi_phi_array.get_meta_data(), psi_phi_array.get_cpu_array_ptr(),
+                            psi_phi_array.get_cpu_time_array_ptr(), params, &trj, scratch);
 #endif
 }
 
@@ -155,15 +247,55 @@ Trajectory StackSearch::search_linear_trajectory(short x, short y, float vx, flo
     return result;
 }
 
-void StackSearch::search(std::vector<Trajectory>& search_list, int min_observations) {
+void StackSearch::search_current_bounds(std::vector<Trajectory>& search_list, TrajectoryList& bound_results,
+                                        bool on_gpu) {
+    int search_width = params.x_start_max - params.x_start_min;
+    int search_height = params.y_start_max - params.y_start_min;
+    bound_results.resize(search_width * search_height * RESULTS_PER_PIXEL);
+
+    if (on_gpu) {
+#ifdef HAVE_CUDA
+        bound_results.move_to_gpu();
+
+        // Allocate space for the search list and move that to the GPU.
+        TrajectoryList gpu_search_list(search_list);
+        gpu_search_list.move_to_gpu();
+
+        // Do the actual search on the GPU.
+        deviceSearchFilter(psi_phi_array, params, gpu_search_list, bound_results);
+
+        // Move data back to CPU to unallocate GPU space (this will happen automatically
+        // for gpu_search_list when the object goes out of scope, but we do it explicitly here).
+        bound_results.move_to_cpu();
+        gpu_search_list.move_to_cpu();
+#endif
+    } else {
+        search_cpu_only(psi_phi_array, params, search_list, bound_results);
+    }
+}
+
+void StackSearch::deduplicate_results(TrajectoryList& trj_list, int min_observations) {
+    std::vector<Trajectory>& trjs = trj_list.get_list();
+    auto new_end = std::remove_if(trjs.begin(), trjs.end(), [min_observations](const Trajectory& trj) {
+        return (trj.obs_count <= 0) || (trj.obs_count < min_observations);
+    });
+    trj_list.resize(std::distance(trjs.begin(), new_end));
+    trj_list.filter_duplicates(dedup_pos_radius, dedup_vel_radius);
+}
+
+void StackSearch::search(std::vector<Trajectory>& search_list, int min_observations, bool on_gpu) {
     DebugTimer core_timer = DebugTimer("core search", rs_logger);
 
+    if (on_gpu && !HAVE_GPU) {
+        rs_logger->warning("GPU search requested, but no CUDA support found. Falling back to CPU.");
+        on_gpu = false;
+    }
+
     DebugTimer psi_phi_timer = DebugTimer("creating psi/phi buffers", rs_logger);
     prepare_psi_phi();
-    psi_phi_array.move_to_gpu();
+    if (on_gpu) psi_phi_array.move_to_gpu();
     psi_phi_timer.stop();
 
-    // Allocate a vector for the results and move it onto the GPU.
     int search_width = params.x_start_max - params.x_start_min;
     int search_height = params.y_start_max - params.y_start_min;
     int num_search_pixels = search_width * search_height;
@@ -175,40 +307,122 @@ void StackSearch::search(std::vector<Trajectory>& search_list, int min_observati
            << "Allocating space for " << max_results << " results.";
     rs_logger->info(logmsg.str());
 
-    results.resize(max_results);
-    results.move_to_gpu();
-
-    // Allocate space for the search list and move that to the GPU.
-    int num_to_search = search_list.size();
-
     logmsg.str("");
-    logmsg << search_list.size() << " trajectories...";
+    logmsg << search_list.size() << " trajectories on " << (on_gpu ? "GPU" : "CPU") << "...";
     rs_logger->info(logmsg.str());
 
-    TrajectoryList gpu_search_list(search_list);
-    gpu_search_list.move_to_gpu();
-
     // Set the minimum number of observations.
     params.min_observations = min_observations;
 
-    // Do the actual search on the GPU.
     DebugTimer search_timer = DebugTimer("search execution", rs_logger);
-#ifdef HAVE_CUDA
-    deviceSearchFilter(psi_phi_array, params, gpu_search_list, results);
-#else
-    throw std::runtime_error("Non-GPU search is not implemented.");
-#endif
+    search_current_bounds(search_list, results, on_gpu);
+    if (on_gpu) psi_phi_array.clear_from_gpu();
     search_timer.stop();
 
-    // Move data back to CPU to unallocate GPU space (this will happen automatically
-    // for gpu_search_list when the object goes out of scope, but we do it explicitly here).
-    psi_phi_array.clear_from_gpu();
-    results.move_to_cpu();
-    gpu_search_list.move_to_cpu();
+    // The results are sorted when they are first retrieved (or during deduplication).
+    results_sorted = false;
+    if (do_dedup) {
+        DebugTimer dedup_timer = DebugTimer("deduplicating results", rs_logger);
+        int num_before = results.get_size();
+        deduplicate_results(results, min_observations);
+        results_sorted = true;
+
+        logmsg.str("");
+        logmsg << "Kept " << results.get_size() << " of " << num_before << " results after deduplication.";
+        rs_logger->info(logmsg.str());
+        dedup_timer.stop();
+    }
+    core_timer.stop();
+}
+
+void StackSearch::search_tiled(std::vector<Trajectory>& search_list, int min_observations, int tile_size,
+                               int max_results, bool on_gpu) {
+    if (tile_size <= 0) throw std::runtime_error("Tile size must be positive.");
+    if (max_results <= 0) throw std::runtime_error("Maximum number of results must be positive.");
+    DebugTimer core_timer = DebugTimer("core tiled search", rs_logger);
+
+    if (on_gpu && !HAVE_GPU) {
+        rs_logger->warning("GPU search requested, but no CUDA support found. Falling back to CPU.");
+        on_gpu = false;
+    }
+
+    DebugTimer psi_phi_timer = DebugTimer("creating psi/phi buffers", rs_logger);
+    prepare_psi_phi();
+    if (on_gpu) psi_phi_array.move_to_gpu();
+    psi_phi_timer.stop();
+
+    const int x_min = params.x_start_min;
+    const int x_max = params.x_start_max;
+    const int y_min = params.y_start_min;
+    const int y_max = params.y_start_max;
+
+    std::stringstream logmsg;
+    logmsg << "Searching X=[" << x_min << ", " << x_max << "] Y=[" << y_min << ", " << y_max << "] in "
+           << tile_size << "x" << tile_size << " tiles keeping the top " << max_results << " results.\n"
+           << search_list.size() << " trajectories on " << (on_gpu ? "GPU" : "CPU") << "...";
+    rs_logger->info(logmsg.str());
+
+    // Set the minimum number of observations.
+    params.min_observations = min_observations;
+
+    // The global top-K results are kept in a min-heap (by likelihood), so the worst
+    // kept result is always at the front and memory is bounded by max_results.
+    auto lh_greater = [](const Trajectory& a, const Trajectory& b) { return a.lh > b.lh; };
+    std::vector<Trajectory> top_results;
+    top_results.reserve(std::min(max_results, (x_max - x_min) * (y_max - y_min) * RESULTS_PER_PIXEL));
+    TrajectoryList tile_results(0);
+
+    // Restores the full search bounds and frees the GPU data (also when a tile's search throws).
+    auto restore_state = [&]() {
+        params.x_start_min = x_min;
+        params.x_start_max = x_max;
+        params.y_start_min = y_min;
+        params.y_start_max = y_max;
+        if (on_gpu) psi_phi_array.clear_from_gpu();
+    };
+
+    DebugTimer search_timer = DebugTimer("search execution", rs_logger);
+    try {
+        for (int tile_y = y_min; tile_y < y_max; tile_y += tile_size) {
+            for (int tile_x = x_min; tile_x < x_max; tile_x += tile_size) {
+                params.x_start_min = tile_x;
+                params.x_start_max = std::min(tile_x + tile_size, x_max);
+                params.y_start_min = tile_y;
+                params.y_start_max = std::min(tile_y + tile_size, y_max);
+                search_current_bounds(search_list, tile_results, on_gpu);
+                if (do_dedup) deduplicate_results(tile_results, min_observations);
+
+                // Merge the tile's results into the global heap, skipping the unfilled
+                // placeholder entries (which have no observations).
+                for (const Trajectory& trj : tile_results.get_list()) {
+                    if ((trj.obs_count <= 0) || (trj.obs_count < min_observations)) continue;
+
+                    if (top_results.size() < (size_t)max_results) {
+                        top_results.push_back(trj);
+                        std::push_heap(top_results.begin(), top_results.end(), lh_greater);
+                    } else if (trj.lh > top_results.front().lh) {
+                        std::pop_heap(top_results.begin(), top_results.end(), lh_greater);
+                        top_results.back() = trj;
+                        std::push_heap(top_results.begin(), top_results.end(), lh_greater);
+                    }
+                }
+            }
+        }
+    } catch (...) {
+        restore_state();
+        throw;
+    }
+    search_timer.stop();
+    restore_state();
 
     DebugTimer sort_timer = DebugTimer("Sorting results", rs_logger);
-    results.sort_by_likelihood();
+    std::sort_heap(top_results.begin(), top_results.end(), lh_greater);
+    results.set_trajectories(top_results);
+    results_sorted = true;
     sort_timer.stop();
+
+    // Suppress the duplicates across tile boundaries.
+    if (do_dedup) results.filter_duplicates(dedup_pos_radius, dedup_vel_radius);
     core_timer.stop();
 }
 
@@ -242,13 +456,73 @@ std::vector<float> StackSearch::get_phi_curves(Trajectory& trj) {
     return extract_psi_or_phi_curve(trj, false);
 }
 
+std::pair<Image, Image> StackSearch::get_psi_phi_curves(const std::vector<Trajectory>& trajectories) {
+    prepare_psi_phi();
+
+    const int num_trjs = trajectories.size();
+    const int num_times = stack.img_count();
+    Image psi_curves = Image::Zero(num_trjs, num_times);
+    Image phi_curves = Image::Zero(num_trjs, num_times);
+
+    std::vector<float> times(num_times);
+    for (int i = 0; i < num_times; ++i) {
+        times[i] = psi_phi_array.read_time(i);
+    }
+
+    // Each trajectory fills its own row of the outputs.
+#pragma omp parallel for schedule(static)
+    for (int r = 0; r < num_trjs; ++r) {
+        const Trajectory& trj = trajectories[r];
+        for (int i = 0; i < num_times; ++i) {
+            // Query the center of the predicted location's pixel.
+            Point pred_pt = {trj.get_x_pos(times[i]) + 0.5f, trj.get_y_pos(times[i]) + 0.5f};
+            Index pred_idx = pred_pt.to_index();
+            PsiPhi psi_phi_val = psi_phi_array.read_psi_phi(i, pred_idx.i, pred_idx.j);
+
+            if (pixel_value_valid(psi_phi_val.psi)) psi_curves(r, i) = psi_phi_val.psi;
+            if (pixel_value_valid(psi_phi_val.phi)) phi_curves(r, i) = psi_phi_val.phi;
+        }
+    }
+    return std::make_pair(std::move(psi_curves), std::move(phi_curves));
+}
+
+std::pair<Image, Image> StackSearch::get_psi_phi_curves_from_array(const Eigen::Ref<const Image>& trj_params) {
+    if (trj_params.cols() != 4) {
+        throw std::runtime_error("Trajectory array must have 4 columns (x, y, vx, vy).");
+    }
+
+    std::vector<Trajectory> trajectories(trj_params.rows());
+    for (int r = 0; r < trj_params.rows(); ++r) {
+        trajectories[r].x = static_cast<short>(trj_params(r, 0));
+        trajectories[r].y = static_cast<short>(trj_params(r, 1));
+        trajectories[r].vx = trj_params(r, 2);
+        trajectories[r].vy = trj_params(r, 3);
+    }
+    return get_psi_phi_curves(trajectories);
+}
+
 std::vector<Trajectory> StackSearch::get_results(int start, int count) {
+    if (!results_sorted) {
+        DebugTimer sort_timer = DebugTimer("Sorting results", rs_logger);
+        results.sort_by_likelihood();
+        results_sorted = true;
+        sort_timer.stop();
+    }
     return results.get_batch(start, count);
 }
 
+std::vector<Trajectory> StackSearch::get_results_above(float min_lh) {
+    int count = results.partition_by_likelihood(min_lh);
+    results_sorted = (count == results.get_size());
+
+    std::vector<Trajectory>& all_results = results.get_list();
+    return std::vector<Trajectory>(all_results.begin(), all_results.begin() + count);
+}
+
 // This function is used only for testing by injecting known result trajectories.
 void StackSearch::set_results(const std::vector<Trajectory>& new_results) {
     results.set_trajectories(new_results);
+    results_sorted = true;
 }
 
 #ifdef Py_PYTHON_H
@@ -261,7 +535,11 @@ static void stack_search_bindings(py::module& m) {
 
     py::class_<ks>(m, "StackSearch", pydocs::DOC_StackSearch)
             .def(py::init<is&>())
-            .def("search", &ks::search, pydocs::DOC_StackSearch_search)
+            .def("search", &ks::search, py::arg("search_list"), py::arg("min_observations"),
+                 py::arg("on_gpu") = search::HAVE_GPU, pydocs::DOC_StackSearch_search)
+            .def("search_tiled", &ks::search_tiled, py::arg("search_list"), py::arg("min_observations"),
+                 py::arg("tile_size"), py::arg("max_results"), py::arg("on_gpu") = search::HAVE_GPU,
+                 pydocs::DOC_StackSearch_search_tiled)
             .def("evaluate_single_trajectory", &ks::evaluate_single_trajectory,
                  pydocs::DOC_StackSearch_evaluate_single_trajectory)
             .def("search_linear_trajectory", &ks::search_linear_trajectory,
@@ -271,6 +549,13 @@ static void stack_search_bindings(py::module& m) {
             .def("enable_gpu_sigmag_filter", &ks::enable_gpu_sigmag_filter,
                  pydocs::DOC_StackSearch_enable_gpu_sigmag_filter)
             .def("enable_gpu_encoding", &ks::enable_gpu_encoding, pydocs::DOC_StackSearch_enable_gpu_encoding)
+            .def("set_psi_phi_layout", &ks::set_psi_phi_layout, py::arg("layout"), py::arg("tile_size") = 1,
+                 pydocs::DOC_StackSearch_set_psi_phi_layout)
+            .def("set_encoding_scaling", &ks::set_encoding_scaling, py::arg("per_time_scaling"),
+                 py::arg("clip_fraction") = 0.0, pydocs::DOC_StackSearch_set_encoding_scaling)
+            .def("enable_result_dedup", &ks::enable_result_dedup, py::arg("pos_radius"), py::arg("vel_radius"),
+                 pydocs::DOC_StackSearch_enable_result_dedup)
+            .def("disable_result_dedup", &ks::disable_result_dedup, pydocs::DOC_StackSearch_disable_result_dedup)
             .def("set_start_bounds_x", &ks::set_start_bounds_x, pydocs::DOC_StackSearch_set_start_bounds_x)
             .def("set_start_bounds_y", &ks::set_start_bounds_y, pydocs::DOC_StackSearch_set_start_bounds_y)
             .def("set_debug", &ks::set_debug, pydocs::DOC_StackSearch_set_debug)
@@ -285,9 +570,28 @@ static void stack_search_bindings(py::module& m) {
                  pydocs::DOC_StackSearch_get_psi_curves)
             .def("get_phi_curves", (std::vector<float>(ks::*)(tj&)) & ks::get_phi_curves,
                  pydocs::DOC_StackSearch_get_phi_curves)
+            .def("get_psi_phi_curves", &ks::get_psi_phi_curves_from_array, py::arg("trajectories"),
+                 pydocs::DOC_StackSearch_get_psi_phi_curves)
+            .def("get_psi_phi_curves", &ks::get_psi_phi_curves, py::arg("trajectories"),
+                 pydocs::DOC_StackSearch_get_psi_phi_curves)
             .def("prepare_psi_phi", &ks::prepare_psi_phi, pydocs::DOC_StackSearch_prepare_psi_phi)
             .def("clear_psi_phi", &ks::clear_psi_phi, pydocs::DOC_StackSearch_clear_psi_phi)
+            .def("get_psi_phi_cache_key", &ks::get_psi_phi_cache_key,
+                 pydocs::DOC_StackSearch_get_psi_phi_cache_key)
+            .def("save_psi_phi_cache", &ks::save_psi_phi_cache, py::arg("filename"),
+                 pydocs::DOC_StackSearch_save_psi_phi_cache)
+            .def("load_psi_phi_cache", &ks::load_psi_phi_cache, py::arg("filename"),
+                 pydocs::DOC_StackSearch_load_psi_phi_cache)
             .def("get_results", &ks::get_results, pydocs::DOC_StackSearch_get_results)
+            .def(
+                    "get_results_above",
+                    [](ks& s, float min_lh) {
+                        // Copy the results directly into a structured array instead of
+                        // converting each Trajectory into a Python object.
+                        std::vector<tj> trjs = s.get_results_above(min_lh);
+                        return py::array_t<tj>(trjs.size(), trjs.data());
+                    },
+                    py::arg("min_lh"), pydocs::DOC_StackSearch_get_results_above)
             .def("set_results", &ks::set_results, pydocs::DOC_StackSearch_set_results);
 }
 #endif /* Py_PYTHON_H */
@@ -14,6 +14,7 @@
 
 #include "logging.h"
 #include "common.h"
+#include "cpu_search.h"
 #include "debug_timer.h"
 #include "geom.h"
 #include "image_stack.h"
@@ -44,25 +45,39 @@ public:
     void set_min_lh(float new_value);
     void enable_gpu_sigmag_filter(std::vector<float> percentiles, float sigmag_coeff, float min_lh);
     void enable_gpu_encoding(int num_bytes);
+    void set_psi_phi_layout(PsiPhiLayout layout, int tile_size = 1);
+    void set_encoding_scaling(bool per_time_scaling, float clip_fraction = 0.0);
+    void enable_result_dedup(float pos_radius, float vel_radius);
+    void disable_result_dedup();
     void set_start_bounds_x(int x_min, int x_max);
     void set_start_bounds_y(int y_min, int y_max);
 
     // The primary search functions
     void evaluate_single_trajectory(Trajectory& trj);
     Trajectory search_linear_trajectory(short x, short y, float vx, float vy);
-    void search(std::vector<Trajectory>& search_list, int min_observations);
+    void search(std::vector<Trajectory>& search_list, int min_observations, bool on_gpu = HAVE_GPU);
+    void search_tiled(std::vector<Trajectory>& search_list, int min_observations, int tile_size, int max_results,
+                      bool on_gpu = HAVE_GPU);
 
     // Gets the vector of result trajectories from the grid search.
     std::vector<Trajectory> get_results(int start, int end);
+    std::vector<Trajectory> get_results_above(float min_lh);
 
     // Getters for the Psi and Phi data.
     std::vector<float> get_psi_curves(Trajectory& t);
     std::vector<float> get_phi_curves(Trajectory& t);
+    std::pair<Image, Image> get_psi_phi_curves(const std::vector<Trajectory>& trajectories);
+    std::pair<Image, Image> get_psi_phi_curves_from_array(const Eigen::Ref<const Image>& trj_params);
 
     // Helper functions for computing Psi and Phi
     void prepare_psi_phi();
     void clear_psi_phi();
 
+    // Save and load the psi and phi data to avoid recomputing it for repeated searches.
+    std::string get_psi_phi_cache_key();
+    void save_psi_phi_cache(const std::string& filename);
+    void load_psi_phi_cache(const std::string& filename);
+
     // Helper functions for testing
     void set_results(const std::vector<Trajectory>& new_results);
 
@@ -71,17 +86,32 @@ public:
 protected:
     std::vector<float> extract_psi_or_phi_curve(Trajectory& trj, bool extract_psi);
 
+    // Run the grid search over the current start bounds, filling bound_results with
+    // RESULTS_PER_PIXEL (unsorted) trajectories per starting pixel.
+    void search_current_bounds(std::vector<Trajectory>& search_list, TrajectoryList& bound_results, bool on_gpu);
+
+    // Drop the unfilled results (and those with too few observations) and suppress the
+    // near-duplicates. Leaves the list sorted by decreasing likelihood.
+    void deduplicate_results(TrajectoryList& trj_list, int min_observations);
+
     // Core data and search parameters
     ImageStack stack;
     SearchParameters params;
     bool debug_info;
 
+    // Suppression of near-duplicate results at the end of the search.
+    bool do_dedup;
+    float dedup_pos_radius;
+    float dedup_vel_radius;
+
     // Precomputed and cached search data
     bool psi_phi_generated;
     PsiPhiArray psi_phi_array;
 
-    // Results from the grid search.
+    // Results from the grid search. The results are sorted by likelihood lazily
+    // (on first retrieval) so callers that only need the top results can skip the full sort.
     TrajectoryList results;
+    bool results_sorted;
 };
 
 } /* namespace search */
@@ -77,49 +77,148 @@ std::vector<RawImage> StampCreator::get_coadded_stamps_cpu(ImageStack& stack,
                                                            std::vector<Trajectory>& t_array,
                                                            std::vector<std::vector<bool>>& use_index_vect,
                                                            const StampParameters& params) {
+    CoaddedStampBatch batch = get_coadded_stamp_batch_cpu(stack, t_array, use_index_vect, params);
+    const int stamp_width = 2 * params.radius + 1;
     const int num_trajectories = t_array.size();
+
     std::vector<RawImage> results(num_trajectories);
+    for (int i = 0; i < num_trajectories; ++i) {
+        if (batch.keep[i]) {
+            Image stamp = Eigen::Map<Image>(batch.stamps.row(i).data(), stamp_width, stamp_width);
+            results[i] = RawImage(stamp);
+        } else {
+            results[i] = RawImage(1, 1, NO_DATA);
+        }
+    }
+    return results;
+}
+
+// Coadd the valid values of a single stamp pixel (given in time order).
+static inline float coadd_pixel_values(float* values, int num_values, StampType stamp_type) {
+    // We use a 0.0 value if there is no data to allow for visualization and value based filtering.
+    if (num_values == 0) return 0.0;
+
+    if (stamp_type == STAMP_MEDIAN) {
+        // Matches create_median_image().
+        int median_ind = num_values / 2;
+        std::nth_element(values, values + median_ind, values + num_values);
+        if (num_values % 2 == 0) {
+            float lower = *std::max_element(values, values + median_ind);
+            return (values[median_ind] + lower) / 2.0;
+        }
+        return values[median_ind];
+    }
+
+    // Sum the values in time order (matching create_summed_image() and create_mean_image()).
+    float sum = 0.0;
+    for (int v = 0; v < num_values; ++v) sum += values[v];
+    return (stamp_type == STAMP_MEAN) ? sum / (float)num_values : sum;
+}
 
+CoaddedStampBatch StampCreator::get_coadded_stamp_batch_cpu(ImageStack& stack,
+                                                            std::vector<Trajectory>& t_array,
+                                                            std::vector<std::vector<bool>>& use_index_vect,
+                                                            const StampParameters& params) {
+    const int num_trajectories = t_array.size();
+    const int num_times = stack.img_count();
+    if (params.radius < 0) throw std::runtime_error("stamp radius must be at least 0");
+    if (params.stamp_type != STAMP_MEDIAN && params.stamp_type != STAMP_MEAN &&
+        params.stamp_type != STAMP_SUM) {
+        throw std::runtime_error("Invalid stamp coadd type.");
+    }
+    if (use_index_vect.size() < num_trajectories) {
+        throw std::runtime_error("Wrong size use_index_vect passed into get_coadded_stamps_cpu()");
+    }
     for (int i = 0; i < num_trajectories; ++i) {
-        std::vector<RawImage> stamps =
-                StampCreator::create_stamps(stack, t_array[i], params.radius, true, use_index_vect[i]);
-
-        RawImage coadd(1, 1);
-        switch (params.stamp_type) {
-            case STAMP_MEDIAN:
-                coadd = create_median_image(stamps);
-                break;
-            case STAMP_MEAN:
-                coadd = create_mean_image(stamps);
-                break;
-            case STAMP_SUM:
-                coadd = create_summed_image(stamps);
-                break;
-            default:
-                throw std::runtime_error("Invalid stamp coadd type.");
+        if (use_index_vect[i].size() > 0 && use_index_vect[i].size() != num_times) {
+            throw std::runtime_error("Wrong size use_index passed into get_coadded_stamps_cpu()");
         }
+    }
 
-        // Do the filtering if needed.
-        if (params.do_filtering && filter_stamp(coadd, params)) {
-            results[i] = RawImage(1, 1, NO_DATA);
-        } else {
-            results[i] = coadd;
+    const int radius = params.radius;
+    const int stamp_width = 2 * radius + 1;
+    const int stamp_ppi = stamp_width * stamp_width;
+    const int width = stack.get_width();
+    const int height = stack.get_height();
+    const std::vector<float> times = stack.build_zeroed_times();
+
+    CoaddedStampBatch batch;
+    batch.stamps = Image::Zero(num_trajectories, stamp_ppi);
+    batch.keep.assign(num_trajectories, 1);
+
+#pragma omp parallel
+    {
+        // Per thread scratch space with the valid values of each stamp pixel in
+        // [pixel][time] order and the number of valid values for each pixel.
+        std::vector<float> values((uint64_t)stamp_ppi * num_times);
+        std::vector<int> counts(stamp_ppi);
+
+#pragma omp for schedule(dynamic)
+        for (int i = 0; i < num_trajectories; ++i) {
+            const Trajectory& trj = t_array[i];
+            const std::vector<bool>& use_index = use_index_vect[i];
+            std::fill(counts.begin(), counts.end(), 0);
+
+            for (int t = 0; t < num_times; ++t) {
+                if (use_index.size() > 0 && !use_index[t]) continue;
+
+                // Gather the stamp's valid pixels using the same pixel grid as RawImage::create_stamp().
+                Point pos{trj.x + times[t] * trj.vx, trj.y + times[t] * trj.vy};
+                Index idx = pos.to_index();
+                if ((idx.j + radius < 0) || (idx.j - radius >= width) || (idx.i + radius < 0) ||
+                    (idx.i - radius >= height)) {
+                    continue;
+                }
+                const int top = (int)pos.y - radius;
+                const int left = (int)pos.x - radius;
+                const Image& img = stack.get_single_image(t).get_science().get_image();
+
+                for (int sy = std::max(0, -top); sy < std::min(stamp_width, height - top); ++sy) {
+                    for (int sx = std::max(0, -left); sx < std::min(stamp_width, width - left); ++sx) {
+                        const float value = img(top + sy, left + sx);
+                        if (pixel_value_valid(value)) {
+                            const int p = sy * stamp_width + sx;
+                            values[(uint64_t)p * num_times + counts[p]] = value;
+                            counts[p] += 1;
+                        }
+                    }
+                }
+            }
+
+            // Coadd the values directly into the output row. Trajectories without any
+            // valid time steps get an all zero stamp.
+            float* out = batch.stamps.row(i).data();
+            for (int p = 0; p < stamp_ppi; ++p) {
+                out[p] = coadd_pixel_values(&values[(uint64_t)p * num_times], counts[p], params.stamp_type);
+            }
+
+            // Do the filtering if needed.
+            if (params.do_filtering) {
+                Eigen::Map<const Image> stamp(out, stamp_width, stamp_width);
+                batch.keep[i] = filter_stamp_pixels(stamp, params) ? 0 : 1;
+            }
         }
     }
 
-    return results;
+    return batch;
 }
 
 bool StampCreator::filter_stamp(const RawImage& img, const StampParameters& params) {
+    return filter_stamp_pixels(img.get_image(), params);
+}
+
+// The filters are applied from cheapest to most expensive, so most rejected
+// stamps never compute the moments.
+bool StampCreator::filter_stamp_pixels(const Eigen::Ref<const Image>& img, const StampParameters& params) {
     // Allocate space for the coadd information and initialize to zero.
     const int stamp_width = 2 * params.radius + 1;
     const int stamp_ppi = stamp_width * stamp_width;
     // this ends up being something like eigen::vector1f something, not vector
     // but it behaves in all the same ways so just let it figure it out itself
-    const auto& pixels = img.get_image().reshaped();
+    const auto& pixels = img.reshaped();
 
     // Filter on the peak's position.
-    Index idx = img.find_peak(true);
+    Index idx = find_image_peak(img, true);
     if ((abs(idx.i - params.radius) >= params.peak_offset_x) ||
         (abs(idx.j - params.radius) >= params.peak_offset_y)) {
         return true;
@@ -127,7 +226,7 @@ bool StampCreator::filter_stamp(const RawImage& img, const StampParameters& para
 
     // Filter on the percentage of flux in the central pixel.
     if (params.center_thresh > 0.0) {
-        const auto& pixels = img.get_image().reshaped();
+        const auto& pixels = img.reshaped();
         float center_val = pixels[idx.j * stamp_width + idx.i];
         float pixel_sum = 0.0;
         for (int p = 0; p < stamp_ppi; ++p) {
@@ -140,7 +239,7 @@ bool StampCreator::filter_stamp(const RawImage& img, const StampParameters& para
     }
 
     // Filter on the image moments.
-    ImageMoments moments = img.find_central_moments();
+    ImageMoments moments = find_image_central_moments(img);
     if ((fabs(moments.m01) >= params.m01_limit) || (fabs(moments.m10) >= params.m10_limit) ||
         (fabs(moments.m11) >= params.m11_limit) || (moments.m02 >= params.m02_limit) ||
         (moments.m20 >= params.m20_limit)) {
@@ -228,6 +327,30 @@ static void stamp_creator_bindings(py::module& m) {
             .def_static("get_summed_stamp", &sc::get_summed_stamp, pydocs::DOC_StampCreator_get_summed_stamp)
             .def_static("get_coadded_stamps", &sc::get_coadded_stamps,
                         pydocs::DOC_StampCreator_get_coadded_stamps)
+            .def_static(
+                    "get_coadded_stamp_array",
+                    [](search::ImageStack& stack, std::vector<search::Trajectory>& t_array,
+                       std::vector<std::vector<bool>>& use_index_vect,
+                       const search::StampParameters& params) {
+                        search::CoaddedStampBatch batch =
+                                sc::get_coadded_stamp_batch_cpu(stack, t_array, use_index_vect, params);
+                        const py::ssize_t num_stamps = t_array.size();
+                        const py::ssize_t stamp_width = 2 * params.radius + 1;
+
+                        // Hand the stamp data to numpy without copying it.
+                        search::Image* stamp_data = new search::Image(std::move(batch.stamps));
+                        py::capsule owner(stamp_data,
+                                          [](void* ptr) { delete static_cast<search::Image*>(ptr); });
+                        py::array_t<float> stamps({num_stamps, stamp_width, stamp_width}, stamp_data->data(),
+                                                  owner);
+
+                        py::array_t<bool> keep(num_stamps);
+                        auto keep_ref = keep.mutable_unchecked<1>();
+                        for (py::ssize_t i = 0; i < num_stamps; ++i) keep_ref(i) = batch.keep[i] != 0;
+                        return py::make_tuple(stamps, keep);
+                    },
+                    py::arg("stack"), py::arg("trajectories"), py::arg("use_index"), py::arg("params"),
+                    pydocs::DOC_StampCreator_get_coadded_stamp_array)
             .def_static("filter_stamp", &sc::filter_stamp, pydocs::DOC_StampCreator_filter_stamp);
 }
 #endif /* Py_PYTHON_H */
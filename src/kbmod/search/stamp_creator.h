@@ -1,11 +1,21 @@
 #ifndef STAMPCREATOR_H_
 #define STAMPCREATOR_H_
 
+#include <algorithm>
+
 #include "common.h"
 #include "image_stack.h"
 #include "pydocs/stamp_creator_docs.h"
 
 namespace search {
+// The coadded stamps for a batch of trajectories stored as a single (N, S * S) array,
+// where S = 2 * radius + 1, with a flag for each trajectory indicating whether it
+// passed the stamp filtering.
+struct CoaddedStampBatch {
+    Image stamps;
+    std::vector<uint8_t> keep;
+};
+
 /**
  * Utility class for functions used for creating science stamps for
  * filtering, visualization, etc.
@@ -49,8 +59,16 @@ public:
                                                         std::vector<std::vector<bool> >& use_index_vect,
                                                         const StampParameters& params);
 
-    // Function to do the actual stamp filtering.
+    // Compute the coadded stamps for each trajectory on the CPU in parallel over the trajectories.
+    // The stamps are coadded in per-thread scratch buffers and written directly into the output
+    // array, and the filtering is done as each stamp is finished.
+    static CoaddedStampBatch get_coadded_stamp_batch_cpu(ImageStack& stack, std::vector<Trajectory>& t_array,
+                                                         std::vector<std::vector<bool> >& use_index_vect,
+                                                         const StampParameters& params);
+
+    // Function to do the actual stamp filtering. Returns true if the stamp should be filtered.
     static bool filter_stamp(const RawImage& img, const StampParameters& params);
+    static bool filter_stamp_pixels(const Eigen::Ref<const Image>& img, const StampParameters& params);
 
     virtual ~StampCreator(){};
 };
@@ -3,6 +3,8 @@
 
 #include <parallel/algorithm>
 #include <algorithm>
+#include <cmath>
+#include <unordered_map>
 
 namespace search {
 
@@ -115,6 +117,69 @@ void TrajectoryList::filter_by_valid() {
     resize(new_size);
 }
 
+int TrajectoryList::partition_by_likelihood(float min_likelihood) {
+    if (data_on_gpu) throw std::runtime_error("Data on GPU");
+
+    // Move the entries that meet the threshold to the front (in linear time) and only
+    // sort those. The remaining entries are left in an unspecified order.
+    auto new_end = std::partition(cpu_list.begin(), cpu_list.end(),
+                                  [min_likelihood](const Trajectory& x) { return x.lh >= min_likelihood; });
+    __gnu_parallel::sort(cpu_list.begin(), new_end, [](Trajectory a, Trajectory b) { return b.lh < a.lh; });
+    return std::distance(cpu_list.begin(), new_end);
+}
+
+void TrajectoryList::filter_duplicates(float pos_radius, float vel_radius) {
+    if (data_on_gpu) throw std::runtime_error("Data on GPU");
+    if (pos_radius < 0.0 || vel_radius < 0.0) throw std::runtime_error("Invalid duplicate radius.");
+    sort_by_likelihood();
+
+    // Greedy non-maximum suppression in decreasing order of likelihood: a trajectory is kept
+    // only if no kept trajectory is within pos_radius (starting pixel) and vel_radius (velocity).
+    // The kept trajectories are indexed by a grid over the starting pixels with cells at least
+    // pos_radius wide, so only the neighboring cells need to be checked.
+    const float cell_size = std::max(pos_radius, 1.0f);
+    const float pos_radius2 = pos_radius * pos_radius;
+    const float vel_radius2 = vel_radius * vel_radius;
+    auto cell_key = [](int64_t cx, int64_t cy) { return ((uint64_t)cx << 32) ^ ((uint64_t)cy & 0xFFFFFFFF); };
+
+    std::unordered_map<uint64_t, std::vector<int>> kept_by_cell;
+    int num_kept = 0;
+    for (int i = 0; i < max_size; ++i) {
+        const Trajectory& trj = cpu_list[i];
+        const int64_t cx = (int64_t)std::floor(trj.x / cell_size);
+        const int64_t cy = (int64_t)std::floor(trj.y / cell_size);
+
+        bool duplicate = false;
+        for (int64_t dx = -1; dx <= 1 && !duplicate; ++dx) {
+            for (int64_t dy = -1; dy <= 1 && !duplicate; ++dy) {
+                auto it = kept_by_cell.find(cell_key(cx + dx, cy + dy));
+                if (it == kept_by_cell.end()) continue;
+
+                for (int k : it->second) {
+                    const Trajectory& other = cpu_list[k];
+                    float pos_dx = trj.x - other.x;
+                    float pos_dy = trj.y - other.y;
+                    float vel_dx = trj.vx - other.vx;
+                    float vel_dy = trj.vy - other.vy;
+                    if ((pos_dx * pos_dx + pos_dy * pos_dy <= pos_radius2) &&
+                        (vel_dx * vel_dx + vel_dy * vel_dy <= vel_radius2)) {
+                        duplicate = true;
+                        break;
+                    }
+                }
+            }
+        }
+
+        // Compact the kept trajectories to the front of the list (preserving the order).
+        if (!duplicate) {
+            cpu_list[num_kept] = trj;
+            kept_by_cell[cell_key(cx, cy)].push_back(num_kept);
+            ++num_kept;
+        }
+    }
+    resize(num_kept);
+}
+
 void TrajectoryList::move_to_gpu() {
     if (data_on_gpu) return;  // Nothing to do.
 
@@ -161,6 +226,10 @@ static void trajectory_list_binding(py::module &m) {
             .def("filter_by_obs_count", &trjl::filter_by_obs_count,
                  pydocs::DOC_TrajectoryList_filter_by_obs_count)
             .def("filter_by_valid", &trjl::filter_by_valid, pydocs::DOC_TrajectoryList_filter_by_valid)
+            .def("partition_by_likelihood", &trjl::partition_by_likelihood,
+                 pydocs::DOC_TrajectoryList_partition_by_likelihood)
+            .def("filter_duplicates", &trjl::filter_duplicates, py::arg("pos_radius"), py::arg("vel_radius"),
+                 pydocs::DOC_TrajectoryList_filter_duplicates)
             .def("move_to_cpu", &trjl::move_to_cpu, pydocs::DOC_TrajectoryList_move_to_cpu)
             .def("move_to_gpu", &trjl::move_to_gpu, pydocs::DOC_TrajectoryList_move_to_gpu);
 }
@@ -64,6 +64,8 @@ public:
     void filter_by_likelihood(float min_likelihood);
     void filter_by_obs_count(int min_obs_count);
     void filter_by_valid();
+    int partition_by_likelihood(float min_likelihood);
+    void filter_duplicates(float pos_radius, float vel_radius);
 
     // Data allocation functions.
     inline bool on_gpu() const { return data_on_gpu; }
@@ -0,0 +1,258 @@
+"""Tools for splitting a WorkUnit into overlapping spatial shards and merging
+the results of the per-shard searches.
+
+Each shard contains the images for a rectangular region of the field (the shard's core)
+plus a margin on every side that is large enough to contain any trajectory that starts
+in the core. The shard's configuration restricts the search's starting pixels to the
+core, so each trajectory is found by exactly one shard. After the shards are searched
+(for example on separate nodes), `merge_shard_results` moves the results back to the
+full field's pixel coordinates and combines them.
+"""
+
+import copy
+import math
+
+import numpy as np
+
+from kbmod.filters.clustering_filters import apply_clustering
+from kbmod.result_list import ResultList
+from kbmod.search import Logging, TrajectoryList
+from kbmod.trajectory_utils import make_trajectory
+from kbmod.wcs_utils import calc_ecliptic_angle
+
+
+logger = Logging.getLogger(__name__)
+
+
+def compute_shard_margin(config, times):
+    """Compute the margin needed around a shard's core region so that any trajectory
+    in the search grid that starts in the core stays inside the shard.
+
+    Parameters
+    ----------
+    config : `SearchConfiguration`
+        The search configuration (provides the velocity range ``v_arr``).
+    times : `list`
+        The observation times.
+
+    Returns
+    -------
+    margin : `int`
+        The margin in pixels (the maximum speed times the time span).
+    """
+    if len(times) == 0:
+        return 0
+    max_speed = max(abs(config["v_arr"][0]), abs(config["v_arr"][1]))
+    time_span = max(times) - min(times)
+    return int(math.ceil(max_speed * time_span))
+
+
+def _search_start_range(config, size, bounds_key, buffer_key):
+    """Return the [start, end) range of starting pixels that the search would use
+    along one axis. Matches the logic in `SearchRunner.do_gpu_search`.
+    """
+    if config[bounds_key] and len(config[bounds_key]) == 2:
+        return int(config[bounds_key][0]), int(config[bounds_key][1])
+    elif config[buffer_key] and config[buffer_key] > 0:
+        return -int(config[buffer_key]), size + int(config[buffer_key])
+    return 0, size
+
+
+def _split_axis(start, end, num_shards, margin, size):
+    """Split the range of starting pixels along one axis into shards.
+
+    Returns
+    -------
+    shards : `list`
+        A list of (core_start, core_end, data_start, data_end) tuples where the core
+        is the range of starting pixels and the data range is the region of the images
+        (including the margin) that the shard needs.
+    """
+    if end - start < num_shards:
+        raise ValueError(f"Cannot split the range [{start}, {end}) into {num_shards} shards.")
+
+    shards = []
+    for i in range(num_shards):
+        core_start = start + (i * (end - start)) // num_shards
+        core_end = start + ((i + 1) * (end - start)) // num_shards
+        data_start = min(max(core_start - margin, 0), size - 1)
+        data_end = max(min(core_end + margin, size), data_start + 1)
+        shards.append((core_start, core_end, data_start, data_end))
+    return shards
+
+
+def split_work_unit(work, num_x, num_y, margin=None):
+    """Split a WorkUnit into a grid of overlapping spatial shards.
+
+    The starting pixels of the search are divided into ``num_x`` by ``num_y`` core regions.
+    Each shard holds the images cropped to its core region plus the margin (with
+    correspondingly cropped WCS), and its configuration's ``x_pixel_bounds`` and
+    ``y_pixel_bounds`` limit the search to the starting pixels in the core.
+
+    Parameters
+    ----------
+    work : `WorkUnit`
+        The WorkUnit to split.
+    num_x : `int`
+        The number of shards along the x axis.
+    num_y : `int`
+        The number of shards along the y axis.
+    margin : `int`, optional
+        The number of pixels to include around each core region. If None, uses
+        the maximum velocity times the time span from `compute_shard_margin`.
+
+    Returns
+    -------
+    shards : `list` of `WorkUnit`
+        The shards in row-major order. Each shard's ``origin`` gives its offset within
+        the full field, which `merge_shard_results` uses to combine the results.
+
+    Raises
+    ------
+    Raises a ``ValueError`` if the number of shards or margin is invalid.
+    """
+    if num_x < 1 or num_y < 1:
+        raise ValueError(f"Invalid number of shards {num_x} x {num_y}")
+    if margin is None:
+        margin = compute_shard_margin(work.config, work.get_all_obstimes())
+    if margin < 0:
+        raise ValueError(f"Invalid margin {margin}")
+
+    width = work.im_stack.get_width()
+    height = work.im_stack.get_height()
+    x_start, x_end = _search_start_range(work.config, width, "x_pixel_bounds", "x_pixel_buffer")
+    y_start, y_end = _search_start_range(work.config, height, "y_pixel_bounds", "y_pixel_buffer")
+    x_shards = _split_axis(x_start, x_end, num_x, margin, width)
+    y_shards = _split_axis(y_start, y_end, num_y, margin, height)
+
+    # Fix the search angle from the full field so all shards search the same velocity grid.
+    average_angle = work.config["average_angle"]
+    if average_angle is None and work.get_wcs(0) is not None:
+        average_angle = calc_ecliptic_angle(work.get_wcs(0), (width / 2, height / 2))
+
+    shards = []
+    for y_core_start, y_core_end, y_data_start, y_data_end in y_shards:
+        for x_core_start, x_core_end, x_data_start, x_data_end in x_shards:
+            shard = work.crop(x_data_start, x_data_end, y_data_start, y_data_end)
+            shard.config.set("x_pixel_bounds", [x_core_start - x_data_start, x_core_end - x_data_start])
+            shard.config.set("y_pixel_bounds", [y_core_start - y_data_start, y_core_end - y_data_start])
+            shard.config.set("x_pixel_buffer", None)
+            shard.config.set("y_pixel_buffer", None)
+            if average_angle is not None:
+                shard.config.set("average_angle", average_angle)
+            shards.append(shard)
+
+    logger.info(f"Split WorkUnit into {len(shards)} shards with a margin of {margin} pixels.")
+    return shards
+
+
+def _filter_duplicate_rows(result_list, pos_radius, vel_radius):
+    """Remove the results that are within ``pos_radius`` (starting pixel) and
+    ``vel_radius`` (velocity) of a result with a higher likelihood using
+    `TrajectoryList.filter_duplicates`. Modifies the ResultList in place.
+    """
+    if result_list.num_results() == 0:
+        return
+    trj_list = TrajectoryList([row.trajectory for row in result_list.results])
+    trj_list.filter_duplicates(pos_radius, vel_radius)
+
+    # Map the kept trajectories back to their rows (the rows' keys are unique).
+    row_inds = {
+        (row.trajectory.x, row.trajectory.y, row.trajectory.vx, row.trajectory.vy): i
+        for i, row in enumerate(result_list.results)
+    }
+    keep = [row_inds[(trj.x, trj.y, trj.vx, trj.vy)] for trj in trj_list.get_list()]
+    result_list.filter_results(keep, "dedup")
+
+
+def merge_shard_results(result_lists, origins, config=None, width=None, height=None):
+    """Merge the results of searching each shard into a single list in the
+    full field's pixel coordinates.
+
+    Trajectories found by more than one shard (for example if the shards' starting
+    regions overlap) are deduplicated by keeping the one with the highest likelihood.
+
+    The shards' cores are disjoint, so near duplicate results from neighboring shards
+    (for example those on either side of a shard boundary) are only removed when the
+    search configuration is given. In that case the combined results are post-processed
+    over the full field the way `SearchRunner.run_search` processes a single search:
+    duplicates within ``dedup_radius`` are removed and, if ``do_clustering`` is set, the
+    results are clustered.
+
+    Parameters
+    ----------
+    result_lists : `list` of `ResultList`
+        The results of each shard's search.
+    origins : `list` of `tuple`
+        The (x, y) origin of each shard (the shard WorkUnit's ``origin``).
+    config : `SearchConfiguration`, optional
+        The configuration used to search the shards (for example ``shards[0].config``).
+        If None, only exact duplicates are removed.
+    width : `int`, optional
+        The width of the full field in pixels. Required for clustering.
+    height : `int`, optional
+        The height of the full field in pixels. Required for clustering.
+
+    Returns
+    -------
+    merged : `ResultList`
+        The combined results sorted by decreasing likelihood.
+
+    Raises
+    ------
+    Raises a ``ValueError`` if the number of origins does not match the number of result lists
+    or if clustering is requested without the size of the full field.
+    """
+    if len(result_lists) != len(origins):
+        raise ValueError(f"Expected {len(result_lists)} origins. Found {len(origins)}.")
+    if config is not None and config["do_clustering"] and (width is None or height is None):
+        raise ValueError("The width and height of the full field are required for clustering.")
+
+    all_times = result_lists[0].all_times if len(result_lists) > 0 else []
+    best = {}
+    for results, (x_origin, y_origin) in zip(result_lists, origins):
+        for row in results.results:
+            trj = row.trajectory
+            shifted = make_trajectory(
+                x=trj.x + x_origin,
+                y=trj.y + y_origin,
+                vx=trj.vx,
+                vy=trj.vy,
+                flux=trj.flux,
+                lh=trj.lh,
+                obs_count=trj.obs_count,
+            )
+            new_row = copy.copy(row)
+            new_row.trajectory = shifted
+
+            key = (shifted.x, shifted.y, round(shifted.vx, 4), round(shifted.vy, 4))
+            if key not in best or new_row.final_likelihood > best[key].final_likelihood:
+                best[key] = new_row
+
+    merged = ResultList(all_times)
+    for row in best.values():
+        merged.append_result(row)
+    merged.sort()
+
+    if config is not None and config["dedup_radius"] is not None:
+        _filter_duplicate_rows(merged, float(config["dedup_radius"][0]), float(config["dedup_radius"][1]))
+
+    if config is not None and config["do_clustering"]:
+        average_angle = config["average_angle"]
+        if average_angle is None:
+            logger.warning("Average angle not set. Clustering with average_angle=0.0")
+            average_angle = 0.0
+        cluster_params = {
+            "ang_lims": [average_angle - config["ang_arr"][0], average_angle + config["ang_arr"][1]],
+            "cluster_type": config["cluster_type"],
+            "eps": config["eps"],
+            "mjd": np.array(all_times),
+            "vel_lims": config["v_arr"],
+            "width": width,
+            "height": height,
+        }
+        apply_clustering(merged, cluster_params)
+
+    num_input = sum(len(results) for results in result_lists)
+    logger.info(f"Merged {num_input} shard results into {len(merged)} unique results.")
+    return merged
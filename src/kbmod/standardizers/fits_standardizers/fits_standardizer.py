@@ -9,6 +9,7 @@ simplify further processing, so there is not much to gain by using it directly.
 
 from os.path import isfile
 from pathlib import Path
+import re
 
 from astropy.utils import isiterable
 import astropy.io.fits as fits
@@ -22,6 +23,8 @@ from kbmod.search import LayeredImage, RawImage, PSF
 __all__ = [
     "FitsStandardizer",
     "FitsStandardizerConfig",
+    "HeaderOnlyHDU",
+    "HeaderOnlyHDUList",
 ]
 
 
@@ -33,6 +36,356 @@ class FitsStandardizerConfig(StandardizerConfig):
     processable items, an index-matched STD per processable item.
     """
 
+    header_only = False
+    """When ``True`` only the headers of the FITS file are read and the file
+    is closed immediately. Pixel data of an extension is read from the file
+    only if it is accessed. Useful when only the metadata is needed, f.e. when
+    indexing many files into an `ImageCollection`."""
+
+
+# Size of the FITS header and data blocks and of a single header card.
+_FITS_BLOCK_SIZE = 2880
+_FITS_CARD_SIZE = 80
+
+# Keywords describing the binary table of a tile-compressed image that are
+# not a part of the image's header.
+_COMPRESSION_KEYS = {
+    "XTENSION",
+    "BITPIX",
+    "NAXIS",
+    "PCOUNT",
+    "GCOUNT",
+    "TFIELDS",
+    "THEAP",
+    "ZIMAGE",
+    "ZBITPIX",
+    "ZNAXIS",
+    "ZCMPTYPE",
+    "ZMASKCMP",
+    "ZQUANTIZ",
+    "ZDITHER0",
+    "ZSIMPLE",
+    "ZTENSION",
+    "ZEXTEND",
+    "ZBLOCKED",
+    "ZPCOUNT",
+    "ZGCOUNT",
+    "ZHECKSUM",
+    "ZDATASUM",
+    "CHECKSUM",
+    "DATASUM",
+}
+_COMPRESSION_INDEXED_KEYS = re.compile(
+    r"^(NAXIS|TTYPE|TFORM|TUNIT|TSCAL|TZERO|TNULL|TDIM|TDISP|ZNAXIS|ZTILE|ZNAME|ZVAL)\d+$"
+)
+
+
+def _parseRawCards(raw):
+    """Parse the keyword and values of the cards in a raw header string,
+    skipping the cards that have no value (f.e. ``COMMENT``, ``HISTORY``).
+
+    Only simple (non-continued) values are supported, which is sufficient
+    for the structural keywords.
+    """
+    cards = {}
+    for i in range(0, len(raw), _FITS_CARD_SIZE):
+        card = raw[i : i + _FITS_CARD_SIZE]
+        if card[8:10] != "= ":
+            continue
+        key = card[:8].strip()
+        value = card[10:].strip()
+        if value.startswith("'"):
+            end = value.find("'", 1)
+            while end != -1 and value[end + 1 : end + 2] == "'":
+                end = value.find("'", end + 2)
+            value = value[1:end].replace("''", "'").rstrip()
+        else:
+            value = value.split("/", 1)[0].strip()
+            if value == "T":
+                value = True
+            elif value == "F":
+                value = False
+            else:
+                try:
+                    value = int(value)
+                except ValueError:
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        pass
+        cards[key] = value
+    return cards
+
+
+def _imageHeaderFromCompressed(header):
+    """Returns the header of the image stored in a tile-compressed image
+    binary table with the given header."""
+    image_header = fits.Header()
+    image_header["XTENSION"] = "IMAGE"
+    image_header["BITPIX"] = header["ZBITPIX"]
+    image_header["NAXIS"] = header["ZNAXIS"]
+    for i in range(1, header["ZNAXIS"] + 1):
+        image_header[f"NAXIS{i}"] = header[f"ZNAXIS{i}"]
+    image_header["PCOUNT"] = 0
+    image_header["GCOUNT"] = 1
+
+    for card in header.cards:
+        if card.keyword in _COMPRESSION_KEYS or _COMPRESSION_INDEXED_KEYS.match(card.keyword):
+            continue
+        image_header.append(card)
+    return image_header
+
+
+class HeaderOnlyHDU:
+    """A stand-in for an HDU that holds only its header.
+
+    The header is parsed the first time it's accessed, and the data is read
+    from the file, and kept, the first time it is accessed.
+
+    Parameters
+    ----------
+    index : `int`
+        The index of the HDU in the file.
+    location : `str` or `None`
+        Path to the file.
+    name : `str`
+        Extension name.
+    ver : `int`
+        Extension version.
+    isImage : `bool`
+        Whether the HDU is an image (primary, image or compressed image) HDU.
+    shape : `tuple`
+        Shape of the data, an empty tuple when the HDU has no data.
+    header : `~astropy.io.fits.Header` or `None`
+        The parsed header. Required if ``rawHeader`` is not given.
+    rawHeader : `str` or `None`
+        The unparsed header.
+    hdu : `astropy.io.fits.hdu.base._BaseHDU` or `None`
+        The HDU, used to access the data when ``location`` is `None`.
+    """
+
+    def __init__(self, index, location, name, ver, isImage, shape, header=None, rawHeader=None, hdu=None):
+        self.index = index
+        self.location = location
+        self.name = name
+        self.ver = ver
+        self.isImage = isImage
+        self.shape = shape
+        self._header = header
+        self._rawHeader = rawHeader
+        self._hdu = hdu
+        self._data = None
+
+    @classmethod
+    def fromHDU(cls, hdu, index, location=None):
+        """Create a header-only HDU from an existing HDU.
+
+        Parameters
+        ----------
+        hdu : `astropy.io.fits.hdu.base._BaseHDU`
+            The HDU whose header to keep.
+        index : `int`
+            The index of the HDU in the file.
+        location : `str` or `None`
+            Path to the file. When `None`, the original HDU is kept and used to
+            access the data.
+        """
+        isImage = isinstance(hdu, (fits.CompImageHDU, fits.PrimaryHDU, fits.ImageHDU))
+        header = hdu.header
+        naxis = header.get("NAXIS", 0)
+        shape = tuple(header.get(f"NAXIS{i}", 0) for i in range(naxis, 0, -1)) if isImage else ()
+        return cls(
+            index,
+            location,
+            hdu.name,
+            hdu.ver,
+            isImage,
+            shape,
+            header=header,
+            hdu=hdu if location is None else None,
+        )
+
+    @classmethod
+    def fromRawHeader(cls, rawHeader, index, location):
+        """Create a header-only HDU from an unparsed header.
+
+        Parameters
+        ----------
+        rawHeader : `str`
+            The header, as read from the file.
+        index : `int`
+            The index of the HDU in the file.
+        location : `str`
+            Path to the file.
+
+        Returns
+        -------
+        hdu : `HeaderOnlyHDU`
+            The header-only HDU.
+        dataSize : `int`
+            Size of the data in the file, in bytes, including padding.
+        """
+        cards = _parseRawCards(rawHeader)
+
+        naxis = cards.get("NAXIS", 0)
+        axes = [cards.get(f"NAXIS{i}", 0) for i in range(1, naxis + 1)]
+        dataSize = 0
+        if naxis > 0:
+            dataSize = abs(cards.get("BITPIX", 8)) // 8 * cards.get("GCOUNT", 1)
+            dataSize *= cards.get("PCOUNT", 0) + int(np.prod(axes))
+            dataSize = -(-dataSize // _FITS_BLOCK_SIZE) * _FITS_BLOCK_SIZE
+
+        isCompressed = cards.get("XTENSION", None) == "BINTABLE" and cards.get("ZIMAGE", False)
+        isImage = index == 0 or cards.get("XTENSION", None) == "IMAGE" or isCompressed
+        if isCompressed:
+            axes = [cards.get(f"ZNAXIS{i}", 0) for i in range(1, cards.get("ZNAXIS", 0) + 1)]
+            default_name = "COMPRESSED_IMAGE"
+        else:
+            default_name = "PRIMARY" if index == 0 else ""
+
+        shape = tuple(reversed(axes)) if isImage else ()
+        name = str(cards.get("EXTNAME", default_name)).upper()
+        ver = cards.get("EXTVER", 1)
+        return cls(index, location, name, ver, isImage, shape, rawHeader=rawHeader), dataSize
+
+    @property
+    def header(self):
+        if self._header is None:
+            header = fits.Header.fromstring(self._rawHeader)
+            if header.get("XTENSION", None) == "BINTABLE" and header.get("ZIMAGE", False):
+                header = _imageHeaderFromCompressed(header)
+            self._header = header
+            self._rawHeader = None
+        return self._header
+
+    @property
+    def data(self):
+        if self._data is None:
+            if self._hdu is not None:
+                self._data = self._hdu.data
+            else:
+                self._data = fits.getdata(self.location, ext=self.index)
+        return self._data
+
+
+class HeaderOnlyHDUList:
+    """A read-only stand-in for an `~astropy.io.fits.HDUList` containing
+    `HeaderOnlyHDU` entries.
+
+    Supports indexing by position or by extension name, like a `HDUList`.
+
+    Parameters
+    ----------
+    hdus : `list`
+        The `HeaderOnlyHDU` objects.
+    location : `str` or `None`
+        Path to the file the headers were read from.
+    """
+
+    def __init__(self, hdus, location=None):
+        self._hdus = hdus
+        self._location = location
+
+    @classmethod
+    def fromFile(cls, location):
+        """Read the headers of a FITS file, skipping over the data. The
+        headers are not parsed until they are accessed and the file is closed
+        before returning.
+
+        Parameters
+        ----------
+        location : `str`
+            Path to the FITS file.
+
+        Returns
+        -------
+        headers : `HeaderOnlyHDUList`
+            The header-only HDU list.
+
+        Raises
+        ------
+        OSError
+            When the file is not a valid FITS file.
+        """
+        hdus = []
+        with open(location, "rb") as f:
+            while True:
+                blocks = []
+                while True:
+                    block = f.read(_FITS_BLOCK_SIZE)
+                    if len(block) < _FITS_BLOCK_SIZE:
+                        if blocks or not hdus:
+                            raise OSError(f"{location} is not a valid FITS file, truncated header.")
+                        block = None
+                        break
+                    blocks.append(block.decode("ascii"))
+                    # The END card is always at the start of a card.
+                    if any(
+                        block[i : i + 8] == b"END     " for i in range(0, _FITS_BLOCK_SIZE, _FITS_CARD_SIZE)
+                    ):
+                        break
+                if block is None:
+                    break
+
+                rawHeader = "".join(blocks)
+                if not hdus and not rawHeader.startswith("SIMPLE"):
+                    raise OSError(f"{location} is not a valid FITS file.")
+                hdu, dataSize = HeaderOnlyHDU.fromRawHeader(rawHeader, len(hdus), location)
+                hdus.append(hdu)
+                f.seek(dataSize, 1)
+        return cls(hdus, location)
+
+    @classmethod
+    def fromHDUList(cls, hdulist):
+        """Take the headers of a `HDUList`. When the HDUList is backed by a
+        file, the HDUList is closed and the data will be read from the file
+        on demand.
+
+        Parameters
+        ----------
+        hdulist : `~astropy.io.fits.HDUList`
+            The HDUList to take the headers from.
+
+        Returns
+        -------
+        headers : `HeaderOnlyHDUList`
+            The header-only HDU list.
+        """
+        location = hdulist.filename()
+        hdus = [HeaderOnlyHDU.fromHDU(hdu, i, location) for i, hdu in enumerate(hdulist)]
+        if location is not None:
+            hdulist.close()
+        return cls(hdus, location)
+
+    def __len__(self):
+        return len(self._hdus)
+
+    def __iter__(self):
+        return iter(self._hdus)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer, slice)):
+            return self._hdus[key]
+        if isinstance(key, tuple):
+            name, ver = key
+        else:
+            name, ver = key, None
+
+        # Like HDUList, "PRIMARY" always refers to the first HDU.
+        if name.upper() == "PRIMARY" and ver is None:
+            return self._hdus[0]
+        for hdu in self._hdus:
+            if hdu.name.upper() == name.upper() and (ver is None or hdu.ver == ver):
+                return hdu
+        raise KeyError(f"Extension {key!r} not found.")
+
+    def filename(self):
+        return self._location
+
+    def close(self, *args, **kwargs):
+        """No-op, the file is already closed."""
+        pass
+
 
 class FitsStandardizer(Standardizer):
     """Supports processing of a single FITS file.
@@ -181,12 +534,17 @@ class FitsStandardizer(Standardizer):
         # :memory: otherwise
         # - if hdulist and location exist - nothing to do.
         # The object will attempt to close the hdulist when it gets GC'd
+        header_only = self.configClass(config)["header_only"]
         if location is not None and hdulist is None:
-            hdulist = fits.open(location)
+            hdulist = HeaderOnlyHDUList.fromFile(location) if header_only else fits.open(location)
         elif location is None and hdulist is not None:
             location = ":memory:" if hdulist.filename() is None else hdulist.filename()
 
         super().__init__(location, config=config, **kwargs)
+
+        # In header-only mode, keep only the headers and release the file.
+        if header_only and not isinstance(hdulist, HeaderOnlyHDUList):
+            hdulist = HeaderOnlyHDUList.fromHDUList(hdulist)
         self.hdulist = hdulist
         self.primary = self.hdulist["PRIMARY"].header
         self.isMultiExt = len(self.hdulist) > 1
@@ -266,6 +624,17 @@ class FitsStandardizer(Standardizer):
         standardizedBBox = {}
         centerX, centerY = int(dimX / 2), int(dimY / 2)
 
+        # In header-only mode, skip constructing SkyCoord objects and evaluate
+        # both points in a single call.
+        if self.config["header_only"] and wcs.has_celestial:
+            world = wcs.all_pix2world([[centerX, centerY], [0, 0]], 0)
+            lng, lat = wcs.wcs.lng, wcs.wcs.lat
+            standardizedBBox["center_ra"] = world[0, lng]
+            standardizedBBox["center_dec"] = world[0, lat]
+            standardizedBBox["corner_ra"] = world[1, lng]
+            standardizedBBox["corner_dec"] = world[1, lat]
+            return standardizedBBox
+
         centerSkyCoord = wcs.pixel_to_world(centerX, centerY)
         cornerSkyCoord = wcs.pixel_to_world(0, 0)
 
@@ -2,7 +2,7 @@
 
 from astropy.io.fits import CompImageHDU, PrimaryHDU, ImageHDU
 
-from .fits_standardizer import FitsStandardizer, FitsStandardizerConfig
+from .fits_standardizer import FitsStandardizer, FitsStandardizerConfig, HeaderOnlyHDU
 
 
 __all__ = [
@@ -74,7 +74,10 @@ class MultiExtensionFits(FitsStandardizer):
             True if HDU is image-like, False otherwise.
         """
         # This is already a pretty good basic test
-        if not any((isinstance(hdu, CompImageHDU), isinstance(hdu, PrimaryHDU), isinstance(hdu, ImageHDU))):
+        if isinstance(hdu, HeaderOnlyHDU):
+            if not hdu.isImage:
+                return False
+        elif not any((isinstance(hdu, CompImageHDU), isinstance(hdu, PrimaryHDU), isinstance(hdu, ImageHDU))):
             return False
 
         # The problem is that all kinds of things are stored as ImageHDUs, say
@@ -87,6 +90,10 @@ class MultiExtensionFits(FitsStandardizer):
         if hdu.shape[0] > 6000 or hdu.shape[1] > 6000:
             return False
 
+        # Header-only HDUs have a non-empty shape only if they contain data.
+        if isinstance(hdu, HeaderOnlyHDU):
+            return hdu.shape[0] > 0 and hdu.shape[1] > 0
+
         if hdu.data is None:
             return False
 
@@ -1,4 +1,9 @@
+import copy
 import math
+import os
+import struct
+import threading
+import zlib
 
 from astropy.io import fits
 from astropy.table import Table
@@ -11,6 +16,7 @@ from yaml import dump, safe_load
 
 from kbmod.configuration import SearchConfiguration
 from kbmod.search import ImageStack, LayeredImage, PSF, RawImage, Logging
+from kbmod.worker_pool import WorkerPool
 from kbmod.wcs_utils import (
     append_wcs_to_hdu_header,
     extract_wcs_from_hdu_header,
@@ -40,11 +46,15 @@ class WorkUnit:
     per_image_wcs : `list`
         A list with one WCS for each image in the WorkUnit. Used for when
         the images have *not* been standardized to the same pixel space.
+    origin : `tuple`
+        The (x, y) pixel coordinates of this WorkUnit's first pixel in the full field.
+        Non-zero for WorkUnits cropped from a larger one, such as spatial shards.
     """
 
-    def __init__(self, im_stack=None, config=None, wcs=None, per_image_wcs=None):
-        self.im_stack = im_stack
+    def __init__(self, im_stack=None, config=None, wcs=None, per_image_wcs=None, origin=(0, 0)):
+        self._im_stack = im_stack
         self.config = config
+        self.origin = (int(origin[0]), int(origin[1]))
 
         # Handle WCS input. If both the global and per-image WCS are provided,
         # ensure they are consistent.
@@ -72,9 +82,40 @@ class WorkUnit:
                 self.wcs = self._per_image_wcs[0]
                 self._per_image_wcs = [None] * im_stack.img_count()
 
+    @property
+    def im_stack(self):
+        """The `ImageStack` of image data. For a lazily loaded WorkUnit the image
+        layers are read from disk on the first access."""
+        if isinstance(self._im_stack, _LazyImageStack):
+            self._im_stack = self._im_stack.load()
+        return self._im_stack
+
+    @im_stack.setter
+    def im_stack(self, value):
+        self._im_stack = value
+
+    @property
+    def is_loaded(self):
+        """Whether the image data has been loaded into memory."""
+        return not isinstance(self._im_stack, _LazyImageStack)
+
+    def close(self):
+        """Release the file of a lazily loaded WorkUnit without reading the image
+        data. Does nothing if the images have already been loaded. The image data of
+        an unloaded WorkUnit can not be accessed after it is closed.
+        """
+        if not self.is_loaded:
+            self._im_stack.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def __len__(self):
         """Returns the size of the WorkUnit in number of images."""
-        return self.im_stack.img_count()
+        return self._im_stack.img_count()
 
     def has_common_wcs(self):
         """Returns whether the WorkUnit has a common WCS for all images."""
@@ -117,7 +158,7 @@ class WorkUnit:
         ------
         IndexError if an invalid index is given.
         """
-        if img_num < 0 or img_num >= self.im_stack.img_count():
+        if img_num < 0 or img_num >= len(self):
             raise IndexError(f"Invalid image number {img_num}")
 
         # Extract the per-image WCS if one exists.
@@ -135,10 +176,66 @@ class WorkUnit:
 
     def get_all_obstimes(self):
         """Return a list of the observation times."""
-        return [self.im_stack.get_obstime(i) for i in range(self.im_stack.img_count())]
+        return [self._im_stack.get_obstime(i) for i in range(len(self))]
+
+    def crop(self, x_min, x_max, y_min, y_max):
+        """Create a new WorkUnit containing a rectangular region of this one's images.
+
+        The WCS (global and per-image) are shifted to the cropped pixel grid and the
+        new WorkUnit's origin records the region's position in the full field.
+
+        Parameters
+        ----------
+        x_min : `int`
+            The first column of the region (inclusive).
+        x_max : `int`
+            The last column of the region (exclusive).
+        y_min : `int`
+            The first row of the region (inclusive).
+        y_max : `int`
+            The last row of the region (exclusive).
+
+        Returns
+        -------
+        result : `WorkUnit`
+            The cropped WorkUnit with a copy of the configuration.
+
+        Raises
+        ------
+        Raises a ``ValueError`` if the region is empty or outside the images.
+        """
+        width = self._im_stack.get_width()
+        height = self._im_stack.get_height()
+        if x_min < 0 or y_min < 0 or x_max > width or y_max > height or x_min >= x_max or y_min >= y_max:
+            raise ValueError(
+                f"Invalid crop region x=[{x_min}, {x_max}), y=[{y_min}, {y_max}) "
+                f"for images of size {width} x {height}."
+            )
+
+        imgs = []
+        for i in range(self.im_stack.img_count()):
+            layered = self.im_stack.get_single_image(i)
+            obstime = layered.get_obstime()
+            layers = []
+            for layer in [layered.get_science(), layered.get_variance(), layered.get_mask()]:
+                data = np.ascontiguousarray(layer.image[y_min:y_max, x_min:x_max])
+                layers.append(RawImage(data, obstime))
+            imgs.append(LayeredImage(layers[0], layers[1], layers[2], PSF(layered.get_psf())))
+
+        def _crop_wcs(wcs):
+            return None if wcs is None else wcs[y_min:y_max, x_min:x_max]
+
+        config = SearchConfiguration.from_dict(copy.deepcopy(self.config._params))
+        return WorkUnit(
+            im_stack=ImageStack(imgs),
+            config=config,
+            wcs=_crop_wcs(self.wcs),
+            per_image_wcs=[_crop_wcs(wcs) for wcs in self._per_image_wcs],
+            origin=(self.origin[0] + x_min, self.origin[1] + y_min),
+        )
 
     @classmethod
-    def from_fits(cls, filename):
+    def from_fits(cls, filename, lazy=False, num_workers=1):
         """Create a WorkUnit from a single FITS file.
 
         The FITS file will have at least the following extensions:
@@ -154,6 +251,12 @@ class WorkUnit:
         ----------
         filename : `str`
             The file to load.
+        lazy : `bool`
+            If True, only the headers are read. The file is memory mapped and the
+            image layers are converted to native float32 the first time the WorkUnit's
+            ``im_stack`` is accessed.
+        num_workers : `int`
+            The number of threads to use when reading the image layers.
 
         Returns
         -------
@@ -163,8 +266,8 @@ class WorkUnit:
         if not Path(filename).is_file():
             raise ValueError(f"WorkUnit file {filename} not found.")
 
-        imgs = []
-        with fits.open(filename) as hdul:
+        hdul = fits.open(filename, memmap=True)
+        try:
             num_layers = len(hdul)
             if num_layers < 5:
                 raise ValueError(f"WorkUnit file has too few extensions {len(hdul)}.")
@@ -183,31 +286,87 @@ class WorkUnit:
 
             # Read the size and order information from the primary header.
             num_images = hdul[0].header["NUMIMG"]
+            origin = (hdul[0].header.get("XORIGIN", 0), hdul[0].header.get("YORIGIN", 0))
             if len(hdul) != 4 * num_images + 3:
                 raise ValueError(
                     f"WorkUnit wrong number of extensions. Expected "
                     f"{4 * num_images + 3}. Found {len(hdul)}."
                 )
 
-            # Read in all the image files.
+            # Extract the per-image WCS if one exists.
             per_image_wcs = []
             for i in range(num_images):
-                # Extract the per-image WCS if one exists.
                 per_image_wcs.append(extract_wcs_from_hdu_header(hdul[f"SCI_{i}"].header))
 
-                # Read in science, variance, and mask layers.
-                sci = hdu_to_raw_image(hdul[f"SCI_{i}"])
-                var = hdu_to_raw_image(hdul[f"VAR_{i}"])
-                msk = hdu_to_raw_image(hdul[f"MSK_{i}"])
+            im_stack = _LazyFitsImageStack(hdul, num_images, num_workers)
+            if not lazy:
+                im_stack = im_stack.load()
+        except Exception:
+            hdul.close()
+            raise
+
+        result = WorkUnit(
+            im_stack=im_stack, config=config, wcs=global_wcs, per_image_wcs=per_image_wcs, origin=origin
+        )
+        return result
 
-                # Read the PSF layer.
-                p = PSF(hdul[f"PSF_{i}"].data)
+    @classmethod
+    def from_binary(cls, filename, lazy=False, num_workers=1):
+        """Create a WorkUnit from a binary file written by `to_binary`.
 
-                imgs.append(LayeredImage(sci, var, msk, p))
+        The file is memory mapped, so uncompressed layers are read directly from
+        the page cache without an intermediate copy.
 
-        im_stack = ImageStack(imgs)
-        result = WorkUnit(im_stack=im_stack, config=config, wcs=global_wcs, per_image_wcs=per_image_wcs)
-        return result
+        Parameters
+        ----------
+        filename : `str`
+            The file to load.
+        lazy : `bool`
+            If True, only the header is read and the image layers are decoded
+            the first time the WorkUnit's ``im_stack`` is accessed.
+        num_workers : `int`
+            The number of threads to use when decoding the image layers.
+
+        Returns
+        -------
+        result : `WorkUnit`
+            The loaded WorkUnit.
+
+        Raises
+        ------
+        Raises a ``ValueError`` if the file does not exist or is not a valid binary WorkUnit.
+        """
+        if not Path(filename).is_file():
+            raise ValueError(f"WorkUnit file {filename} not found.")
+
+        file_data = np.memmap(filename, dtype=np.uint8, mode="r")
+        if len(file_data) < _BINARY_PREAMBLE.size:
+            raise ValueError(f"WorkUnit file {filename} is too small.")
+        magic, version, _, footer_offset, footer_size = _BINARY_PREAMBLE.unpack(
+            file_data[: _BINARY_PREAMBLE.size].tobytes()
+        )
+        if magic != _BINARY_MAGIC:
+            raise ValueError(f"{filename} is not a binary WorkUnit file.")
+        if version != _BINARY_VERSION:
+            raise ValueError(f"Unsupported binary WorkUnit version {version}.")
+        if footer_offset + footer_size > len(file_data):
+            raise ValueError(f"WorkUnit file {filename} is truncated.")
+        header = safe_load(file_data[footer_offset : footer_offset + footer_size].tobytes().decode("utf-8"))
+
+        config = SearchConfiguration.from_dict(header["config"])
+        global_wcs = wcs_from_dict(header["wcs"])
+        per_image_wcs = [wcs_from_dict(img["wcs"]) for img in header["images"]]
+
+        im_stack = _LazyBinaryImageStack(file_data, header, num_workers)
+        if not lazy:
+            im_stack = im_stack.load()
+        return WorkUnit(
+            im_stack=im_stack,
+            config=config,
+            wcs=global_wcs,
+            per_image_wcs=per_image_wcs,
+            origin=header.get("origin", (0, 0)),
+        )
 
     @classmethod
     def from_dict(cls, workunit_dict):
@@ -293,7 +452,13 @@ class WorkUnit:
             per_image_wcs.append(current_wcs)
 
         im_stack = ImageStack(imgs)
-        return WorkUnit(im_stack=im_stack, config=config, wcs=global_wcs, per_image_wcs=per_image_wcs)
+        return WorkUnit(
+            im_stack=im_stack,
+            config=config,
+            wcs=global_wcs,
+            per_image_wcs=per_image_wcs,
+            origin=workunit_dict.get("origin", (0, 0)),
+        )
 
     @classmethod
     def from_yaml(cls, work_unit, strict=False):
@@ -357,6 +522,8 @@ class WorkUnit:
         hdul = fits.HDUList()
         pri = fits.PrimaryHDU()
         pri.header["NUMIMG"] = self.im_stack.img_count()
+        pri.header["XORIGIN"] = self.origin[0]
+        pri.header["YORIGIN"] = self.origin[1]
 
         # If the global WCS exists, append the corresponding keys.
         if self.wcs is not None:
@@ -396,6 +563,80 @@ class WorkUnit:
 
         hdul.writeto(filename)
 
+    def to_binary(self, filename, overwrite=False, compression=None, num_workers=1):
+        """Write the WorkUnit to a single binary file.
+
+        The file contains a small fixed size preamble, one chunk per image layer, and a
+        YAML footer with the configuration, WCS, observation times, PSFs, and the location
+        and encoding of each chunk. Science and variance layers are stored as contiguous
+        little-endian float32 values. Masks that only contain 0 and 1 are packed to one bit
+        per pixel, other masks are stored as float32 so that all flags are preserved.
+
+        Parameters
+        ----------
+        filename : `str`
+            The file to which to write the data.
+        overwrite : bool
+            Indicates whether to overwrite an existing file.
+        compression : `str`, optional
+            The compression to apply to each chunk: None or "zlib".
+        num_workers : `int`
+            The number of threads to use when encoding and writing the layers.
+
+        Raises
+        ------
+        Raises a ``ValueError`` if the compression is not supported.
+        """
+        if compression not in _BINARY_COMPRESSION:
+            raise ValueError(f"Unsupported compression {compression}. Expected one of {_BINARY_COMPRESSION}")
+        if Path(filename).is_file() and not overwrite:
+            logger.error(f"Warning: WorkUnit file {filename} already exists.")
+            return
+
+        num_images = self.im_stack.img_count()
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            writer = _BinaryChunkWriter(fd)
+
+            def _write_image(index):
+                layered = self.im_stack.get_single_image(index)
+                p = layered.get_psf()
+                img_info = {
+                    "time": float(layered.get_obstime()),
+                    "psf": np.array(p.get_kernel()).reshape((p.get_dim(), p.get_dim())).tolist(),
+                    "wcs": wcs_to_dict(self._per_image_wcs[index]),
+                }
+                for name, layer, allow_bits in [
+                    ("science", layered.get_science(), False),
+                    ("variance", layered.get_variance(), False),
+                    ("mask", layered.get_mask(), True),
+                ]:
+                    buffer, info = _encode_layer(layer.image, allow_bits, compression)
+                    info["offset"] = writer.write(buffer)
+                    info["size"] = len(memoryview(buffer).cast("B"))
+                    img_info[name] = info
+                return img_info
+
+            with WorkerPool(num_workers, "thread") as pool:
+                images = pool.map(_write_image, range(num_images))
+
+            header = {
+                "num_images": num_images,
+                "width": self.im_stack.get_width(),
+                "height": self.im_stack.get_height(),
+                "config": self.config._params,
+                "wcs": wcs_to_dict(self.wcs),
+                "origin": list(self.origin),
+                "images": images,
+            }
+            footer = dump(header).encode("utf-8")
+            footer_offset = writer.end
+            _pwrite_all(fd, footer, footer_offset)
+            preamble = _BINARY_PREAMBLE.pack(_BINARY_MAGIC, _BINARY_VERSION, 0, footer_offset, len(footer))
+            _pwrite_all(fd, preamble, 0)
+        finally:
+            os.close(fd)
+
     def to_yaml(self):
         """Serialize the WorkUnit as a YAML string.
 
@@ -410,6 +651,7 @@ class WorkUnit:
             "height": self.im_stack.get_height(),
             "config": self.config._params,
             "wcs": wcs_to_dict(self.wcs),
+            "origin": list(self.origin),
             # Per image data
             "times": [],
             "sci_imgs": [],
@@ -488,3 +730,265 @@ def hdu_to_raw_image(hdu):
         if "MJD" in hdu.header:
             img.obstime = hdu.header["MJD"]
     return img
+
+
+class _LazyImageStack:
+    """Handles to the image layers of an open WorkUnit file.
+
+    Provides the subset of the `ImageStack` interface that can be answered from the
+    headers alone (the number of images, their sizes, and observation times) so a
+    WorkUnit can be inspected without reading the pixels. `load` reads the layers,
+    converting them to native-endian float32 in parallel, and closes the file.
+    `close` releases the file without reading the layers (and is also called when
+    the object is garbage collected). Subclasses implement `_load_image` and `_close`
+    for each file format.
+    """
+
+    def __init__(self, obstimes, width, height, num_workers=1):
+        self._obstimes = obstimes
+        self._width = width
+        self._height = height
+        self._num_workers = num_workers
+        self._closed = False
+
+    def __del__(self):
+        # The object may be only partially constructed if the subclass raised.
+        if hasattr(self, "_closed"):
+            self.close()
+
+    def img_count(self):
+        return len(self._obstimes)
+
+    def get_obstime(self, index):
+        return self._obstimes[index]
+
+    def get_width(self):
+        return self._width
+
+    def get_height(self):
+        return self._height
+
+    def _prepare(self):
+        """Any set up that must be done on the main thread before the workers start."""
+        pass
+
+    def _load_image(self, index):
+        """Read the layers of a single image into a `LayeredImage`."""
+        raise NotImplementedError()
+
+    def _close(self):
+        """Release the file."""
+        pass
+
+    def close(self):
+        """Release the file. Safe to call more than once."""
+        if not self._closed:
+            self._closed = True
+            self._close()
+
+    def load(self):
+        """Read all of the image layers and close the file.
+
+        Returns
+        -------
+        im_stack : `ImageStack`
+            The loaded images.
+
+        Raises
+        ------
+        Raises a ``ValueError`` if the file has already been closed.
+        """
+        if self._closed:
+            raise ValueError("Unable to load the images, the WorkUnit file has been closed.")
+
+        try:
+            self._prepare()
+            with WorkerPool(self._num_workers, "thread") as pool:
+                imgs = pool.map(self._load_image, range(self.img_count()))
+            im_stack = ImageStack(imgs)
+        finally:
+            self.close()
+        return im_stack
+
+
+class _LazyFitsImageStack(_LazyImageStack):
+    """The image layers of an open (memory mapped) WorkUnit FITS file."""
+
+    def __init__(self, hdul, num_images, num_workers=1):
+        self._hdul = hdul
+
+        # Look up the extensions once (this parses the headers but does not read any data).
+        self._layers = []
+        for i in range(num_images):
+            self._layers.append((hdul[f"SCI_{i}"], hdul[f"VAR_{i}"], hdul[f"MSK_{i}"], hdul[f"PSF_{i}"]))
+
+        obstimes = [sci.header.get("MJD", -1.0) for sci, _, _, _ in self._layers]
+        if num_images > 0:
+            width = self._layers[0][0].header["NAXIS1"]
+            height = self._layers[0][0].header["NAXIS2"]
+        else:
+            width = 0
+            height = 0
+        super().__init__(obstimes, width, height, num_workers)
+
+    def _prepare(self):
+        # Create the memory mapped arrays on the main thread so the workers
+        # only touch the (thread safe) numpy views.
+        for layers in self._layers:
+            for hdu in layers:
+                hdu.data
+
+    def _load_image(self, index):
+        sci_hdu, var_hdu, msk_hdu, psf_hdu = self._layers[index]
+        obstime = self._obstimes[index]
+
+        # The data of the memory mapped HDUs are views into the file, so converting
+        # them to float32 performs the only read (and byte swap) of the pixels.
+        sci = RawImage(np.asarray(sci_hdu.data, dtype=np.single), obstime)
+        var = RawImage(np.asarray(var_hdu.data, dtype=np.single), obstime)
+        msk = RawImage(np.asarray(msk_hdu.data, dtype=np.single), obstime)
+        return LayeredImage(sci, var, msk, PSF(psf_hdu.data))
+
+    def _close(self):
+        self._layers = []
+        self._hdul.close()
+
+
+# The binary WorkUnit format is a fixed size preamble followed by the data chunks
+# (each starting on an _BINARY_ALIGNMENT byte boundary) and a YAML footer. The preamble
+# holds the magic string, format version, and the offset and size of the footer.
+_BINARY_MAGIC = b"KBMODWU\x00"
+_BINARY_VERSION = 1
+_BINARY_PREAMBLE = struct.Struct("<8sIIQQ")
+_BINARY_ALIGNMENT = 64
+_BINARY_COMPRESSION = [None, "zlib"]
+
+
+def _encode_layer(data, allow_bits=False, compression=None):
+    """Encode an image layer as a binary chunk.
+
+    Parameters
+    ----------
+    data : `numpy.ndarray`
+        The layer's pixel values.
+    allow_bits : `bool`
+        Pack the layer as one bit per pixel if all of the values are 0 or 1.
+    compression : `str`, optional
+        The compression to apply to the chunk (None or "zlib").
+
+    Returns
+    -------
+    buffer : `bytes` or `numpy.ndarray`
+        The encoded data.
+    info : `dict`
+        The encoding information for the chunk (without the offset).
+    """
+    if allow_bits and np.all((data == 0.0) | (data == 1.0)):
+        buffer = np.packbits(data.ravel() != 0.0, bitorder="little")
+        encoding = "bits"
+    else:
+        buffer = np.ascontiguousarray(data, dtype="<f4")
+        encoding = "float32"
+
+    if compression == "zlib":
+        buffer = zlib.compress(buffer)
+    return buffer, {"encoding": encoding, "compression": compression}
+
+
+def _decode_layer(file_data, info, height, width):
+    """Decode an image layer from a binary chunk.
+
+    Parameters
+    ----------
+    file_data : `numpy.memmap`
+        The full contents of the file as bytes.
+    info : `dict`
+        The encoding information for the chunk.
+    height : `int`
+        The height of the image in pixels.
+    width : `int`
+        The width of the image in pixels.
+
+    Returns
+    -------
+    data : `numpy.ndarray`
+        A (height, width) array of native float32 values. Uncompressed float32
+        chunks are returned as views into ``file_data`` on little-endian machines.
+
+    Raises
+    ------
+    Raises a ``ValueError`` if the chunk's encoding is unknown.
+    """
+    buffer = file_data[info["offset"] : info["offset"] + info["size"]]
+    if info["compression"] == "zlib":
+        buffer = np.frombuffer(zlib.decompress(buffer), dtype=np.uint8)
+    elif info["compression"] is not None:
+        raise ValueError(f"Unknown chunk compression {info['compression']}")
+
+    if info["encoding"] == "float32":
+        data = np.frombuffer(buffer, dtype="<f4").reshape(height, width)
+    elif info["encoding"] == "bits":
+        data = np.unpackbits(buffer, count=height * width, bitorder="little").reshape(height, width)
+    else:
+        raise ValueError(f"Unknown chunk encoding {info['encoding']}")
+    return np.asarray(data, dtype=np.single)
+
+
+def _pwrite_all(fd, buffer, offset):
+    """Write the full buffer to the file at the given offset (positional writes
+    may write fewer bytes than requested)."""
+    view = memoryview(buffer).cast("B")
+    while len(view) > 0:
+        num_written = os.pwrite(fd, view, offset)
+        view = view[num_written:]
+        offset += num_written
+
+
+class _BinaryChunkWriter:
+    """Writes data chunks to a file from multiple threads. Each chunk's location is
+    reserved under a lock and the data is written with positional writes."""
+
+    def __init__(self, fd):
+        self._fd = fd
+        self._lock = threading.Lock()
+        self._next_offset = _BINARY_PREAMBLE.size
+
+    def write(self, buffer):
+        """Write a chunk and return its offset in the file."""
+        view = memoryview(buffer).cast("B")
+        with self._lock:
+            start = -(-self._next_offset // _BINARY_ALIGNMENT) * _BINARY_ALIGNMENT
+            self._next_offset = start + len(view)
+
+        _pwrite_all(self._fd, view, start)
+        return start
+
+    @property
+    def end(self):
+        """The offset just past the last chunk."""
+        return self._next_offset
+
+
+class _LazyBinaryImageStack(_LazyImageStack):
+    """The image layers of a memory mapped binary WorkUnit file."""
+
+    def __init__(self, file_data, header, num_workers=1):
+        self._file_data = file_data
+        self._images = header["images"]
+        obstimes = [img["time"] for img in self._images]
+        super().__init__(obstimes, header["width"], header["height"], num_workers)
+
+    def _load_image(self, index):
+        img_info = self._images[index]
+        obstime = self._obstimes[index]
+
+        layers = []
+        for name in ["science", "variance", "mask"]:
+            data = _decode_layer(self._file_data, img_info[name], self._height, self._width)
+            layers.append(RawImage(data, obstime))
+        p = PSF(np.array(img_info["psf"], dtype=np.single))
+        return LayeredImage(layers[0], layers[1], layers[2], p)
+
+    def _close(self):
+        self._images = []
+        self._file_data = None
@@ -0,0 +1,187 @@
+"""A reusable pool of workers for the parallel filtering steps.
+
+Creating a new ``multiprocessing.Pool`` for every filtering call (and pickling the full
+``ResultRow`` objects, including their stamps, for every task) can cost more than the filtering
+itself. A `WorkerPool` is created once (for example by the `SearchRunner`) and its workers are
+reused across calls and chunks. Array data, such as a matrix of likelihood curves or a stack of
+stamps, is passed to process based workers through shared memory so that only the columns a
+filter needs are copied to the workers.
+"""
+
+import concurrent.futures
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _apply_to_shared_rows(func, shm_name, shape, dtype, start, end, args):
+    """Apply a function to a slice of the rows of an array stored in shared memory.
+
+    Parameters
+    ----------
+    func : callable
+        The function to apply. Must take the slice of the array as its first argument.
+    shm_name : `str`
+        The name of the shared memory block.
+    shape : `tuple`
+        The shape of the full array.
+    dtype : `numpy.dtype`
+        The data type of the array.
+    start : `int`
+        The first row of the slice.
+    end : `int`
+        The row after the last row of the slice.
+    args : `tuple`
+        Additional arguments to pass to ``func``.
+
+    Returns
+    -------
+    result : any
+        The output of ``func``.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    data = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    try:
+        result = func(data[start:end], *args)
+
+        # Copy the result in case it is a view into the shared block.
+        if isinstance(result, np.ndarray):
+            result = np.array(result)
+    finally:
+        # Drop all views before closing the block.
+        data = None
+        shm.close()
+    return result
+
+
+class WorkerPool:
+    """A pool of thread or process workers that is created once and reused.
+
+    Attributes
+    ----------
+    num_workers : `int`
+        The number of workers.
+    pool_type : `str`
+        The type of workers: "thread" or "process".
+    """
+
+    valid_pool_types = ["thread", "process"]
+
+    def __init__(self, num_workers=1, pool_type="thread"):
+        """Create the WorkerPool. The underlying executor is not started until the first use.
+
+        Parameters
+        ----------
+        num_workers : `int`
+            The number of workers.
+        pool_type : `str`
+            The type of workers: "thread" or "process".
+
+        Raises
+        ------
+        Raises a ``ValueError`` if the number of workers or pool type are invalid.
+        """
+        if num_workers <= 0:
+            raise ValueError(f"Invalid number of workers {num_workers}")
+        if pool_type not in WorkerPool.valid_pool_types:
+            raise ValueError(f"Invalid pool type {pool_type}. Expected one of {WorkerPool.valid_pool_types}")
+        self.num_workers = num_workers
+        self.pool_type = pool_type
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def executor(self):
+        """The underlying executor (started on first access)."""
+        if self._executor is None:
+            if self.pool_type == "thread":
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.num_workers)
+            else:
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers)
+        return self._executor
+
+    def close(self):
+        """Shut down the workers. The pool will be restarted if it is used again."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def map(self, func, items):
+        """Apply a function to each item.
+
+        Parameters
+        ----------
+        func : callable
+            The function to apply. Must be picklable for a process pool.
+        items : iterable
+            The inputs.
+
+        Returns
+        -------
+        results : `list`
+            The outputs in the same order as the inputs.
+        """
+        items = list(items)
+        if self.num_workers == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        chunksize = max(1, len(items) // (4 * self.num_workers))
+        return list(self.executor.map(func, items, chunksize=chunksize))
+
+    def map_rows(self, func, data, *args):
+        """Split an array into blocks of rows, apply a function to each block, and
+        concatenate the results along the first axis. For a process pool the array is
+        placed in shared memory so each worker only reads its own rows.
+
+        Parameters
+        ----------
+        func : callable
+            The function to apply. It takes a block of rows (and ``args``) and returns
+            an array with one entry per row. Must be picklable for a process pool.
+        data : `numpy.ndarray`
+            The input array with one entry per row.
+        *args : tuple
+            Additional arguments passed to ``func``.
+
+        Returns
+        -------
+        result : `numpy.ndarray`
+            The concatenated outputs.
+        """
+        data = np.ascontiguousarray(data)
+        num_rows = data.shape[0]
+        num_blocks = min(self.num_workers, num_rows)
+        if num_blocks <= 1:
+            return func(data, *args)
+        bounds = np.linspace(0, num_rows, num_blocks + 1).astype(int)
+
+        if self.pool_type == "thread":
+            futures = [
+                self.executor.submit(func, data[bounds[i] : bounds[i + 1]], *args) for i in range(num_blocks)
+            ]
+            return np.concatenate([f.result() for f in futures], axis=0)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+        try:
+            np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+            futures = [
+                self.executor.submit(
+                    _apply_to_shared_rows,
+                    func,
+                    shm.name,
+                    data.shape,
+                    data.dtype,
+                    bounds[i],
+                    bounds[i + 1],
+                    args,
+                )
+                for i in range(num_blocks)
+            ]
+            return np.concatenate([f.result() for f in futures], axis=0)
+        finally:
+            shm.close()
+            shm.unlink()
@@ -1,5 +1,8 @@
 import unittest
 
+import numpy as np
+from sklearn.cluster import DBSCAN
+
 from kbmod.filters.clustering_filters import *
 from kbmod.result_list import ResultList, ResultRow
 from kbmod.search import *
@@ -127,6 +130,44 @@ class test_clustering_filters(unittest.TestCase):
         f3 = ClusterMidPosFilter(eps=0.1, height=20, width=20, times=[0, 0.001, 0.002])
         self.assertEqual(f3.keep_indices(rs), [0, 3, 5])
 
+    def test_cluster_grid(self):
+        # Three clusters: a chain of linked points, a pair, and a single point.
+        points = np.array([[0.0, 0.0], [5.0, 5.0], [0.9, 0.0], [1.8, 0.1], [5.5, 5.5], [2.6, 0.4]])
+        self.assertEqual(cluster_grid(points, 1.0).tolist(), [0, 1, 0, 0, 1, 0])
+        self.assertEqual(cluster_grid(points, 0.5).tolist(), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(len(cluster_grid(np.zeros((0, 2)), 1.0)), 0)
+
+        # Catch invalid parameters.
+        self.assertRaises(RuntimeError, cluster_grid, points, 0.0)
+        self.assertRaises(RuntimeError, cluster_grid, np.array([[0.0, np.nan]]), 1.0)
+        self.assertRaises(RuntimeError, cluster_grid, np.zeros(5), 1.0)
+
+        # Check the labels match DBSCAN's for random data.
+        rng = np.random.default_rng(101)
+        for num_dims in [1, 2, 4]:
+            points = rng.random((500, num_dims))
+            labels = DBSCAN(eps=0.05, min_samples=1).fit(points).labels_
+            self.assertTrue(np.array_equal(cluster_grid(points, 0.05), labels))
+
+    def test_dbscan_backends(self):
+        rng = np.random.default_rng(102)
+        objs = [[int(x), int(y), vx, vy] for x, y, vx, vy in rng.random((200, 4)) * [100, 100, 20, 20]]
+        rs = self._make_data(objs)
+
+        for eps in [0.01, 0.05, 0.2]:
+            f_grid = ClusterPosAngVelFilter(eps, 100, 100, [0, 30], [0, 1.5])
+            f_sk = ClusterPosAngVelFilter(eps, 100, 100, [0, 30], [0, 1.5], backend="sklearn")
+            self.assertEqual(f_grid.keep_indices(rs), f_sk.keep_indices(rs))
+        self.assertRaises(ValueError, ClusterPositionFilter, 0.025, 100, 100, backend="none")
+
+    def test_dbscan_keeps_best_likelihood(self):
+        rs = ResultList(self.times)
+        for x, lh in [(10, 1.0), (50, 5.0), (11, 3.0), (51, 2.0), (12, 3.0)]:
+            rs.append_result(ResultRow(make_trajectory(x, 10, 0.0, 0.0, lh=lh), self.num_times))
+
+        f1 = ClusterPositionFilter(eps=0.025, height=100, width=100)
+        self.assertEqual(f1.keep_indices(rs), [1, 2])
+
     def test_clustering(self):
         cluster_params = {
             "ang_lims": [0.0, 1.5],
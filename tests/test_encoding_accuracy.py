@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from kbmod.encoding_accuracy import encoding_accuracy_report
+from kbmod.fake_data.fake_data_creator import make_fake_layered_image
+from kbmod.search import PSF, ImageStack
+from kbmod.trajectory_utils import make_trajectory
+
+
+class test_encoding_accuracy(unittest.TestCase):
+    def setUp(self):
+        self.num_times = 5
+        images = [
+            make_fake_layered_image(30, 25, 2.0, 4.0, 0.1 * i, PSF(1.0), seed=i)
+            for i in range(self.num_times)
+        ]
+
+        # Make one image much brighter than the others.
+        images[2].get_science().set_pixel(3, 3, 5000.0)
+        self.stack = ImageStack(images)
+        self.trjs = [make_trajectory(x, y, 1.0, 0.5) for x in range(2, 20, 4) for y in range(2, 20, 5)]
+
+    def test_report(self):
+        report = encoding_accuracy_report(self.stack, self.trjs, num_bytes=2)
+        self.assertEqual(len(report), len(self.trjs))
+        for col in ["float_lh", "encoded_lh", "lh_error", "float_flux", "encoded_flux", "flux_error"]:
+            self.assertIn(col, report.colnames)
+        self.assertEqual(report.meta["num_bytes"], 2)
+        np.testing.assert_allclose(report["lh_error"], np.abs(report["float_lh"] - report["encoded_lh"]))
+        self.assertGreater(report.meta["max_lh_error"], 0.0)
+
+        # The trajectories can also be given as an array.
+        trj_array = np.array([[t.x, t.y, t.vx, t.vy] for t in self.trjs])
+        report2 = encoding_accuracy_report(self.stack, trj_array, num_bytes=2)
+        np.testing.assert_allclose(report2["encoded_lh"], report["encoded_lh"])
+
+        # The 1 byte encoding is less accurate, but per time scaling helps.
+        report_1 = encoding_accuracy_report(self.stack, self.trjs, num_bytes=1)
+        report_1_per_time = encoding_accuracy_report(
+            self.stack, self.trjs, num_bytes=1, per_time_scaling=True
+        )
+        self.assertGreater(report_1.meta["mean_lh_error"], report.meta["mean_lh_error"])
+        self.assertLess(report_1_per_time.meta["mean_lh_error"], report_1.meta["mean_lh_error"])
+        self.assertTrue(report_1_per_time.meta["per_time_scaling"])
+
+        self.assertRaises(ValueError, encoding_accuracy_report, self.stack, self.trjs, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
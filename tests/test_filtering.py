@@ -7,14 +7,12 @@ from kbmod.search import *
 
 
 class test_kernels_wrappers(unittest.TestCase):
-    @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_sigmag_filtered_indices_same(self):
         # With everything the same, nothing should be filtered.
         values = [1.0 for _ in range(20)]
         inds = sigmag_filtered_indices(values, 0.25, 0.75, 0.7413, 2.0)
         self.assertEqual(len(inds), 20)
 
-    @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_sigmag_filtered_indices_no_outliers(self):
         # Try with a median of 1.0 and a percentile range of 3.0 (2.0 - -1.0).
         # It should filter any values outside [-3.45, 5.45]
@@ -22,7 +20,6 @@ class test_kernels_wrappers(unittest.TestCase):
         inds = sigmag_filtered_indices(values, 0.25, 0.75, 0.7413, 2.0)
         self.assertEqual(len(inds), len(values))
 
-    @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_sigmag_filtered_indices_one_outlier(self):
         # Try with a median of 1.0 and a percentile range of 3.0 (2.0 - -1.0).
         # It should filter any values outside [-3.45, 5.45]
@@ -39,7 +36,6 @@ class test_kernels_wrappers(unittest.TestCase):
         inds = sigmag_filtered_indices(values, 0.25, 0.75, 0.7413, 3.0)
         self.assertEqual(len(inds), len(values))
 
-    @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_sigmag_filtered_indices_other_bounds(self):
         # Do the filtering of test_sigmag_filtered_indices_one_outlier
         # with wider bounds [-1.8944, 3.8944].
@@ -61,7 +57,6 @@ class test_kernels_wrappers(unittest.TestCase):
         for i in range(1, 9):
             self.assertTrue(i in inds)
 
-    @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_sigmag_filtered_indices_two_outliers(self):
         # Try with a median of 0.0 and a percentile range of 1.1 (1.0 - -0.1).
         # It should filter any values outside [-1.631, 1.631].
@@ -76,7 +71,6 @@ class test_kernels_wrappers(unittest.TestCase):
         inds = sigmag_filtered_indices(values, 0.25, 0.75, 0.7413, 20.0)
         self.assertEqual(len(inds), len(values) - 1)
 
-    @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_sigmag_filtered_indices_three_outliers(self):
         # Try with a median of 5.0 and a percentile range of 4.0 (7.0-3.0).
         # It should filter any values outside [-0.93, 10.93].
@@ -1,6 +1,8 @@
 import tempfile
 import unittest
 
+import numpy as np
+
 from kbmod.fake_data.fake_data_creator import add_fake_object, make_fake_layered_image
 from kbmod.search import *
 
@@ -72,6 +74,100 @@ class test_ImageStack(unittest.TestCase):
                 else:
                     self.assertEqual(mask.get_pixel(y, x), 0)
 
+    def test_global_mask_builder(self):
+        # Mask a single point in each image with flag=2.
+        for i in range(self.num_images):
+            self.images[i].get_mask().set_pixel(5, 5, 2)
+
+        builder = GlobalMaskBuilder(60, 80, 1)
+        self.assertEqual(builder.width, 60)
+        self.assertEqual(builder.height, 80)
+        self.assertEqual(builder.flags, 1)
+        self.assertEqual(builder.num_images, 0)
+
+        # Adding the images one at a time matches building from the full stack.
+        for i in range(self.num_images):
+            builder.add_image(self.images[i])
+        self.assertEqual(builder.num_images, self.num_images)
+        self.assertEqual(builder.get_count(10, 10), 1)
+        self.assertEqual(builder.get_count(5, 5), 0)
+        self.assertRaises(IndexError, builder.get_count, 80, 0)
+
+        full_builder = GlobalMaskBuilder(60, 80, 1)
+        full_builder.add_stack(ImageStack(self.images))
+        for threshold in [0, 1, 2]:
+            expected = ImageStack(self.images).make_global_mask(1, threshold)
+            np.testing.assert_array_equal(builder.make_mask(threshold).image, expected.image)
+            np.testing.assert_array_equal(full_builder.make_mask(threshold).image, expected.image)
+
+        # Mask the same pixel in every image, so it is in the global mask for a threshold of 3.
+        extra = [make_fake_layered_image(60, 80, 2.0, 4.0, 20.0 + i, self.p[0]) for i in range(3)]
+        for img in extra:
+            img.get_mask().set_pixel(20, 30, 1)
+            builder.add_image(img)
+        self.assertEqual(builder.make_mask(3).get_pixel(20, 30), 1)
+        self.assertEqual(builder.make_mask(3).get_pixel(10, 10), 0)
+
+        # Removing an image updates the mask.
+        builder.remove_image(extra[0])
+        self.assertEqual(builder.num_images, self.num_images + 2)
+        self.assertEqual(builder.get_count(20, 30), 2)
+        self.assertEqual(builder.make_mask(3).get_pixel(20, 30), 0)
+
+        # An image that was never added cannot be removed and the counts are unchanged.
+        bad_img = make_fake_layered_image(60, 80, 2.0, 4.0, 0.0, self.p[0])
+        bad_img.get_mask().set_pixel(0, 0, 1)
+        self.assertRaises(RuntimeError, builder.remove_image, bad_img)
+        self.assertEqual(builder.get_count(20, 30), 2)
+
+        # Images with the wrong size are rejected.
+        self.assertRaises(
+            RuntimeError, builder.add_image, make_fake_layered_image(10, 10, 2.0, 4.0, 0.0, self.p[0])
+        )
+
+        builder.clear()
+        self.assertEqual(builder.num_images, 0)
+        self.assertEqual(np.sum(builder.make_mask(1).image), 0.0)
+
+    def test_apply_mask_operations(self):
+        rng = np.random.default_rng(101)
+        for global_flags, mask_threshold, grow_steps in [(0, np.inf, 0), (4, 5.0, 3), (2, np.inf, 10)]:
+            # Build two copies of the stack with the same random mask flags.
+            images = []
+            for i in range(self.num_images):
+                img = make_fake_layered_image(40, 30, 2.0, 4.0, float(i), PSF(1.0), seed=i)
+                mask_vals = rng.choice([0, 1, 2, 4, 8], size=(30, 40), p=[0.97, 0.01, 0.01, 0.005, 0.005])
+                img.get_mask().image = mask_vals.astype(np.float32)
+                images.append(img)
+            fused_stack = ImageStack(images)
+            expected_stack = ImageStack(images)
+
+            # Apply the operations one at a time.
+            global_mask = expected_stack.make_global_mask(global_flags, 2)
+            for i in range(self.num_images):
+                img = expected_stack.get_single_image(i)
+                img.binarize_mask(1 + 8)
+                img.union_threshold_masking(mask_threshold)
+                if global_flags > 0:
+                    img.union_masks(global_mask)
+                if grow_steps > 0:
+                    img.grow_mask(grow_steps)
+                img.apply_mask(0xFFFFFF)
+
+            fused_stack.apply_mask_operations(
+                1 + 8,
+                global_flags=global_flags,
+                global_threshold=2,
+                mask_threshold=mask_threshold,
+                grow_steps=grow_steps,
+            )
+            for i in range(self.num_images):
+                img1 = fused_stack.get_single_image(i)
+                img2 = expected_stack.get_single_image(i)
+                np.testing.assert_array_equal(img1.get_mask().image, img2.get_mask().image)
+                np.testing.assert_array_equal(img1.get_science().image, img2.get_science().image)
+                np.testing.assert_array_equal(img1.get_variance().image, img2.get_variance().image)
+
     # WOW, this is the first test that caught the fact that interpolated_add
     # called add, and that add had flipped i and j by accident. The first one.
     # TODO: more clean understandable tests for basic functionality, these big
@@ -1,3 +1,4 @@
+import json
 import os
 import shutil
 import tempfile
@@ -121,6 +122,79 @@ class TestImageCollection(unittest.TestCase):
         # cleanup resources
         shutil.rmtree(tmpdir)
 
+    def test_parallel_and_cached(self):
+        """Test building an ImageCollection with a process pool and a metadata cache."""
+        hduls = self.fitsFactory.get_n(3, spoof_data=True)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for i, hdul in enumerate(hduls):
+                hdul.writeto(os.path.join(tmpdir, f"{i:0>3}.fits"), output_verify="silentfix")
+                hdul.close()
+            files = sorted(os.path.join(tmpdir, f) for f in os.listdir(tmpdir))
+            cache_file = os.path.join(tmpdir, "cache.json")
+
+            ic = ImageCollection.fromTargets(files)
+            ic2 = ImageCollection.fromTargets(files, num_workers=2, cache_file=cache_file)
+            self.assertTrue(os.path.isfile(cache_file))
+            self.assertEqual(ic2.meta["n_stds"], 3)
+            cols = list(ic.columns.keys())
+            self.assertEqual(list(ic2.columns.keys()), cols)
+            self.assertTrue((ic.data[cols] == ic2.data[cols]).all())
+            for wcs1, wcs2 in zip(ic.wcs, ic2.wcs):
+                self.assertTrue(np.allclose(wcs1.wcs.crval, wcs2.wcs.crval))
+
+            # The standardizers are created lazily and read the same images.
+            stack1 = ic.toImageStack()
+            stack2 = ic2.toImageStack(num_workers=2)
+            self.assertEqual(stack1.img_count(), stack2.img_count())
+            for i in range(stack1.img_count()):
+                sci1 = stack1.get_single_image(i).get_science().image
+                sci2 = stack2.get_single_image(i).get_science().image
+                self.assertTrue(np.array_equal(sci1, sci2, equal_nan=True))
+
+            # Cached entries are used for unchanged files, so an edit to
+            # the cache shows up in the new collection.
+            with open(cache_file) as f:
+                entries = json.load(f)
+            for entry in entries.values():
+                entry["rows"][0]["filter"] = "cached"
+            with open(cache_file, "w") as f:
+                json.dump(entries, f)
+            ic3 = ImageCollection.fromTargets(files, cache_file=cache_file)
+            self.assertTrue(all(ic3["filter"] == "cached"))
+
+            # Modified files are re-read.
+            stat = os.stat(files[0])
+            os.utime(files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            ic4 = ImageCollection.fromTargets(files, cache_file=cache_file)
+            self.assertEqual(list(ic4["filter"] == "cached").count(True), 2)
+            new_filter = np.asarray(ic4["filter"])[np.asarray(ic4["location"]) == files[0]][0]
+            orig_filter = np.asarray(ic["filter"])[np.asarray(ic["location"]) == files[0]][0]
+            self.assertEqual(new_filter, orig_filter)
+
+            # Changing the value of a keyword argument invalidates the cache.
+            ImageCollection.fromTargets(files, cache_file=cache_file, extra=1)
+            with open(cache_file) as f:
+                entries = json.load(f)
+            for entry in entries.values():
+                entry["rows"][0]["filter"] = "cached"
+            with open(cache_file, "w") as f:
+                json.dump(entries, f)
+            ic6 = ImageCollection.fromTargets(files, cache_file=cache_file, extra=1)
+            self.assertTrue(all(ic6["filter"] == "cached"))
+            ic6 = ImageCollection.fromTargets(files, cache_file=cache_file, extra=2)
+            self.assertFalse(any(ic6["filter"] == "cached"))
+
+            # Header-only standardization produces the same metadata and images.
+            ic5 = ImageCollection.fromTargets(files, config={"header_only": True})
+            self.assertTrue((ic.data[cols[:-2]] == ic5.data[cols[:-2]]).all())
+            self.assertTrue(np.allclose(ic["ra"], ic5["ra"]))
+            self.assertTrue(np.allclose(ic["dec"], ic5["dec"]))
+            stack5 = ic5.toImageStack()
+            for i in range(stack1.img_count()):
+                sci1 = stack1.get_single_image(i).get_science().image
+                sci5 = stack5.get_single_image(i).get_science().image
+                self.assertTrue(np.array_equal(sci1, sci5, equal_nan=True))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -92,6 +92,16 @@ class test_PSF(unittest.TestCase):
             self.assertEqual(x.get_size(), p.get_size())
             self.assertEqual(x.get_radius(), p.get_radius())
 
+    def test_is_separable(self):
+        for p in self.psf_list:
+            self.assertTrue(p.is_separable())
+        self.assertTrue(PSF().is_separable())
+        self.assertTrue(PSF(np.outer([1.0, 2.0, 1.0], [0.5, 1.0, 0.25])).is_separable())
+
+        # A non-symmetric, rank 2 kernel and an all zero kernel are not separable.
+        self.assertFalse(PSF(np.array([[0.0, 0.0, 0.0], [0.0, 0.5, 0.4], [0.0, 0.1, 0.0]])).is_separable())
+        self.assertFalse(PSF(np.zeros((3, 3))).is_separable())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,7 @@
 import math
 import numpy as np
+import os
+import tempfile
 import unittest
 
 
@@ -8,17 +10,22 @@ from kbmod.search import (
     HAS_GPU,
     KB_NO_DATA,
     PSF,
+    PSI_PHI_INTERLEAVED,
+    PSI_PHI_TILED,
     ImageStack,
     LayeredImage,
     PsiPhi,
     PsiPhiArray,
     RawImage,
+    compute_psi_phi_cache_key,
     compute_scale_params_from_image_vect,
     decode_uint_scalar,
     encode_uint_scalar,
     fill_psi_phi_array,
     fill_psi_phi_array_from_image_stack,
+    load_psi_phi_array,
     pixel_value_valid,
+    save_psi_phi_array,
 )
 
 
@@ -238,6 +245,318 @@ class test_psi_phi_array(unittest.TestCase):
         self.assertFalse(arr.on_gpu)
         self.assertFalse(arr.gpu_array_allocated)
 
+    def test_fill_psi_phi_array_from_image_stack_values(self):
+        # Use more images than threads so the images are built in parallel.
+        num_times = 20
+        width = 17
+        height = 13
+        images = [
+            make_fake_layered_image(width, height, 2.0, 4.0, float(i), PSF(1.0), seed=i)
+            for i in range(num_times)
+        ]
+        images[3].get_science().set_pixel(4, 5, KB_NO_DATA)
+        im_stack = ImageStack(images)
+
+        psi_imgs = [img.generate_psi_image() for img in images]
+        phi_imgs = [img.generate_phi_image() for img in images]
+
+        for num_bytes in [1, 2, 4]:
+            arr = PsiPhiArray()
+            fill_psi_phi_array_from_image_stack(arr, im_stack, num_bytes, False)
+
+            expected = PsiPhiArray()
+            fill_psi_phi_array(
+                expected, num_bytes, psi_imgs, phi_imgs, [float(i) for i in range(num_times)], False
+            )
+            self.assertAlmostEqual(arr.psi_min_val, expected.psi_min_val)
+            self.assertAlmostEqual(arr.psi_max_val, expected.psi_max_val)
+            self.assertAlmostEqual(arr.phi_min_val, expected.phi_min_val)
+            self.assertAlmostEqual(arr.phi_max_val, expected.phi_max_val)
+
+            for t in range(num_times):
+                for row in range(height):
+                    for col in range(width):
+                        val1 = arr.read_psi_phi(t, row, col)
+                        val2 = expected.read_psi_phi(t, row, col)
+                        np.testing.assert_equal(val1.psi, val2.psi)
+                        np.testing.assert_equal(val1.phi, val2.phi)
+
+                        # The float encoding matches the psi and phi images exactly.
+                        if num_bytes == 4:
+                            np.testing.assert_equal(val1.psi, psi_imgs[t].get_pixel(row, col))
+                            np.testing.assert_equal(val1.phi, phi_imgs[t].get_pixel(row, col))
+
+    def test_save_load_psi_phi_array(self):
+        images = [make_fake_layered_image(11, 9, 2.0, 4.0, 0.5 * i, PSF(1.0), seed=i) for i in range(4)]
+        im_stack = ImageStack(images)
+
+        with tempfile.TemporaryDirectory() as dir_name:
+            for num_bytes in [1, 2, 4]:
+                arr = PsiPhiArray()
+                fill_psi_phi_array_from_image_stack(arr, im_stack, num_bytes, False)
+                self.assertFalse(arr.cpu_array_mapped)
+
+                filename = os.path.join(dir_name, f"psi_phi_{num_bytes}.bin")
+                save_psi_phi_array(arr, filename)
+
+                loaded = PsiPhiArray()
+                load_psi_phi_array(loaded, filename)
+                self.assertTrue(loaded.cpu_array_allocated)
+                self.assertTrue(loaded.cpu_array_mapped)
+                self.assertEqual(loaded.num_bytes, arr.num_bytes)
+                self.assertEqual(loaded.num_times, arr.num_times)
+                self.assertEqual(loaded.width, arr.width)
+                self.assertEqual(loaded.height, arr.height)
+                self.assertEqual(loaded.total_array_size, arr.total_array_size)
+                self.assertEqual(loaded.psi_min_val, arr.psi_min_val)
+                self.assertEqual(loaded.psi_scale, arr.psi_scale)
+                self.assertEqual(loaded.phi_max_val, arr.phi_max_val)
+                self.assertEqual(loaded.phi_scale, arr.phi_scale)
+                for t in range(arr.num_times):
+                    self.assertEqual(loaded.read_time(t), arr.read_time(t))
+                    for row in range(arr.height):
+                        for col in range(arr.width):
+                            val1 = arr.read_psi_phi(t, row, col)
+                            val2 = loaded.read_psi_phi(t, row, col)
+                            np.testing.assert_equal(val1.psi, val2.psi)
+                            np.testing.assert_equal(val1.phi, val2.phi)
+
+                loaded.clear()
+                self.assertFalse(loaded.cpu_array_allocated)
+                self.assertFalse(loaded.cpu_array_mapped)
+
+            # Missing, truncated, and non-PsiPhi files fail.
+            self.assertRaises(RuntimeError, load_psi_phi_array, loaded, os.path.join(dir_name, "none.bin"))
+            with open(filename, "r+b") as f:
+                f.truncate(os.path.getsize(filename) - 4)
+            self.assertRaises(RuntimeError, load_psi_phi_array, loaded, filename)
+            with open(filename, "wb") as f:
+                f.write(b"not a psi phi file" * 10)
+            self.assertRaises(RuntimeError, load_psi_phi_array, loaded, filename)
+
+    def test_compute_psi_phi_cache_key(self):
+        images = [make_fake_layered_image(11, 9, 2.0, 4.0, 0.5 * i, PSF(1.0), seed=i) for i in range(4)]
+        key = compute_psi_phi_cache_key(ImageStack(images), 4)
+        self.assertEqual(len(key), 16)
+
+        # The same data gives the same key (float encoding is 4 bytes).
+        self.assertEqual(compute_psi_phi_cache_key(ImageStack(images), 4), key)
+        self.assertEqual(compute_psi_phi_cache_key(ImageStack(images), -1), key)
+
+        # Changes to the encoding, pixels, PSF, or times change the key.
+        self.assertNotEqual(compute_psi_phi_cache_key(ImageStack(images), 1), key)
+
+        changed = [make_fake_layered_image(11, 9, 2.0, 4.0, 0.5 * i, PSF(1.0), seed=i) for i in range(4)]
+        changed[2].get_variance().set_pixel(3, 4, 10.0)
+        self.assertNotEqual(compute_psi_phi_cache_key(ImageStack(changed), 4), key)
+
+        changed = [make_fake_layered_image(11, 9, 2.0, 4.0, 0.5 * i, PSF(1.0), seed=i) for i in range(4)]
+        changed[0].set_psf(PSF(1.5))
+        self.assertNotEqual(compute_psi_phi_cache_key(ImageStack(changed), 4), key)
+
+        changed = [make_fake_layered_image(11, 9, 2.0, 4.0, 0.6 * i, PSF(1.0), seed=i) for i in range(4)]
+        self.assertNotEqual(compute_psi_phi_cache_key(ImageStack(changed), 4), key)
+
+    def test_tiled_layout(self):
+        width = 13
+        height = 10
+        num_times = 3
+        images = [
+            make_fake_layered_image(width, height, 2.0, 4.0, 0.5 * i, PSF(1.0), seed=i)
+            for i in range(num_times)
+        ]
+        images[1].get_science().set_pixel(9, 12, KB_NO_DATA)
+        im_stack = ImageStack(images)
+
+        arr = PsiPhiArray()
+        self.assertEqual(arr.layout, PSI_PHI_INTERLEAVED)
+        self.assertRaises(RuntimeError, arr.set_layout, PSI_PHI_TILED, 3)
+        self.assertRaises(RuntimeError, arr.set_layout, PSI_PHI_TILED, 0)
+
+        for num_bytes in [1, 2, 4]:
+            expected = PsiPhiArray()
+            fill_psi_phi_array_from_image_stack(expected, im_stack, num_bytes, False)
+
+            for tile_size in [1, 4, 8, 16]:
+                arr = PsiPhiArray()
+                arr.set_layout(PSI_PHI_TILED, tile_size)
+                fill_psi_phi_array_from_image_stack(arr, im_stack, num_bytes, False)
+                self.assertEqual(arr.layout, PSI_PHI_TILED)
+                self.assertEqual(arr.tile_size, tile_size)
+                self.assertEqual(arr.pixels_per_image, width * height)
+
+                # The tiles are padded out to cover the full image.
+                num_tiles = math.ceil(width / tile_size) * math.ceil(height / tile_size)
+                self.assertEqual(arr.num_entries, 2 * num_tiles * tile_size * tile_size * num_times)
+                self.assertEqual(arr.total_array_size, arr.num_entries * arr.block_size)
+
+                # The layout cannot change while the data is allocated, but is kept after clearing.
+                self.assertRaises(RuntimeError, arr.set_layout, PSI_PHI_INTERLEAVED)
+
+                for t in range(num_times):
+                    for row in range(-1, height + 1):
+                        for col in range(-1, width + 1):
+                            val1 = arr.read_psi_phi(t, row, col)
+                            val2 = expected.read_psi_phi(t, row, col)
+                            np.testing.assert_equal(val1.psi, val2.psi)
+                            np.testing.assert_equal(val1.phi, val2.phi)
+
+                with tempfile.TemporaryDirectory() as dir_name:
+                    filename = os.path.join(dir_name, "tiled.bin")
+                    save_psi_phi_array(arr, filename)
+                    loaded = PsiPhiArray()
+                    load_psi_phi_array(loaded, filename)
+                    self.assertEqual(loaded.layout, PSI_PHI_TILED)
+                    self.assertEqual(loaded.tile_size, tile_size)
+                    val1 = arr.read_psi_phi(num_times - 1, height - 1, width - 1)
+                    val2 = loaded.read_psi_phi(num_times - 1, height - 1, width - 1)
+                    self.assertEqual(val1.psi, val2.psi)
+                    loaded.clear()
+
+                arr.clear()
+                self.assertEqual(arr.layout, PSI_PHI_TILED)
+                self.assertEqual(arr.tile_size, tile_size)
+
+        # The layout is part of the cache key.
+        self.assertNotEqual(
+            compute_psi_phi_cache_key(im_stack, 4, PSI_PHI_TILED, 8), compute_psi_phi_cache_key(im_stack, 4)
+        )
+        self.assertNotEqual(
+            compute_psi_phi_cache_key(im_stack, 4, PSI_PHI_TILED, 8),
+            compute_psi_phi_cache_key(im_stack, 4, PSI_PHI_TILED, 16),
+        )
+
+    def _max_encoding_error(self, arr, expected, times, bounds=None):
+        """Compute the maximum absolute psi error of arr relative to expected over the given
+        times, optionally only for pixels whose expected value is within the given bounds."""
+        max_err = 0.0
+        for t in times:
+            for row in range(expected.height):
+                for col in range(expected.width):
+                    val1 = arr.read_psi_phi(t, row, col)
+                    val2 = expected.read_psi_phi(t, row, col)
+                    if bounds is not None and not (bounds[0] <= val2.psi <= bounds[1]):
+                        continue
+                    if pixel_value_valid(val2.psi):
+                        max_err = max(max_err, abs(val1.psi - val2.psi))
+        return max_err
+
+    def test_per_time_scaling(self):
+        num_times = 4
+        images = [
+            make_fake_layered_image(12, 10, 2.0, 4.0, 0.5 * i, PSF(1.0), seed=i) for i in range(num_times)
+        ]
+        images[3].get_science().set_pixel(0, 0, KB_NO_DATA)
+
+        # Make one image much brighter than the others.
+        sci = images[1].get_science()
+        sci.set_all(0.0)
+        sci.set_pixel(5, 5, 1000.0)
+        im_stack = ImageStack(images)
+
+        arr = PsiPhiArray()
+        self.assertFalse(arr.per_time_scaling)
+        self.assertEqual(arr.clip_fraction, 0.0)
+        self.assertRaises(RuntimeError, arr.set_encoding_options, True, 0.5)
+        self.assertRaises(RuntimeError, arr.set_encoding_options, True, -0.1)
+
+        expected = PsiPhiArray()
+        fill_psi_phi_array_from_image_stack(expected, im_stack, 4, False)
+        for num_bytes in [1, 2]:
+            global_arr = PsiPhiArray()
+            fill_psi_phi_array_from_image_stack(global_arr, im_stack, num_bytes, False)
+            self.assertEqual(len(global_arr.time_scaling), 0)
+
+            arr = PsiPhiArray()
+            arr.set_encoding_options(True)
+            fill_psi_phi_array_from_image_stack(arr, im_stack, num_bytes, False)
+            self.assertTrue(arr.per_time_scaling)
+            self.assertEqual(len(arr.time_scaling), 4 * num_times)
+            self.assertRaises(RuntimeError, arr.set_encoding_options, False)
+
+            # The global bounds are unchanged and the invalid pixels are still invalid.
+            self.assertEqual(arr.psi_min_val, global_arr.psi_min_val)
+            self.assertEqual(arr.psi_max_val, global_arr.psi_max_val)
+            self.assertFalse(pixel_value_valid(arr.read_psi_phi(3, 0, 0).psi))
+
+            # Using separate parameters for each time reduces the error for the other images.
+            other_times = [0, 2, 3]
+            self.assertLess(
+                self._max_encoding_error(arr, expected, other_times),
+                0.5 * self._max_encoding_error(global_arr, expected, other_times),
+            )
+
+            # Filling from the individual psi and phi images gives the same result.
+            arr2 = PsiPhiArray()
+            arr2.set_encoding_options(True)
+            fill_psi_phi_array(
+                arr2,
+                num_bytes,
+                [img.generate_psi_image() for img in images],
+                [img.generate_phi_image() for img in images],
+                im_stack.build_zeroed_times(),
+                False,
+            )
+            np.testing.assert_array_equal(arr2.time_scaling, arr.time_scaling)
+            self.assertEqual(self._max_encoding_error(arr2, arr, range(num_times)), 0.0)
+
+            # The per time parameters are saved and loaded.
+            with tempfile.TemporaryDirectory() as dir_name:
+                filename = os.path.join(dir_name, "per_time.bin")
+                save_psi_phi_array(arr, filename)
+                loaded = PsiPhiArray()
+                load_psi_phi_array(loaded, filename)
+                self.assertTrue(loaded.per_time_scaling)
+                np.testing.assert_array_equal(loaded.time_scaling, arr.time_scaling)
+                self.assertEqual(self._max_encoding_error(loaded, arr, range(num_times)), 0.0)
+                loaded.clear()
+
+            # The options are kept when the array is cleared.
+            arr.clear()
+            self.assertTrue(arr.per_time_scaling)
+            self.assertEqual(len(arr.time_scaling), 0)
+
+        # The options are part of the cache key, but only for the compressed encodings.
+        self.assertNotEqual(
+            compute_psi_phi_cache_key(im_stack, 1, PSI_PHI_INTERLEAVED, 1, True),
+            compute_psi_phi_cache_key(im_stack, 1),
+        )
+        self.assertNotEqual(
+            compute_psi_phi_cache_key(im_stack, 1, PSI_PHI_INTERLEAVED, 1, False, 0.01),
+            compute_psi_phi_cache_key(im_stack, 1),
+        )
+        self.assertEqual(
+            compute_psi_phi_cache_key(im_stack, 4, PSI_PHI_INTERLEAVED, 1, True, 0.01),
+            compute_psi_phi_cache_key(im_stack, 4),
+        )
+
+    def test_clipped_scaling(self):
+        images = [make_fake_layered_image(20, 20, 2.0, 4.0, 0.5 * i, PSF(1.0), seed=i) for i in range(3)]
+        images[0].get_science().set_pixel(10, 10, 1000.0)
+        im_stack = ImageStack(images)
+
+        expected = PsiPhiArray()
+        fill_psi_phi_array_from_image_stack(expected, im_stack, 4, False)
+        unclipped = PsiPhiArray()
+        fill_psi_phi_array_from_image_stack(unclipped, im_stack, 1, False)
+
+        arr = PsiPhiArray()
+        arr.set_encoding_options(False, 0.01)
+        fill_psi_phi_array_from_image_stack(arr, im_stack, 1, False)
+        self.assertAlmostEqual(arr.clip_fraction, 0.01)
+        self.assertLess(arr.psi_max_val, unclipped.psi_max_val)
+
+        # The outlier is clamped to the top of the range.
+        self.assertLess(arr.read_psi_phi(0, 10, 10).psi, expected.read_psi_phi(0, 10, 10).psi)
+        self.assertGreater(arr.read_psi_phi(0, 10, 10).psi, 0.9 * arr.psi_max_val)
+
+        # The pixels within the clipped range are encoded more precisely.
+        bounds = [arr.psi_min_val, arr.psi_max_val]
+        self.assertLess(
+            self._max_encoding_error(arr, expected, [1, 2], bounds),
+            self._max_encoding_error(unclipped, expected, [1, 2], bounds),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
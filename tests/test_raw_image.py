@@ -8,7 +8,11 @@ from kbmod.search import (
     HAS_GPU,
     KB_NO_DATA,
     PSF,
+    STAMP_MEAN,
+    STAMP_MEDIAN,
+    STAMP_SUM,
     RawImage,
+    create_coadded_images,
     create_median_image,
     create_summed_image,
     create_mean_image,
@@ -440,6 +444,43 @@ class test_RawImage(unittest.TestCase):
         """Test convolution on GPU with a non-symmetric PSF"""
         self.convolve_psf_orientation_cpu("GPU")
 
+    def test_convolve_methods_match(self):
+        """Test that the separable and FFT convolutions match the direct sum."""
+        rng = np.random.default_rng(100)
+        arr = rng.normal(0.0, 1.0, size=(47, 53)).astype(np.single)
+        arr[rng.random(arr.shape) < 0.05] = np.nan
+        arr[10:20, 5:15] = KB_NO_DATA
+
+        psfs = [
+            PSF(1.0),
+            PSF(2.5),
+            PSF(rng.random((17, 17)).astype(np.single)),
+            PSF(np.array([[0.0, 0.0, 0.0], [0.0, 0.5, 0.4], [0.0, 0.1, 0.0]], dtype=np.single)),
+        ]
+        for p in psfs:
+            expected = RawImage(arr.copy())
+            expected.convolve_direct_cpu(p)
+            expected_valid = np.array(
+                [[pixel_value_valid(v) for v in row] for row in expected.image], dtype=bool
+            )
+
+            methods = ["convolve_cpu", "convolve_fft_cpu"]
+            if p.is_separable():
+                methods.append("convolve_separable_cpu")
+            else:
+                self.assertRaises(RuntimeError, RawImage(arr.copy()).convolve_separable_cpu, p)
+
+            for method in methods:
+                img = RawImage(arr.copy())
+                getattr(img, method)(p)
+
+                # The same pixels are NaN or masked and the values match.
+                self.assertTrue(np.array_equal(np.isnan(img.image), np.isnan(expected.image)))
+                self.assertTrue(np.array_equal(img.image == KB_NO_DATA, expected.image == KB_NO_DATA))
+                self.assertTrue(
+                    np.allclose(img.image[expected_valid], expected.image[expected_valid], atol=1e-4)
+                )
+
     # Stamp as is tested here and as it's used in StackSearch are heaven and earth
     # TODO: Add proper tests
     def test_make_stamp(self):
@@ -615,6 +656,47 @@ class test_RawImage(unittest.TestCase):
         self.assertEqual(mean_image.height, 3)
         self.assertTrue(np.allclose(mean_image.image, expected, atol=1e-6))
 
+    def test_create_coadds_large(self):
+        # Use enough data that the coadds are computed in parallel and include masked pixels.
+        rng = np.random.default_rng(100)
+        arrs = rng.normal(size=(10, 120, 80)).astype(np.single)
+        arrs[rng.random(arrs.shape) < 0.2] = np.nan
+        arrs[:, 0, 0] = np.nan
+        imgs = [RawImage(arr) for arr in arrs]
+
+        with np.errstate(all="ignore"):
+            expected_median = np.nan_to_num(np.nanmedian(arrs, axis=0), nan=0.0)
+            expected_mean = np.nan_to_num(np.nanmean(arrs, axis=0), nan=0.0)
+        expected_sum = np.nansum(arrs, axis=0)
+
+        self.assertTrue(np.allclose(create_median_image(imgs).image, expected_median, atol=1e-6))
+        self.assertTrue(np.allclose(create_mean_image(imgs).image, expected_mean, atol=1e-5))
+        self.assertTrue(np.allclose(create_summed_image(imgs).image, expected_sum, atol=1e-5))
+
+        # Images with different sizes cannot be coadded.
+        self.assertRaises(RuntimeError, create_median_image, imgs + [RawImage(5, 5)])
+
+    def test_create_coadded_images(self):
+        rng = np.random.default_rng(101)
+        image_sets = []
+        for num_imgs in range(1, 8):
+            arrs = rng.normal(size=(num_imgs, 5, 5)).astype(np.single)
+            arrs[rng.random(arrs.shape) < 0.1] = np.nan
+            image_sets.append([RawImage(arr) for arr in arrs])
+
+        for coadd_type, func in [
+            (STAMP_SUM, create_summed_image),
+            (STAMP_MEAN, create_mean_image),
+            (STAMP_MEDIAN, create_median_image),
+        ]:
+            coadds = create_coadded_images(image_sets, coadd_type)
+            self.assertEqual(len(coadds), len(image_sets))
+            for coadd, imgs in zip(coadds, image_sets):
+                np.testing.assert_array_equal(coadd.image, func(imgs).image)
+
+        # An empty set of images fails.
+        self.assertRaises(RuntimeError, create_coadded_images, image_sets + [[]], STAMP_SUM)
+
 
 if __name__ == "__main__":
     unittest.main()
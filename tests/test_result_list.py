@@ -710,5 +710,153 @@ class test_result_list(unittest.TestCase):
             self.assertEqual(trjs[1].x, 40)
 
 
+class test_columnar_result_list(unittest.TestCase):
+    def setUp(self):
+        self.times = [(10.0 + 0.1 * float(i)) for i in range(5)]
+        self.num_times = len(self.times)
+
+        self.num_results = 6
+        self.trjs = [
+            make_trajectory(x=i, y=2 * i, vx=float(i), vy=-1.0, lh=float(i), obs_count=self.num_times)
+            for i in range(self.num_results)
+        ]
+        self.psi = np.array([[float(i + j) for j in range(self.num_times)] for i in range(self.num_results)])
+        self.phi = np.full((self.num_results, self.num_times), 2.0)
+        self.phi[1, :] = 0.0
+
+    def test_from_trajectories(self):
+        rs = ColumnarResultList.from_trajectories(self.trjs, self.times, self.psi, self.phi)
+        self.assertEqual(len(rs), self.num_results)
+        self.assertEqual(rs.num_results(), self.num_results)
+        self.assertTrue(np.array_equal(rs.get_column("x"), np.arange(self.num_results)))
+        self.assertTrue(np.array_equal(rs.get_result_values("trajectory.y"), 2 * np.arange(self.num_results)))
+        self.assertEqual(rs.get_column("psi_curve").shape, (self.num_results, self.num_times))
+        self.assertTrue(np.all(rs.get_column("valid")))
+        self.assertIsNone(rs.get_column("stamp"))
+
+        # The likelihoods match those computed by the ResultRows.
+        for i in range(self.num_results):
+            row = ResultRow(make_trajectory(x=i), self.num_times)
+            row.set_psi_phi(self.psi[i], self.phi[i])
+            self.assertAlmostEqual(rs.get_column("likelihood")[i], row.final_likelihood, places=4)
+            self.assertAlmostEqual(rs.get_column("flux")[i], row.trajectory.flux, places=4)
+
+        # We can also create the list from a structured array of trajectories.
+        trj_arr = np.array(
+            [(t.x, t.y, t.vx, t.vy, t.lh, t.flux, t.obs_count) for t in self.trjs],
+            dtype=[
+                ("x", "i2"),
+                ("y", "i2"),
+                ("vx", "f4"),
+                ("vy", "f4"),
+                ("lh", "f4"),
+                ("flux", "f4"),
+                ("obs_count", "i2"),
+            ],
+        )
+        rs2 = ColumnarResultList.from_trajectories(trj_arr, self.times)
+        self.assertTrue(np.allclose(rs2.get_column("likelihood"), np.arange(self.num_results)))
+        self.assertIsNone(rs2.get_column("psi_curve"))
+
+        # Mismatched curves raise an error.
+        self.assertRaises(ValueError, ColumnarResultList.from_trajectories, self.trjs, self.times, self.psi)
+        self.assertRaises(
+            ValueError, ColumnarResultList.from_trajectories, self.trjs, self.times, self.psi[1:], self.phi
+        )
+
+    def test_valid_mask(self):
+        rs = ColumnarResultList.from_trajectories(self.trjs, self.times, self.psi, self.phi)
+        mask = np.ones((self.num_results, self.num_times), dtype=bool)
+        mask[2, [0, 4]] = False
+        rs.set_valid_mask(mask)
+
+        row = ResultRow(make_trajectory(x=2), self.num_times)
+        row.set_psi_phi(self.psi[2], self.phi[2])
+        row.filter_indices([1, 2, 3])
+        self.assertAlmostEqual(rs.get_column("likelihood")[2], row.final_likelihood, places=4)
+        self.assertEqual(rs.get_column("obs_count")[2], 3)
+        self.assertEqual(rs.get_row(2).valid_indices, [1, 2, 3])
+        self.assertTrue(np.array_equal(rs.get_result_values("valid_indices")[2], [1, 2, 3]))
+
+        self.assertRaises(ValueError, rs.set_valid_mask, mask[1:])
+
+    def test_get_row(self):
+        rs = ColumnarResultList.from_trajectories(self.trjs, self.times, self.psi, self.phi)
+        rs.set_column("stamp", np.ones((self.num_results, 3, 3)))
+
+        row = rs.get_row(3)
+        self.assertEqual(row.trajectory.x, 3)
+        self.assertEqual(row.trajectory.y, 6)
+        self.assertAlmostEqual(row.final_likelihood, rs.get_column("likelihood")[3])
+        self.assertTrue(np.allclose(row.psi_curve, self.psi[3]))
+        self.assertEqual(row.stamp.shape, (3, 3))
+        self.assertIsNone(row.all_stamps)
+
+        self.assertRaises(ValueError, rs.set_column, "stamp", np.ones((2, 3, 3)))
+        self.assertRaises(KeyError, rs.set_column, "x", np.ones(self.num_results))
+
+    def test_sort_and_extend(self):
+        rs1 = ColumnarResultList.from_trajectories(self.trjs[0:3], self.times)
+        rs2 = ColumnarResultList.from_trajectories(self.trjs[3:], self.times)
+        rs1.extend(rs2)
+        self.assertEqual(len(rs1), self.num_results)
+        self.assertTrue(np.array_equal(rs1.get_column("x"), np.arange(self.num_results)))
+
+        rs1.sort()
+        self.assertTrue(np.array_equal(rs1.get_column("x"), np.arange(self.num_results)[::-1]))
+        rs1.sort("trajectory.x", reverse=False)
+        self.assertTrue(np.array_equal(rs1.get_column("x"), np.arange(self.num_results)))
+
+        # We cannot combine lists with different optional columns.
+        rs3 = ColumnarResultList.from_trajectories(self.trjs, self.times, self.psi, self.phi)
+        self.assertRaises(ValueError, rs1.extend, rs3)
+
+        # Extending an empty list copies the columns.
+        rs4 = ColumnarResultList(self.times)
+        rs4.extend(rs3)
+        self.assertEqual(len(rs4), self.num_results)
+        self.assertIsNotNone(rs4.get_column("psi_curve"))
+
+    def test_filter(self):
+        rs = ColumnarResultList.from_trajectories(self.trjs, self.times, track_filtered=True)
+        rs.filter_results([0, 2, 2, 5], "first")
+        self.assertTrue(np.array_equal(rs.get_column("x"), [0, 2, 5]))
+
+        rs.filter_results(np.array([True, False, True]), "second")
+        self.assertTrue(np.array_equal(rs.get_column("x"), [0, 5]))
+
+        self.assertTrue(np.array_equal(rs.get_filtered("first").get_column("x"), [1, 3, 4]))
+        self.assertTrue(np.array_equal(rs.get_filtered("second").get_column("x"), [2]))
+        self.assertEqual(len(rs.get_filtered()), 4)
+        self.assertEqual(len(rs.get_filtered("unknown")), 0)
+
+        # Without tracking we do not keep the filtered results.
+        rs2 = ColumnarResultList.from_trajectories(self.trjs, self.times)
+        rs2.filter_results([1])
+        self.assertEqual(len(rs2), 1)
+        self.assertRaises(ValueError, rs2.get_filtered)
+
+    def test_to_from_result_list(self):
+        rs = ColumnarResultList.from_trajectories(self.trjs, self.times, self.psi, self.phi)
+        mask = np.ones((self.num_results, self.num_times), dtype=bool)
+        mask[0, 1] = False
+        rs.set_valid_mask(mask)
+
+        row_list = rs.to_result_list()
+        self.assertEqual(row_list.num_results(), self.num_results)
+        self.assertEqual(row_list.results[0].valid_indices, [0, 2, 3, 4])
+
+        rs2 = ColumnarResultList.from_result_list(row_list)
+        self.assertEqual(len(rs2), self.num_results)
+        for col in ["x", "y", "vx", "vy", "obs_count", "valid"]:
+            self.assertTrue(np.array_equal(rs.get_column(col), rs2.get_column(col)))
+        self.assertTrue(np.allclose(rs.get_column("likelihood"), rs2.get_column("likelihood")))
+        self.assertTrue(np.allclose(rs.get_column("psi_curve"), rs2.get_column("psi_curve")))
+
+        table = rs.to_table(append_times=True)
+        self.assertEqual(len(table), self.num_results)
+        self.assertTrue(np.array_equal(table["trajectory_x"], np.arange(self.num_results)))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 
 import numpy as np
@@ -130,6 +132,57 @@ class test_search(unittest.TestCase):
         self.assertRaises(RuntimeError, self.search.get_results, -1, 5)
         self.assertRaises(RuntimeError, self.search.get_results, 0, 0)
 
+    def test_get_results_above(self):
+        lh = [10.0, 50.0, 5.0, 70.0, 30.0, -1.0]
+        trjs = [
+            make_trajectory(x=i, y=2 * i, vx=1.0, vy=-1.0, flux=3.0, lh=lh[i], obs_count=i) for i in range(6)
+        ]
+        self.search.set_results(trjs)
+
+        results = self.search.get_results_above(10.0)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(np.array_equal(results["x"], [3, 1, 4, 0]))
+        self.assertTrue(np.array_equal(results["y"], [6, 2, 8, 0]))
+        self.assertTrue(np.allclose(results["lh"], [70.0, 50.0, 30.0, 10.0]))
+        self.assertTrue(np.allclose(results["vx"], 1.0))
+        self.assertTrue(np.allclose(results["vy"], -1.0))
+        self.assertTrue(np.allclose(results["flux"], 3.0))
+        self.assertTrue(np.array_equal(results["obs_count"], [3, 1, 4, 0]))
+
+        # The full set of results is still available (and sorted).
+        all_results = self.search.get_results(0, 10)
+        self.assertEqual(len(all_results), 6)
+        self.assertEqual([trj.x for trj in all_results], [3, 1, 4, 0, 2, 5])
+
+        # We can get an empty array.
+        self.assertEqual(len(self.search.get_results_above(100.0)), 0)
+
+    def test_get_psi_phi_curves(self):
+        trjs = [
+            self.trj,
+            make_trajectory(x=self.masked_x, y=self.masked_y, vx=0.0, vy=0.0),
+            make_trajectory(x=-5, y=70, vx=-2.0, vy=30.0),
+        ]
+        psi_curves, phi_curves = self.search.get_psi_phi_curves(trjs)
+        self.assertEqual(psi_curves.shape, (3, self.img_count))
+        self.assertEqual(phi_curves.shape, (3, self.img_count))
+        self.assertEqual(psi_curves.dtype, np.float32)
+
+        for i, trj in enumerate(trjs):
+            self.assertTrue(np.allclose(psi_curves[i], self.search.get_psi_curves(trj)))
+            self.assertTrue(np.allclose(phi_curves[i], self.search.get_phi_curves(trj)))
+
+        # The masked pixel is zeroed in every other image.
+        self.assertEqual(psi_curves[1, 0], 0.0)
+        self.assertEqual(phi_curves[1, 0], 0.0)
+
+        # We can also pass in an array of (x, y, vx, vy).
+        trj_arr = np.array([[trj.x, trj.y, trj.vx, trj.vy] for trj in trjs])
+        psi_curves2, phi_curves2 = self.search.get_psi_phi_curves(trj_arr)
+        self.assertTrue(np.allclose(psi_curves, psi_curves2))
+        self.assertTrue(np.allclose(phi_curves, phi_curves2))
+        self.assertRaises(RuntimeError, self.search.get_psi_phi_curves, np.zeros((3, 3)))
+
     def test_load_and_filter_results_lh(self):
         time_list = [i / self.img_count for i in range(self.img_count)]
         fake_ds = FakeDataSet(
@@ -178,7 +231,6 @@ class test_search(unittest.TestCase):
         self.assertEqual(results.results[0].trajectory.y, 30)
         self.assertEqual(results.results[1].trajectory.y, 40)
 
-    @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_evaluate_single_trajectory(self):
         test_trj = make_trajectory(
             x=self.start_x,
@@ -193,7 +245,6 @@ class test_search(unittest.TestCase):
         self.assertGreater(test_trj.flux, 0.0)
         self.assertGreater(test_trj.lh, 0.0)
 
-    @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_search_linear_trajectory(self):
         test_trj = self.search.search_linear_trajectory(
             self.start_x,
@@ -220,6 +271,191 @@ class test_search(unittest.TestCase):
         self.assertAlmostEqual(best.vy / self.vyel, 1, delta=self.velocity_error)
         self.assertAlmostEqual(best.flux / self.object_flux, 1, delta=self.flux_error)
 
+    def test_evaluate_trajectories_cpu_block_matches_scalar(self):
+        # Include velocities that leave the image and pass over the masked pixel.
+        candidates = [
+            make_trajectory(vx=float(vx), vy=float(vy))
+            for vx in range(-40, 41, 7)
+            for vy in range(-30, 31, 9)
+        ]
+        for num_bytes in [1, 2, 4]:
+            psi_phi = PsiPhiArray()
+            fill_psi_phi_array_from_image_stack(psi_phi, self.stack, num_bytes, False)
+            for do_sigmag in [False, True]:
+                for x, y in [(self.start_x, self.start_y), (self.masked_x, self.masked_y), (-2, 70)]:
+                    block = evaluate_trajectories_cpu(psi_phi, x, y, candidates, True, do_sigmag)
+                    scalar = evaluate_trajectories_cpu(psi_phi, x, y, candidates, False, do_sigmag)
+                    self.assertEqual(len(block), len(candidates))
+                    for b_trj, s_trj in zip(block, scalar):
+                        self.assertEqual(b_trj.x, x)
+                        self.assertEqual(b_trj.y, y)
+                        self.assertEqual(b_trj.obs_count, s_trj.obs_count)
+                        if s_trj.obs_count > 0:
+                            self.assertAlmostEqual(b_trj.lh, s_trj.lh, delta=1e-5)
+                            self.assertAlmostEqual(b_trj.flux, s_trj.flux, delta=1e-5)
+
+    def test_results_cpu(self):
+        # Use a small grid of candidate velocities (including the true one) to keep the CPU search fast.
+        candidates = [
+            make_trajectory(vx=float(vx), vy=float(vy)) for vx in range(15, 28) for vy in range(10, 23)
+        ]
+        self.search.search(candidates, int(self.img_count / 2), False)
+
+        results = self.search.get_results(0, 10)
+        best = results[0]
+        self.assertAlmostEqual(best.x, self.start_x, delta=self.pixel_error)
+        self.assertAlmostEqual(best.y, self.start_y, delta=self.pixel_error)
+        self.assertAlmostEqual(best.vx / self.vxel, 1, delta=self.velocity_error)
+        self.assertAlmostEqual(best.vy / self.vyel, 1, delta=self.velocity_error)
+        self.assertAlmostEqual(best.flux / self.object_flux, 1, delta=self.flux_error)
+
+        # The CPU results should match evaluating the same trajectory directly.
+        test_trj = make_trajectory(x=best.x, y=best.y, vx=best.vx, vy=best.vy)
+        self.search.evaluate_single_trajectory(test_trj)
+        self.assertEqual(test_trj.obs_count, best.obs_count)
+        self.assertAlmostEqual(test_trj.lh, best.lh, delta=1e-4)
+        self.assertAlmostEqual(test_trj.flux, best.flux, delta=1e-4)
+
+    def test_results_tiled_cpu(self):
+        candidates = [
+            make_trajectory(vx=float(vx), vy=float(vy)) for vx in range(15, 28, 2) for vy in range(10, 23, 2)
+        ]
+        candidates.append(make_trajectory(vx=self.vxel, vy=self.vyel))
+
+        # Use tiles that do not evenly divide the search region.
+        self.search.search_tiled(candidates, int(self.img_count / 2), 13, 50, False)
+        tiled = self.search.get_results(0, 100)
+        self.assertEqual(len(tiled), 50)
+        for i in range(1, len(tiled)):
+            self.assertGreaterEqual(tiled[i - 1].lh, tiled[i].lh)
+
+        best = tiled[0]
+        self.assertEqual(best.x, self.start_x)
+        self.assertEqual(best.y, self.start_y)
+        self.assertAlmostEqual(best.vx, self.vxel)
+        self.assertAlmostEqual(best.vy, self.vyel)
+
+        # The tiled results match the top results from the full search.
+        self.search.search(candidates, int(self.img_count / 2), False)
+        full = self.search.get_results(0, 50)
+        for t_trj, f_trj in zip(tiled, full):
+            self.assertAlmostEqual(t_trj.lh, f_trj.lh, delta=1e-4)
+
+        self.assertRaises(RuntimeError, self.search.search_tiled, candidates, 10, 0, 50, False)
+        self.assertRaises(RuntimeError, self.search.search_tiled, candidates, 10, 10, 0, False)
+
+    def test_search_tiled_layout(self):
+        candidates = [
+            make_trajectory(vx=float(vx), vy=float(vy)) for vx in range(15, 28, 3) for vy in [12, 16]
+        ]
+        candidates.append(make_trajectory(vx=self.vxel, vy=self.vyel))
+        min_obs = int(self.img_count / 2)
+
+        self.search.search(candidates, min_obs, False)
+        expected = self.search.get_results(0, 1000)
+
+        self.assertRaises(RuntimeError, self.search.set_psi_phi_layout, PSI_PHI_TILED, 6)
+        for tile_size in [4, 16]:
+            self.search.set_psi_phi_layout(PSI_PHI_TILED, tile_size)
+            self.search.search(candidates, min_obs, False)
+            results = self.search.get_results(0, 1000)
+            self.assertEqual(len(results), len(expected))
+            for trj1, trj2 in zip(results, expected):
+                self.assertEqual(trj1.x, trj2.x)
+                self.assertEqual(trj1.y, trj2.y)
+                self.assertEqual(trj1.obs_count, trj2.obs_count)
+                self.assertAlmostEqual(trj1.lh, trj2.lh, delta=1e-5)
+
+            # The psi and phi curves are read from the tiled data.
+            psi1, phi1 = self.search.get_psi_phi_curves([expected[0]])
+            self.search.set_psi_phi_layout(PSI_PHI_INTERLEAVED)
+            psi2, phi2 = self.search.get_psi_phi_curves([expected[0]])
+            np.testing.assert_allclose(psi1, psi2)
+            np.testing.assert_allclose(phi1, phi2)
+
+    def test_psi_phi_cache(self):
+        candidates = [
+            make_trajectory(vx=float(vx), vy=float(vy)) for vx in range(15, 28, 3) for vy in [12, 16]
+        ]
+        candidates.append(make_trajectory(vx=self.vxel, vy=self.vyel))
+        self.search.enable_gpu_encoding(2)
+        self.search.search(candidates, int(self.img_count / 2), False)
+        expected = self.search.get_results(0, 1000)
+
+        with tempfile.TemporaryDirectory() as dir_name:
+            runner = SearchRunner()
+            cache_file = runner.load_or_save_psi_phi_cache(self.search, dir_name)
+            self.assertTrue(os.path.exists(cache_file))
+            self.assertIn(self.search.get_psi_phi_cache_key(), cache_file)
+
+            # A new search over the same images loads the cached data and finds the same results.
+            search2 = StackSearch(ImageStack(self.imlist))
+            search2.enable_gpu_encoding(2)
+            self.assertEqual(search2.get_psi_phi_cache_key(), self.search.get_psi_phi_cache_key())
+            self.assertEqual(runner.load_or_save_psi_phi_cache(search2, dir_name), cache_file)
+            search2.search(candidates, int(self.img_count / 2), False)
+            results = search2.get_results(0, 1000)
+            self.assertEqual(len(results), len(expected))
+            for trj1, trj2 in zip(results, expected):
+                self.assertEqual(trj1.x, trj2.x)
+                self.assertEqual(trj1.y, trj2.y)
+                self.assertAlmostEqual(trj1.lh, trj2.lh, delta=1e-5)
+
+            # The cache is keyed by the encoding and loading a mismatched file fails.
+            search3 = StackSearch(ImageStack(self.imlist))
+            self.assertNotEqual(search3.get_psi_phi_cache_key(), self.search.get_psi_phi_cache_key())
+            self.assertRaises(RuntimeError, search3.load_psi_phi_cache, cache_file)
+
+            # The encoding options are part of the key and must match when loading.
+            search4 = StackSearch(ImageStack(self.imlist))
+            search4.enable_gpu_encoding(2)
+            search4.set_encoding_scaling(True, 0.001)
+            self.assertNotEqual(search4.get_psi_phi_cache_key(), self.search.get_psi_phi_cache_key())
+            self.assertRaises(RuntimeError, search4.load_psi_phi_cache, cache_file)
+            search4.search(candidates, int(self.img_count / 2), False)
+            self.assertEqual(search4.get_results(0, 1)[0].x, expected[0].x)
+
+    def test_results_dedup_cpu(self):
+        candidates = [
+            make_trajectory(vx=float(vx), vy=float(vy)) for vx in range(15, 28, 2) for vy in range(10, 23, 2)
+        ]
+        candidates.append(make_trajectory(vx=self.vxel, vy=self.vyel))
+        min_obs = int(self.img_count / 2)
+
+        self.search.search(candidates, min_obs, False)
+        full = self.search.get_results(0, 100000)
+
+        self.assertRaises(RuntimeError, self.search.enable_result_dedup, -1.0, 1.0)
+        self.search.enable_result_dedup(3.0, 2.5)
+        self.search.search(candidates, min_obs, False)
+        dedup = self.search.get_results(0, 100000)
+        self.assertLess(len(dedup), len(full))
+
+        # The best result is unchanged and the results are sorted.
+        self.assertEqual(dedup[0].x, full[0].x)
+        self.assertEqual(dedup[0].y, full[0].y)
+        self.assertAlmostEqual(dedup[0].lh, full[0].lh, delta=1e-4)
+        for i in range(1, len(dedup)):
+            self.assertGreaterEqual(dedup[i - 1].lh, dedup[i].lh)
+
+        # No two kept results are within both radii and all have enough observations. The tiled
+        # search suppresses within each tile first, so it can differ slightly near tile edges.
+        self.search.search_tiled(candidates, min_obs, 13, 100000, False)
+        tiled = self.search.get_results(0, 100000)
+        self.assertAlmostEqual(tiled[0].lh, dedup[0].lh, delta=1e-4)
+        for res in [dedup, tiled]:
+            pos = np.array([[trj.x, trj.y] for trj in res], dtype=float)
+            vel = np.array([[trj.vx, trj.vy] for trj in res], dtype=float)
+            pos_dist = np.linalg.norm(pos[:, None, :] - pos[None, :, :], axis=2)
+            vel_dist = np.linalg.norm(vel[:, None, :] - vel[None, :, :], axis=2)
+            close = (pos_dist <= 3.0) & (vel_dist <= 2.5)
+            self.assertEqual(np.count_nonzero(close), len(res))
+            self.assertTrue(all(trj.obs_count >= min_obs for trj in res))
+
+        self.search.disable_result_dedup()
+        self.search.search(candidates, min_obs, False)
+        self.assertEqual(len(self.search.get_results(0, 100000)), len(full))
+
     @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_results_extended_bounds(self):
         self.search.set_start_bounds_x(-10, self.dim_x + 10)
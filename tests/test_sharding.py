@@ -0,0 +1,175 @@
+import math
+import numpy as np
+import os
+import tempfile
+import unittest
+
+from kbmod.configuration import SearchConfiguration
+from kbmod.fake_data.fake_data_creator import FakeDataSet, create_fake_times
+from kbmod.result_list import ResultList, ResultRow
+from kbmod.run_search import SearchRunner
+from kbmod.sharding import compute_shard_margin, merge_shard_results, split_work_unit
+from kbmod.trajectory_utils import make_trajectory
+from kbmod.wcs_utils import make_fake_wcs
+from kbmod.work_unit import WorkUnit
+
+
+class test_sharding(unittest.TestCase):
+    def setUp(self):
+        self.width = 60
+        self.height = 50
+        self.times = create_fake_times(8, 57130.2, 8, 0.05, 1)
+        self.ds = FakeDataSet(self.width, self.height, self.times, use_seed=True)
+        self.trj = make_trajectory(x=17, y=32, vx=10.0, vy=-5.0, flux=500.0)
+        self.ds.insert_object(self.trj)
+
+        self.config = SearchConfiguration()
+        self.config.set("ang_arr", [math.pi, math.pi, 16])
+        self.config.set("v_arr", [0, 20.0, 21])
+        self.config.set("average_angle", 0.0)
+        self.config.set("num_obs", 8)
+        self.config.set("lh_level", 10.0)
+        self.config.set("do_clustering", False)
+        self.config.set("do_stamp_filter", False)
+        self.config.set("sigmaG_lims", [25, 75])
+
+        self.wcs = make_fake_wcs(10.0, 10.0, self.height, self.width)
+        self.work = WorkUnit(im_stack=self.ds.stack, config=self.config, wcs=self.wcs)
+
+    def test_compute_shard_margin(self):
+        time_span = self.times[-1] - self.times[0]
+        self.assertEqual(compute_shard_margin(self.config, self.times), math.ceil(20.0 * time_span))
+        self.assertEqual(compute_shard_margin(self.config, []), 0)
+
+    def test_crop(self):
+        cropped = self.work.crop(10, 40, 5, 25)
+        self.assertEqual(cropped.origin, (10, 5))
+        self.assertEqual(cropped.im_stack.get_width(), 30)
+        self.assertEqual(cropped.im_stack.get_height(), 20)
+        for i in range(len(self.work)):
+            full = self.work.im_stack.get_single_image(i)
+            part = cropped.im_stack.get_single_image(i)
+            self.assertEqual(part.get_obstime(), full.get_obstime())
+            self.assertTrue(np.array_equal(part.get_science().image, full.get_science().image[5:25, 10:40]))
+            self.assertTrue(np.array_equal(part.get_variance().image, full.get_variance().image[5:25, 10:40]))
+
+        # The cropped WCS maps the shifted pixels to the same sky positions.
+        self.assertTrue(
+            np.allclose(cropped.wcs.pixel_to_world_values(3, 4), self.wcs.pixel_to_world_values(13, 9))
+        )
+
+        # The origin is saved with the WorkUnit.
+        with tempfile.TemporaryDirectory() as dir_name:
+            cropped.to_fits(os.path.join(dir_name, "shard.fits"))
+            self.assertEqual(WorkUnit.from_fits(os.path.join(dir_name, "shard.fits")).origin, (10, 5))
+            cropped.to_binary(os.path.join(dir_name, "shard.kbwu"))
+            self.assertEqual(WorkUnit.from_binary(os.path.join(dir_name, "shard.kbwu")).origin, (10, 5))
+        self.assertEqual(WorkUnit.from_yaml(cropped.to_yaml()).origin, (10, 5))
+
+        # Cropping a crop accumulates the origin.
+        self.assertEqual(cropped.crop(1, 5, 2, 6).origin, (11, 7))
+
+        self.assertRaises(ValueError, self.work.crop, 10, 10, 5, 25)
+        self.assertRaises(ValueError, self.work.crop, -1, 10, 5, 25)
+        self.assertRaises(ValueError, self.work.crop, 0, 10, 5, self.height + 1)
+
+    def test_split_work_unit(self):
+        shards = split_work_unit(self.work, 3, 2, margin=4)
+        self.assertEqual(len(shards), 6)
+
+        # The core regions (in full field coordinates) tile the image exactly.
+        covered = np.zeros((self.height, self.width), dtype=int)
+        for shard in shards:
+            x_bnds = shard.config["x_pixel_bounds"]
+            y_bnds = shard.config["y_pixel_bounds"]
+            x0, y0 = shard.origin
+            covered[y0 + y_bnds[0] : y0 + y_bnds[1], x0 + x_bnds[0] : x0 + x_bnds[1]] += 1
+
+            # Each core has the margin around it (unless it is at the edge of the image).
+            self.assertEqual(x_bnds[0], min(4, x0 + x_bnds[0]))
+            self.assertEqual(y_bnds[0], min(4, y0 + y_bnds[0]))
+            self.assertLessEqual(x0 + shard.im_stack.get_width(), self.width)
+            self.assertLessEqual(y0 + shard.im_stack.get_height(), self.height)
+            self.assertEqual(len(shard), len(self.work))
+        self.assertTrue(np.all(covered == 1))
+
+        self.assertRaises(ValueError, split_work_unit, self.work, 0, 2)
+        self.assertRaises(ValueError, split_work_unit, self.work, 2, 2, -1)
+        self.assertRaises(ValueError, split_work_unit, self.work, self.width + 1, 1)
+
+    def test_merge_shard_results(self):
+        num_times = len(self.times)
+        res1 = ResultList(self.times)
+        res1.append_result(ResultRow(make_trajectory(1, 2, 1.0, 2.0, lh=10.0), num_times))
+        res1.append_result(ResultRow(make_trajectory(5, 5, 0.0, 0.0, lh=5.0), num_times))
+        res2 = ResultList(self.times)
+        res2.append_result(ResultRow(make_trajectory(0, 0, 1.0, 2.0, lh=12.0), num_times))
+        res2.append_result(ResultRow(make_trajectory(3, 3, 0.0, 0.0, lh=20.0), num_times))
+
+        merged = merge_shard_results([res1, res2], [(10, 20), (11, 22)])
+        self.assertEqual(len(merged), 3)
+        self.assertEqual(merged.get_result_values("trajectory.x"), [14, 11, 15])
+        self.assertEqual(merged.get_result_values("trajectory.y"), [25, 22, 25])
+        self.assertEqual(merged.get_result_values("final_likelihood"), [20.0, 12.0, 5.0])
+
+        # The inputs are not modified.
+        self.assertEqual(res1.results[0].trajectory.x, 1)
+
+        self.assertRaises(ValueError, merge_shard_results, [res1, res2], [(0, 0)])
+
+        # With a configuration, near duplicates from different shards are removed.
+        config = SearchConfiguration()
+        config.set("do_clustering", False)
+        config.set("dedup_radius", [2.0, 0.5])
+        merged = merge_shard_results([res1, res2], [(10, 20), (11, 22)], config=config)
+        self.assertEqual(merged.get_result_values("trajectory.x"), [14, 11])
+        self.assertEqual(merged.get_result_values("final_likelihood"), [20.0, 12.0])
+
+        # Clustering needs the size of the full field.
+        config.set("do_clustering", True)
+        self.assertRaises(ValueError, merge_shard_results, [res1, res2], [(10, 20), (11, 22)], config)
+
+    def test_sharded_search_matches_full(self):
+        rs = SearchRunner()
+        full = rs.run_search_from_work_unit(self.work)
+
+        shards = split_work_unit(self.work, 2, 2)
+        shard_results = [rs.run_search_from_work_unit(shard) for shard in shards]
+        merged = merge_shard_results(shard_results, [shard.origin for shard in shards])
+
+        self.assertGreaterEqual(len(merged), 1)
+        self.assertEqual(len(merged), len(full))
+        best = merged.results[0].trajectory
+        self.assertLessEqual(abs(best.x - self.trj.x), 1)
+        self.assertLessEqual(abs(best.y - self.trj.y), 1)
+        self.assertEqual(best.x, full.results[0].trajectory.x)
+        self.assertEqual(best.y, full.results[0].trajectory.y)
+
+    def test_sharded_search_matches_full_clustering(self):
+        # Place the object on the boundary between the shards and cluster the results.
+        ds = FakeDataSet(self.width, self.height, self.times, use_seed=True)
+        ds.insert_object(make_trajectory(x=30, y=25, vx=10.0, vy=-5.0, flux=500.0))
+        self.config.set("do_clustering", True)
+        work = WorkUnit(im_stack=ds.stack, config=self.config, wcs=self.wcs)
+
+        rs = SearchRunner()
+        full = rs.run_search_from_work_unit(work)
+
+        shards = split_work_unit(work, 2, 2)
+        shard_results = [rs.run_search_from_work_unit(shard) for shard in shards]
+        origins = [shard.origin for shard in shards]
+
+        # Without the configuration the results near the boundary are duplicated.
+        self.assertGreater(len(merge_shard_results(shard_results, origins)), len(full))
+
+        merged = merge_shard_results(
+            shard_results, origins, config=shards[0].config, width=self.width, height=self.height
+        )
+        self.assertEqual(len(merged), len(full))
+        full_keys = set((r.trajectory.x, r.trajectory.y) for r in full.results)
+        merged_keys = set((r.trajectory.x, r.trajectory.y) for r in merged.results)
+        self.assertEqual(merged_keys, full_keys)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,7 @@ import numpy as np
 import unittest
 
 from kbmod.filters.sigma_g_filter import SigmaGClipping, apply_clipped_sigma_g
-from kbmod.result_list import ResultRow, ResultList
+from kbmod.result_list import ColumnarResultList, ResultRow, ResultList
 from kbmod.search import Trajectory
 
 
@@ -77,13 +77,64 @@ class test_sigma_g_math(unittest.TestCase):
             r_set.append_result(row)
 
         clipper = SigmaGClipping(10, 90)
-        apply_clipped_sigma_g(clipper, r_set, num_threads=2)
+        with self.assertWarns(DeprecationWarning):
+            apply_clipped_sigma_g(clipper, r_set, num_threads=2)
         self.assertEqual(r_set.num_results(), 5)
 
         # Confirm that the ResultRows were modified in place.
         for i in range(5):
             self.assertEqual(len(r_set.results[i].valid_indices), num_times - i)
 
+    def test_sigma_g_clipping_matrix(self):
+        rng = np.random.default_rng(100)
+        lh = rng.normal(5.0, 2.0, size=(50, 30)).astype(np.float32)
+        lh[:, 3] = 100.0
+        lh[4, :] = -1.0
+        lh[5, 7] = 0.0
+        lh[6, 2] = np.nan
+        lh[7, :] = np.nan
+
+        for clip_negative in [False, True]:
+            params = SigmaGClipping(clip_negative=clip_negative)
+            keep = params.compute_clipped_sigma_g_matrix(lh)
+            self.assertEqual(keep.shape, lh.shape)
+            for i in range(lh.shape[0]):
+                expected = np.zeros(lh.shape[1], dtype=bool)
+                expected[params.compute_clipped_sigma_g(lh[i]).astype(int)] = True
+                self.assertTrue(np.array_equal(keep[i], expected))
+
+            # NaNs and the outlier column are never kept (except in the row where
+            # the outlier is the only positive value).
+            self.assertFalse(np.any(keep[np.arange(50) != 4, 3]))
+            self.assertFalse(np.any(keep[np.isnan(lh)]))
+
+        # All negative rows are clipped entirely with clip_negative.
+        keep = SigmaGClipping(clip_negative=True).compute_clipped_sigma_g_matrix(lh)
+        self.assertFalse(np.any(keep[4]))
+        self.assertFalse(keep[5, 7])
+
+        # Empty inputs and invalid shapes.
+        self.assertEqual(SigmaGClipping().compute_clipped_sigma_g_matrix(np.zeros((0, 5))).shape, (0, 5))
+        self.assertRaises(ValueError, SigmaGClipping().compute_clipped_sigma_g_matrix, np.zeros(5))
+
+    def test_apply_clipped_sigma_g_columnar(self):
+        num_times = 20
+        times = [(10.0 + 0.1 * float(i)) for i in range(num_times)]
+        psi = np.ones((5, num_times), dtype=np.float32)
+        for i in range(5):
+            psi[i, :i] = 100.0
+        phi = np.full((5, num_times), 0.1, dtype=np.float32)
+
+        trjs = [Trajectory() for _ in range(5)]
+        r_set = ColumnarResultList.from_trajectories(trjs, times, psi, phi)
+        apply_clipped_sigma_g(SigmaGClipping(10, 90), r_set)
+        self.assertEqual(r_set.num_results(), 5)
+        for i in range(5):
+            self.assertEqual(r_set.get_column("obs_count")[i], num_times - i)
+            self.assertAlmostEqual(
+                r_set.get_column("likelihood")[i], (num_times - i) / np.sqrt(0.1 * (num_times - i)), places=4
+            )
+
     def test_sigmag_computation(self):
         self.assertAlmostEqual(SigmaGClipping.find_sigma_g_coeff(25.0, 75.0), 0.7413, delta=0.001)
         self.assertRaises(ValueError, SigmaGClipping.find_sigma_g_coeff, -1.0, 75.0)
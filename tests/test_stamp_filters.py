@@ -31,6 +31,16 @@ class test_stamp_filters(unittest.TestCase):
         row = self._create_row(stamp)
         self.assertFalse(StampPeakFilter(5, 100, 100).keep_row(row))
 
+    def test_keep_data(self):
+        stamps = [np.zeros((11, 11)), None, np.zeros((5, 5)), np.zeros(121)]
+        stamps[0][5, 5] = 10.0
+        stamps[3][0] = 10.0
+        filter = StampPeakFilter(5, 2, 2)
+        data, valid = filter.get_column_data(stamps)
+        self.assertTrue(np.array_equal(valid, [True, False, False, True]))
+        self.assertEqual(data.shape, (2, 11, 11))
+        self.assertTrue(np.array_equal(filter.keep_data(data), [True, False]))
+
     def test_peak_filtering(self):
         stamp = RawImage(11, 11)
         stamp.set_all(1.0)
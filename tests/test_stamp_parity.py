@@ -47,6 +47,67 @@ class test_search(unittest.TestCase):
                 img.apply_mask(1)
         self.search = StackSearch(fake_ds.stack)
 
+    def test_coadd_array_cpu_parity(self):
+        radius = 3
+        params = StampParameters()
+        params.radius = radius
+        params.do_filtering = False
+        stack = self.search.get_imagestack()
+
+        # Include trajectories that leave the image and one that passes through the masked pixel.
+        trjs = [
+            self.trj,
+            make_trajectory(0, 0, -10.0, 5.0),
+            make_trajectory(self.dim_x - 1, self.dim_y - 2, 30.0, 0.0),
+            make_trajectory(self.masked_x, self.masked_y, 0.0, 0.0),
+        ]
+        use_index = [[], [True] * self.img_count, [i % 3 != 0 for i in range(self.img_count)], []]
+        use_index[1][4] = False
+
+        for stamp_type, func in [
+            (StampType.STAMP_SUM, StampCreator.get_summed_stamp),
+            (StampType.STAMP_MEAN, StampCreator.get_mean_stamp),
+            (StampType.STAMP_MEDIAN, StampCreator.get_median_stamp),
+        ]:
+            params.stamp_type = stamp_type
+            stamps, keep = StampCreator.get_coadded_stamp_array(stack, trjs, use_index, params)
+            self.assertEqual(stamps.shape, (len(trjs), 2 * radius + 1, 2 * radius + 1))
+            self.assertTrue(np.all(keep))
+
+            for i, trj in enumerate(trjs):
+                expected = func(stack, trj, radius, use_index[i])
+                np.testing.assert_array_equal(stamps[i], expected.image)
+
+            # The list version matches.
+            stamps_list = StampCreator.get_coadded_stamps(stack, trjs, use_index, params, False)
+            for i in range(len(trjs)):
+                np.testing.assert_array_equal(stamps[i], stamps_list[i].image)
+
+        # With filtering the keep mask matches filtering each stamp separately.
+        params.stamp_type = StampType.STAMP_MEAN
+        params.do_filtering = True
+        params.peak_offset_x = 1.5
+        params.peak_offset_y = 1.5
+        params.center_thresh = 0.01
+        params.m01_limit = 1.0
+        params.m10_limit = 1.0
+        params.m11_limit = 2.0
+        params.m02_limit = 35.5
+        params.m20_limit = 35.5
+        stamps, keep = StampCreator.get_coadded_stamp_array(stack, trjs, use_index, params)
+        self.assertTrue(keep[0])
+        for i, trj in enumerate(trjs):
+            expected = StampCreator.get_mean_stamp(stack, trj, radius, use_index[i])
+            self.assertEqual(keep[i], not StampCreator.filter_stamp(expected, params))
+
+        # Invalid parameters fail.
+        self.assertRaises(
+            RuntimeError, StampCreator.get_coadded_stamp_array, stack, trjs, use_index[0:2], params
+        )
+        self.assertRaises(
+            RuntimeError, StampCreator.get_coadded_stamp_array, stack, trjs, [[True]] * 4, params
+        )
+
     @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_coadd_gpu_parity(self):
         radius = 2
@@ -13,6 +13,7 @@ from kbmod.standardizers import (
     KBMODV1,
     KBMODV1Config,
     FitsStandardizer,
+    HeaderOnlyHDUList,
 )
 
 
@@ -367,6 +368,46 @@ class TestKBMODV1(unittest.TestCase):
         self.assertEqual(expected_mjd, img.get_variance().obstime)
         self.assertEqual(expected_mjd, img.get_mask().obstime)
 
+    def test_header_only(self):
+        """Test KBMODV1 standardizes metadata from the headers alone and reads
+        data on demand."""
+        fits_file = tempfile.NamedTemporaryFile(suffix=".fits", delete=False)
+        self.fits.writeto(fits_file.file, overwrite=True, output_verify="ignore")
+        fits_file.close()
+
+        std = Standardizer.get(fits_file.name, force=KBMODV1)
+        std_hdr = Standardizer.get(fits_file.name, force=KBMODV1, config={"header_only": True})
+        self.assertIsInstance(std_hdr.hdulist, HeaderOnlyHDUList)
+        self.assertEqual(len(std_hdr.hdulist), len(std.hdulist))
+        self.assertEqual(std_hdr.hdulist["IMAGE"].shape, std.hdulist["IMAGE"].shape)
+        self.assertEqual(std_hdr.primary, std.primary)
+        with self.assertRaises(KeyError):
+            std_hdr.hdulist["NOEXIST"]
+
+        # No data is loaded for the metadata.
+        meta = std.standardizeMetadata()
+        meta_hdr = std_hdr.standardizeMetadata()
+        for hdu in std_hdr.hdulist:
+            self.assertIsNone(hdu._data)
+
+        for key in ["mjd", "filter", "visit_id", "location"]:
+            with self.subTest("Value not standardized as expected.", key=key):
+                self.assertEqual(meta[key], meta_hdr[key])
+        np.testing.assert_allclose(meta["ra"], meta_hdr["ra"])
+        np.testing.assert_allclose(meta["dec"], meta_hdr["dec"])
+        for bbox, bbox_hdr in zip(meta["bbox"], meta_hdr["bbox"]):
+            for key in bbox:
+                self.assertAlmostEqual(bbox[key], bbox_hdr[key])
+
+        # The data is read when needed.
+        img = std.toLayeredImage()[0]
+        img_hdr = std_hdr.toLayeredImage()[0]
+        np.testing.assert_equal(img.get_science().image, img_hdr.get_science().image)
+        np.testing.assert_equal(img.get_variance().image, img_hdr.get_variance().image)
+        np.testing.assert_equal(img.get_mask().image, img_hdr.get_mask().image)
+
+        os.unlink(fits_file.name)
+
 
 if __name__ == "__main__":
     unittest.main()
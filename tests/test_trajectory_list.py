@@ -147,6 +147,50 @@ class test_trajectory_list(unittest.TestCase):
             self.assertTrue(idx in expected)
             expected.remove(idx)
 
+    def test_partition_by_likelihood(self):
+        lh = [100.0, 110.0, 90.0, 120.0, 125.0, 121.0, 10.0]
+        trjs = TrajectoryList(len(lh))
+        for i in range(len(lh)):
+            trjs.set_trajectory(i, make_trajectory(x=i, lh=lh[i]))
+
+        count = trjs.partition_by_likelihood(110.0)
+        self.assertEqual(count, 4)
+
+        # Nothing is dropped, but the results above the threshold are first and sorted.
+        self.assertEqual(len(trjs), len(lh))
+        self.assertEqual([trjs.get_trajectory(i).x for i in range(count)], [4, 5, 3, 1])
+        self.assertEqual(set([trjs.get_trajectory(i).x for i in range(count, len(lh))]), set([0, 2, 6]))
+
+    def test_filter_duplicates(self):
+        # (x, y, vx, vy, lh)
+        values = [
+            (10, 10, 1.0, 1.0, 50.0),
+            (11, 10, 1.0, 1.1, 60.0),  # Best in the cluster around (10, 10).
+            (10, 12, 1.0, 1.0, 40.0),  # Close in velocity, but too far in position.
+            (10, 10, 5.0, 1.0, 30.0),  # Close in position, but too far in velocity.
+            (50, 50, 1.0, 1.0, 20.0),
+            (-1, 11, 1.2, 1.0, 55.0),  # Far from the best, but within the radius of (0, 10).
+            (0, 10, 1.0, 1.0, 10.0),
+        ]
+        trjs = TrajectoryList(len(values))
+        for i, (x, y, vx, vy, lh) in enumerate(values):
+            trjs.set_trajectory(i, make_trajectory(x=x, y=y, vx=vx, vy=vy, lh=lh))
+
+        trjs.filter_duplicates(1.5, 0.5)
+        self.assertEqual(
+            [trjs.get_trajectory(i).lh for i in range(len(trjs))], [60.0, 55.0, 40.0, 30.0, 20.0]
+        )
+
+        # A zero radius only removes exact duplicates.
+        trjs = TrajectoryList(3)
+        for i in range(3):
+            trjs.set_trajectory(i, make_trajectory(x=5, y=5 + (i == 2), vx=1.0, vy=1.0, lh=float(i)))
+        trjs.filter_duplicates(0.0, 0.0)
+        self.assertEqual([trjs.get_trajectory(i).lh for i in range(len(trjs))], [2.0, 1.0])
+
+        self.assertRaises(RuntimeError, trjs.filter_duplicates, -1.0, 1.0)
+        self.assertRaises(RuntimeError, trjs.filter_duplicates, 1.0, -1.0)
+
     @unittest.skipIf(not HAS_GPU, "Skipping test (no GPU detected)")
     def test_move_to_from_gpu(self):
         for i in range(self.max_size):
@@ -1,6 +1,7 @@
 from astropy.io import fits
 from astropy.table import Table
 from astropy.wcs import WCS
+import gc
 import numpy as np
 import os
 from pathlib import Path
@@ -246,6 +247,142 @@ class test_work_unit(unittest.TestCase):
                 self.assertIsNotNone(work2.get_wcs(i))
                 self.assertTrue(wcs_fits_equal(work2.get_wcs(i), self.wcs))
 
+    def test_save_and_load_fits_lazy(self):
+        with tempfile.TemporaryDirectory() as dir_name:
+            file_path = os.path.join(dir_name, "test_workunit_lazy.fits")
+            work = WorkUnit(self.im_stack, self.config, None, self.diff_wcs)
+            work.to_fits(file_path)
+
+            # The metadata is available without loading the images.
+            work2 = WorkUnit.from_fits(file_path, lazy=True, num_workers=2)
+            self.assertFalse(work2.is_loaded)
+            self.assertEqual(len(work2), self.num_images)
+            self.assertEqual(work2.get_all_obstimes(), [2.0 * i + 1.0 for i in range(self.num_images)])
+            self.assertTrue(wcs_fits_equal(work2.get_wcs(1), self.diff_wcs[1]))
+            self.assertEqual(work2.config["num_obs"], self.num_images)
+            self.assertFalse(work2.is_loaded)
+
+            # Accessing the ImageStack loads the data.
+            self.assertEqual(work2.im_stack.img_count(), self.num_images)
+            self.assertTrue(work2.is_loaded)
+            for i in range(self.num_images):
+                li = work2.im_stack.get_single_image(i)
+                li_org = self.im_stack.get_single_image(i)
+                self.assertEqual(li.get_obstime(), 2 * i + 1)
+                self.assertTrue(np.allclose(li.get_science().image, li_org.get_science().image))
+                self.assertTrue(np.allclose(li.get_variance().image, li_org.get_variance().image))
+                self.assertTrue(np.allclose(li.get_mask().image, li_org.get_mask().image))
+                self.assertEqual(li.get_psf().get_dim(), self.p[i].get_dim())
+
+    @unittest.skipIf(not os.path.isdir("/proc/self/fd"), "Requires /proc/self/fd")
+    def test_lazy_close(self):
+        def is_open(file_path):
+            fds = os.listdir("/proc/self/fd")
+            links = []
+            for fd in fds:
+                try:
+                    links.append(os.readlink(os.path.join("/proc/self/fd", fd)))
+                except OSError:
+                    pass
+            return os.path.realpath(file_path) in links
+
+        with tempfile.TemporaryDirectory() as dir_name:
+            file_path = os.path.join(dir_name, "test_workunit_lazy.fits")
+            work = WorkUnit(self.im_stack, self.config, None, self.diff_wcs)
+            work.to_fits(file_path)
+
+            # Closing an inspected, unloaded WorkUnit releases the file.
+            work2 = WorkUnit.from_fits(file_path, lazy=True)
+            self.assertEqual(len(work2), self.num_images)
+            self.assertTrue(is_open(file_path))
+            work2.close()
+            self.assertFalse(is_open(file_path))
+            self.assertFalse(work2.is_loaded)
+            with self.assertRaises(ValueError):
+                work2.im_stack
+            work2.close()
+
+            # As does leaving a with block or dropping the WorkUnit.
+            with WorkUnit.from_fits(file_path, lazy=True) as work3:
+                self.assertEqual(len(work3.get_all_obstimes()), self.num_images)
+                self.assertTrue(is_open(file_path))
+            self.assertFalse(is_open(file_path))
+
+            work4 = WorkUnit.from_fits(file_path, lazy=True)
+            self.assertTrue(is_open(file_path))
+            del work4
+            gc.collect()
+            self.assertFalse(is_open(file_path))
+
+            # Loading the data also releases the file and closing is then a no-op.
+            work5 = WorkUnit.from_fits(file_path, lazy=True)
+            self.assertEqual(work5.im_stack.img_count(), self.num_images)
+            self.assertFalse(is_open(file_path))
+            work5.close()
+            self.assertTrue(work5.is_loaded)
+
+    def _check_images_match(self, stack1, stack2):
+        self.assertEqual(stack1.img_count(), stack2.img_count())
+        for i in range(stack1.img_count()):
+            li1 = stack1.get_single_image(i)
+            li2 = stack2.get_single_image(i)
+            self.assertEqual(li1.get_obstime(), li2.get_obstime())
+            self.assertTrue(np.array_equal(li1.get_science().image, li2.get_science().image, equal_nan=True))
+            self.assertTrue(
+                np.array_equal(li1.get_variance().image, li2.get_variance().image, equal_nan=True)
+            )
+            self.assertTrue(np.array_equal(li1.get_mask().image, li2.get_mask().image))
+            self.assertTrue(np.array_equal(li1.get_psf().get_kernel(), li2.get_psf().get_kernel()))
+
+    def test_save_and_load_binary(self):
+        # Use a multi-bit flag in one mask so it cannot be packed as bits.
+        self.images[2].get_mask().set_pixel(5, 5, 6)
+        self.im_stack = kb.ImageStack(self.images)
+
+        with tempfile.TemporaryDirectory() as dir_name:
+            file_path = os.path.join(dir_name, "test_workunit.kbwu")
+            self.assertRaises(ValueError, WorkUnit.from_binary, file_path)
+
+            work = WorkUnit(self.im_stack, self.config, None, self.diff_wcs)
+            for compression in [None, "zlib"]:
+                work.to_binary(file_path, overwrite=True, compression=compression, num_workers=2)
+                for lazy in [False, True]:
+                    work2 = WorkUnit.from_binary(file_path, lazy=lazy, num_workers=2)
+                    self.assertEqual(work2.is_loaded, not lazy)
+                    self.assertEqual(len(work2), self.num_images)
+                    self.assertEqual(work2.get_all_obstimes(), work.get_all_obstimes())
+                    self._check_images_match(work2.im_stack, self.im_stack)
+
+                    self.assertIsNone(work2.wcs)
+                    for i in range(self.num_images):
+                        self.assertTrue(wcs_fits_equal(work2.get_wcs(i), self.diff_wcs[i]))
+                    self.assertEqual(work2.config["num_obs"], self.num_images)
+                    self.assertDictEqual(work2.config["mask_bits_dict"], {"A": 1, "B": 2})
+
+            self.assertRaises(ValueError, work.to_binary, file_path, True, "unknown")
+
+            # Files that are not binary WorkUnits fail to load.
+            fits_path = os.path.join(dir_name, "test_workunit.fits")
+            work.to_fits(fits_path)
+            self.assertRaises(ValueError, WorkUnit.from_binary, fits_path)
+
+    def test_binary_fits_round_trip(self):
+        with tempfile.TemporaryDirectory() as dir_name:
+            fits_path = os.path.join(dir_name, "test_workunit.fits")
+            bin_path = os.path.join(dir_name, "test_workunit.kbwu")
+            fits_path2 = os.path.join(dir_name, "test_workunit2.fits")
+
+            # Convert FITS -> binary -> FITS.
+            WorkUnit(self.im_stack, self.config, self.wcs, None).to_fits(fits_path)
+            WorkUnit.from_fits(fits_path).to_binary(bin_path)
+            WorkUnit.from_binary(bin_path).to_fits(fits_path2)
+
+            work1 = WorkUnit.from_fits(fits_path)
+            work2 = WorkUnit.from_fits(fits_path2)
+            self._check_images_match(work1.im_stack, work2.im_stack)
+            self.assertTrue(wcs_fits_equal(work2.wcs, self.wcs))
+            self.assertEqual(work1.config._params, work2.config._params)
+
     def test_to_from_yaml(self):
         # Create WorkUnit with only global WCS.
         work = WorkUnit(self.im_stack, self.config, self.wcs, None)
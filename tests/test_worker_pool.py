@@ -0,0 +1,139 @@
+import unittest
+
+import numpy as np
+
+from kbmod.configuration import SearchConfiguration
+from kbmod.fake_data.fake_data_creator import FakeDataSet, create_fake_times
+from kbmod.filters.sigma_g_filter import SigmaGClipping, apply_clipped_sigma_g
+from kbmod.filters.stamp_filters import StampPeakFilter
+from kbmod.filters.stats_filters import LHFilter
+from kbmod.result_list import ColumnarResultList, ResultList, ResultRow
+from kbmod.run_search import SearchRunner
+from kbmod.trajectory_utils import make_trajectory
+from kbmod.worker_pool import WorkerPool
+
+
+def _row_sums(data, offset):
+    return np.sum(data, axis=1) + offset
+
+
+class test_worker_pool(unittest.TestCase):
+    def test_create(self):
+        pool = WorkerPool(2, "process")
+        self.assertEqual(pool.num_workers, 2)
+        self.assertEqual(pool.pool_type, "process")
+        self.assertRaises(ValueError, WorkerPool, 0)
+        self.assertRaises(ValueError, WorkerPool, 2, "gpu")
+
+    def test_map(self):
+        for pool_type in ["thread", "process"]:
+            with WorkerPool(3, pool_type) as pool:
+                self.assertEqual(pool.map(abs, range(-10, 10)), [abs(i) for i in range(-10, 10)])
+
+                # The executor is reused across calls.
+                executor = pool.executor
+                self.assertEqual(pool.map(abs, [-1, -2]), [1, 2])
+                self.assertIs(pool.executor, executor)
+            self.assertIsNone(pool._executor)
+
+    def test_map_rows(self):
+        data = np.arange(60, dtype=np.float32).reshape(20, 3)
+        expected = np.sum(data, axis=1) + 1.0
+        for pool_type in ["thread", "process"]:
+            with WorkerPool(4, pool_type) as pool:
+                self.assertTrue(np.allclose(pool.map_rows(_row_sums, data, 1.0), expected))
+                self.assertTrue(np.allclose(pool.map_rows(_row_sums, data[:2], 1.0), expected[:2]))
+
+    def test_apply_filter_with_pool(self):
+        times = [(10.0 + 0.1 * float(i)) for i in range(5)]
+        for pool_type in ["thread", "process"]:
+            rs = ResultList(times)
+            for i in range(10):
+                rs.append_result(ResultRow(make_trajectory(lh=float(i)), len(times)))
+            with WorkerPool(2, pool_type) as pool:
+                rs.apply_filter(LHFilter(5.5, 7.5), pool=pool)
+            self.assertEqual([row.final_likelihood for row in rs.results], [6.0, 7.0])
+
+    def test_apply_stamp_filter_with_pool(self):
+        times = [(10.0 + 0.1 * float(i)) for i in range(5)]
+        stamps = [np.zeros((5, 5), dtype=np.float32) for _ in range(6)]
+        for i, stamp in enumerate(stamps):
+            stamp[i % 5, 2] = 10.0
+        stamps[5] = None
+
+        for pool_type in ["thread", "process"]:
+            rs = ResultList(times)
+            for i, stamp in enumerate(stamps):
+                row = ResultRow(make_trajectory(x=i), len(times))
+                row.stamp = stamp
+                rs.append_result(row)
+            with WorkerPool(2, pool_type) as pool:
+                rs.apply_filter(StampPeakFilter(2, 1.5, 1.5), pool=pool)
+            self.assertEqual([row.trajectory.x for row in rs.results], [1, 2, 3])
+
+    def test_sigma_g_with_pool(self):
+        rng = np.random.default_rng(10)
+        num_res = 50
+        num_times = 25
+        psi = rng.normal(1.0, 0.5, size=(num_res, num_times)).astype(np.float32)
+        psi[:, 3] = 50.0
+        phi = np.full((num_res, num_times), 0.1, dtype=np.float32)
+        trjs = [make_trajectory() for _ in range(num_res)]
+        times = [float(i) for i in range(num_times)]
+        clipper = SigmaGClipping()
+
+        expected = ColumnarResultList.from_trajectories(trjs, times, psi, phi)
+        apply_clipped_sigma_g(clipper, expected)
+        for pool_type in ["thread", "process"]:
+            res = ColumnarResultList.from_trajectories(trjs, times, psi, phi)
+            with WorkerPool(3, pool_type) as pool:
+                apply_clipped_sigma_g(clipper, res, pool=pool)
+            self.assertTrue(np.array_equal(res.get_column("valid"), expected.get_column("valid")))
+            self.assertFalse(np.any(res.get_column("valid")[:, 3]))
+
+    def test_search_runner_pool(self):
+        runner = SearchRunner()
+        config = SearchConfiguration()
+        self.assertIsNone(runner.get_worker_pool(config))
+
+        config.set("num_cores", 2)
+        pool = runner.get_worker_pool(config)
+        self.assertEqual(pool.num_workers, 2)
+        self.assertEqual(pool.pool_type, "thread")
+        self.assertIs(runner.get_worker_pool(config), pool)
+
+        # Changing the configuration creates a new pool.
+        config.set("pool_type", "process")
+        pool2 = runner.get_worker_pool(config)
+        self.assertIsNot(pool2, pool)
+        self.assertEqual(pool2.pool_type, "process")
+        runner.close()
+        self.assertIsNone(runner._pool)
+
+    def test_search_runner_closes_pool(self):
+        times = create_fake_times(5, 57130.2, 5, 0.01, 1)
+        ds = FakeDataSet(20, 15, times, use_seed=True)
+        config = SearchConfiguration()
+        config.set("num_cores", 2)
+        config.set("v_arr", [0.0, 10.0, 3])
+        config.set("ang_arr", [0.5, 0.5, 3])
+        config.set("average_angle", 0.0)
+        config.set("num_obs", 3)
+
+        # The pool is shut down at the end of each search.
+        runner = SearchRunner()
+        runner.run_search(config, ds.stack)
+        self.assertIsNone(runner._pool)
+
+        # As a context manager, the pool is kept until the context exits.
+        with SearchRunner() as runner:
+            runner.run_search(config, ds.stack)
+            pool = runner._pool
+            self.assertIsNotNone(pool)
+            runner.run_search(config, ds.stack)
+            self.assertIs(runner._pool, pool)
+        self.assertIsNone(runner._pool)
+
+
+if __name__ == "__main__":
+    unittest.main()